@@ -6,7 +6,8 @@ from .models import (
     Invoice, InvoiceItem, Payment, Expense, Account, 
     JournalEntry, JournalEntryLine, PettyCash, Report,
     Journal, AccountingPeriod, AccountBalance, FinancialStatement,
-    ExpenseCategory, ExpenseLineItem, AccountsPayable, AccountsPayableLineItem
+    ExpenseCategory, ExpenseLineItem, AccountsPayable, AccountsPayableLineItem,
+    BankStatement, BankStatementLine, OverdueSweepRun
 )
 
 # Register your models here.
@@ -127,7 +128,7 @@ class JournalEntryLineAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('Line Information', {
-            'fields': ('journal_entry', 'account', 'description')
+            'fields': ('journal_entry', 'account', 'client', 'description')
         }),
         ('Amounts', {
             'fields': ('debit', 'credit')
@@ -321,3 +322,28 @@ class AccountsPayableLineItemAdmin(admin.ModelAdmin):
     search_fields = ['description', 'payable__vendor']
     readonly_fields = ['line_total', 'created_at', 'updated_at']
     ordering = ['payable', 'id']
+
+@admin.register(BankStatement)
+class BankStatementAdmin(admin.ModelAdmin):
+    list_display = ['file_name', 'account', 'file_format', 'start_date', 'end_date', 'imported_by', 'imported_at']
+    list_filter = ['file_format', 'account']
+    search_fields = ['file_name', 'account__code', 'account__name']
+    ordering = ['-imported_at']
+    readonly_fields = ['imported_at']
+
+@admin.register(BankStatementLine)
+class BankStatementLineAdmin(admin.ModelAdmin):
+    list_display = ['date', 'account', 'description', 'reference', 'amount', 'status', 'matched_line', 'matched_payment']
+    list_filter = ['status', 'account']
+    search_fields = ['description', 'reference', 'fit_id']
+    ordering = ['-date', 'id']
+    raw_id_fields = ['statement', 'matched_line', 'matched_payment']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('account', 'matched_line__journal_entry', 'matched_payment')
+
+@admin.register(OverdueSweepRun)
+class OverdueSweepRunAdmin(admin.ModelAdmin):
+    list_display = ['as_of_date', 'invoices_overdue', 'invoices_current', 'payables_overdue', 'ran_at']
+    ordering = ['-ran_at']
+    readonly_fields = ['as_of_date', 'invoices_overdue', 'invoices_current', 'payables_overdue', 'ran_at']
@@ -1,4 +1,5 @@
 from django import forms
+from django.db.models import Q
 from django.forms import ModelForm, inlineformset_factory
 from .models import (
     Invoice, InvoiceItem, Payment, Expense, Account, 
@@ -7,6 +8,7 @@ from .models import (
     ExpenseCategory, ExpenseLineItem, AccountsPayable, AccountsPayableLineItem
 )
 from django.contrib.auth.models import User
+from client_management.models import Client
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
@@ -66,6 +68,11 @@ class InvoiceForm(forms.ModelForm):
             'notes': forms.Textarea(attrs={'rows': 3}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['invoice_number'].required = False
+        self.fields['invoice_number'].help_text = 'Leave blank to assign the next number automatically'
+
 class InvoiceItemForm(forms.ModelForm):
     class Meta:
         model = InvoiceItem
@@ -406,6 +413,192 @@ class PeriodClosingForm(forms.Form):
         widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         help_text="Create reversing entries for next period"
     )
+    dry_run = forms.BooleanField(
+        required=False,
+        initial=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        help_text="Preview the closing entries without closing the period"
+    )
+
+class JournalEntryImportForm(forms.Form):
+    file = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx,.xls'}),
+        help_text="CSV or XLSX with columns entry, date, journal, account, debit, credit"
+    )
+    post_entries = forms.BooleanField(
+        required=False,
+        initial=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        help_text="Post the entries once they are imported"
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        initial=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        help_text="Validate the file without importing it"
+    )
+
+class GeneralLedgerReportForm(forms.Form):
+    date_from = forms.DateField(
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    date_to = forms.DateField(
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    accounts = forms.ModelMultipleChoiceField(
+        queryset=Account.objects.filter(status='ACTIVE').order_by('code'),
+        required=False,
+        widget=forms.SelectMultiple(attrs={'class': 'form-control'}),
+        help_text="Leave empty for all active accounts"
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get('date_from')
+        date_to = cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("Start date must be on or before the end date")
+        return cleaned_data
+
+class ComparativeStatementForm(forms.Form):
+    STATEMENT_TYPE_CHOICES = [
+        ('income-statement', 'Income Statement'),
+        ('balance-sheet', 'Balance Sheet'),
+    ]
+    GRANULARITY_CHOICES = [
+        ('month', 'Monthly'),
+        ('quarter', 'Quarterly'),
+        ('year', 'Yearly'),
+    ]
+    MAX_COLUMNS = 36
+
+    statement_type = forms.ChoiceField(
+        choices=STATEMENT_TYPE_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    granularity = forms.ChoiceField(
+        choices=GRANULARITY_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    date_from = forms.DateField(
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    date_to = forms.DateField(
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get('date_from')
+        date_to = cleaned_data.get('date_to')
+        granularity = cleaned_data.get('granularity')
+        if date_from and date_to:
+            if date_from > date_to:
+                raise forms.ValidationError("Start date must be on or before the end date")
+            months = (date_to.year - date_from.year) * 12 + date_to.month - date_from.month + 1
+            per_column = {'month': 1, 'quarter': 3, 'year': 12}.get(granularity, 1)
+            if months / per_column > self.MAX_COLUMNS:
+                raise forms.ValidationError(f"Choose a range of at most {self.MAX_COLUMNS} columns")
+        return cleaned_data
+
+class PaymentAllocationForm(forms.Form):
+    client = forms.ModelChoiceField(
+        queryset=Client.objects.order_by('name'),
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    amount = forms.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        min_value=Decimal('0.01'),
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'})
+    )
+    payment_date = forms.DateField(
+        initial=timezone.now,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    payment_method = forms.ChoiceField(
+        choices=Payment.PAYMENT_METHOD_CHOICES,
+        initial='BANK_TRANSFER',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    reference_number = forms.CharField(
+        required=False,
+        max_length=100,
+        widget=forms.TextInput(attrs={'class': 'form-control'})
+    )
+    deposit_account = forms.ModelChoiceField(
+        queryset=Account.objects.filter(status='ACTIVE').filter(
+            Q(is_bank_account=True) | Q(is_cash_account=True)
+        ).order_by('code'),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        help_text="Defaults to the first bank account"
+    )
+    invoices = forms.ModelMultipleChoiceField(
+        queryset=Invoice.objects.filter(status__in=['SENT', 'OVERDUE']).select_related('client').order_by('due_date'),
+        required=False,
+        widget=forms.SelectMultiple(attrs={'class': 'form-control'}),
+        help_text="Leave empty to pay the client's oldest invoices first"
+    )
+    notes = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 2})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        client = cleaned_data.get('client')
+        invoices = cleaned_data.get('invoices')
+        if client and invoices:
+            others = [invoice.invoice_number for invoice in invoices if invoice.client_id != client.pk]
+            if others:
+                raise forms.ValidationError(f"Invoices {', '.join(others)} belong to another client")
+        return cleaned_data
+
+class TimeBillingForm(forms.Form):
+    date_from = forms.DateField(
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    date_to = forms.DateField(
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    issue_date = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+        help_text="Defaults to the end of the period"
+    )
+    due_days = forms.IntegerField(
+        min_value=0,
+        max_value=365,
+        initial=30,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+        help_text="Payment terms in days"
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get('date_from')
+        date_to = cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("Start date must be before end date")
+        return cleaned_data
+
+class BankStatementImportForm(forms.Form):
+    account = forms.ModelChoiceField(
+        queryset=Account.objects.filter(status='ACTIVE', is_bank_account=True).order_by('code'),
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    file = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.ofx,.qfx'}),
+        help_text="CSV with date and amount (or deposit/withdrawal) columns, or an OFX/QFX export"
+    )
+    tolerance_days = forms.IntegerField(
+        min_value=0,
+        max_value=31,
+        initial=3,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+        help_text="Days a bank date may differ from the ledger date"
+    )
 
 class AccountBalanceForm(forms.ModelForm):
     class Meta:
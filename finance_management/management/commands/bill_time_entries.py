@@ -0,0 +1,81 @@
+from datetime import datetime
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from finance_management.services import TimeBillingService
+
+class Command(BaseCommand):
+    help = 'Invoice approved billable time entries of a period, one invoice per client'
+
+    def add_arguments(self, parser):
+        parser.add_argument('date_from', help='First day of the billing period (YYYY-MM-DD)')
+        parser.add_argument('date_to', help='Last day of the billing period (YYYY-MM-DD)')
+        parser.add_argument(
+            '--issue-date',
+            help='Invoice date (YYYY-MM-DD, default: last day of the period)'
+        )
+        parser.add_argument(
+            '--due-days',
+            type=int,
+            default=TimeBillingService.DEFAULT_DUE_DAYS,
+            help='Payment terms in days'
+        )
+        parser.add_argument(
+            '--user',
+            help='Username recorded on the journal entry (default: first superuser)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the invoices that would be created without writing anything'
+        )
+
+    def parse_date(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date {value}, expected YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        date_from = self.parse_date(options['date_from'])
+        date_to = self.parse_date(options['date_to'])
+        if date_from > date_to:
+            raise CommandError('date_from must be before date_to')
+        issue_date = self.parse_date(options['issue_date']) if options['issue_date'] else None
+
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if not user:
+                raise CommandError(f"User {options['user']} does not exist")
+        else:
+            user = User.objects.filter(is_superuser=True).first()
+            if not user:
+                raise CommandError('No superuser found, pass --user')
+
+        try:
+            result = TimeBillingService.run(
+                date_from,
+                date_to,
+                user,
+                issue_date=issue_date,
+                due_days=max(options['due_days'], 0),
+                dry_run=options['dry_run'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for label, count in result['unresolved'].items():
+            self.stdout.write(self.style.WARNING(f'  No client or case matches "{label}" ({count} entries)'))
+
+        if options['dry_run']:
+            for draft in result['invoices']:
+                self.stdout.write(f"  {draft['client'].name}: {draft['hours']}h, {draft['total']:,.2f}")
+            self.stdout.write(self.style.SUCCESS(
+                f"Would create {len(result['invoices'])} invoices for {result['total']:,.2f} "
+                f"({result['entries']} time entries)."
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(result['invoices'])} invoices for {result['total']:,.2f} "
+            f"({result['entries']} time entries), journal entry {result['journal_entry'].entry_number}."
+        ))
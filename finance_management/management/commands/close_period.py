@@ -0,0 +1,54 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from finance_management.models import AccountingPeriod
+
+class Command(BaseCommand):
+    help = 'Close an accounting period, posting its closing entry and closing balance snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('period', type=int, help='ID of the accounting period to close')
+        parser.add_argument(
+            '--notes',
+            default='',
+            help='Closing notes recorded on the period'
+        )
+        parser.add_argument(
+            '--user',
+            help='Username recorded as closing the period (default: first superuser)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the closing entry lines without closing the period'
+        )
+
+    def handle(self, *args, **options):
+        period = AccountingPeriod.objects.filter(pk=options['period']).first()
+        if not period:
+            raise CommandError(f"Accounting period {options['period']} does not exist")
+
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if not user:
+                raise CommandError(f"User {options['user']} does not exist")
+        else:
+            user = User.objects.filter(is_superuser=True).first()
+
+        try:
+            result = period.close_period(user, options['notes'], dry_run=options['dry_run'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for line in result['lines']:
+            self.stdout.write(
+                f"  {line['account'].code:<10} {line['description']:<40} "
+                f"{line['debit']:>15,.2f} {line['credit']:>15,.2f}"
+            )
+        self.stdout.write(f"Net income: {result['net_income']:,.2f}")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Dry run: {period.name} was not closed.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Closed {period.name} with entry {result['journal_entry'].entry_number}."
+            ))
@@ -0,0 +1,59 @@
+import os
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from finance_management.services import ClientStatementService
+
+class Command(BaseCommand):
+    help = 'Render monthly client statement PDFs in a process pool and write a manifest'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Statement date (YYYY-MM-DD, default: today); payments are listed from the first of its month'
+        )
+        parser.add_argument(
+            '--client',
+            type=int,
+            action='append',
+            help='Only generate the statement of this client (ID); repeatable'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of rendering processes'
+        )
+        parser.add_argument(
+            '--output-dir',
+            help='Directory for the PDFs (default: MEDIA_ROOT/client_statements/YYYY-MM)'
+        )
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                as_of_date = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f"Invalid date {options['date']}, expected YYYY-MM-DD")
+        else:
+            as_of_date = timezone.now().date()
+
+        try:
+            manifest = ClientStatementService.generate(
+                as_of_date,
+                client_ids=options['client'],
+                workers=max(options['workers'], 1),
+                output_dir=options['output_dir'],
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        failed = [row for row in manifest['statements'] if row['error']]
+        for row in failed:
+            self.stdout.write(self.style.ERROR(f"  {row['client']}: {row['error']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(manifest['statements']) - len(failed)} statements in {manifest['seconds']}s "
+            f"into {manifest['output_dir']}."
+        ))
+        if failed:
+            raise CommandError(f'{len(failed)} statements failed to render')
@@ -0,0 +1,69 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from finance_management.models import Account
+from finance_management.services import BankReconciliationService, BankStatementImportError
+
+class Command(BaseCommand):
+    help = 'Import a CSV or OFX bank statement into a bank account and reconcile it against the ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV, OFX or QFX file to import')
+        parser.add_argument(
+            '--account',
+            required=True,
+            help='Code of the bank account the statement belongs to'
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'ofx'],
+            help='File format (default: detected from the file)'
+        )
+        parser.add_argument(
+            '--user',
+            help='Username recorded as the importer (default: first superuser)'
+        )
+        parser.add_argument(
+            '--tolerance-days',
+            type=int,
+            default=BankReconciliationService.DEFAULT_TOLERANCE_DAYS,
+            help='Days a bank date may differ from the ledger date'
+        )
+        parser.add_argument(
+            '--no-match',
+            action='store_true',
+            help='Only import the lines, do not run the matcher'
+        )
+
+    def handle(self, *args, **options):
+        account = Account.objects.filter(code=options['account']).first()
+        if not account:
+            raise CommandError(f"Account {options['account']} does not exist")
+
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if not user:
+                raise CommandError(f"User {options['user']} does not exist")
+        else:
+            user = User.objects.filter(is_superuser=True).first()
+
+        try:
+            with open(options['path'], 'rb') as handle:
+                result = BankReconciliationService.import_statement(
+                    handle,
+                    account,
+                    user,
+                    filename=options['path'],
+                    file_format=options['format'],
+                    match=not options['no_match'],
+                    tolerance_days=max(options['tolerance_days'], 0),
+                )
+        except (OSError, BankStatementImportError) as e:
+            raise CommandError(str(e))
+
+        if result['duplicates']:
+            self.stdout.write(self.style.WARNING(f"  Skipped {result['duplicates']} lines already imported"))
+        self.stdout.write(self.style.SUCCESS(f"Imported {result['imported']} statement lines into {account.code}."))
+        if not options['no_match']:
+            self.stdout.write(
+                f"  {result['matched']} matched, {result['review']} to review, {result['unmatched']} unmatched"
+            )
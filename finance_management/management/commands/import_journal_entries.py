@@ -0,0 +1,71 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from finance_management.services import JournalEntryImportError, JournalEntryImportService
+
+class Command(BaseCommand):
+    help = 'Bulk import journal entries from a CSV or XLSX file (one row per line, grouped by the entry column)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file to import')
+        parser.add_argument(
+            '--user',
+            help='Username recorded as the creator (default: first superuser)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of entries written per transaction'
+        )
+        parser.add_argument(
+            '--post',
+            action='store_true',
+            help='Post the imported entries after writing them'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file without writing anything'
+        )
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if not user:
+                raise CommandError(f"User {options['user']} does not exist")
+        else:
+            user = User.objects.filter(is_superuser=True).first()
+            if not user:
+                raise CommandError('No superuser found, pass --user')
+
+        try:
+            with open(options['path'], 'rb') as handle:
+                result = JournalEntryImportService.run(
+                    handle,
+                    user,
+                    filename=options['path'],
+                    chunk_size=max(options['chunk_size'], 1),
+                    post=options['post'],
+                    dry_run=options['dry_run'],
+                )
+        except (OSError, JournalEntryImportError) as e:
+            raise CommandError(str(e))
+
+        if result['errors']:
+            for error in result['errors']:
+                self.stdout.write(self.style.ERROR(
+                    f"  Row {error['row']} (entry {error['entry'] or '-'}): {error['message']}"
+                ))
+            raise CommandError(f"{len(result['errors'])} validation errors, nothing was imported")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f"File is valid: {result['entries']} entries, {result['lines']} lines."
+            ))
+            return
+
+        for entry_number, reason in result['skipped'].items():
+            self.stdout.write(self.style.WARNING(f'  Not posted {entry_number}: {reason}'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['entries']} journal entries ({result['lines']} lines, {result['posted']} posted)."
+        ))
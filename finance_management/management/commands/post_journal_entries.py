@@ -0,0 +1,72 @@
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from finance_management.models import JournalEntry
+
+class Command(BaseCommand):
+    help = 'Post draft journal entries in batches, one transaction per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'entry_ids',
+            nargs='*',
+            type=int,
+            help='IDs of the draft journal entries to post (default: all drafts)'
+        )
+        parser.add_argument(
+            '--journal',
+            help='Only post drafts of the journal with this code'
+        )
+        parser.add_argument(
+            '--date-to',
+            help='Only post drafts dated on or before this date (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--user',
+            help='Username recorded as the poster (default: first superuser)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of entries posted per transaction'
+        )
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if not user:
+                raise CommandError(f"User {options['user']} does not exist")
+        else:
+            user = User.objects.filter(is_superuser=True).first()
+            if not user:
+                raise CommandError('No superuser found, pass --user')
+
+        drafts = JournalEntry.objects.filter(status='DRAFT')
+        if options['entry_ids']:
+            drafts = drafts.filter(pk__in=options['entry_ids'])
+        if options['journal']:
+            drafts = drafts.filter(journal__code=options['journal'])
+        if options['date_to']:
+            try:
+                date_to = datetime.strptime(options['date_to'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--date-to must be in YYYY-MM-DD format')
+            drafts = drafts.filter(date__lte=date_to)
+
+        entry_ids = list(drafts.order_by('date', 'id').values_list('id', flat=True))
+        batch_size = max(options['batch_size'], 1)
+
+        total_posted = 0
+        total_skipped = 0
+        for start in range(0, len(entry_ids), batch_size):
+            posted, skipped = JournalEntry.post_entries(entry_ids[start:start + batch_size], user)
+            total_posted += len(posted)
+            total_skipped += len(skipped)
+            for entry_number, reason in skipped.items():
+                self.stdout.write(self.style.WARNING(f'  Skipped {entry_number}: {reason}'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Posted {total_posted} journal entries ({total_skipped} skipped).'
+        ))
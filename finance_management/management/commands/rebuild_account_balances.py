@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from finance_management.models import AccountingPeriod, AccountBalance
+
+class Command(BaseCommand):
+    help = 'Rebuild per-period account balance snapshots from posted journal entry lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period',
+            type=int,
+            help='Only rebuild the snapshots of this accounting period (ID)'
+        )
+        parser.add_argument(
+            '--closed-only',
+            action='store_true',
+            help='Only rebuild closed and locked periods'
+        )
+
+    def handle(self, *args, **options):
+        periods = AccountingPeriod.objects.all()
+
+        if options['period']:
+            periods = periods.filter(pk=options['period'])
+            if not periods.exists():
+                raise CommandError(f"Accounting period {options['period']} does not exist")
+        elif options['closed_only']:
+            periods = periods.filter(status__in=['CLOSED', 'LOCKED'])
+
+        total = 0
+        for period in periods.order_by('start_date'):
+            with transaction.atomic():
+                count = AccountBalance.rebuild_for_period(period)
+            total += count
+            self.stdout.write(f'  {period.name}: {count} account balances')
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} account balance snapshots.'))
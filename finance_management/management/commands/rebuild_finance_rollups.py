@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from finance_management.models import FinanceDailyRollup
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily finance rollups behind the finance dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--metric',
+            action='append',
+            help='Only rebuild this metric (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        metrics = options['metric']
+        valid = [choice[0] for choice in FinanceDailyRollup.METRIC_CHOICES]
+        for metric in metrics or []:
+            if metric not in valid:
+                raise CommandError(f"Unknown metric {metric}, choose from {', '.join(valid)}")
+
+        written = FinanceDailyRollup.rebuild(metrics)
+        for metric, count in written.items():
+            self.stdout.write(f'  {metric}: {count} rows')
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {sum(written.values())} finance rollup rows.'))
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from finance_management.services import ReportGenerationService
+
+class Command(BaseCommand):
+    help = 'Generate queued finance reports in the background'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling for new reports'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5.0,
+            help='Seconds to wait between polls when the queue is empty'
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=0,
+            help='Exit after generating this many reports (default: no limit)'
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        self.stdout.write('Report worker started.')
+
+        try:
+            while not options['max_jobs'] or processed < options['max_jobs']:
+                report = ReportGenerationService.process_next()
+                if report is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                processed += 1
+                if report.status == 'completed':
+                    self.stdout.write(self.style.SUCCESS(
+                        f'  {report.name}: {report.file_path} ({report.file_size} bytes)'
+                    ))
+                else:
+                    self.stdout.write(self.style.ERROR(f'  {report.name}: {report.error_message}'))
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'Report worker stopped after {processed} reports.'))
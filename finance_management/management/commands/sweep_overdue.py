@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from finance_management.services import OverdueSweepService
+
+class Command(BaseCommand):
+    help = 'Move past-due invoices and payables to OVERDUE with set-based updates (safe to run repeatedly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Treat this date as today (YYYY-MM-DD)'
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--date must be in YYYY-MM-DD format')
+
+        result = OverdueSweepService.sweep(today)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Overdue sweep as of {result['as_of_date']}: "
+            f"{result['invoices_overdue']} invoices marked overdue, "
+            f"{result['invoices_current']} invoices back to sent, "
+            f"{result['payables_overdue']} payables marked overdue."
+        ))
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+from finance_management.services import LedgerVerificationService
+
+class Command(BaseCommand):
+    help = 'Recompute account balances from posted journal lines and report (or repair) drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='Rewrite drifted current balances, snapshots and entry totals'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Maximum number of findings listed per check'
+        )
+
+    def handle(self, *args, **options):
+        report = LedgerVerificationService.verify()
+        limit = max(options['limit'], 0)
+
+        self.stdout.write(
+            f"Checked {report['accounts_checked']} accounts and {report['snapshots_checked']} balance snapshots."
+        )
+
+        mismatches = report['account_mismatches']
+        if mismatches:
+            self.stdout.write(self.style.WARNING(f'{len(mismatches)} accounts with a drifted current balance:'))
+            for row in mismatches[:limit]:
+                self.stdout.write(
+                    f"  {row['code']} {row['name']}: stored {row['current_balance']}, "
+                    f"ledger {row['expected']} (off by {row['difference']})"
+                )
+
+        mismatches = report['snapshot_mismatches']
+        if mismatches:
+            self.stdout.write(self.style.WARNING(f'{len(mismatches)} balance snapshots out of date:'))
+            for row in mismatches[:limit]:
+                self.stdout.write(
+                    f"  {row['code']} {row['period']}: stored closing {row['stored']['closing_balance']}, "
+                    f"ledger {row['expected']['closing_balance']}"
+                )
+
+        entries = report['unbalanced_entries']
+        if entries:
+            self.stdout.write(self.style.WARNING(f'{len(entries)} posted entries with inconsistent totals:'))
+            for row in entries[:limit]:
+                self.stdout.write(f"  {row['entry_number']} ({row['date']}): {', '.join(row['reasons'])}")
+
+        if report['ok']:
+            self.stdout.write(self.style.SUCCESS('Ledger is consistent.'))
+            return
+
+        if not options['repair']:
+            raise CommandError('Ledger drift found, run with --repair to fix it')
+
+        repaired = LedgerVerificationService.repair(report)
+        self.stdout.write(self.style.SUCCESS(
+            f"Repaired {repaired['accounts']} account balances, {repaired['periods']} periods "
+            f"and {repaired['entries']} entry totals."
+        ))
+
+        unrepairable = [row['entry_number'] for row in entries if not row['repairable']]
+        if unrepairable:
+            raise CommandError(
+                f"{len(unrepairable)} entries have unbalanced lines and need manual correction: "
+                f"{', '.join(unrepairable[:limit])}"
+            )
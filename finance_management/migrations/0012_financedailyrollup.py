@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2025-09-15 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance_management', '0011_auto_20250901_1427'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinanceDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('metric', models.CharField(choices=[('PAYMENT', 'Payments by Method'), ('CLIENT_PAYMENT', 'Payments by Client'), ('PAYMENT_TIME', 'Payment Time'), ('EXPENSE', 'Expenses by Category'), ('INVOICE', 'Invoices by Status'), ('PAYABLE', 'Accounts Payable by Status')], max_length=20)),
+                ('dimension', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(blank=True, max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Finance Daily Rollups',
+                'ordering': ['date', 'metric'],
+                'indexes': [models.Index(fields=['metric', 'date'], name='finance_man_metric_bb398a_idx')],
+                'unique_together': {('date', 'metric', 'dimension', 'status')},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2025-09-17 10:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_management', '0005_alter_client_code_case_casedocument_caseupdate'),
+        ('finance_management', '0014_bank_reconciliation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journalentryline',
+            name='client',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='journal_lines', to='client_management.client'),
+        ),
+    ]
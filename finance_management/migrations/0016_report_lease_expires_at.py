@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2025-09-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance_management', '0015_journalentryline_client'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2025-09-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance_management', '0016_report_lease_expires_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverdueSweepRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of_date', models.DateField()),
+                ('invoices_overdue', models.PositiveIntegerField(default=0)),
+                ('invoices_current', models.PositiveIntegerField(default=0)),
+                ('payables_overdue', models.PositiveIntegerField(default=0)),
+                ('ran_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Overdue Sweep Runs',
+                'ordering': ['-ran_at'],
+            },
+        ),
+    ]
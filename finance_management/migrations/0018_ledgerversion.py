@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2025-09-19 09:40
+
+from django.db import migrations, models
+
+
+def create_counter(apps, schema_editor):
+    apps.get_model('finance_management', 'LedgerVersion').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance_management', '0017_overduesweeprun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Ledger Version',
+            },
+        ),
+        migrations.RunPython(create_counter, migrations.RunPython.noop),
+    ]
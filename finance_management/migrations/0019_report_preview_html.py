@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2025-09-19 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance_management', '0018_ledgerversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='preview_html',
+            field=models.TextField(blank=True),
+        ),
+    ]
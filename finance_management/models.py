@@ -1,8 +1,15 @@
-from django.db import models
+from django.db import connection, models, transaction, IntegrityError
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.conf import settings
 from client_management.models import Client
 from django.contrib.auth.models import User
+from contextlib import contextmanager
+from datetime import timedelta
 from decimal import Decimal
+import os
+import threading
 import uuid
 
 class Account(models.Model):
@@ -93,28 +100,60 @@ class Account(models.Model):
             return f"(${abs(balance):,.2f})"
     
     def get_balance_as_of_date(self, as_of_date):
-        """Get account balance as of a specific date"""
-        from .models import JournalEntryLine
+        """Get account balance as of a specific date
+
+        Starts from the closing snapshot of the last closed period ending on or
+        before the date, so only lines posted after that period are summed.
+        """
+        from .models import JournalEntryLine, AccountBalance
         
-        # Get all journal entry lines up to the date
         lines = JournalEntryLine.objects.filter(
             account=self,
             journal_entry__date__lte=as_of_date,
-            journal_entry__status='POSTED'
+            journal_entry__status__in=JournalEntry.LEDGER_STATUSES
         )
         
-        # Calculate balance
-        total_debit = lines.aggregate(total=models.Sum('debit'))['total'] or Decimal('0.00')
-        total_credit = lines.aggregate(total=models.Sum('credit'))['total'] or Decimal('0.00')
+        snapshot = AccountBalance.objects.filter(
+            account=self,
+            period__status__in=['CLOSED', 'LOCKED'],
+            period__end_date__lte=as_of_date
+        ).select_related('period').order_by('-period__end_date').first()
+        
+        if snapshot:
+            balance = snapshot.closing_balance
+            lines = lines.filter(journal_entry__date__gt=snapshot.period.end_date)
+        else:
+            balance = self.opening_balance
         
-        # Add opening balance
-        balance = self.opening_balance + total_debit - total_credit
+        totals = lines.aggregate(debit=Sum('debit'), credit=Sum('credit'))
+        balance += (totals['debit'] or Decimal('0.00')) - (totals['credit'] or Decimal('0.00'))
         
         # Adjust for normal balance side
         if self.normal_balance == 'CREDIT':
             balance = -balance
             
         return balance
+    
+    @classmethod
+    def apply_movements(cls, movements):
+        """
+        Apply posted movements to current balances with one UPDATE per account.
+        
+        ``movements`` maps account ids to ``(debit, credit)`` totals. The
+        increment is evaluated in the database with F() so concurrent postings
+        to the same account cannot overwrite each other.
+        """
+        for account_id, (debit, credit) in movements.items():
+            net = (debit or Decimal('0.00')) - (credit or Decimal('0.00'))
+            if not net:
+                continue
+            cls.objects.filter(pk=account_id).update(
+                current_balance=F('current_balance') + Case(
+                    When(normal_balance='CREDIT', then=Value(-net)),
+                    default=Value(net),
+                    output_field=models.DecimalField(max_digits=15, decimal_places=2)
+                )
+            )
 
 class Journal(models.Model):
     JOURNAL_TYPE_CHOICES = [
@@ -149,9 +188,10 @@ class Journal(models.Model):
     def __str__(self):
         return f'{self.code} - {self.name}'
     
-    def get_next_entry_number(self):
-        """Get the next available entry number for this journal"""
-        return f"{self.code}-{self.next_number:06d}"
+    def get_next_entry_number(self, date=None):
+        """Allocate the next entry number of this journal for the month of ``date``"""
+        from .services import NumberingService
+        return NumberingService.next_number('JE', date=date, prefix=self.code)
 
 class AccountingPeriod(models.Model):
     STATUS_CHOICES = [
@@ -192,78 +232,149 @@ class AccountingPeriod(models.Model):
         """Check if period can be closed"""
         return self.status == 'OPEN' and not self.is_current
     
-    def close_period(self, closed_by_user, notes=""):
-        """Close the accounting period"""
+    def close_period(self, closed_by_user, notes="", dry_run=False):
+        """
+        Close the accounting period.
+        
+        With ``dry_run`` nothing is written and the closing preview is returned.
+        Otherwise the status change, the closing entry and the closing account
+        balance snapshots are written in one transaction.
+        """
         if not self.is_closable:
             raise ValueError("Period cannot be closed")
         
-        self.status = 'CLOSED'
-        self.closed_by = closed_by_user
-        self.closed_at = timezone.now()
-        self.closing_notes = notes
-        self.save()
+        if dry_run:
+            return self.get_closing_preview()
         
-        # Create closing entries
-        self.create_closing_entries()
-    
-    def create_closing_entries(self):
-        """Create closing entries for revenue and expense accounts"""
-        from .models import JournalEntry, JournalEntryLine
+        with transaction.atomic():
+            # Lock the period so it cannot be closed twice concurrently
+            locked = AccountingPeriod.objects.select_for_update().get(pk=self.pk)
+            if locked.status != 'OPEN':
+                raise ValueError("Period cannot be closed")
+            
+            self.status = 'CLOSED'
+            self.closed_by = closed_by_user
+            self.closed_at = timezone.now()
+            self.closing_notes = notes
+            self.save()
+            
+            # Create closing entries
+            return self.create_closing_entries()
+    
+    def get_closing_preview(self):
+        """
+        Compute the closing lines for revenue and expense accounts without
+        writing anything. Balances of every account come from one grouped
+        aggregate over the ledger.
+        """
+        from .services import FinancialStatementService
         
-        # Get revenue and expense accounts
-        revenue_accounts = Account.objects.filter(account_type='REVENUE', status='ACTIVE')
-        expense_accounts = Account.objects.filter(account_type='EXPENSE', status='ACTIVE')
+        rows = FinancialStatementService.get_account_balances(
+            self.end_date,
+            Account.objects.filter(account_type__in=['REVENUE', 'EXPENSE'], status='ACTIVE')
+        )
+        
+        lines = []
+        total_revenue = Decimal('0.00')
+        total_expenses = Decimal('0.00')
+        for row in rows:
+            balance = row['balance']
+            if row['account_type'] == 'REVENUE':
+                total_revenue += balance
+                # Revenue carries a credit balance, so it is closed with a debit
+                amount = balance
+            else:
+                total_expenses += balance
+                amount = -balance
+            if amount == 0:
+                continue
+            lines.append({
+                'account': row['account'],
+                'description': f"Close {row['name']}",
+                'debit': amount if amount > 0 else Decimal('0.00'),
+                'credit': -amount if amount < 0 else Decimal('0.00'),
+            })
         
-        # Calculate totals
-        total_revenue = sum(acc.get_balance_as_of_date(self.end_date) for acc in revenue_accounts)
-        total_expenses = sum(acc.get_balance_as_of_date(self.end_date) for acc in expense_accounts)
         net_income = total_revenue - total_expenses
         
-        # Create closing journal entry
-        closing_je = JournalEntry.objects.create(
-            journal=Journal.objects.get(code='CLOSING'),
-            entry_number=f"CLOSE-{self.name.replace(' ', '-')}",
-            date=self.end_date,
-            description=f"Closing entries for {self.name}",
-            reference=f"PERIOD-{self.id}",
-            status='POSTED',
-            created_by=self.closed_by
-        )
+        # Close to retained earnings
+        retained_earnings = Account.objects.filter(code='3000').first()  # Assuming 3000 is retained earnings
+        if retained_earnings and net_income != 0:
+            lines.append({
+                'account': retained_earnings,
+                'description': f"Net income for {self.name}",
+                'debit': abs(net_income) if net_income < 0 else Decimal('0.00'),
+                'credit': net_income if net_income > 0 else Decimal('0.00'),
+            })
         
-        # Close revenue accounts
-        for account in revenue_accounts:
-            balance = account.get_balance_as_of_date(self.end_date)
-            if balance != 0:
-                JournalEntryLine.objects.create(
-                    journal_entry=closing_je,
-                    account=account,
-                    description=f"Close {account.name}",
-                    debit=balance,
-                    credit=0.00
-                )
+        return {
+            'period': self,
+            'lines': lines,
+            'total_revenue': total_revenue,
+            'total_expenses': total_expenses,
+            'net_income': net_income,
+            'total_debit': sum((line['debit'] for line in lines), Decimal('0.00')),
+            'total_credit': sum((line['credit'] for line in lines), Decimal('0.00')),
+        }
+    
+    def create_closing_entries(self):
+        """
+        Create closing entries for revenue and expense accounts and write the
+        closing balance snapshot of every account for this period.
+        """
+        from .models import JournalEntry, JournalEntryLine
         
-        # Close expense accounts
-        for account in expense_accounts:
-            balance = account.get_balance_as_of_date(self.end_date)
-            if balance != 0:
-                JournalEntryLine.objects.create(
+        preview = self.get_closing_preview()
+        
+        with transaction.atomic():
+            # Create closing journal entry
+            closing_je = JournalEntry.objects.create(
+                journal=Journal.objects.get(code='CLOSING'),
+                entry_number=f"CLOSE-{self.name.replace(' ', '-')}",
+                date=self.end_date,
+                description=f"Closing entries for {self.name}",
+                reference=f"PERIOD-{self.id}",
+                status='POSTED',
+                period=self,
+                total_debit=preview['total_debit'],
+                total_credit=preview['total_credit'],
+                created_by=self.closed_by
+            )
+            
+            JournalEntryLine.objects.bulk_create([
+                JournalEntryLine(
                     journal_entry=closing_je,
-                    account=account,
-                    description=f"Close {account.name}",
-                    debit=0.00,
-                    credit=balance
+                    account=line['account'],
+                    description=line['description'],
+                    debit=line['debit'],
+                    credit=line['credit'],
+                    is_closing=True
                 )
+                for line in preview['lines']
+            ])
+            
+            # The closing entry is posted, so its lines move current balances too
+            movements = {}
+            for line in preview['lines']:
+                debit, credit = movements.get(line['account'].pk, (Decimal('0.00'), Decimal('0.00')))
+                movements[line['account'].pk] = (debit + line['debit'], credit + line['credit'])
+            Account.apply_movements(movements)
+            
+            # Snapshots of this period are rebuilt in bulk with the closing entry
+            # included; snapshots of later periods shift by its net movement
+            AccountBalance.rebuild_for_period(self)
+            if AccountBalance.objects.filter(period__start_date__gt=self.end_date).exists():
+                for line in preview['lines']:
+                    AccountBalance.objects.filter(
+                        account=line['account'],
+                        period__start_date__gt=self.end_date
+                    ).update(
+                        opening_balance=F('opening_balance') + line['debit'] - line['credit'],
+                        closing_balance=F('closing_balance') + line['debit'] - line['credit']
+                    )
         
-        # Close to retained earnings
-        retained_earnings = Account.objects.filter(code='3000').first()  # Assuming 3000 is retained earnings
-        if retained_earnings:
-            JournalEntryLine.objects.create(
-                journal_entry=closing_je,
-                account=retained_earnings,
-                description=f"Net income for {self.name}",
-                debit=0.00 if net_income >= 0 else abs(net_income),
-                credit=net_income if net_income >= 0 else 0.00
-            )
+        preview['journal_entry'] = closing_je
+        return preview
 
 class JournalEntry(models.Model):
     STATUS_CHOICES = [
@@ -273,6 +384,10 @@ class JournalEntry(models.Model):
         ('VOID', 'Void'),
     ]
     
+    # Statuses whose lines make up the ledger. A reversed entry stays in it and
+    # is cancelled by its posted reversing entry.
+    LEDGER_STATUSES = ['POSTED', 'REVERSED']
+    
     journal = models.ForeignKey(Journal, on_delete=models.CASCADE, related_name='entries')
     entry_number = models.CharField(max_length=50, unique=True)
     date = models.DateField(default=timezone.now)
@@ -306,6 +421,11 @@ class JournalEntry(models.Model):
     
     def __str__(self):
         return f'{self.entry_number} - {self.description[:50]}'
+
+    def save(self, *args, **kwargs):
+        if not self.entry_number:
+            self.entry_number = self.journal.get_next_entry_number(self.date)
+        super().save(*args, **kwargs)
     
     def is_balanced(self):
         """Check if debits equal credits"""
@@ -319,65 +439,151 @@ class JournalEntry(models.Model):
         if not self.is_balanced():
             raise ValueError("Entry must be balanced before posting")
         
-        self.status = 'POSTED'
-        self.posted_by = posted_by_user
-        self.posted_at = timezone.now()
-        self.save()
+        with transaction.atomic():
+            # Lock the row so the same entry cannot be posted twice concurrently
+            status = JournalEntry.objects.select_for_update().filter(pk=self.pk).values_list('status', flat=True).first()
+            if status != 'DRAFT':
+                raise ValueError("Only draft entries can be posted")
+            
+            self.status = 'POSTED'
+            self.posted_by = posted_by_user
+            self.posted_at = timezone.now()
+            self.save()
+            
+            # Update account balances
+            self.update_account_balances()
+            self.update_period_balances()
+    
+    @classmethod
+    def post_entries(cls, entry_ids, posted_by_user):
+        """
+        Post many draft entries in one transaction.
         
-        # Update account balances
-        self.update_account_balances()
-    
-    def update_account_balances(self):
-        """Update account balances when entry is posted"""
-        for line in self.lines.all():
-            account = line.account
+        Line movements of the whole batch are aggregated per account, so each
+        touched account gets a single balance UPDATE however many entries hit
+        it. Entries that are not drafts or not balanced are skipped. Returns a
+        ``(posted, skipped)`` pair: the posted entry numbers and a mapping of
+        skipped entry numbers to the reason.
+        """
+        skipped = {}
+        
+        with transaction.atomic():
+            entries = list(
+                cls.objects.select_for_update()
+                .filter(pk__in=entry_ids)
+                .only('id', 'entry_number', 'date', 'status', 'total_debit', 'total_credit')
+                .order_by('date', 'id')
+            )
             
-            if line.debit > 0:
-                if account.normal_balance == 'DEBIT':
-                    account.current_balance += line.debit
-                else:
-                    account.current_balance -= line.debit
-            else:
-                if account.normal_balance == 'DEBIT':
-                    account.current_balance -= line.credit
+            drafts = []
+            for entry in entries:
+                if entry.status != 'DRAFT':
+                    skipped[entry.entry_number] = "Only draft entries can be posted"
+                elif not entry.is_balanced():
+                    skipped[entry.entry_number] = "Entry must be balanced before posting"
                 else:
-                    account.current_balance += line.credit
+                    drafts.append(entry)
             
-            account.save()
+            if not drafts:
+                return [], skipped
+            
+            posted_ids = [entry.pk for entry in drafts]
+            now = timezone.now()
+            cls.objects.filter(pk__in=posted_ids).update(
+                status='POSTED',
+                posted_by=posted_by_user,
+                posted_at=now,
+                updated_at=now
+            )
+            
+            lines = JournalEntryLine.objects.filter(journal_entry_id__in=posted_ids)
+            
+            movements = lines.values('account_id').annotate(debit=Sum('debit'), credit=Sum('credit'))
+            Account.apply_movements({row['account_id']: (row['debit'], row['credit']) for row in movements})
+            
+            # Period snapshots are applied date by date; entries dated later are
+            # still pending, so snapshots computed from the ledger must skip them
+            by_date = {}
+            for row in lines.values('journal_entry__date', 'account_id').annotate(debit=Sum('debit'), credit=Sum('credit')):
+                by_date.setdefault(row['journal_entry__date'], {})[row['account_id']] = (row['debit'], row['credit'])
+            
+            for entry_date in sorted(by_date):
+                pending = [entry.pk for entry in drafts if entry.date >= entry_date]
+                AccountBalance.record_movements(entry_date, by_date[entry_date], exclude_entries=pending)
+            
+            # Status was changed with update(), which sends no signals
+            from .services import bump_ledger_version
+            bump_ledger_version()
+        
+        return [entry.entry_number for entry in drafts], skipped
+    
+    def update_account_balances(self):
+        """Update account balances when entry is posted"""
+        movements = self.lines.values('account_id').annotate(
+            debit=Sum('debit'),
+            credit=Sum('credit')
+        )
+        Account.apply_movements({row['account_id']: (row['debit'], row['credit']) for row in movements})
+    
+    def update_period_balances(self):
+        """Apply this entry's lines to the per-period account snapshots once it is POSTED"""
+        movements = self.lines.values('account_id').annotate(
+            debit=Sum('debit'),
+            credit=Sum('credit')
+        )
+        AccountBalance.record_movements(
+            self.date,
+            {row['account_id']: (row['debit'], row['credit']) for row in movements},
+            exclude_entries=[self.pk]
+        )
     
     def reverse_entry(self, reversed_by_user, reason=""):
         """Reverse the journal entry"""
         if self.status != 'POSTED':
             raise ValueError("Only posted entries can be reversed")
         
-        # Create reversing entry
-        reversing_je = JournalEntry.objects.create(
-            journal=self.journal,
-            entry_number=f"REV-{self.entry_number}",
-            date=timezone.now().date(),
-            description=f"Reversal of {self.entry_number}",
-            reference=f"REV-{self.reference}",
-            status='POSTED',
-            period=self.period,
-            created_by=reversed_by_user
-        )
-        
-        # Create reversing lines
-        for line in self.lines.all():
-            JournalEntryLine.objects.create(
-                journal_entry=reversing_je,
-                account=line.account,
-                description=f"Reverse {line.description}",
-                debit=line.credit,
-                credit=line.debit
+        with transaction.atomic():
+            # Lock the row so the same entry cannot be reversed twice concurrently
+            status = JournalEntry.objects.select_for_update().filter(pk=self.pk).values_list('status', flat=True).first()
+            if status != 'POSTED':
+                raise ValueError("Only posted entries can be reversed")
+            
+            # Create reversing entry
+            reversing_je = JournalEntry.objects.create(
+                journal=self.journal,
+                entry_number=f"REV-{self.entry_number}",
+                date=timezone.now().date(),
+                description=f"Reversal of {self.entry_number}",
+                reference=f"REV-{self.reference}",
+                status='POSTED',
+                period=self.period,
+                total_debit=self.total_credit,
+                total_credit=self.total_debit,
+                created_by=reversed_by_user
             )
-        
-        # Mark original as reversed
-        self.status = 'REVERSED'
-        self.reversed_by = reversed_by_user
-        self.reversed_at = timezone.now()
-        self.reversal_reason = reason
-        self.save()
+            
+            # Create reversing lines
+            for line in self.lines.all():
+                JournalEntryLine.objects.create(
+                    journal_entry=reversing_je,
+                    account=line.account,
+                    description=f"Reverse {line.description}",
+                    debit=line.credit,
+                    credit=line.debit,
+                    client_id=line.client_id
+                )
+            
+            # The original stays in the ledger (see LEDGER_STATUSES), so the
+            # reversal alone cancels it
+            reversing_je.update_account_balances()
+            reversing_je.update_period_balances()
+            
+            # Mark original as reversed
+            self.status = 'REVERSED'
+            self.reversed_by = reversed_by_user
+            self.reversed_at = timezone.now()
+            self.reversal_reason = reason
+            self.save()
         
         return reversing_je
 
@@ -387,6 +593,7 @@ class JournalEntryLine(models.Model):
     description = models.CharField(max_length=255, blank=True)
     debit = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
     credit = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    client = models.ForeignKey(Client, on_delete=models.SET_NULL, null=True, blank=True, related_name='journal_lines')
     
     # Line properties
     is_adjustment = models.BooleanField(default=False)
@@ -441,6 +648,141 @@ class AccountBalance(models.Model):
         """Calculate closing balance"""
         self.closing_balance = self.opening_balance + self.net_movement
         self.save()
+    
+    @classmethod
+    def record_movements(cls, entry_date, movements, exclude_entries=None):
+        """
+        Incrementally apply posted movements dated ``entry_date``.
+        
+        ``movements`` maps account ids to ``(debit, credit)`` totals. Snapshots of
+        every period covering the date absorb the movement; snapshots of later
+        periods shift their opening and closing balances by the net amount.
+        Missing snapshots are computed from the ledger, ignoring the entry ids in
+        ``exclude_entries`` so the movement being applied is not counted twice.
+        """
+        periods = list(AccountingPeriod.objects.filter(
+            start_date__lte=entry_date,
+            end_date__gte=entry_date
+        ))
+        
+        with transaction.atomic():
+            for account_id, (debit, credit) in movements.items():
+                debit = debit or Decimal('0.00')
+                credit = credit or Decimal('0.00')
+                net = debit - credit
+                
+                for period in periods:
+                    cls.get_or_compute(account_id, period, exclude_entries=exclude_entries)
+                    cls.objects.filter(account_id=account_id, period=period).update(
+                        period_debits=F('period_debits') + debit,
+                        period_credits=F('period_credits') + credit,
+                        closing_balance=F('closing_balance') + net
+                    )
+                
+                if net:
+                    cls.objects.filter(
+                        account_id=account_id,
+                        period__start_date__gt=entry_date
+                    ).update(
+                        opening_balance=F('opening_balance') + net,
+                        closing_balance=F('closing_balance') + net
+                    )
+    
+    @classmethod
+    def get_or_compute(cls, account_id, period, exclude_entries=None):
+        """Get the snapshot for an account and period, computing it from the ledger if missing"""
+        snapshot = cls.objects.filter(account_id=account_id, period=period).first()
+        if snapshot:
+            return snapshot
+        
+        lines = JournalEntryLine.objects.filter(
+            account_id=account_id,
+            journal_entry__status__in=JournalEntry.LEDGER_STATUSES
+        )
+        if exclude_entries:
+            lines = lines.exclude(journal_entry_id__in=exclude_entries)
+        
+        # Opening balance: nearest earlier snapshot plus the lines in the gap
+        previous = cls.objects.filter(
+            account_id=account_id,
+            period__end_date__lt=period.start_date
+        ).select_related('period').order_by('-period__end_date').first()
+        
+        if previous:
+            opening = previous.closing_balance
+            before = lines.filter(
+                journal_entry__date__gt=previous.period.end_date,
+                journal_entry__date__lt=period.start_date
+            )
+        else:
+            opening = Account.objects.filter(pk=account_id).values_list('opening_balance', flat=True).first() or Decimal('0.00')
+            before = lines.filter(journal_entry__date__lt=period.start_date)
+        
+        totals = before.aggregate(debit=Sum('debit'), credit=Sum('credit'))
+        opening += (totals['debit'] or Decimal('0.00')) - (totals['credit'] or Decimal('0.00'))
+        
+        movement = lines.filter(
+            journal_entry__date__gte=period.start_date,
+            journal_entry__date__lte=period.end_date
+        ).aggregate(debit=Sum('debit'), credit=Sum('credit'))
+        period_debits = movement['debit'] or Decimal('0.00')
+        period_credits = movement['credit'] or Decimal('0.00')
+        
+        try:
+            with transaction.atomic():
+                return cls.objects.create(
+                    account_id=account_id,
+                    period=period,
+                    opening_balance=opening,
+                    period_debits=period_debits,
+                    period_credits=period_credits,
+                    closing_balance=opening + period_debits - period_credits
+                )
+        except IntegrityError:
+            # Created concurrently by another posting
+            return cls.objects.get(account_id=account_id, period=period)
+    
+    @classmethod
+    def rebuild_for_period(cls, period):
+        """
+        Recompute the snapshots of every account for a period with one grouped
+        query over the ledger. Returns the number of snapshots written.
+        """
+        start = period.start_date
+        totals = JournalEntryLine.objects.filter(
+            journal_entry__status__in=JournalEntry.LEDGER_STATUSES,
+            journal_entry__date__lte=period.end_date
+        ).values('account_id').annotate(
+            before_debit=Sum('debit', filter=Q(journal_entry__date__lt=start)),
+            before_credit=Sum('credit', filter=Q(journal_entry__date__lt=start)),
+            period_debit=Sum('debit', filter=Q(journal_entry__date__gte=start)),
+            period_credit=Sum('credit', filter=Q(journal_entry__date__gte=start)),
+        )
+        totals = {row['account_id']: row for row in totals}
+        zero = Decimal('0.00')
+        
+        snapshots = []
+        for account_id, account_opening in Account.objects.values_list('id', 'opening_balance'):
+            row = totals.get(account_id, {})
+            opening = account_opening + (row.get('before_debit') or zero) - (row.get('before_credit') or zero)
+            period_debits = row.get('period_debit') or zero
+            period_credits = row.get('period_credit') or zero
+            snapshots.append(cls(
+                account_id=account_id,
+                period=period,
+                opening_balance=opening,
+                period_debits=period_debits,
+                period_credits=period_credits,
+                closing_balance=opening + period_debits - period_credits
+            ))
+        
+        cls.objects.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=['account', 'period'],
+            update_fields=['opening_balance', 'period_debits', 'period_credits', 'closing_balance']
+        )
+        return len(snapshots)
 
 class FinancialStatement(models.Model):
     """Generated financial statements"""
@@ -563,25 +905,8 @@ class Expense(models.Model):
     
     def generate_reference_number(self):
         """Generate unique reference number"""
-        from datetime import datetime
-        prefix = "EXP"
-        date_part = datetime.now().strftime("%Y%m")
-        
-        # Get the last expense number for this month
-        last_expense = Expense.objects.filter(
-            reference_number__startswith=f"{prefix}{date_part}"
-        ).order_by('reference_number').last()
-        
-        if last_expense:
-            try:
-                last_number = int(last_expense.reference_number[-4:])
-                new_number = last_number + 1
-            except ValueError:
-                new_number = 1
-        else:
-            new_number = 1
-        
-        return f"{prefix}{date_part}{new_number:04d}"
+        from .services import NumberingService
+        return NumberingService.next_number('EXP')
     
     def create_journal_entry(self):
         """Create journal entry for this expense"""
@@ -728,8 +1053,17 @@ class Invoice(models.Model):
     def __str__(self):
         return f'Invoice {self.invoice_number} - {self.client.name}'
 
+    def save(self, *args, **kwargs):
+        if not self.invoice_number:
+            from .services import NumberingService
+            self.invoice_number = NumberingService.next_number('INV', date=self.issue_date)
+        super().save(*args, **kwargs)
+
     @property
     def amount_paid(self):
+        # Lists annotate paid_total through AgingService.annotate_invoices
+        if hasattr(self, 'paid_total'):
+            return self.paid_total
         from django.db.models import Sum
         return self.payments.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
 
@@ -860,12 +1194,21 @@ class Report(models.Model):
     description = models.TextField(blank=True)
     filters = models.JSONField(default=dict, blank=True)  # Store additional filters
     generated_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='finance_generated_reports')
+    
+    # Background generation (see run_report_worker)
+    error_message = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    preview_html = models.TextField(blank=True)  # rendered by the worker for the preview page
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Reports'
+        indexes = [models.Index(fields=['status', 'created_at'])]
     
     def __str__(self):
         return f'{self.name} - {self.get_report_type_display()}'
@@ -885,6 +1228,67 @@ class Report(models.Model):
                 return f"{self.file_size:.1f} {unit}"
             self.file_size /= 1024.0
         return f"{self.file_size:.1f} TB"
+    
+    @property
+    def absolute_file_path(self):
+        """Location of the generated file under MEDIA_ROOT"""
+        if not self.file_path:
+            return None
+        return os.path.join(settings.MEDIA_ROOT, self.file_path)
+    
+    # How long a worker may hold a processing report without renewing its lease
+    LEASE_DURATION = timedelta(minutes=10)
+    
+    @classmethod
+    def claim_next(cls):
+        """
+        Take the oldest pending report off the queue and mark it processing.
+        
+        Rows locked by another worker are skipped, so several workers can
+        consume the queue at the same time. Reports left processing by a
+        worker whose lease has expired (e.g. it crashed) are claimed again.
+        Returns None when there is nothing to do.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            report = cls.objects.select_for_update(skip_locked=True).filter(
+                Q(status='pending') | Q(status='processing', lease_expires_at__lt=now)
+            ).order_by('created_at', 'id').first()
+            if report is None:
+                return None
+            
+            report.status = 'processing'
+            report.started_at = now
+            report.lease_expires_at = now + cls.LEASE_DURATION
+            report.error_message = ''
+            report.save(update_fields=['status', 'started_at', 'lease_expires_at', 'error_message', 'updated_at'])
+            return report
+    
+    def renew_lease(self):
+        """Extend the processing lease so other workers do not reclaim this report"""
+        self.lease_expires_at = timezone.now() + self.LEASE_DURATION
+        Report.objects.filter(pk=self.pk, status='processing').update(lease_expires_at=self.lease_expires_at)
+    
+    @contextmanager
+    def keep_lease(self):
+        """Renew the lease every third of LEASE_DURATION from a background thread while the block runs"""
+        stop = threading.Event()
+        
+        def renew():
+            try:
+                while not stop.wait(self.LEASE_DURATION.total_seconds() / 3):
+                    self.renew_lease()
+            finally:
+                # The thread has its own connection
+                connection.close()
+        
+        thread = threading.Thread(target=renew, name=f'report-{self.pk}-lease', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
 
 class AccountsPayable(models.Model):
     """
@@ -978,8 +1382,8 @@ class AccountsPayable(models.Model):
     
     def generate_reference_number(self):
         """Generate a unique reference number"""
-        import uuid
-        return f"AP-{timezone.now().strftime('%Y%m')}-{str(uuid.uuid4())[:8].upper()}"
+        from .services import NumberingService
+        return NumberingService.next_number('AP')
     
     @property
     def is_overdue(self):
@@ -1076,3 +1480,218 @@ class AccountsPayableLineItem(models.Model):
         tax_amount = subtotal * self.tax_rate
         self.line_total = subtotal + tax_amount
         super().save(*args, **kwargs)
+
+class FinanceDailyRollup(models.Model):
+    """Pre-aggregated daily finance facts read by the finance dashboard"""
+    METRIC_CHOICES = [
+        ('PAYMENT', 'Payments by Method'),
+        ('CLIENT_PAYMENT', 'Payments by Client'),
+        ('PAYMENT_TIME', 'Payment Time'),
+        ('EXPENSE', 'Expenses by Category'),
+        ('INVOICE', 'Invoices by Status'),
+        ('PAYABLE', 'Accounts Payable by Status'),
+    ]
+    
+    date = models.DateField()
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    dimension = models.CharField(max_length=255, blank=True)  # payment method, client or category
+    status = models.CharField(max_length=20, blank=True)
+    
+    count = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)  # total days for PAYMENT_TIME
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['date', 'metric', 'dimension', 'status']
+        ordering = ['date', 'metric']
+        indexes = [models.Index(fields=['metric', 'date'])]
+        verbose_name_plural = 'Finance Daily Rollups'
+    
+    def __str__(self):
+        return f'{self.date} {self.metric} {self.dimension} {self.status}'.strip()
+    
+    @staticmethod
+    def get_source(metric):
+        """Source queryset, date field, dimension, status and amount field of a metric"""
+        return {
+            'PAYMENT': (Payment.objects.all(), 'payment_date', F('payment_method'), Value(''), 'amount'),
+            'CLIENT_PAYMENT': (Payment.objects.all(), 'payment_date', Coalesce(F('invoice__client__name'), Value('')), Value(''), 'amount'),
+            'EXPENSE': (Expense.objects.all(), 'expense_date', Coalesce(F('expense_category__name'), Value('')), F('status'), 'total_amount'),
+            'INVOICE': (Invoice.objects.all(), 'issue_date', Value(''), F('status'), 'total'),
+            'PAYABLE': (AccountsPayable.objects.all(), 'invoice_date', Value(''), F('status'), 'balance_due'),
+        }[metric]
+    
+    @classmethod
+    def compute(cls, metric, dates=None):
+        """Aggregate the source rows of a metric into unsaved rollups, optionally for some dates only"""
+        if metric == 'PAYMENT_TIME':
+            return cls.compute_payment_time(dates)
+        
+        queryset, date_field, dimension, status, amount_field = cls.get_source(metric)
+        if dates is not None:
+            queryset = queryset.filter(**{f'{date_field}__in': dates})
+        
+        rows = queryset.values(
+            rollup_date=F(date_field),
+            rollup_dimension=dimension,
+            rollup_status=status
+        ).annotate(
+            rollup_count=Count('id'),
+            rollup_amount=Sum(amount_field)
+        ).order_by()
+        
+        return [
+            cls(
+                date=row['rollup_date'],
+                metric=metric,
+                dimension=row['rollup_dimension'],
+                status=row['rollup_status'],
+                count=row['rollup_count'],
+                amount=row['rollup_amount'] or Decimal('0.00')
+            )
+            for row in rows
+        ]
+    
+    @classmethod
+    def compute_payment_time(cls, dates=None):
+        """Days from invoice issue to payment, summed per payment date"""
+        payments = Payment.objects.all()
+        if dates is not None:
+            payments = payments.filter(payment_date__in=dates)
+        
+        totals = {}
+        for payment_date, issue_date in payments.values_list('payment_date', 'invoice__issue_date').iterator():
+            if not issue_date:
+                continue
+            days = (payment_date - issue_date).days
+            if days >= 0:  # Only count valid payment times
+                count, total_days = totals.get(payment_date, (0, 0))
+                totals[payment_date] = (count + 1, total_days + days)
+        
+        return [
+            cls(date=payment_date, metric='PAYMENT_TIME', count=count, amount=total_days)
+            for payment_date, (count, total_days) in totals.items()
+        ]
+    
+    @classmethod
+    def refresh(cls, metric, dates):
+        """Recompute the rollups of a metric for the given dates"""
+        dates = {d for d in dates if d}
+        if not dates:
+            return
+        with transaction.atomic():
+            cls.objects.filter(metric=metric, date__in=dates).delete()
+            cls.objects.bulk_create(cls.compute(metric, dates))
+    
+    @classmethod
+    def rebuild(cls, metrics=None):
+        """Recompute every rollup of the given metrics (default: all). Returns the rows written per metric"""
+        written = {}
+        for metric in metrics or [choice[0] for choice in cls.METRIC_CHOICES]:
+            with transaction.atomic():
+                cls.objects.filter(metric=metric).delete()
+                written[metric] = len(cls.objects.bulk_create(cls.compute(metric), batch_size=1000))
+        return written
+
+class BankStatement(models.Model):
+    """A bank statement file imported against a bank account"""
+    FORMAT_CHOICES = [
+        ('CSV', 'CSV'),
+        ('OFX', 'OFX'),
+    ]
+    
+    account = models.ForeignKey(Account, on_delete=models.PROTECT, related_name='bank_statements')
+    file_name = models.CharField(max_length=255)
+    file_format = models.CharField(max_length=3, choices=FORMAT_CHOICES)
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+    
+    imported_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='imported_bank_statements')
+    imported_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-imported_at']
+        verbose_name_plural = 'Bank Statements'
+    
+    def __str__(self):
+        return f'{self.account.code} - {self.file_name}'
+
+class BankStatementLine(models.Model):
+    """A single bank transaction; positive amounts are deposits, negative amounts withdrawals"""
+    STATUS_CHOICES = [
+        ('UNMATCHED', 'Unmatched'),
+        ('REVIEW', 'Needs Review'),
+        ('MATCHED', 'Matched'),
+        ('IGNORED', 'Ignored'),
+    ]
+    
+    statement = models.ForeignKey(BankStatement, on_delete=models.CASCADE, related_name='lines')
+    account = models.ForeignKey(Account, on_delete=models.PROTECT, related_name='bank_statement_lines')
+    date = models.DateField()
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    description = models.CharField(max_length=255, blank=True)
+    reference = models.CharField(max_length=100, blank=True)
+    fit_id = models.CharField(max_length=255)  # bank transaction id, or a content hash for CSV files
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='UNMATCHED')
+    matched_line = models.ForeignKey(JournalEntryLine, on_delete=models.SET_NULL, null=True, blank=True, related_name='bank_statement_lines')
+    matched_payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, null=True, blank=True, related_name='bank_statement_lines')
+    candidate_count = models.PositiveIntegerField(default=0)
+    matched_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='matched_bank_statement_lines')
+    matched_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ['account', 'fit_id']
+        ordering = ['date', 'id']
+        indexes = [models.Index(fields=['account', 'status', 'date'])]
+        verbose_name_plural = 'Bank Statement Lines'
+    
+    def __str__(self):
+        return f'{self.date} {self.amount} {self.description}'.strip()
+
+class OverdueSweepRun(models.Model):
+    """Counts recorded by each run of the overdue sweep (see sweep_overdue)"""
+    as_of_date = models.DateField()
+    invoices_overdue = models.PositiveIntegerField(default=0)
+    invoices_current = models.PositiveIntegerField(default=0)
+    payables_overdue = models.PositiveIntegerField(default=0)
+    ran_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-ran_at']
+        verbose_name_plural = 'Overdue Sweep Runs'
+    
+    def __str__(self):
+        return f'Overdue sweep as of {self.as_of_date}'
+
+class LedgerVersion(models.Model):
+    """
+    Single-row counter bumped whenever the posted ledger or the chart of accounts
+    changes. Ledger-derived caches are keyed by it, so every process sees a
+    change made by any other process once the bumping transaction commits.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = 'Ledger Version'
+    
+    def __str__(self):
+        return f'Ledger version {self.version}'
+    
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+    
+    @classmethod
+    def bump(cls):
+        """Increment the counter in the caller's transaction"""
+        if cls.objects.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now()):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(pk=1, version=1)
+        except IntegrityError:
+            # Created concurrently by another posting
+            cls.objects.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now())
@@ -0,0 +1,2986 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Case, Count, DecimalField, F, Max, Min, OuterRef, Q, Subquery, Sum, Value, When, Window
+from django.db.models.expressions import RowRange
+from django.db.models.functions import Coalesce, Greatest, Lower, TruncMonth
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.text import slugify
+from sequences import Sequence
+
+from client_management.models import Case as ClientCase, Client
+from hr_management.models import TimeEntry
+
+from . import statement_pdf
+from .models import (
+    Account, AccountBalance, AccountingPeriod, AccountsPayable, BankStatement, BankStatementLine, Expense,
+    FinanceDailyRollup, Invoice, InvoiceItem, Journal, JournalEntry, JournalEntryLine, LedgerVersion, OverdueSweepRun,
+    Payment, Report
+)
+
+
+ZERO = Decimal('0.00')
+
+# Journal and account codes the posting services book to, by role; override
+# through settings.FINANCE_LEDGER_CODES, e.g. {'receivable_account': '1200'}
+# for the chart created by populate_legal_accounts
+LEDGER_CODES = {
+    'cash_receipts_journal': 'CRJ',
+    'sales_journal': 'SJ',
+    'receivable_account': '1040',
+    'fee_revenue_account': '4000',
+}
+
+
+def to_cents(value):
+    """Decimal amount as an integer number of cents, for exact numpy arithmetic"""
+    return int((value or ZERO) * 100)
+
+
+def from_cents(value):
+    return (Decimal(int(value)) / 100).quantize(ZERO)
+
+
+def get_ledger_version():
+    """Token that changes whenever the posted ledger or the chart of accounts changes"""
+    return LedgerVersion.current()
+
+
+def bump_ledger_version():
+    """
+    Invalidate ledger-derived caches. The shared counter is incremented inside
+    the current transaction, so the change is visible to every process on commit
+    and undone with it on rollback.
+    """
+    LedgerVersion.bump()
+
+
+def get_ledger_code(role):
+    """Configured journal or account code for a posting role in LEDGER_CODES"""
+    return {**LEDGER_CODES, **getattr(settings, 'FINANCE_LEDGER_CODES', {})}[role]
+
+
+class FinancialStatementService:
+    """Service class to build financial statements from the posted ledger"""
+
+    @staticmethod
+    def get_account_balances(as_of_date, accounts=None):
+        """
+        Get debit/credit totals and the balance of every account as of a date.
+
+        All accounts are resolved with one grouped aggregate over
+        JournalEntryLine instead of one aggregate per account. Balances follow
+        Account.get_balance_as_of_date: opening balance plus debits minus
+        credits, negated for credit-normal accounts.
+        """
+        if accounts is None:
+            accounts = Account.objects.filter(status='ACTIVE')
+        accounts = list(accounts.order_by('code'))
+
+        totals = JournalEntryLine.objects.filter(
+            account__in=[account.pk for account in accounts],
+            journal_entry__status__in=JournalEntry.LEDGER_STATUSES,
+            journal_entry__date__lte=as_of_date
+        ).values('account').annotate(
+            debit_total=Sum('debit'),
+            credit_total=Sum('credit')
+        )
+        totals = {row['account']: row for row in totals}
+
+        rows = []
+        for account in accounts:
+            row = totals.get(account.pk, {})
+            debit_total = row.get('debit_total') or ZERO
+            credit_total = row.get('credit_total') or ZERO
+            net = Decimal(account.opening_balance) + debit_total - credit_total
+            rows.append({
+                'account': account,
+                'code': account.code,
+                'name': account.name,
+                'account_type': account.account_type,
+                'account_category': account.account_category,
+                'debit_total': debit_total,
+                'credit_total': credit_total,
+                'net': net,
+                'balance': -net if account.normal_balance == 'CREDIT' else net,
+            })
+        return rows
+
+    @staticmethod
+    def rollup(rows, key):
+        """Sum row balances by an account attribute such as account_type or account_category"""
+        totals = {}
+        for row in rows:
+            totals[row[key]] = totals.get(row[key], ZERO) + row['balance']
+        return totals
+
+    @staticmethod
+    def trial_balance(as_of_date):
+        """Trial balance rows with each non-zero account on its debit or credit side"""
+        rows = []
+        total_debits = ZERO
+        total_credits = ZERO
+
+        for row in FinancialStatementService.get_account_balances(as_of_date):
+            if row['net'] == 0:
+                continue
+            row['debit'] = row['net'] if row['net'] > 0 else ZERO
+            row['credit'] = -row['net'] if row['net'] < 0 else ZERO
+            total_debits += row['debit']
+            total_credits += row['credit']
+            rows.append(row)
+
+        return {
+            'as_of_date': as_of_date,
+            'rows': rows,
+            'total_debits': total_debits,
+            'total_credits': total_credits,
+            'is_balanced': total_debits == total_credits,
+            'by_type': FinancialStatementService.rollup(rows, 'account_type'),
+        }
+
+    @staticmethod
+    def balance_sheet(as_of_date):
+        """Balance sheet sections for asset, liability and equity accounts"""
+        rows = FinancialStatementService.get_account_balances(
+            as_of_date,
+            Account.objects.filter(status='ACTIVE', account_type__in=['ASSET', 'LIABILITY', 'EQUITY'])
+        )
+        sections = {'ASSET': [], 'LIABILITY': [], 'EQUITY': []}
+        for row in rows:
+            sections[row['account_type']].append(row)
+
+        return {
+            'as_of_date': as_of_date,
+            'assets': sections['ASSET'],
+            'liabilities': sections['LIABILITY'],
+            'equity': sections['EQUITY'],
+            'total_assets': sum((row['balance'] for row in sections['ASSET']), ZERO),
+            'total_liabilities': sum((row['balance'] for row in sections['LIABILITY']), ZERO),
+            'total_equity': sum((row['balance'] for row in sections['EQUITY']), ZERO),
+            'by_category': FinancialStatementService.rollup(rows, 'account_category'),
+        }
+
+    @staticmethod
+    def income_statement(as_of_date):
+        """Income statement sections for revenue and expense accounts"""
+        rows = FinancialStatementService.get_account_balances(
+            as_of_date,
+            Account.objects.filter(status='ACTIVE', account_type__in=['REVENUE', 'EXPENSE'])
+        )
+        revenue = [row for row in rows if row['account_type'] == 'REVENUE']
+        expenses = [row for row in rows if row['account_type'] == 'EXPENSE']
+        revenue_total = sum((row['balance'] for row in revenue), ZERO)
+        expense_total = sum((row['balance'] for row in expenses), ZERO)
+
+        return {
+            'as_of_date': as_of_date,
+            'revenue_accounts': revenue,
+            'expense_accounts': expenses,
+            'revenue_total': revenue_total,
+            'expense_total': expense_total,
+            'net_income': revenue_total - expense_total,
+            'by_category': FinancialStatementService.rollup(rows, 'account_category'),
+        }
+
+    GRANULARITIES = {'month': 'M', 'quarter': 'Q', 'year': 'Y'}
+
+    STATEMENT_SECTIONS = {
+        'income-statement': ['REVENUE', 'EXPENSE'],
+        'balance-sheet': ['ASSET', 'LIABILITY', 'EQUITY'],
+    }
+
+    @staticmethod
+    def comparative_columns(date_from, date_to, granularity):
+        """Calendar months, quarters or years covering the range, as pandas periods"""
+        return pd.period_range(date_from, date_to, freq=FinancialStatementService.GRANULARITIES[granularity])
+
+    @staticmethod
+    def comparative(statement_type, date_from, date_to, granularity='month'):
+        """
+        Income statement or balance sheet with one column per month, quarter or
+        year between two dates.
+
+        Movements come from a single aggregate over JournalEntryLine grouped by
+        account and TruncMonth; the account x month matrix is pivoted into the
+        requested columns with pandas. Income statement columns hold the
+        movement of each column; balance sheet columns hold the cumulative
+        balance at the end of each column (capped at ``date_to``).
+        """
+        account_types = FinancialStatementService.STATEMENT_SECTIONS[statement_type]
+        cumulative = statement_type == 'balance-sheet'
+        columns = FinancialStatementService.comparative_columns(date_from, date_to, granularity)
+        start = columns[0].start_time.date()
+
+        accounts = list(
+            Account.objects.filter(status='ACTIVE', account_type__in=account_types).order_by('code').values(
+                'id', 'code', 'name', 'account_type', 'account_category', 'normal_balance', 'opening_balance'
+            )
+        )
+        lines = JournalEntryLine.objects.filter(
+            account__in=[account['id'] for account in accounts],
+            journal_entry__status__in=JournalEntry.LEDGER_STATUSES,
+            journal_entry__date__lte=date_to
+        )
+        if not cumulative:
+            lines = lines.filter(journal_entry__date__gte=start)
+        # Period closing zeroes revenue and expense accounts; those lines would
+        # cancel the column's activity, so only the equity side is kept
+        lines = lines.exclude(is_closing=True, account__account_type__in=['REVENUE', 'EXPENSE'])
+        movements = lines.annotate(month=TruncMonth('journal_entry__date')).values('account_id', 'month').annotate(
+            debit=Sum('debit'), credit=Sum('credit')
+        ).order_by()
+
+        frame = pd.DataFrame.from_records(list(movements), columns=['account_id', 'month', 'debit', 'credit'])
+        frame['net'] = frame['debit'].map(to_cents).astype(np.int64) - frame['credit'].map(to_cents).astype(np.int64)
+        frame['column'] = pd.PeriodIndex(pd.to_datetime(frame['month']), freq=columns.freq)
+        account_ids = [account['id'] for account in accounts]
+
+        if cumulative:
+            # Everything before the first column folds into the opening balance
+            earlier = frame['column'] < columns[0]
+            opening = frame[earlier].groupby('account_id')['net'].sum().reindex(account_ids, fill_value=0)
+            opening = opening.to_numpy(dtype=np.int64) + np.array(
+                [to_cents(account['opening_balance']) for account in accounts], dtype=np.int64
+            )
+            frame = frame[~earlier]
+
+        if frame.empty:
+            matrix = np.zeros((len(accounts), len(columns)), dtype=np.int64)
+        else:
+            matrix = frame.pivot_table(
+                index='account_id', columns='column', values='net', aggfunc='sum', fill_value=0
+            ).reindex(index=account_ids, columns=columns, fill_value=0).to_numpy(dtype=np.int64)
+        if cumulative:
+            matrix = np.cumsum(matrix, axis=1) + opening[:, None]
+
+        signs = np.array([-1 if account['normal_balance'] == 'CREDIT' else 1 for account in accounts], dtype=np.int64)
+        matrix = matrix * signs[:, None]
+
+        sections = {account_type: [] for account_type in account_types}
+        totals = {account_type: np.zeros(len(columns), dtype=np.int64) for account_type in account_types}
+        for account, values in zip(accounts, matrix):
+            totals[account['account_type']] += values
+            if not values.any():
+                continue
+            sections[account['account_type']].append({
+                'code': account['code'],
+                'name': account['name'],
+                'account_type': account['account_type'],
+                'account_category': account['account_category'],
+                'values': [from_cents(value) for value in values],
+            })
+
+        statement = {
+            'statement_type': statement_type,
+            'granularity': granularity,
+            'date_from': date_from,
+            'date_to': date_to,
+            'columns': [
+                {
+                    'label': str(column),
+                    'start': column.start_time.date(),
+                    'end': min(column.end_time.date(), date_to),
+                }
+                for column in columns
+            ],
+            'sections': sections,
+            'totals': {
+                account_type: [from_cents(value) for value in values] for account_type, values in totals.items()
+            },
+        }
+        if statement_type == 'income-statement':
+            statement['totals']['net_income'] = [
+                from_cents(value) for value in totals['REVENUE'] - totals['EXPENSE']
+            ]
+        return statement
+
+    @staticmethod
+    def serialize(statement):
+        """Strip model instances from a statement so it can be returned as JSON"""
+        data = {}
+        for key, value in statement.items():
+            if isinstance(value, list):
+                value = [
+                    {k: v for k, v in row.items() if k != 'account'}
+                    for row in value
+                ]
+            data[key] = value
+        return data
+
+
+class ReportGenerationService:
+    """Service class to render queued finance reports to files under MEDIA_ROOT"""
+
+    REPORTS_DIR = os.path.join('reports', 'finance')
+    EXTENSIONS = {'pdf': 'pdf', 'excel': 'xlsx', 'csv': 'csv'}
+    PREVIEW_TEMPLATE = 'finance_management/report_preview_content.html'
+
+    @staticmethod
+    def process_next():
+        """Claim the next pending report and generate it. Returns the report, or None if the queue is empty"""
+        report = Report.claim_next()
+        if report is not None:
+            ReportGenerationService.generate(report)
+        return report
+
+    @staticmethod
+    def generate(report):
+        """
+        Build the report data, render the preview and the file in the report's
+        format and record them. The processing lease is renewed throughout.
+        """
+        try:
+            with report.keep_lease():
+                data = ReportGenerationService.generate_report_data(
+                    report.report_type,
+                    report.start_date,
+                    report.end_date,
+                    report.filters
+                )
+                if 'error' in data:
+                    raise ValueError(data['error'])
+                report.preview_html = render_to_string(ReportGenerationService.PREVIEW_TEMPLATE, {
+                    'report': report,
+                    'report_data': data,
+                })
+
+                rows = ReportGenerationService.flatten(data)
+                renderer = {
+                    'pdf': ReportGenerationService.render_pdf,
+                    'excel': ReportGenerationService.render_excel,
+                    'csv': ReportGenerationService.render_csv,
+                }[report.format]
+                content = renderer(report, rows)
+
+            relative_path = os.path.join(
+                ReportGenerationService.REPORTS_DIR,
+                f"{report.report_type}_{report.pk}.{ReportGenerationService.EXTENSIONS[report.format]}"
+            )
+            absolute_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+            os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+
+            # Write next to the target and swap in, so downloads never see a partial file
+            temp_path = f'{absolute_path}.tmp'
+            with open(temp_path, 'wb') as output:
+                output.write(content)
+            os.replace(temp_path, absolute_path)
+
+            report.file_path = relative_path
+            report.file_size = len(content)
+            report.status = 'completed'
+            report.error_message = ''
+        except Exception as e:
+            report.status = 'failed'
+            report.error_message = str(e)
+            report.preview_html = ''
+
+        report.completed_at = timezone.now()
+        report.lease_expires_at = None
+        report.save(update_fields=[
+            'file_path', 'file_size', 'status', 'error_message', 'preview_html', 'completed_at',
+            'lease_expires_at', 'updated_at'
+        ])
+        return report
+
+    @staticmethod
+    def generate_report_data(report_type, start_date, end_date, filters=None):
+        """Generate report data based on report type"""
+        if report_type == 'cash_flow':
+            return ReportGenerationService.generate_cash_flow_report(start_date, end_date)
+        elif report_type == 'profit_loss':
+            return ReportGenerationService.generate_profit_loss_report(start_date, end_date)
+        elif report_type == 'balance_sheet':
+            return ReportGenerationService.generate_balance_sheet_report(start_date, end_date)
+        elif report_type == 'accounts_receivable':
+            return ReportGenerationService.generate_ar_aging_report(start_date, end_date)
+        elif report_type == 'accounts_payable':
+            return ReportGenerationService.generate_ap_aging_report(start_date, end_date)
+        elif report_type == 'expense_analysis':
+            return ReportGenerationService.generate_expense_analysis_report(start_date, end_date)
+        elif report_type == 'revenue_analysis':
+            return ReportGenerationService.generate_revenue_analysis_report(start_date, end_date)
+        elif report_type == 'working_capital':
+            return ReportGenerationService.generate_working_capital_report(start_date, end_date)
+        elif report_type == 'collection_performance':
+            return ReportGenerationService.generate_collection_performance_report(start_date, end_date)
+        elif report_type == 'vendor_analysis':
+            return ReportGenerationService.generate_vendor_analysis_report(start_date, end_date)
+        elif report_type == 'client_revenue':
+            return ReportGenerationService.generate_client_revenue_report(start_date, end_date)
+        elif report_type == 'monthly_summary':
+            return ReportGenerationService.generate_monthly_summary_report(start_date, end_date)
+        else:
+            return {'error': 'Unknown report type'}
+
+    @staticmethod
+    def generate_cash_flow_report(start_date, end_date):
+        """Generate Cash Flow Report"""
+        # Operating Activities
+        payments_received = Payment.objects.filter(
+            payment_date__range=[start_date, end_date]
+        ).aggregate(total=Sum('amount'))['total'] or 0
+        
+        expenses_paid = Expense.objects.filter(
+            expense_date__range=[start_date, end_date],
+            status='PAID'
+        ).aggregate(total=Sum('total_amount'))['total'] or 0
+        
+        ap_payments = AccountsPayable.objects.filter(
+            status='PAID'
+        ).aggregate(total=Sum('amount_paid'))['total'] or 0
+        
+        net_operating_cash = payments_received - expenses_paid - ap_payments
+        
+        return {
+            'report_type': 'Cash Flow Report',
+            'period': f'{start_date} to {end_date}',
+            'operating_activities': {
+                'payments_received': float(payments_received),
+                'expenses_paid': float(expenses_paid),
+                'ap_payments': float(ap_payments),
+                'net_operating_cash': float(net_operating_cash)
+            },
+            'cash_position': {
+                'opening_balance': 0,  # Would need to track this
+                'net_change': float(net_operating_cash),
+                'closing_balance': float(net_operating_cash)
+            }
+        }
+
+    @staticmethod
+    def generate_profit_loss_report(start_date, end_date):
+        """Generate Profit & Loss Statement"""
+        # Revenue
+        total_revenue = Payment.objects.filter(
+            payment_date__range=[start_date, end_date]
+        ).aggregate(total=Sum('amount'))['total'] or 0
+        
+        # Expenses
+        total_expenses = Expense.objects.filter(
+            expense_date__range=[start_date, end_date],
+            status__in=['APPROVED', 'PAID']
+        ).aggregate(total=Sum('total_amount'))['total'] or 0
+        
+        # Net Income
+        net_income = total_revenue - total_expenses
+        
+        # Expense breakdown by category
+        expense_by_category = Expense.objects.filter(
+            expense_date__range=[start_date, end_date],
+            status__in=['APPROVED', 'PAID']
+        ).values('expense_category__name').annotate(
+            total=Sum('total_amount')
+        ).order_by('-total')
+        
+        return {
+            'report_type': 'Profit & Loss Statement',
+            'period': f'{start_date} to {end_date}',
+            'revenue': {
+                'total_revenue': float(total_revenue)
+            },
+            'expenses': {
+                'total_expenses': float(total_expenses),
+                'by_category': [
+                    {
+                        'category': item['expense_category__name'] or 'Uncategorized',
+                        'amount': float(item['total'])
+                    } for item in expense_by_category
+                ]
+            },
+            'net_income': float(net_income),
+            'gross_margin': float((net_income / total_revenue * 100) if total_revenue > 0 else 0)
+        }
+
+    @staticmethod
+    def generate_balance_sheet_report(start_date, end_date):
+        """Generate Balance Sheet"""
+        # Assets
+        cash_position = Payment.objects.aggregate(total=Sum('amount'))['total'] or 0
+        accounts_receivable = Invoice.objects.filter(
+            status__in=['SENT', 'OVERDUE']
+        ).aggregate(total=Sum('total'))['total'] or 0
+        
+        # Liabilities
+        accounts_payable = AccountsPayable.objects.filter(
+            status__in=AgingService.PAYABLE_STATUSES
+        ).aggregate(total=Sum('balance_due'))['total'] or 0
+        
+        # Equity (simplified)
+        total_assets = cash_position + accounts_receivable
+        total_liabilities = accounts_payable
+        total_equity = total_assets - total_liabilities
+        
+        return {
+            'report_type': 'Balance Sheet',
+            'as_of_date': end_date,
+            'assets': {
+                'cash_and_equivalents': float(cash_position),
+                'accounts_receivable': float(accounts_receivable),
+                'total_assets': float(total_assets)
+            },
+            'liabilities': {
+                'accounts_payable': float(accounts_payable),
+                'total_liabilities': float(total_liabilities)
+            },
+            'equity': {
+                'total_equity': float(total_equity)
+            }
+        }
+
+    @staticmethod
+    def generate_ar_aging_report(start_date, end_date):
+        """Generate Accounts Receivable Aging Report"""
+        from datetime import date
+        
+        today = date.today()
+        
+        # Outstanding balances (net of payments) by aging bucket, in one query each
+        aging = AgingService.receivables(today)
+        by_client = AgingService.receivables(today, group_by_client=True)
+        
+        return {
+            'report_type': 'Accounts Receivable Aging',
+            'as_of_date': today,
+            'aging_buckets': {
+                name: float(aging[name])
+                for name in [bucket[0] for bucket in AgingService.RECEIVABLE_BUCKETS] + ['total']
+            },
+            'total_outstanding': float(aging['total']),
+            'by_client': [
+                {
+                    'client': row['client__name'],
+                    **{name: float(row[name]) for name in [bucket[0] for bucket in AgingService.RECEIVABLE_BUCKETS] + ['total']},
+                }
+                for row in by_client if row['total'] > 0
+            ]
+        }
+
+    @staticmethod
+    def generate_ap_aging_report(start_date, end_date):
+        """Generate Accounts Payable Aging Report"""
+        from datetime import date
+        
+        today = date.today()
+        
+        # Balances due by aging bucket, in one query each
+        aging = AgingService.payables(today)
+        by_vendor = AgingService.payables(today, group_by_vendor=True)
+        
+        return {
+            'report_type': 'Accounts Payable Aging',
+            'as_of_date': today,
+            'aging_buckets': {
+                name: float(aging[name])
+                for name in [bucket[0] for bucket in AgingService.PAYABLE_BUCKETS] + ['total']
+            },
+            'total_outstanding': float(aging['total']),
+            'by_vendor': [
+                {
+                    'vendor': row['vendor'],
+                    **{name: float(row[name]) for name in [bucket[0] for bucket in AgingService.PAYABLE_BUCKETS] + ['total']},
+                }
+                for row in by_vendor if row['total'] > 0
+            ]
+        }
+
+    @staticmethod
+    def generate_expense_analysis_report(start_date, end_date):
+        """Generate Expense Analysis Report"""
+        # Total expenses
+        total_expenses = Expense.objects.filter(
+            expense_date__range=[start_date, end_date],
+            status__in=['APPROVED', 'PAID']
+        ).aggregate(total=Sum('total_amount'))['total'] or 0
+        
+        # Expenses by category
+        expenses_by_category = Expense.objects.filter(
+            expense_date__range=[start_date, end_date],
+            status__in=['APPROVED', 'PAID']
+        ).values('expense_category__name').annotate(
+            total=Sum('total_amount'),
+            count=Count('id')
+        ).order_by('-total')
+        
+        # Expenses by vendor
+        expenses_by_vendor = Expense.objects.filter(
+            expense_date__range=[start_date, end_date],
+            status__in=['APPROVED', 'PAID']
+        ).values('vendor').annotate(
+            total=Sum('total_amount'),
+            count=Count('id')
+        ).order_by('-total')[:10]
+        
+        return {
+            'report_type': 'Expense Analysis Report',
+            'period': f'{start_date} to {end_date}',
+            'summary': {
+                'total_expenses': float(total_expenses),
+                'total_transactions': Expense.objects.filter(
+                    expense_date__range=[start_date, end_date],
+                    status__in=['APPROVED', 'PAID']
+                ).count()
+            },
+            'by_category': [
+                {
+                    'category': item['expense_category__name'] or 'Uncategorized',
+                    'amount': float(item['total']),
+                    'count': item['count'],
+                    'percentage': float((item['total'] / total_expenses * 100) if total_expenses > 0 else 0)
+                } for item in expenses_by_category
+            ],
+            'by_vendor': [
+                {
+                    'vendor': item['vendor'],
+                    'amount': float(item['total']),
+                    'count': item['count']
+                } for item in expenses_by_vendor
+            ]
+        }
+
+    @staticmethod
+    def generate_revenue_analysis_report(start_date, end_date):
+        """Generate Revenue Analysis Report"""
+        # Total revenue
+        total_revenue = Payment.objects.filter(
+            payment_date__range=[start_date, end_date]
+        ).aggregate(total=Sum('amount'))['total'] or 0
+        
+        # Revenue by client
+        revenue_by_client = Payment.objects.filter(
+            payment_date__range=[start_date, end_date]
+        ).values('invoice__client__name').annotate(
+            total=Sum('amount'),
+            count=Count('id')
+        ).order_by('-total')
+        
+        # Revenue by payment method
+        revenue_by_method = Payment.objects.filter(
+            payment_date__range=[start_date, end_date]
+        ).values('payment_method').annotate(
+            total=Sum('amount'),
+            count=Count('id')
+        ).order_by('-total')
+        
+        return {
+            'report_type': 'Revenue Analysis Report',
+            'period': f'{start_date} to {end_date}',
+            'summary': {
+                'total_revenue': float(total_revenue),
+                'total_payments': Payment.objects.filter(
+                    payment_date__range=[start_date, end_date]
+                ).count()
+            },
+            'by_client': [
+                {
+                    'client': item['invoice__client__name'] or 'Unknown Client',
+                    'amount': float(item['total']),
+                    'count': item['count'],
+                    'percentage': float((item['total'] / total_revenue * 100) if total_revenue > 0 else 0)
+                } for item in revenue_by_client
+            ],
+            'by_payment_method': [
+                {
+                    'method': item['payment_method'],
+                    'amount': float(item['total']),
+                    'count': item['count']
+                } for item in revenue_by_method
+            ]
+        }
+
+    @staticmethod
+    def generate_working_capital_report(start_date, end_date):
+        """Generate Working Capital Report"""
+        # Current Assets
+        cash_position = Payment.objects.aggregate(total=Sum('amount'))['total'] or 0
+        accounts_receivable = Invoice.objects.filter(
+            status__in=['SENT', 'OVERDUE']
+        ).aggregate(total=Sum('total'))['total'] or 0
+        
+        # Current Liabilities
+        accounts_payable = AccountsPayable.objects.filter(
+            status__in=AgingService.PAYABLE_STATUSES
+        ).aggregate(total=Sum('balance_due'))['total'] or 0
+        
+        # Working Capital
+        current_assets = cash_position + accounts_receivable
+        current_liabilities = accounts_payable
+        working_capital = current_assets - current_liabilities
+        
+        # Working Capital Ratio
+        working_capital_ratio = (current_assets / current_liabilities) if current_liabilities > 0 else 0
+        
+        return {
+            'report_type': 'Working Capital Report',
+            'as_of_date': end_date,
+            'current_assets': {
+                'cash_and_equivalents': float(cash_position),
+                'accounts_receivable': float(accounts_receivable),
+                'total_current_assets': float(current_assets)
+            },
+            'current_liabilities': {
+                'accounts_payable': float(accounts_payable),
+                'total_current_liabilities': float(current_liabilities)
+            },
+            'working_capital': {
+                'working_capital': float(working_capital),
+                'working_capital_ratio': float(working_capital_ratio)
+            }
+        }
+
+    @staticmethod
+    def generate_collection_performance_report(start_date, end_date):
+        """Generate Collection Performance Report"""
+        # Collection metrics
+        total_invoices = Invoice.objects.count()
+        paid_invoices = Invoice.objects.filter(status='PAID').count()
+        overdue_invoices = Invoice.objects.filter(status='OVERDUE').count()
+        
+        # Collection rate
+        collection_rate = (paid_invoices / total_invoices * 100) if total_invoices > 0 else 0
+        
+        # Average payment time
+        paid_payments = Payment.objects.filter(payment_date__isnull=False)
+        if paid_payments.exists():
+            total_days = 0
+            payment_count = 0
+            for payment in paid_payments:
+                if payment.invoice and payment.invoice.issue_date:
+                    days_diff = (payment.payment_date - payment.invoice.issue_date).days
+                    if days_diff >= 0:
+                        total_days += days_diff
+                        payment_count += 1
+            
+            avg_payment_time = total_days / payment_count if payment_count > 0 else 0
+        else:
+            avg_payment_time = 0
+        
+        # Outstanding amounts
+        outstanding_amount = Invoice.objects.filter(
+            status__in=['SENT', 'OVERDUE']
+        ).aggregate(total=Sum('total'))['total'] or 0
+        
+        return {
+            'report_type': 'Collection Performance Report',
+            'period': f'{start_date} to {end_date}',
+            'collection_metrics': {
+                'total_invoices': total_invoices,
+                'paid_invoices': paid_invoices,
+                'overdue_invoices': overdue_invoices,
+                'collection_rate': float(collection_rate),
+                'avg_payment_time': float(avg_payment_time),
+                'outstanding_amount': float(outstanding_amount)
+            }
+        }
+
+    @staticmethod
+    def generate_vendor_analysis_report(start_date, end_date):
+        """Generate Vendor Analysis Report"""
+        # Vendor spending
+        vendor_spending = AccountsPayable.objects.filter(
+            invoice_date__range=[start_date, end_date]
+        ).values('vendor').annotate(
+            total_amount=Sum('total_amount'),
+            total_paid=Sum('amount_paid'),
+            count=Count('id')
+        ).order_by('-total_amount')
+        
+        # Vendor payment performance
+        vendor_performance = []
+        for vendor in vendor_spending:
+            vendor_name = vendor['vendor']
+            total_amount = vendor['total_amount']
+            total_paid = vendor['total_paid']
+            payment_rate = (total_paid / total_amount * 100) if total_amount > 0 else 0
+            
+            vendor_performance.append({
+                'vendor': vendor_name,
+                'total_amount': float(total_amount),
+                'total_paid': float(total_paid),
+                'outstanding': float(total_amount - total_paid),
+                'payment_rate': float(payment_rate),
+                'transaction_count': vendor['count']
+            })
+        
+        return {
+            'report_type': 'Vendor Analysis Report',
+            'period': f'{start_date} to {end_date}',
+            'vendor_performance': vendor_performance
+        }
+
+    @staticmethod
+    def generate_client_revenue_report(start_date, end_date):
+        """Generate Client Revenue Report"""
+        # Client revenue
+        client_revenue = Payment.objects.filter(
+            payment_date__range=[start_date, end_date]
+        ).values('invoice__client__name').annotate(
+            total_revenue=Sum('amount'),
+            payment_count=Count('id')
+        ).order_by('-total_revenue')
+        
+        # Client outstanding amounts
+        client_outstanding = Invoice.objects.filter(
+            status__in=['SENT', 'OVERDUE']
+        ).values('client__name').annotate(
+            outstanding_amount=Sum('total'),
+            invoice_count=Count('id')
+        ).order_by('-outstanding_amount')
+        
+        return {
+            'report_type': 'Client Revenue Report',
+            'period': f'{start_date} to {end_date}',
+            'client_revenue': [
+                {
+                    'client': item['invoice__client__name'] or 'Unknown Client',
+                    'revenue': float(item['total_revenue']),
+                    'payment_count': item['payment_count']
+                } for item in client_revenue
+            ],
+            'client_outstanding': [
+                {
+                    'client': item['client__name'] or 'Unknown Client',
+                    'outstanding': float(item['outstanding_amount']),
+                    'invoice_count': item['invoice_count']
+                } for item in client_outstanding
+            ]
+        }
+
+    @staticmethod
+    def generate_monthly_summary_report(start_date, end_date):
+        """Generate Monthly Financial Summary"""
+        # Monthly revenue
+        monthly_revenue = Payment.objects.filter(
+            payment_date__range=[start_date, end_date]
+        ).aggregate(total=Sum('amount'))['total'] or 0
+        
+        # Monthly expenses
+        monthly_expenses = Expense.objects.filter(
+            expense_date__range=[start_date, end_date],
+            status__in=['APPROVED', 'PAID']
+        ).aggregate(total=Sum('total_amount'))['total'] or 0
+        
+        # Net income
+        net_income = monthly_revenue - monthly_expenses
+        
+        # Key metrics
+        collection_rate = 0
+        if Invoice.objects.count() > 0:
+            collection_rate = (Invoice.objects.filter(status='PAID').count() / Invoice.objects.count()) * 100
+        
+        return {
+            'report_type': 'Monthly Financial Summary',
+            'period': f'{start_date} to {end_date}',
+            'summary': {
+                'total_revenue': float(monthly_revenue),
+                'total_expenses': float(monthly_expenses),
+                'net_income': float(net_income),
+                'collection_rate': float(collection_rate),
+                'profit_margin': float((net_income / monthly_revenue * 100) if monthly_revenue > 0 else 0)
+            }
+        }
+
+    @staticmethod
+    def flatten(data, section=None, label=''):
+        """Flatten nested report data into (section, item, value) rows"""
+        rows = []
+        if isinstance(data, dict):
+            items = data.items()
+        elif isinstance(data, (list, tuple)):
+            items = ((str(index + 1), value) for index, value in enumerate(data))
+        else:
+            return [(section or '', label, data)]
+
+        for key, value in items:
+            key = str(key).replace('_', ' ').title()
+            if section is None:
+                if isinstance(value, (dict, list, tuple)):
+                    rows.extend(ReportGenerationService.flatten(value, key))
+                else:
+                    rows.append(('', key, value))
+            else:
+                item = f'{label} / {key}' if label else key
+                rows.extend(ReportGenerationService.flatten(value, section, item))
+        return rows
+
+    @staticmethod
+    def cell_value(value):
+        """Plain value for a spreadsheet or CSV cell"""
+        if isinstance(value, Decimal):
+            return float(value)
+        if isinstance(value, date):
+            return value.isoformat()
+        if value is None:
+            return ''
+        return value
+
+    @staticmethod
+    def render_csv(report, rows):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['Section', 'Item', 'Value'])
+        for section, item, value in rows:
+            writer.writerow([section, item, ReportGenerationService.cell_value(value)])
+        return output.getvalue().encode('utf-8')
+
+    @staticmethod
+    def render_excel(report, rows):
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(report.get_report_type_display()[:31])
+        ws.append([report.name])
+        ws.append([report.date_range])
+        ws.append([])
+        ws.append(['Section', 'Item', 'Value'])
+        for section, item, value in rows:
+            ws.append([section, item, ReportGenerationService.cell_value(value)])
+
+        output = io.BytesIO()
+        wb.save(output)
+        return output.getvalue()
+
+    @staticmethod
+    def render_pdf(report, rows):
+        from weasyprint import HTML
+
+        html_string = render_to_string('finance_management/report_pdf.html', {
+            'report': report,
+            'rows': rows,
+            'generated_at': timezone.now(),
+        })
+        return HTML(string=html_string).write_pdf()
+
+
+class ClientStatementService:
+    """
+    Service class producing monthly client statements (open invoices, payments
+    received in the month and receivable aging) as PDFs. Statement data comes
+    from a few grouped queries, HTML is rendered in this process and WeasyPrint
+    runs in a process pool.
+    """
+
+    TEMPLATE = 'finance_management/client_statement_pdf.html'
+    OUTPUT_DIR = 'client_statements'
+
+    @staticmethod
+    def collect(as_of_date, client_ids=None):
+        """
+        Statement data for every client with an open balance or a payment in the
+        month of ``as_of_date``, as plain dicts ordered by client name.
+        """
+        period_start = as_of_date.replace(day=1)
+        invoices = Invoice.objects.filter(status__in=AgingService.RECEIVABLE_STATUSES, issue_date__lte=as_of_date)
+        payments = Payment.objects.filter(payment_date__range=(period_start, as_of_date))
+        if client_ids:
+            invoices = invoices.filter(client_id__in=client_ids)
+            payments = payments.filter(invoice__client_id__in=client_ids)
+        invoices = AgingService.annotate_invoices(invoices).filter(outstanding_total__gt=0)
+
+        statements = {}
+
+        def statement(client_id):
+            return statements.setdefault(client_id, {
+                'invoices': [], 'payments': [], 'payments_total': ZERO, 'aging': None, 'balance': ZERO,
+            })
+
+        for row in invoices.order_by('client_id', 'due_date', 'id').values(
+            'client_id', 'invoice_number', 'issue_date', 'due_date', 'total', 'paid_total', 'outstanding_total'
+        ):
+            statement(row.pop('client_id'))['invoices'].append(row)
+
+        for row in payments.order_by('invoice__client_id', 'payment_date', 'id').values(
+            'invoice__client_id', 'invoice__invoice_number', 'payment_date', 'amount', 'payment_method',
+            'reference_number'
+        ):
+            data = statement(row.pop('invoice__client_id'))
+            data['payments'].append(row)
+            data['payments_total'] += row['amount']
+
+        for row in AgingService.receivables(as_of_date, group_by_client=True, queryset=invoices):
+            data = statement(row['client_id'])
+            data['aging'] = row
+            data['balance'] = row['total']
+
+        clients = Client.objects.filter(pk__in=statements).values('id', 'name', 'contact_person', 'email', 'address')
+        result = []
+        for client in sorted(clients, key=lambda client: client['name']):
+            data = statements[client['id']]
+            data.update({'client': client, 'period_start': period_start, 'as_of_date': as_of_date})
+            result.append(data)
+        return result
+
+    @staticmethod
+    def generate(as_of_date, client_ids=None, workers=None, output_dir=None):
+        """
+        Render one PDF per client into MEDIA_ROOT/client_statements/YYYY-MM (or
+        ``output_dir``) and write a manifest.json describing every file.
+        Returns the manifest.
+        """
+        try:
+            import weasyprint  # noqa: F401
+        except ImportError:
+            raise ValueError('WeasyPrint is not installed')
+
+        statements = ClientStatementService.collect(as_of_date, client_ids)
+        output_dir = output_dir or os.path.join(
+            settings.MEDIA_ROOT, ClientStatementService.OUTPUT_DIR, f'{as_of_date:%Y-%m}'
+        )
+        os.makedirs(output_dir, exist_ok=True)
+        generated_at = timezone.now()
+
+        jobs = []
+        for data in statements:
+            filename = f"{data['client']['id']}-{slugify(data['client']['name']) or 'client'}.pdf"
+            html = render_to_string(ClientStatementService.TEMPLATE, {**data, 'generated_at': generated_at})
+            jobs.append((os.path.join(output_dir, filename), html))
+
+        started = time.monotonic()
+        results = []
+        if jobs:
+            workers = workers or os.cpu_count() or 1
+            # Workers never use the database; do not hand them open connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=statement_pdf.init_worker) as executor:
+                results = list(executor.map(
+                    statement_pdf.render, jobs, chunksize=max(1, len(jobs) // (workers * 4))
+                ))
+
+        manifest = {
+            'as_of_date': as_of_date.isoformat(),
+            'generated_at': generated_at.isoformat(),
+            'seconds': round(time.monotonic() - started, 2),
+            'statements': [
+                {
+                    'client_id': data['client']['id'],
+                    'client': data['client']['name'],
+                    'email': data['client']['email'],
+                    'balance': f"{data['balance']:.2f}",
+                    'open_invoices': len(data['invoices']),
+                    'file': os.path.basename(path),
+                    'size': size,
+                    'error': error,
+                }
+                for data, (path, size, error) in zip(statements, results)
+            ],
+        }
+        with open(os.path.join(output_dir, 'manifest.json'), 'w') as handle:
+            json.dump(manifest, handle, indent=2)
+        manifest['output_dir'] = output_dir
+        return manifest
+
+
+class GeneralLedgerService:
+    """Service class for the posted general ledger: per-account streams and the GL report"""
+
+    FIELDS = ['date', 'entry_number', 'description', 'debit', 'credit', 'running_balance']
+
+    @staticmethod
+    def parse_cursor(cursor):
+        """Parse an ``<YYYY-MM-DD>,<line id>`` keyset cursor. Raises ValueError if malformed"""
+        if not cursor:
+            return None
+        date_part, _, id_part = cursor.partition(',')
+        return datetime.strptime(date_part, '%Y-%m-%d').date(), int(id_part)
+
+    @staticmethod
+    def make_cursor(row):
+        return f"{row['date'].isoformat()},{row['id']}"
+
+    @staticmethod
+    def get_lines(account, after=None):
+        """Posted lines of an account in ledger order, starting after a keyset position"""
+        lines = JournalEntryLine.objects.filter(
+            account=account,
+            journal_entry__status__in=JournalEntry.LEDGER_STATUSES
+        )
+        if after:
+            after_date, after_id = after
+            lines = lines.filter(
+                Q(journal_entry__date__gt=after_date) |
+                Q(journal_entry__date=after_date, id__gt=after_id)
+            )
+        return lines.order_by('journal_entry__date', 'id')
+
+    @staticmethod
+    def get_opening_balance(account, after=None):
+        """Balance of the account up to and including the keyset position, in debit-positive sign"""
+        balance = Decimal(account.opening_balance)
+        if after:
+            after_date, after_id = after
+            totals = JournalEntryLine.objects.filter(
+                Q(journal_entry__date__lt=after_date) |
+                Q(journal_entry__date=after_date, id__lte=after_id),
+                account=account,
+                journal_entry__status__in=JournalEntry.LEDGER_STATUSES
+            ).aggregate(debit=Sum('debit'), credit=Sum('credit'))
+            balance += (totals['debit'] or ZERO) - (totals['credit'] or ZERO)
+        return balance
+
+    @staticmethod
+    def iter_rows(account, after=None, limit=None, chunk_size=2000):
+        """
+        Yield ledger rows with a running balance in the account's normal sign.
+
+        Rows are read with a server-side iterator, so memory stays flat however
+        many lines the account has.
+        """
+        sign = -1 if account.normal_balance == 'CREDIT' else 1
+        balance = GeneralLedgerService.get_opening_balance(account, after)
+
+        lines = GeneralLedgerService.get_lines(account, after).values_list(
+            'id', 'journal_entry__date', 'journal_entry__entry_number',
+            'description', 'journal_entry__description', 'debit', 'credit'
+        )
+        if limit is not None:
+            lines = lines[:limit]
+
+        for line_id, entry_date, entry_number, description, entry_description, debit, credit in lines.iterator(chunk_size=chunk_size):
+            balance += debit - credit
+            yield {
+                'id': line_id,
+                'date': entry_date,
+                'entry_number': entry_number,
+                'description': description or entry_description,
+                'debit': debit,
+                'credit': credit,
+                'running_balance': -balance if sign < 0 else balance,
+            }
+
+
+    REPORT_FIELDS = [
+        'account_code', 'account_name', 'date', 'entry_number', 'description', 'debit', 'credit', 'running_balance'
+    ]
+
+    @staticmethod
+    def signed_movement():
+        """debit - credit of a line, flipped for credit-normal accounts"""
+        return Case(
+            When(account__normal_balance='CREDIT', then=F('credit') - F('debit')),
+            default=F('debit') - F('credit'),
+            output_field=DecimalField(max_digits=15, decimal_places=2)
+        )
+
+    @staticmethod
+    def report_accounts(accounts, date_from, date_to):
+        """
+        Opening balance, period debits/credits and closing balance of each
+        account, in its normal sign, from one grouped aggregate. Accounts without
+        an opening balance or movement in the range are left out.
+        """
+        totals = JournalEntryLine.objects.filter(
+            account__in=accounts,
+            journal_entry__status__in=JournalEntry.LEDGER_STATUSES,
+            journal_entry__date__lte=date_to
+        ).values('account_id').annotate(
+            before_debit=Sum('debit', filter=Q(journal_entry__date__lt=date_from)),
+            before_credit=Sum('credit', filter=Q(journal_entry__date__lt=date_from)),
+            period_debit=Sum('debit', filter=Q(journal_entry__date__gte=date_from)),
+            period_credit=Sum('credit', filter=Q(journal_entry__date__gte=date_from)),
+        )
+        totals = {row['account_id']: row for row in totals}
+
+        summaries = []
+        for account in accounts.order_by('code'):
+            row = totals.get(account.pk, {})
+            sign = -1 if account.normal_balance == 'CREDIT' else 1
+            opening = Decimal(account.opening_balance) + (row.get('before_debit') or ZERO) - (row.get('before_credit') or ZERO)
+            # Negate rather than multiply by sign, so a zero balance never renders as -0.00
+            opening = -opening if sign < 0 else opening
+            debit_total = row.get('period_debit') or ZERO
+            credit_total = row.get('period_credit') or ZERO
+            if not (opening or debit_total or credit_total):
+                continue
+            summaries.append({
+                'account': account,
+                'account_id': account.pk,
+                'code': account.code,
+                'name': account.name,
+                'opening_balance': opening,
+                'debit_total': debit_total,
+                'credit_total': credit_total,
+                'closing_balance': opening + sign * (debit_total - credit_total),
+            })
+        return summaries
+
+    @staticmethod
+    def report_lines(accounts, date_from, date_to):
+        """
+        Posted lines in the range, ordered by account, date and id, annotated
+        with ``running_movement``: the cumulative signed movement within the
+        range, computed by a window Sum partitioned by account.
+        """
+        return JournalEntryLine.objects.filter(
+            account__in=accounts,
+            journal_entry__status__in=JournalEntry.LEDGER_STATUSES,
+            journal_entry__date__gte=date_from,
+            journal_entry__date__lte=date_to
+        ).annotate(
+            running_movement=Window(
+                Sum(GeneralLedgerService.signed_movement()),
+                partition_by=[F('account_id')],
+                order_by=[F('journal_entry__date').asc(), F('id').asc()],
+                frame=RowRange(start=None, end=0)
+            )
+        ).order_by('account__code', 'journal_entry__date', 'id').values(
+            'id', 'account_id', 'account__code', 'account__name', 'journal_entry__date',
+            'journal_entry__entry_number', 'description', 'journal_entry__description',
+            'debit', 'credit', 'running_movement'
+        )
+
+    @staticmethod
+    def report_row(line, openings):
+        return {
+            'id': line['id'],
+            'account_code': line['account__code'],
+            'account_name': line['account__name'],
+            'date': line['journal_entry__date'],
+            'entry_number': line['journal_entry__entry_number'],
+            'description': line['description'] or line['journal_entry__description'],
+            'debit': line['debit'],
+            'credit': line['credit'],
+            'running_balance': openings.get(line['account_id'], ZERO) + line['running_movement'],
+        }
+
+    @staticmethod
+    def iter_report(summaries, lines, chunk_size=2000):
+        """
+        Yield the full report for export: per account an opening balance row,
+        its lines with running balances and a closing row with period totals.
+        """
+        # Lines of accounts without a summary row (e.g. only zero-amount lines)
+        # are skipped, so they cannot stall the merge for the accounts after them
+        summary_ids = {summary['account_id'] for summary in summaries}
+        lines = (line for line in lines.iterator(chunk_size=chunk_size) if line['account_id'] in summary_ids)
+        pending = next(lines, None)
+        for summary in summaries:
+            account_row = {
+                'id': None,
+                'account_code': summary['code'],
+                'account_name': summary['name'],
+                'date': None,
+                'entry_number': '',
+            }
+            yield {
+                **account_row,
+                'description': 'Opening balance',
+                'debit': None,
+                'credit': None,
+                'running_balance': summary['opening_balance'],
+            }
+            openings = {summary['account_id']: summary['opening_balance']}
+            while pending is not None and pending['account_id'] == summary['account_id']:
+                yield GeneralLedgerService.report_row(pending, openings)
+                pending = next(lines, None)
+            yield {
+                **account_row,
+                'description': 'Closing balance',
+                'debit': summary['debit_total'],
+                'credit': summary['credit_total'],
+                'running_balance': summary['closing_balance'],
+            }
+
+
+class ChartOfAccountsService:
+    """Service class for the account hierarchy and its rolled-up balances"""
+
+    CACHE_TIMEOUT = 300
+
+    @staticmethod
+    def get_tree():
+        """
+        Parent/child tree over Account.parent_account with sub-account balances
+        rolled up to their parents.
+
+        Built from one grouped aggregate over the posted ledger and cached per
+        ledger version. Returns ``{'nodes': {id: node}, 'roots': [id, ...]}``.
+        """
+        cache_key = f'finance_management:account_tree:{get_ledger_version()}'
+        tree = cache.get(cache_key)
+        if tree is None:
+            tree = ChartOfAccountsService.build_tree()
+            cache.set(cache_key, tree, ChartOfAccountsService.CACHE_TIMEOUT)
+        return tree
+
+    @staticmethod
+    def build_tree():
+        totals = JournalEntryLine.objects.filter(
+            journal_entry__status__in=JournalEntry.LEDGER_STATUSES
+        ).values('account').annotate(
+            debit_total=Sum('debit'),
+            credit_total=Sum('credit')
+        )
+        totals = {row['account']: row for row in totals}
+
+        nodes = {}
+        for account_id, code, name, account_type, normal_balance, opening_balance, parent_id in Account.objects.values_list(
+            'id', 'code', 'name', 'account_type', 'normal_balance', 'opening_balance', 'parent_account_id'
+        ).order_by('code'):
+            row = totals.get(account_id, {})
+            net = Decimal(opening_balance) + (row.get('debit_total') or ZERO) - (row.get('credit_total') or ZERO)
+            balance = -net if normal_balance == 'CREDIT' else net
+            nodes[account_id] = {
+                'id': account_id,
+                'code': code,
+                'name': name,
+                'account_type': account_type,
+                'parent_id': parent_id,
+                'balance': balance,
+                'rollup_balance': balance,
+                'children': [],
+            }
+
+        roots = []
+        for node in nodes.values():
+            parent = nodes.get(node['parent_id'])
+            if parent is not None:
+                parent['children'].append(node['id'])
+            else:
+                roots.append(node['id'])
+
+        # Roll balances up from the leaves, guarding against parent cycles
+        def rollup(node_id, path):
+            node = nodes[node_id]
+            for child_id in node['children']:
+                if child_id not in path:
+                    node['rollup_balance'] += rollup(child_id, path | {child_id})
+            return node['rollup_balance']
+
+        for root_id in roots:
+            rollup(root_id, {root_id})
+
+        return {'nodes': nodes, 'roots': roots}
+
+
+class LedgerCube:
+    """
+    Posted ledger movements at account x month x client grain held in NumPy
+    arrays: int-coded dimensions and debit/credit as int64 cents. Built from one
+    grouped query and sliced in memory.
+
+    Period closing lines are kept as their own facts and left out of every
+    pivot unless ``include_closing`` is passed, so closed months still show
+    their revenue and expenses.
+    """
+
+    DIMENSIONS = ['account', 'account_type', 'account_category', 'client', 'closing', 'month', 'quarter', 'year']
+    MEASURES = ['net', 'movement', 'debit', 'credit']
+
+    def __init__(self, version, accounts, clients, account, month, client, closing, debit, credit):
+        self.version = version
+        self.accounts = accounts    # position -> account dict
+        self.clients = clients      # position -> client dict; position 0 is "no client"
+        self.account = account      # int32 account positions
+        self.month = month          # int32 months since year 0 (year * 12 + month - 1)
+        self.client = client        # int32 client positions
+        self.closing = closing      # bool, True for period closing lines
+        self.debit = debit          # int64 cents
+        self.credit = credit        # int64 cents
+
+        types = [choice[0] for choice in Account.ACCOUNT_TYPE_CHOICES]
+        categories = [choice[0] for choice in Account.ACCOUNT_CATEGORY_CHOICES]
+        self.account_type = np.array([types.index(a['account_type']) for a in accounts], dtype=np.int32)
+        self.account_category = np.array([categories.index(a['account_category']) for a in accounts], dtype=np.int32)
+        self.sign = np.array([1 if a['normal_balance'] == 'DEBIT' else -1 for a in accounts], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.debit)
+
+    @classmethod
+    def build(cls, version):
+        accounts = list(
+            Account.objects.order_by('code').values(
+                'id', 'code', 'name', 'account_type', 'account_category', 'normal_balance'
+            )
+        )
+        account_positions = {a['id']: position for position, a in enumerate(accounts)}
+        rows = list(
+            JournalEntryLine.objects.filter(journal_entry__status__in=JournalEntry.LEDGER_STATUSES)
+            .annotate(month=TruncMonth('journal_entry__date'))
+            .values('account_id', 'month', 'client_id', 'is_closing')
+            .annotate(debit=Sum('debit'), credit=Sum('credit'))
+            .order_by()
+            .values_list('account_id', 'month', 'client_id', 'is_closing', 'debit', 'credit')
+        )
+        client_ids = sorted({row[2] for row in rows if row[2] is not None})
+        clients = [{'id': None, 'name': 'No client'}] + list(
+            Client.objects.filter(pk__in=client_ids).order_by('pk').values('id', 'name')
+        )
+        client_positions = {c['id']: position for position, c in enumerate(clients)}
+
+        size = len(rows)
+        return cls(
+            version,
+            accounts,
+            clients,
+            np.fromiter((account_positions[row[0]] for row in rows), dtype=np.int32, count=size),
+            np.fromiter((row[1].year * 12 + row[1].month - 1 for row in rows), dtype=np.int32, count=size),
+            np.fromiter((client_positions.get(row[2], 0) for row in rows), dtype=np.int32, count=size),
+            np.fromiter((row[3] for row in rows), dtype=bool, count=size),
+            np.fromiter((to_cents(row[4]) for row in rows), dtype=np.int64, count=size),
+            np.fromiter((to_cents(row[5]) for row in rows), dtype=np.int64, count=size),
+        )
+
+    def keys(self, dimension):
+        """Integer key per fact for a dimension, and a function labelling a key as (key, label)"""
+        if dimension == 'account':
+            accounts = self.accounts
+            return self.account, lambda k: (accounts[k]['code'], f"{accounts[k]['code']} - {accounts[k]['name']}")
+        if dimension == 'account_type':
+            labels = Account.ACCOUNT_TYPE_CHOICES
+            return self.account_type[self.account], lambda k: labels[k]
+        if dimension == 'account_category':
+            labels = Account.ACCOUNT_CATEGORY_CHOICES
+            return self.account_category[self.account], lambda k: labels[k]
+        if dimension == 'client':
+            return self.client, lambda k: (self.clients[k]['id'], self.clients[k]['name'])
+        if dimension == 'closing':
+            return self.closing.astype(np.int32), lambda k: (bool(k), 'Period closing' if k else 'Activity')
+        if dimension == 'month':
+            return self.month, lambda k: (f'{k // 12}-{k % 12 + 1:02d}',) * 2
+        if dimension == 'quarter':
+            return self.month // 3, lambda k: (f'{k // 4}-Q{k % 4 + 1}',) * 2
+        if dimension == 'year':
+            return self.month // 12, lambda k: (str(k),) * 2
+        raise ValueError(f"Unknown dimension {dimension}, expected one of {', '.join(self.DIMENSIONS)}")
+
+    def values(self, measure):
+        if measure == 'debit':
+            return self.debit
+        if measure == 'credit':
+            return self.credit
+        if measure == 'movement':
+            return self.debit - self.credit
+        if measure == 'net':
+            # Signed to the account's normal side: revenue and expenses both positive
+            return (self.debit - self.credit) * self.sign[self.account]
+        raise ValueError(f"Unknown measure {measure}, expected one of {', '.join(self.MEASURES)}")
+
+    def mask(self, account_types=None, account_categories=None, accounts=None, clients=None,
+             date_from=None, date_to=None, include_closing=False):
+        mask = np.ones(len(self), dtype=bool) if include_closing else ~self.closing
+        if account_types:
+            types = [choice[0] for choice in Account.ACCOUNT_TYPE_CHOICES]
+            wanted = [types.index(value) for value in account_types if value in types]
+            mask &= np.isin(self.account_type[self.account], wanted)
+        if account_categories:
+            categories = [choice[0] for choice in Account.ACCOUNT_CATEGORY_CHOICES]
+            wanted = [categories.index(value) for value in account_categories if value in categories]
+            mask &= np.isin(self.account_category[self.account], wanted)
+        if accounts:
+            wanted = [position for position, a in enumerate(self.accounts) if a['code'] in set(accounts)]
+            mask &= np.isin(self.account, wanted)
+        if clients:
+            wanted = [position for position, c in enumerate(self.clients) if c['id'] in set(clients)]
+            mask &= np.isin(self.client, wanted)
+        if date_from:
+            mask &= self.month >= date_from.year * 12 + date_from.month - 1
+        if date_to:
+            mask &= self.month <= date_to.year * 12 + date_to.month - 1
+        return mask
+
+    def pivot(self, rows, columns=None, measure='net', **filters):
+        """
+        Roll the cube up to ``rows`` x ``columns`` (any two DIMENSIONS; months
+        are the finest date grain) after applying the filters of ``mask``.
+        Amounts come back as Decimals with row, column and grand totals.
+        """
+        row_keys, row_label = self.keys(rows)
+        if columns:
+            column_keys, column_label = self.keys(columns)
+        else:
+            column_keys, column_label = np.zeros(len(self), dtype=np.int32), lambda k: ('total', 'Total')
+        values = self.values(measure)
+
+        mask = self.mask(**filters)
+        row_values, row_index = np.unique(row_keys[mask], return_inverse=True)
+        column_values, column_index = np.unique(column_keys[mask], return_inverse=True)
+        if not len(column_values) and not columns:
+            column_values = np.zeros(1, dtype=np.int32)
+
+        matrix = np.zeros((len(row_values), len(column_values)), dtype=np.int64)
+        np.add.at(matrix, (row_index, column_index), values[mask])
+
+        def labelled(keys, label):
+            return [dict(zip(('key', 'label'), label(int(k)))) for k in keys]
+
+        return {
+            'version': self.version,
+            'measure': measure,
+            'rows': labelled(row_values, row_label),
+            'columns': labelled(column_values, column_label),
+            'values': [[from_cents(value) for value in row] for row in matrix.tolist()],
+            'row_totals': [from_cents(value) for value in matrix.sum(axis=1).tolist()],
+            'column_totals': [from_cents(value) for value in matrix.sum(axis=0).tolist()],
+            'total': from_cents(matrix.sum()),
+        }
+
+
+class LedgerCubeService:
+    """Service class handing out the ledger cube for the current ledger version"""
+
+    CACHE_TIMEOUT = 3600
+    # Process-local copy so requests do not unpickle the arrays from the cache every time
+    _current = None
+
+    @staticmethod
+    def get_cube():
+        version = get_ledger_version()
+        cube = LedgerCubeService._current
+        if cube is not None and cube.version == version:
+            return cube
+
+        cache_key = f'finance_management:ledger_cube:v2:{version}'
+        cube = cache.get(cache_key)
+        if cube is None:
+            cube = LedgerCube.build(version)
+            cache.set(cache_key, cube, LedgerCubeService.CACHE_TIMEOUT)
+        LedgerCubeService._current = cube
+        return cube
+
+
+class AgingService:
+    """Service class for receivable and payable aging computed in the database"""
+
+    RECEIVABLE_STATUSES = ['SENT', 'OVERDUE']
+    PAYABLE_STATUSES = ['DRAFT', 'PENDING_APPROVAL', 'APPROVED', 'PARTIALLY_PAID', 'OVERDUE']
+
+    # (bucket, first day past due, last day past due); None leaves the range open
+    RECEIVABLE_BUCKETS = [
+        ('current', None, 0),
+        ('days_30', 1, 30),
+        ('days_60', 31, 60),
+        ('days_90', 61, 90),
+        ('over_90', 91, None),
+    ]
+    PAYABLE_BUCKETS = [
+        ('current', None, 0),
+        ('days_30', 1, 30),
+        ('days_60', 31, 60),
+        ('over_60', 61, None),
+    ]
+
+    AMOUNT_FIELD = DecimalField(max_digits=15, decimal_places=2)
+
+    @staticmethod
+    def annotate_invoices(queryset):
+        """Annotate invoices with paid_total and outstanding_total (total minus payments, never negative)"""
+        if 'outstanding_total' in queryset.query.annotations:
+            return queryset
+        paid = Payment.objects.filter(invoice=OuterRef('pk')).values('invoice').annotate(
+            paid=Sum('amount')
+        ).values('paid')
+        return queryset.annotate(
+            paid_total=Coalesce(Subquery(paid), Value(ZERO), output_field=AgingService.AMOUNT_FIELD)
+        ).annotate(
+            outstanding_total=Greatest(
+                F('total') - F('paid_total'),
+                Value(ZERO),
+                output_field=AgingService.AMOUNT_FIELD
+            )
+        )
+
+    @staticmethod
+    def bucket_aggregates(buckets, as_of_date, amount):
+        """Conditional Sum() per bucket over ``amount``, keyed on days past due_date"""
+        aggregates = {}
+        for name, first_day, last_day in buckets:
+            condition = Q()
+            if first_day is not None:
+                condition &= Q(due_date__lte=as_of_date - timedelta(days=first_day))
+            if last_day is not None:
+                condition &= Q(due_date__gte=as_of_date - timedelta(days=last_day))
+            aggregates[name] = Coalesce(
+                Sum(amount, filter=condition), Value(ZERO), output_field=AgingService.AMOUNT_FIELD
+            )
+        aggregates['total'] = Coalesce(Sum(amount), Value(ZERO), output_field=AgingService.AMOUNT_FIELD)
+        aggregates['count'] = Count('id', filter=Q(**{f'{amount}__gt': 0}))
+        return aggregates
+
+    @staticmethod
+    def receivables(as_of_date=None, group_by_client=False, queryset=None):
+        """
+        Receivable aging in one query: outstanding amounts per bucket, overall
+        or one row per client (largest balance first).
+        """
+        as_of_date = as_of_date or timezone.now().date()
+        if queryset is None:
+            queryset = Invoice.objects.filter(status__in=AgingService.RECEIVABLE_STATUSES)
+        queryset = AgingService.annotate_invoices(queryset)
+        aggregates = AgingService.bucket_aggregates(
+            AgingService.RECEIVABLE_BUCKETS, as_of_date, 'outstanding_total'
+        )
+
+        if group_by_client:
+            return list(
+                queryset.values('client_id', 'client__name').annotate(**aggregates).order_by('-total', 'client__name')
+            )
+        return queryset.aggregate(**aggregates)
+
+    @staticmethod
+    def payables(as_of_date=None, group_by_vendor=False, queryset=None):
+        """Payable aging in one query over balance_due, overall or one row per vendor"""
+        as_of_date = as_of_date or timezone.now().date()
+        if queryset is None:
+            queryset = AccountsPayable.objects.filter(status__in=AgingService.PAYABLE_STATUSES)
+        aggregates = AgingService.bucket_aggregates(
+            AgingService.PAYABLE_BUCKETS, as_of_date, 'balance_due'
+        )
+
+        if group_by_vendor:
+            return list(queryset.values('vendor').annotate(**aggregates).order_by('-total', 'vendor'))
+        return queryset.aggregate(**aggregates)
+
+
+class OverdueSweepService:
+    """Service class that moves past-due invoices and payables to OVERDUE with set-based updates"""
+
+    # Invoices that are sent but unpaid become overdue; payables in any open state do
+    INVOICE_OPEN_STATUSES = ['SENT']
+    PAYABLE_OPEN_STATUSES = ['DRAFT', 'PENDING_APPROVAL', 'APPROVED', 'PARTIALLY_PAID']
+
+    @staticmethod
+    def sweep_invoices(today):
+        """
+        Flag sent invoices with an outstanding amount and a past due date as
+        OVERDUE, and move OVERDUE invoices whose due date was pushed back to
+        SENT. Returns (newly overdue, no longer overdue).
+        """
+        outstanding = AgingService.annotate_invoices(Invoice.objects.all()).filter(
+            outstanding_total__gt=0
+        ).values('pk')
+        overdue = Invoice.objects.filter(
+            status__in=OverdueSweepService.INVOICE_OPEN_STATUSES,
+            due_date__lt=today,
+            pk__in=Subquery(outstanding)
+        )
+        current = Invoice.objects.filter(status='OVERDUE', due_date__gte=today)
+
+        with transaction.atomic():
+            dates = set(overdue.values_list('issue_date', flat=True).distinct())
+            dates |= set(current.values_list('issue_date', flat=True).distinct())
+            flagged = overdue.update(status='OVERDUE', updated_at=timezone.now())
+            cleared = current.update(status='SENT', updated_at=timezone.now())
+            # update() skips the post_save receivers that keep the dashboard rollups current
+            FinanceDailyRollup.refresh('INVOICE', dates)
+        return flagged, cleared
+
+    @staticmethod
+    def sweep_payables(today):
+        """Flag open payables with a balance due past their due date as OVERDUE. Returns the count"""
+        overdue = AccountsPayable.objects.filter(
+            status__in=OverdueSweepService.PAYABLE_OPEN_STATUSES,
+            due_date__lt=today,
+            balance_due__gt=0
+        )
+        with transaction.atomic():
+            dates = set(overdue.values_list('invoice_date', flat=True).distinct())
+            flagged = overdue.update(status='OVERDUE', updated_at=timezone.now())
+            FinanceDailyRollup.refresh('PAYABLE', dates)
+        return flagged
+
+    @staticmethod
+    def sweep(today=None):
+        """
+        Run both sweeps and record their counts as an OverdueSweepRun.
+        Re-running on the same day changes nothing but adds a run with zero counts.
+        """
+        today = today or timezone.now().date()
+        invoices_flagged, invoices_cleared = OverdueSweepService.sweep_invoices(today)
+        result = {
+            'as_of_date': today,
+            'invoices_overdue': invoices_flagged,
+            'invoices_current': invoices_cleared,
+            'payables_overdue': OverdueSweepService.sweep_payables(today),
+        }
+        OverdueSweepRun.objects.create(**result)
+        return result
+
+
+class PaymentAllocationService:
+    """
+    Service class applying one client receipt across many open invoices, oldest
+    due first or in an explicit order, posted to the cash receipts journal.
+    """
+
+    @staticmethod
+    def get_period(entry_date):
+        period = AccountingPeriod.objects.filter(
+            start_date__lte=entry_date,
+            end_date__gte=entry_date,
+            status='OPEN',
+            is_adjustment_period=False
+        ).order_by('start_date').first()
+        if period is None:
+            raise ValueError(f'No open accounting period covers {entry_date}')
+        return period
+
+    @staticmethod
+    def get_deposit_account(deposit_account=None):
+        if deposit_account is not None:
+            return deposit_account
+        account = (
+            Account.objects.filter(status='ACTIVE', is_bank_account=True).order_by('code').first()
+            or Account.objects.filter(status='ACTIVE', is_cash_account=True).order_by('code').first()
+        )
+        if account is None:
+            raise ValueError('No active bank or cash account to deposit the receipt into')
+        return account
+
+    @staticmethod
+    def plan(invoices, amount):
+        """
+        Split ``amount`` over ``(invoice, outstanding)`` pairs in order. Returns
+        the allocations as ``(invoice, applied)`` and the unapplied remainder.
+        """
+        remaining = amount
+        allocations = []
+        for invoice, outstanding in invoices:
+            if remaining <= 0:
+                break
+            applied = min(outstanding, remaining)
+            if applied <= 0:
+                continue
+            allocations.append((invoice, applied))
+            remaining -= applied
+        return allocations, remaining
+
+    @staticmethod
+    def allocate(client, amount, user, payment_date=None, payment_method='BANK_TRANSFER', reference='',
+                 invoice_ids=None, deposit_account=None, notes=''):
+        """
+        Apply a receipt to a client's open invoices in one transaction.
+
+        Without ``invoice_ids`` the oldest due invoices are paid first; with it
+        the invoices are paid in the order given. Payment rows and the journal
+        lines are written with bulk_create, fully paid invoices move to PAID in
+        one UPDATE, and the entry debiting the deposit account and crediting
+        receivables is posted. Any amount left over is returned as unapplied.
+        """
+        amount = Decimal(amount)
+        if amount <= 0:
+            raise ValueError('Receipt amount must be positive')
+        payment_date = payment_date or timezone.now().date()
+
+        journal_code = get_ledger_code('cash_receipts_journal')
+        journal = Journal.objects.filter(code=journal_code, status='ACTIVE').first()
+        if journal is None:
+            raise ValueError(f'Journal {journal_code} is not set up')
+        receivable_code = get_ledger_code('receivable_account')
+        receivable = Account.objects.filter(code=receivable_code).first()
+        if receivable is None:
+            raise ValueError(f'Receivable account {receivable_code} is not set up (see FINANCE_LEDGER_CODES)')
+        deposit_account = PaymentAllocationService.get_deposit_account(deposit_account)
+        period = PaymentAllocationService.get_period(payment_date)
+
+        with transaction.atomic():
+            open_invoices = Invoice.objects.filter(client=client, status__in=AgingService.RECEIVABLE_STATUSES)
+            if invoice_ids is not None:
+                open_invoices = open_invoices.filter(pk__in=invoice_ids)
+            # Lock the invoices so concurrent receipts cannot both pay the same balance
+            locked = list(open_invoices.select_for_update().values_list('pk', flat=True))
+            invoices = AgingService.annotate_invoices(Invoice.objects.filter(pk__in=locked)).filter(
+                outstanding_total__gt=0
+            )
+
+            if invoice_ids is not None:
+                by_id = {invoice.pk: invoice for invoice in invoices}
+                missing = [invoice_id for invoice_id in invoice_ids if invoice_id not in by_id]
+                if missing:
+                    raise ValueError(f'Invoices {missing} are not open invoices of {client}')
+                ordered = [by_id[invoice_id] for invoice_id in invoice_ids]
+            else:
+                ordered = list(invoices.order_by('due_date', 'issue_date', 'id'))
+
+            allocations, unapplied = PaymentAllocationService.plan(
+                [(invoice, invoice.outstanding_total) for invoice in ordered], amount
+            )
+            if not allocations:
+                raise ValueError(f'{client} has no open invoices to apply the receipt to')
+            applied = amount - unapplied
+
+            payments = Payment.objects.bulk_create([
+                Payment(
+                    invoice=invoice,
+                    amount=value,
+                    payment_date=payment_date,
+                    payment_method=payment_method,
+                    reference_number=reference,
+                    notes=notes,
+                )
+                for invoice, value in allocations
+            ])
+
+            entry = JournalEntry.objects.create(
+                journal=journal,
+                period=period,
+                date=payment_date,
+                description=f'Receipt from {client.name}' + (f' ({reference})' if reference else ''),
+                reference=reference,
+                total_debit=applied,
+                total_credit=applied,
+                created_by=user,
+            )
+            lines = [JournalEntryLine(
+                journal_entry=entry,
+                account=deposit_account,
+                description=f'Receipt from {client.name}',
+                debit=applied,
+                credit=ZERO,
+                client=client,
+            )]
+            lines.extend(
+                JournalEntryLine(
+                    journal_entry=entry,
+                    account=receivable,
+                    description=f'Payment of invoice {invoice.invoice_number}',
+                    debit=ZERO,
+                    credit=value,
+                    client=client,
+                )
+                for invoice, value in allocations
+            )
+            JournalEntryLine.objects.bulk_create(lines)
+            posted, skipped = JournalEntry.post_entries([entry.pk], user)
+            if skipped:
+                raise ValueError(f'Could not post the receipt: {next(iter(skipped.values()))}')
+
+            paid = [invoice for invoice, value in allocations if value == invoice.outstanding_total]
+            paid_count = Invoice.objects.filter(pk__in=[invoice.pk for invoice in paid]).update(
+                status='PAID', updated_at=timezone.now()
+            )
+
+            # bulk_create() and update() skip the receivers that maintain the dashboard rollups
+            for metric in ('PAYMENT', 'CLIENT_PAYMENT', 'PAYMENT_TIME'):
+                FinanceDailyRollup.refresh(metric, [payment_date])
+            FinanceDailyRollup.refresh('INVOICE', [invoice.issue_date for invoice in paid])
+
+        entry.refresh_from_db()
+        return {
+            'payments': payments,
+            'allocations': [(invoice.invoice_number, value) for invoice, value in allocations],
+            'applied': applied,
+            'unapplied': unapplied,
+            'paid_invoices': paid_count,
+            'journal_entry': entry,
+        }
+
+
+class TimeBillingService:
+    """
+    Service class turning approved, unbilled billable time entries into client
+    invoices for a billing period: one invoice per client, one item per case,
+    activity and rate, with the revenue posted to the sales journal.
+    """
+
+    DEFAULT_DUE_DAYS = 30
+
+    @staticmethod
+    def billable_entries(date_from, date_to):
+        return TimeEntry.objects.filter(
+            status='approved',
+            is_billable=True,
+            billable_rate__isnull=False,
+            billable_amount__gt=0,
+            date__range=(date_from, date_to),
+        )
+
+    @staticmethod
+    def resolve_clients(labels):
+        """
+        Map TimeEntry.client_case labels to clients: a case code resolves to the
+        case's client, anything else is matched against client names ignoring case.
+        """
+        labels = {label for label in labels if label}
+        resolved = {
+            case.code: case.client
+            for case in ClientCase.objects.filter(code__in=labels).select_related('client')
+        }
+        by_name = {
+            client.lower_name: client
+            for client in Client.objects.annotate(lower_name=Lower('name')).filter(
+                lower_name__in=[label.lower() for label in labels - resolved.keys()]
+            )
+        }
+        for label in labels - resolved.keys():
+            if label.lower() in by_name:
+                resolved[label] = by_name[label.lower()]
+        return resolved
+
+    @staticmethod
+    def summarize(date_from, date_to):
+        """
+        Group the billable time of a period into invoice drafts with one
+        aggregate query. Returns (invoices, unresolved) where invoices is a
+        list of {client, labels, items, hours, total, entries} and unresolved
+        maps client_case labels that match no client to their entry count.
+        """
+        activities = dict(TimeEntry.ACTIVITY_TYPES)
+        rows = list(
+            TimeBillingService.billable_entries(date_from, date_to)
+            .values('client_case', 'activity_type', 'billable_rate')
+            .annotate(
+                hours=Sum('hours_worked'),
+                amount=Sum('billable_amount'),
+                entries=Count('id'),
+                first_date=Min('date'),
+                last_date=Max('date'),
+            )
+            .order_by('client_case', 'activity_type', 'billable_rate')
+        )
+        clients = TimeBillingService.resolve_clients({row['client_case'] for row in rows})
+
+        invoices = {}
+        unresolved = {}
+        for row in rows:
+            client = clients.get(row['client_case'])
+            if client is None:
+                label = row['client_case'] or '(no client)'
+                unresolved[label] = unresolved.get(label, 0) + row['entries']
+                continue
+            invoice = invoices.setdefault(client.pk, {
+                'client': client, 'labels': set(), 'items': {}, 'hours': ZERO, 'total': ZERO, 'entries': 0,
+            })
+            invoice['labels'].add(row['client_case'])
+            # Spellings of the client name share an item; each case gets its own
+            case_code = row['client_case'] if row['client_case'].lower() != client.name.lower() else ''
+            item = invoice['items'].setdefault((case_code, row['activity_type'], row['billable_rate']), {
+                'activity': activities.get(row['activity_type'], row['activity_type']),
+                'case': case_code,
+                'first_date': row['first_date'],
+                'last_date': row['last_date'],
+                'quantity': ZERO,
+                'unit_price': row['billable_rate'],
+                'amount': ZERO,
+            })
+            item['first_date'] = min(item['first_date'], row['first_date'])
+            item['last_date'] = max(item['last_date'], row['last_date'])
+            item['quantity'] += row['hours']
+            item['amount'] += row['amount']
+            invoice['hours'] += row['hours']
+            invoice['total'] += row['amount']
+            invoice['entries'] += row['entries']
+
+        for invoice in invoices.values():
+            invoice['items'] = [
+                {
+                    'description': (
+                        item['activity'] + (f" - {item['case']}" if item['case'] else '')
+                        + f" ({item['first_date']:%d %b} - {item['last_date']:%d %b %Y})"
+                    )[:255],
+                    'quantity': item['quantity'],
+                    'unit_price': item['unit_price'],
+                    'amount': item['amount'],
+                }
+                for item in invoice['items'].values()
+            ]
+        return sorted(invoices.values(), key=lambda invoice: invoice['client'].name), unresolved
+
+    @staticmethod
+    def run(date_from, date_to, user, issue_date=None, due_days=DEFAULT_DUE_DAYS, dry_run=False):
+        """
+        Bill the approved time of a period in one transaction. Invoices (SENT,
+        numbered from one reserved block) and their items are written with
+        bulk_create, the billed entries move to 'billed' in one UPDATE and a
+        single sales journal entry debiting receivables and crediting revenue
+        per invoice is posted. With dry_run nothing is written.
+        """
+        issue_date = issue_date or date_to
+        result = {'invoices': [], 'unresolved': {}, 'entries': 0, 'total': ZERO, 'journal_entry': None}
+
+        journal_code = get_ledger_code('sales_journal')
+        journal = Journal.objects.filter(code=journal_code, status='ACTIVE').first()
+        if journal is None:
+            raise ValueError(f'Journal {journal_code} is not set up')
+        receivable_code = get_ledger_code('receivable_account')
+        revenue_code = get_ledger_code('fee_revenue_account')
+        accounts = {account.code: account for account in Account.objects.filter(code__in=[receivable_code, revenue_code])}
+        for code in (receivable_code, revenue_code):
+            if code not in accounts:
+                raise ValueError(f'Account {code} is not set up (see FINANCE_LEDGER_CODES)')
+        period = PaymentAllocationService.get_period(issue_date)
+
+        with transaction.atomic():
+            # Lock the period's billable entries so a concurrent run cannot bill them twice
+            list(TimeBillingService.billable_entries(date_from, date_to).select_for_update().values_list('pk', flat=True))
+            drafts, result['unresolved'] = TimeBillingService.summarize(date_from, date_to)
+            result['entries'] = sum(draft['entries'] for draft in drafts)
+            result['total'] = sum((draft['total'] for draft in drafts), ZERO)
+            if dry_run:
+                result['invoices'] = drafts
+                return result
+            if not drafts:
+                raise ValueError(f'No approved billable time to bill between {date_from} and {date_to}')
+
+            numbers = NumberingService.reserve('INV', len(drafts), date=issue_date)
+            invoices = Invoice.objects.bulk_create([
+                Invoice(
+                    invoice_number=number,
+                    client=draft['client'],
+                    issue_date=issue_date,
+                    due_date=issue_date + timedelta(days=due_days),
+                    status='SENT',
+                    subtotal=draft['total'],
+                    tax=ZERO,
+                    total=draft['total'],
+                    notes=f'Professional services from {date_from} to {date_to}',
+                )
+                for number, draft in zip(numbers, drafts)
+            ])
+            InvoiceItem.objects.bulk_create([
+                InvoiceItem(invoice=invoice, **item)
+                for invoice, draft in zip(invoices, drafts)
+                for item in draft['items']
+            ], batch_size=1000)
+
+            entry = JournalEntry.objects.create(
+                journal=journal,
+                period=period,
+                date=issue_date,
+                description=f'Time billing {date_from} to {date_to}',
+                reference=f'{numbers[0]} - {numbers[-1]}' if len(numbers) > 1 else numbers[0],
+                total_debit=result['total'],
+                total_credit=result['total'],
+                created_by=user,
+            )
+            # Receivable and revenue per invoice, so both carry the client
+            lines = []
+            for invoice in invoices:
+                lines.append(JournalEntryLine(
+                    journal_entry=entry,
+                    account=accounts[receivable_code],
+                    description=f'Invoice {invoice.invoice_number} - {invoice.client.name}'[:255],
+                    debit=invoice.total,
+                    credit=ZERO,
+                    client=invoice.client,
+                ))
+                lines.append(JournalEntryLine(
+                    journal_entry=entry,
+                    account=accounts[revenue_code],
+                    description=f'Legal services, invoice {invoice.invoice_number}',
+                    debit=ZERO,
+                    credit=invoice.total,
+                    client=invoice.client,
+                ))
+            JournalEntryLine.objects.bulk_create(lines, batch_size=1000)
+            posted, skipped = JournalEntry.post_entries([entry.pk], user)
+            if skipped:
+                raise ValueError(f'Could not post the billing entry: {next(iter(skipped.values()))}')
+
+            labels = set().union(*(draft['labels'] for draft in drafts))
+            TimeBillingService.billable_entries(date_from, date_to).filter(client_case__in=labels).update(
+                status='billed', updated_at=timezone.now()
+            )
+
+            # bulk_create() skips the receivers that maintain the dashboard rollups
+            FinanceDailyRollup.refresh('INVOICE', [issue_date])
+
+        entry.refresh_from_db()
+        result['invoices'] = invoices
+        result['journal_entry'] = entry
+        return result
+
+
+class NumberingService:
+    """Service class allocating finance document numbers from per-prefix, per-month sequences"""
+
+    # Placeholders: {prefix}, {period} (YYYYMM) and {number}; override through
+    # settings.FINANCE_NUMBER_FORMATS
+    FORMATS = {
+        'EXP': '{prefix}{period}{number:04d}',
+        'AP': '{prefix}-{period}-{number:04d}',
+        'INV': '{prefix}-{period}-{number:04d}',
+        'JE': '{prefix}-{period}-{number:06d}',
+    }
+
+    # Where already issued numbers live, to seed a sequence the first time it is used
+    NUMBERED_FIELDS = {
+        'EXP': (Expense, 'reference_number'),
+        'AP': (AccountsPayable, 'reference_number'),
+        'INV': (Invoice, 'invoice_number'),
+        'JE': (JournalEntry, 'entry_number'),
+    }
+
+    @staticmethod
+    def get_format(document_type):
+        formats = {**NumberingService.FORMATS, **getattr(settings, 'FINANCE_NUMBER_FORMATS', {})}
+        return formats[document_type]
+
+    @staticmethod
+    def split_format(document_type, prefix, period):
+        """Literal text before and after {number} once prefix and period are filled in"""
+        template = NumberingService.get_format(document_type)
+        start = template.index('{number')
+        end = template.index('}', start) + 1
+        return (
+            template[:start].format(prefix=prefix, period=period),
+            template[end:].format(prefix=prefix, period=period),
+        )
+
+    @staticmethod
+    def last_issued(document_type, prefix, period):
+        """Highest number already stored for this prefix and month (0 when none)"""
+        model, field = NumberingService.NUMBERED_FIELDS[document_type]
+        head, tail = NumberingService.split_format(document_type, prefix, period)
+        pattern = re.compile(re.escape(head) + r'(\d+)' + re.escape(tail))
+        last = 0
+        values = model.objects.filter(**{f'{field}__startswith': head}).values_list(field, flat=True)
+        for value in values.iterator():
+            match = pattern.fullmatch(value)
+            if match:
+                last = max(last, int(match.group(1)))
+        return last
+
+    @staticmethod
+    def get_sequence(document_type, prefix, period):
+        name = f'finance:{document_type}:{prefix}:{period}'
+        sequence = Sequence(name)
+        if sequence.get_last_value() is None:
+            # Only the first allocation of a month looks at existing rows, so numbers
+            # issued before the sequence existed are never handed out again
+            sequence = Sequence(name, initial_value=NumberingService.last_issued(document_type, prefix, period) + 1)
+        return sequence
+
+    @staticmethod
+    def reserve(document_type, count, date=None, prefix=None):
+        """
+        Allocate ``count`` consecutive numbers in one sequence update and return
+        them formatted, in order.
+        """
+        if count < 1:
+            return []
+        prefix = prefix or document_type
+        period = (date or timezone.now()).strftime('%Y%m')
+        sequence = NumberingService.get_sequence(document_type, prefix, period)
+        template = NumberingService.get_format(document_type)
+        return [
+            template.format(prefix=prefix, period=period, number=number)
+            for number in sequence.get_next_values(count)
+        ]
+
+    @staticmethod
+    def next_number(document_type, date=None, prefix=None):
+        """Allocate a single document number"""
+        return NumberingService.reserve(document_type, 1, date=date, prefix=prefix)[0]
+
+
+class JournalEntryImportError(Exception):
+    """Raised when an import file cannot be read at all"""
+
+
+class JournalEntryImportService:
+    """
+    Service class for bulk journal entry imports. A file holds one row per line;
+    rows sharing an ``entry`` key form one journal entry.
+    """
+
+    REQUIRED_COLUMNS = ['entry', 'date', 'journal', 'account', 'debit', 'credit']
+    OPTIONAL_COLUMNS = ['entry_number', 'description', 'reference', 'line_description']
+
+    @staticmethod
+    def read_file(file, filename=None):
+        """Load a CSV or XLSX file into a DataFrame of strings with normalised column names"""
+        filename = (filename or getattr(file, 'name', '') or '').lower()
+        try:
+            if filename.endswith(('.xlsx', '.xls')):
+                frame = pd.read_excel(file, dtype=str)
+            else:
+                frame = pd.read_csv(file, dtype=str, index_col=False)
+        except Exception as e:
+            raise JournalEntryImportError(f'Could not read {filename or "file"}: {e}')
+
+        frame.columns = [str(column).strip().lower().replace(' ', '_') for column in frame.columns]
+        missing = [column for column in JournalEntryImportService.REQUIRED_COLUMNS if column not in frame.columns]
+        if missing:
+            raise JournalEntryImportError(f'Missing columns: {", ".join(missing)}')
+        for column in JournalEntryImportService.OPTIONAL_COLUMNS:
+            if column not in frame.columns:
+                frame[column] = ''
+
+        frame = frame.reset_index(drop=True).fillna('')
+        for column in frame.columns:
+            frame[column] = frame[column].astype(str).str.strip()
+        # Spreadsheet row numbers for error messages (header is row 1)
+        frame['row'] = frame.index + 2
+        return frame
+
+    @staticmethod
+    def validate(frame):
+        """
+        Validate a loaded frame with column-wise checks and group-bys, using one
+        query per referenced table. Returns (frame, errors); the frame gains
+        parsed dates, amounts in cents and resolved account/journal/period ids.
+        """
+        errors = []
+
+        def flag(mask, message):
+            for row, entry in frame.loc[mask, ['row', 'entry']].itertuples(index=False):
+                errors.append({'row': int(row), 'entry': entry, 'message': message})
+
+        flag(frame['entry'] == '', 'Missing entry key')
+
+        frame['date'] = pd.to_datetime(frame['date'], errors='coerce').dt.date
+        flag(frame['date'].isna(), 'Invalid date')
+
+        for side in ('debit', 'credit'):
+            amount = pd.to_numeric(frame[side].replace('', '0').str.replace(',', ''), errors='coerce')
+            flag(amount.isna(), f'Invalid {side} amount')
+            flag(amount < 0, f'Negative {side} amount')
+            # Integer cents keep the balance check exact
+            frame[f'{side}_cents'] = (amount.fillna(0) * 100).round().astype(np.int64)
+        flag(
+            (frame['debit_cents'] > 0) == (frame['credit_cents'] > 0),
+            'Each line needs either a debit or a credit amount'
+        )
+
+        accounts = {
+            row['code']: row
+            for row in Account.objects.filter(code__in=frame['account'].unique()).values('id', 'code', 'status')
+        }
+        frame['account_id'] = frame['account'].map(lambda code: accounts.get(code, {}).get('id'))
+        flag(frame['account_id'].isna(), 'Unknown account')
+        frame['account_status'] = frame['account'].map(lambda code: accounts.get(code, {}).get('status'))
+        flag(frame['account_id'].notna() & (frame['account_status'] != 'ACTIVE'), 'Account is not active')
+
+        journals = {
+            row['code']: row
+            for row in Journal.objects.filter(code__in=frame['journal'].unique()).values('id', 'code', 'status')
+        }
+        frame['journal_id'] = frame['journal'].map(lambda code: journals.get(code, {}).get('id'))
+        flag(frame['journal_id'].isna(), 'Unknown journal')
+        frame['journal_status'] = frame['journal'].map(lambda code: journals.get(code, {}).get('status'))
+        flag(frame['journal_id'].notna() & (frame['journal_status'] != 'ACTIVE'), 'Journal is not active')
+
+        # Each date falls in the latest regular period starting on or before it
+        periods = list(
+            AccountingPeriod.objects.filter(is_adjustment_period=False)
+            .order_by('start_date').values('id', 'start_date', 'end_date', 'status')
+        )
+        frame['period_id'] = None
+        dated = frame['date'].notna()
+        if periods and dated.any():
+            starts = np.array([np.datetime64(p['start_date']) for p in periods])
+            dates = frame.loc[dated, 'date'].map(np.datetime64).to_numpy(dtype='datetime64[D]')
+            positions = np.searchsorted(starts, dates, side='right') - 1
+            matched = [
+                periods[position]['id']
+                if position >= 0 and periods[position]['end_date'] >= day and periods[position]['status'] == 'OPEN'
+                else None
+                for position, day in zip(positions, frame.loc[dated, 'date'])
+            ]
+            frame.loc[dated, 'period_id'] = pd.Series(matched, index=frame.index[dated], dtype=object)
+        flag(dated & frame['period_id'].isna(), 'No open accounting period for this date')
+
+        # Entry-level checks
+        entries = frame[frame['entry'] != ''].groupby('entry', sort=False)
+        summary = entries.agg(
+            lines=('row', 'size'),
+            debit=('debit_cents', 'sum'),
+            credit=('credit_cents', 'sum'),
+            dates=('date', 'nunique'),
+            journals=('journal', 'nunique'),
+            numbers=('entry_number', 'nunique'),
+        )
+        for column, message in [
+            (summary['lines'] < 2, 'Entry needs at least two lines'),
+            (summary['debit'] != summary['credit'], 'Entry does not balance'),
+            (summary['dates'] > 1, 'Entry lines have different dates'),
+            (summary['journals'] > 1, 'Entry lines have different journals'),
+            (summary['numbers'] > 1, 'Entry lines have different entry numbers'),
+        ]:
+            flag(frame['entry'].isin(summary.index[column]) & ~frame.duplicated('entry'), message)
+
+        numbers = frame.loc[frame['entry_number'] != ''].drop_duplicates('entry')
+        flag(
+            frame['entry'].isin(numbers.loc[numbers.duplicated('entry_number', keep=False), 'entry'])
+            & ~frame.duplicated('entry'),
+            'Entry number is used by another entry in the file'
+        )
+        existing = set(
+            JournalEntry.objects.filter(entry_number__in=numbers['entry_number'].unique())
+            .values_list('entry_number', flat=True)
+        )
+        flag(
+            frame['entry_number'].isin(existing) & ~frame.duplicated('entry'),
+            'Entry number already exists'
+        )
+
+        errors.sort(key=lambda error: error['row'])
+        return frame, errors
+
+    @staticmethod
+    def assign_entry_numbers(entries):
+        """Fill blank entry numbers, reserving one block per journal and month"""
+        blank = entries['entry_number'] == ''
+        if not blank.any():
+            return entries
+        months = entries['date'].map(lambda day: day.strftime('%Y%m'))
+        for (journal, _month), group in entries[blank].groupby(['journal', months[blank]], sort=False):
+            entries.loc[group.index, 'entry_number'] = NumberingService.reserve(
+                'JE', len(group), date=group['date'].iloc[0], prefix=journal
+            )
+        return entries
+
+    @staticmethod
+    def import_frame(frame, user, chunk_size=500, post=False):
+        """
+        Write a validated frame with bulk_create, one transaction per chunk of
+        entries. Returns counts of entries, lines and posted entries.
+        """
+        frame = frame.sort_values(['date', 'entry', 'row'], kind='stable')
+        entries = frame.drop_duplicates('entry').set_index('entry')
+        totals = frame.groupby('entry')[['debit_cents', 'credit_cents']].sum()
+        entries = JournalEntryImportService.assign_entry_numbers(entries.join(totals, rsuffix='_total'))
+        lines_by_entry = frame.groupby('entry', sort=False)
+
+        result = {'entries': 0, 'lines': 0, 'posted': 0, 'skipped': {}}
+        keys = list(entries.index)
+        for start in range(0, len(keys), chunk_size):
+            chunk = entries.loc[keys[start:start + chunk_size]]
+            with transaction.atomic():
+                JournalEntry.objects.bulk_create([
+                    JournalEntry(
+                        journal_id=int(entry.journal_id),
+                        period_id=int(entry.period_id),
+                        entry_number=entry.entry_number,
+                        date=entry.date,
+                        description=entry.description or f'Imported entry {key}',
+                        reference=entry.reference,
+                        total_debit=Decimal(int(entry.debit_cents_total)) / 100,
+                        total_credit=Decimal(int(entry.credit_cents_total)) / 100,
+                        created_by=user,
+                    )
+                    for key, entry in chunk.iterrows()
+                ])
+                # Not every backend returns primary keys from bulk_create
+                entry_ids = dict(
+                    JournalEntry.objects.filter(entry_number__in=list(chunk['entry_number']))
+                    .values_list('entry_number', 'id')
+                )
+                lines = []
+                for key, entry in chunk.iterrows():
+                    for line in lines_by_entry.get_group(key).itertuples(index=False):
+                        lines.append(JournalEntryLine(
+                            journal_entry_id=entry_ids[entry.entry_number],
+                            account_id=int(line.account_id),
+                            description=line.line_description,
+                            debit=Decimal(int(line.debit_cents)) / 100,
+                            credit=Decimal(int(line.credit_cents)) / 100,
+                        ))
+                JournalEntryLine.objects.bulk_create(lines, batch_size=1000)
+
+                if post:
+                    posted, skipped = JournalEntry.post_entries(list(entry_ids.values()), user)
+                    result['posted'] += len(posted)
+                    result['skipped'].update(skipped)
+
+            result['entries'] += len(chunk)
+            result['lines'] += len(lines)
+        return result
+
+    @staticmethod
+    def run(file, user, filename=None, chunk_size=500, post=False, dry_run=False):
+        """Read, validate and (unless there are errors or dry_run is set) import a file"""
+        frame = JournalEntryImportService.read_file(file, filename)
+        frame, errors = JournalEntryImportService.validate(frame)
+        result = {
+            'entries': 0,
+            'lines': 0,
+            'posted': 0,
+            'skipped': {},
+            'rows': len(frame),
+            'errors': errors,
+        }
+        if errors or dry_run:
+            result['entries'] = int(frame['entry'].nunique())
+            result['lines'] = len(frame)
+            return result
+        result.update(JournalEntryImportService.import_frame(frame, user, chunk_size=chunk_size, post=post))
+        return result
+
+
+class LedgerVerificationService:
+    """
+    Service class that recomputes ledger balances from posted journal entry lines
+    and compares them with the stored Account.current_balance, AccountBalance
+    snapshots and journal entry header totals.
+    """
+
+    @staticmethod
+    def account_totals(account_ids=None):
+        """Posted debit/credit totals per account, in one grouped query"""
+        lines = JournalEntryLine.objects.filter(journal_entry__status__in=JournalEntry.LEDGER_STATUSES)
+        if account_ids is not None:
+            lines = lines.filter(account_id__in=account_ids)
+        return {
+            row['account_id']: (row['debit'] or ZERO, row['credit'] or ZERO)
+            for row in lines.values('account_id').annotate(debit=Sum('debit'), credit=Sum('credit'))
+        }
+
+    @staticmethod
+    def expected_current_balance(normal_balance, totals):
+        """current_balance accumulates posted movements on the account's normal side"""
+        debit, credit = totals
+        net = debit - credit
+        return -net if normal_balance == 'CREDIT' else net
+
+    @staticmethod
+    def check_accounts():
+        totals = LedgerVerificationService.account_totals()
+        mismatches = []
+        accounts = Account.objects.values_list('id', 'code', 'name', 'normal_balance', 'current_balance')
+        for account_id, code, name, normal_balance, current_balance in accounts:
+            expected = LedgerVerificationService.expected_current_balance(
+                normal_balance, totals.get(account_id, (ZERO, ZERO))
+            )
+            if expected != current_balance:
+                mismatches.append({
+                    'account_id': account_id,
+                    'code': code,
+                    'name': name,
+                    'current_balance': current_balance,
+                    'expected': expected,
+                    'difference': current_balance - expected,
+                })
+        return len(accounts), mismatches
+
+    @staticmethod
+    def daily_totals():
+        """
+        Cumulative posted debits and credits per account by date, as numpy arrays
+        in cents, from one query grouped by account and entry date.
+        """
+        rows = JournalEntryLine.objects.filter(journal_entry__status__in=JournalEntry.LEDGER_STATUSES).values_list(
+            'account_id', 'journal_entry__date'
+        ).annotate(debit=Sum('debit'), credit=Sum('credit')).order_by('account_id', 'journal_entry__date')
+        frame = pd.DataFrame.from_records(list(rows), columns=['account_id', 'date', 'debit', 'credit'])
+        if frame.empty:
+            return {}
+        frame['debit'] = frame['debit'].map(to_cents).astype(np.int64)
+        frame['credit'] = frame['credit'].map(to_cents).astype(np.int64)
+        frame['date'] = pd.to_datetime(frame['date'])
+
+        cumulative = {}
+        for account_id, group in frame.groupby('account_id', sort=False):
+            cumulative[account_id] = (
+                group['date'].to_numpy(dtype='datetime64[D]'),
+                np.cumsum(group['debit'].to_numpy()),
+                np.cumsum(group['credit'].to_numpy()),
+            )
+        return cumulative
+
+    @staticmethod
+    def check_snapshots():
+        cumulative = LedgerVerificationService.daily_totals()
+        empty = (np.array([], dtype='datetime64[D]'), np.array([0]), np.array([0]))
+
+        def through(account_id, day, inclusive):
+            dates, debits, credits = cumulative.get(account_id, empty)
+            position = np.searchsorted(dates, np.datetime64(day, 'D'), side='right' if inclusive else 'left')
+            if position == 0:
+                return 0, 0
+            return int(debits[position - 1]), int(credits[position - 1])
+
+        snapshots = AccountBalance.objects.values_list(
+            'id', 'account_id', 'account__code', 'account__opening_balance', 'period_id', 'period__name',
+            'period__start_date', 'period__end_date',
+            'opening_balance', 'period_debits', 'period_credits', 'closing_balance',
+        )
+        mismatches = []
+        count = 0
+        for (snapshot_id, account_id, code, account_opening, period_id, period_name, start, end,
+             opening, debits, credits, closing) in snapshots.iterator():
+            count += 1
+            before_debit, before_credit = through(account_id, start, inclusive=False)
+            end_debit, end_credit = through(account_id, end, inclusive=True)
+            expected_opening = to_cents(account_opening) + before_debit - before_credit
+            expected_debits = end_debit - before_debit
+            expected_credits = end_credit - before_credit
+            expected = {
+                'opening_balance': expected_opening,
+                'period_debits': expected_debits,
+                'period_credits': expected_credits,
+                'closing_balance': expected_opening + expected_debits - expected_credits,
+            }
+            stored = {
+                'opening_balance': to_cents(opening),
+                'period_debits': to_cents(debits),
+                'period_credits': to_cents(credits),
+                'closing_balance': to_cents(closing),
+            }
+            if stored != expected:
+                mismatches.append({
+                    'snapshot_id': snapshot_id,
+                    'account_id': account_id,
+                    'code': code,
+                    'period_id': period_id,
+                    'period': period_name,
+                    'stored': {key: from_cents(value) for key, value in stored.items()},
+                    'expected': {key: from_cents(value) for key, value in expected.items()},
+                })
+        return count, mismatches
+
+    @staticmethod
+    def check_entries():
+        """Posted entries whose header totals do not balance or disagree with their lines"""
+        entries = JournalEntry.objects.filter(status__in=JournalEntry.LEDGER_STATUSES).annotate(
+            line_debit=Coalesce(Sum('lines__debit'), Value(ZERO), output_field=AgingService.AMOUNT_FIELD),
+            line_credit=Coalesce(Sum('lines__credit'), Value(ZERO), output_field=AgingService.AMOUNT_FIELD),
+        ).filter(
+            ~Q(total_debit=F('total_credit'))
+            | ~Q(line_debit=F('total_debit'))
+            | ~Q(line_credit=F('total_credit'))
+            | ~Q(line_debit=F('line_credit'))
+        ).values('id', 'entry_number', 'date', 'total_debit', 'total_credit', 'line_debit', 'line_credit')
+
+        problems = []
+        for entry in entries.order_by('date', 'id'):
+            reasons = []
+            if entry['total_debit'] != entry['total_credit']:
+                reasons.append('header totals do not balance')
+            if entry['line_debit'] != entry['line_credit']:
+                reasons.append('lines do not balance')
+            if entry['line_debit'] != entry['total_debit'] or entry['line_credit'] != entry['total_credit']:
+                reasons.append('lines disagree with header totals')
+            entry['reasons'] = reasons
+            entry['repairable'] = entry['line_debit'] == entry['line_credit']
+            problems.append(entry)
+        return problems
+
+    @staticmethod
+    def verify():
+        """Run every check and return a report dict"""
+        accounts_checked, account_mismatches = LedgerVerificationService.check_accounts()
+        snapshots_checked, snapshot_mismatches = LedgerVerificationService.check_snapshots()
+        entries = LedgerVerificationService.check_entries()
+        return {
+            'checked_at': timezone.now(),
+            'accounts_checked': accounts_checked,
+            'account_mismatches': account_mismatches,
+            'snapshots_checked': snapshots_checked,
+            'snapshot_mismatches': snapshot_mismatches,
+            'unbalanced_entries': entries,
+            'ok': not (account_mismatches or snapshot_mismatches or entries),
+        }
+
+    @staticmethod
+    def repair(report):
+        """
+        Fix what a report found: current balances and entry header totals are
+        rewritten with bulk_update, affected periods are rebuilt with
+        AccountBalance.rebuild_for_period. Entries whose lines do not balance
+        are left alone. Returns the number of rows fixed per kind.
+        """
+        repaired = {'accounts': 0, 'periods': 0, 'entries': 0}
+
+        account_ids = [row['account_id'] for row in report['account_mismatches']]
+        if account_ids:
+            with transaction.atomic():
+                # Lock first so postings in flight apply their F() increments after the rewrite
+                accounts = list(Account.objects.select_for_update().filter(pk__in=account_ids))
+                totals = LedgerVerificationService.account_totals(account_ids)
+                for account in accounts:
+                    account.current_balance = LedgerVerificationService.expected_current_balance(
+                        account.normal_balance, totals.get(account.pk, (ZERO, ZERO))
+                    )
+                Account.objects.bulk_update(accounts, ['current_balance'], batch_size=500)
+                bump_ledger_version()
+            repaired['accounts'] = len(accounts)
+
+        period_ids = {row['period_id'] for row in report['snapshot_mismatches']}
+        for period in AccountingPeriod.objects.filter(pk__in=period_ids).order_by('start_date'):
+            with transaction.atomic():
+                AccountBalance.rebuild_for_period(period)
+                bump_ledger_version()
+            repaired['periods'] += 1
+
+        fixable = [row for row in report['unbalanced_entries'] if row['repairable']]
+        if fixable:
+            entries = []
+            for row in fixable:
+                entries.append(JournalEntry(
+                    pk=row['id'], total_debit=row['line_debit'], total_credit=row['line_credit']
+                ))
+            with transaction.atomic():
+                JournalEntry.objects.bulk_update(entries, ['total_debit', 'total_credit'], batch_size=500)
+                bump_ledger_version()
+            repaired['entries'] = len(entries)
+
+        return repaired
+
+
+class BankStatementImportError(Exception):
+    """Raised when a bank statement file cannot be read"""
+
+
+class BankReconciliationService:
+    """
+    Service class that imports bank statements (CSV or OFX) into a bank account
+    and reconciles their lines against posted journal entry lines on that
+    account and, for deposits with no ledger candidate, recorded client
+    payments. A line with exactly one candidate that no other line competes
+    for is matched automatically; everything else stays in the review queue.
+    """
+    DEFAULT_TOLERANCE_DAYS = 3
+    QUEUE_STATUSES = ['UNMATCHED', 'REVIEW']
+    COLUMN_ALIASES = {
+        'date': ['date', 'transaction_date', 'posting_date', 'value_date'],
+        'description': ['description', 'narrative', 'details', 'memo', 'name'],
+        'reference': ['reference', 'ref', 'cheque_number', 'check_number'],
+        'fit_id': ['fit_id', 'fitid', 'transaction_id'],
+    }
+    # (money in, money out) column pairs accepted when there is no signed amount column
+    AMOUNT_PAIRS = [('deposit', 'withdrawal'), ('credit', 'debit'), ('money_in', 'money_out'), ('paid_in', 'paid_out')]
+    OFX_TRANSACTION = re.compile(r'<STMTTRN>(.*?)</STMTTRN>', re.IGNORECASE | re.DOTALL)
+    OFX_FIELD = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+    @staticmethod
+    def read_file(file, filename=None, file_format=None):
+        """Load a CSV or OFX statement into a DataFrame of date, amount_cents, description, reference, fit_id"""
+        filename = filename or getattr(file, 'name', '') or ''
+        content = file.read()
+        if isinstance(content, bytes):
+            try:
+                content = content.decode('utf-8-sig')
+            except UnicodeDecodeError:
+                content = content.decode('latin-1')
+
+        if not file_format:
+            is_ofx = filename.lower().endswith(('.ofx', '.qfx')) or '<OFX>' in content[:4096].upper()
+            file_format = 'OFX' if is_ofx else 'CSV'
+        file_format = file_format.upper()
+
+        try:
+            if file_format == 'OFX':
+                frame = BankReconciliationService.read_ofx(content)
+            else:
+                frame = BankReconciliationService.read_csv(content)
+        except BankStatementImportError:
+            raise
+        except Exception as e:
+            raise BankStatementImportError(f'Could not read {filename or "file"}: {e}')
+        return BankReconciliationService.normalise(frame), file_format
+
+    @staticmethod
+    def read_csv(content):
+        frame = pd.read_csv(io.StringIO(content), dtype=str, index_col=False)
+        frame.columns = [str(column).strip().lower().replace(' ', '_') for column in frame.columns]
+        frame = frame.reset_index(drop=True).fillna('')
+        for column in frame.columns:
+            frame[column] = frame[column].astype(str).str.strip()
+
+        raw = pd.DataFrame(index=frame.index)
+        for target, aliases in BankReconciliationService.COLUMN_ALIASES.items():
+            found = next((alias for alias in aliases if alias in frame.columns), None)
+            raw[target] = frame[found] if found else ''
+        if not any(alias in frame.columns for alias in BankReconciliationService.COLUMN_ALIASES['date']):
+            raise BankStatementImportError('Missing date column')
+
+        def numbers(column, blank=None):
+            values = frame[column].str.replace(',', '')
+            if blank is not None:
+                values = values.replace('', blank)
+            return pd.to_numeric(values, errors='coerce')
+
+        if 'amount' in frame.columns:
+            raw['amount'] = numbers('amount')
+        else:
+            pair = next(
+                (pair for pair in BankReconciliationService.AMOUNT_PAIRS
+                 if pair[0] in frame.columns and pair[1] in frame.columns),
+                None
+            )
+            if not pair:
+                raise BankStatementImportError('Missing amount column (or deposit/withdrawal columns)')
+            raw['amount'] = numbers(pair[0], '0') - numbers(pair[1], '0').abs()
+        # Spreadsheet row numbers for error messages (header is row 1)
+        raw['row'] = frame.index + 2
+        return raw
+
+    @staticmethod
+    def read_ofx(content):
+        """Parse the STMTTRN blocks of an OFX/QFX file (SGML or XML flavour)"""
+        rows = []
+        for number, block in enumerate(BankReconciliationService.OFX_TRANSACTION.findall(content), start=1):
+            fields = {tag.upper(): value.strip() for tag, value in BankReconciliationService.OFX_FIELD.findall(block)}
+            posted = fields.get('DTPOSTED', '')[:8]
+            rows.append({
+                'date': f'{posted[:4]}-{posted[4:6]}-{posted[6:8]}' if len(posted) == 8 else '',
+                'amount': fields.get('TRNAMT', ''),
+                'description': fields.get('NAME') or fields.get('MEMO', ''),
+                'reference': fields.get('CHECKNUM') or fields.get('REFNUM', ''),
+                'fit_id': fields.get('FITID', ''),
+                'row': number,
+            })
+        if not rows:
+            raise BankStatementImportError('No transactions found in OFX file')
+        frame = pd.DataFrame(rows)
+        frame['amount'] = pd.to_numeric(frame['amount'].str.replace(',', ''), errors='coerce')
+        return frame
+
+    @staticmethod
+    def normalise(raw):
+        frame = pd.DataFrame({
+            'date': pd.to_datetime(raw['date'], errors='coerce').dt.date,
+            'amount_cents': (raw['amount'].fillna(0) * 100).round().astype(np.int64),
+            'description': raw['description'].astype(str).str.slice(0, 255),
+            'reference': raw['reference'].astype(str).str.slice(0, 100),
+            'fit_id': raw['fit_id'].astype(str).str.slice(0, 255),
+        })
+        invalid = raw.loc[frame['date'].isna() | raw['amount'].isna(), 'row'].tolist()
+        if invalid:
+            shown = ', '.join(str(row) for row in invalid[:10])
+            raise BankStatementImportError(f'Invalid date or amount on rows {shown}' + (' ...' if len(invalid) > 10 else ''))
+        if frame.empty:
+            raise BankStatementImportError('No transactions found')
+
+        # CSV exports rarely carry transaction ids; hash the content, numbering
+        # identical same-day rows so they are not collapsed into one
+        blank = frame['fit_id'] == ''
+        if blank.any():
+            content = (
+                frame['date'].astype(str) + '|' + frame['amount_cents'].astype(str) + '|'
+                + frame['description'] + '|' + frame['reference']
+            )
+            occurrence = content.groupby(content).cumcount().astype(str)
+            frame.loc[blank, 'fit_id'] = (content + '|' + occurrence)[blank].map(
+                lambda value: hashlib.sha1(value.encode()).hexdigest()
+            )
+        return frame.drop_duplicates('fit_id').reset_index(drop=True)
+
+    @staticmethod
+    def import_statement(file, account, user, filename=None, file_format=None, match=True,
+                         tolerance_days=DEFAULT_TOLERANCE_DAYS):
+        """
+        Import a statement file into a bank account, skipping transactions that
+        were already imported (same fit_id), then run the matcher. Returns a
+        dict with the statement, imported/duplicate counts and match counts.
+        """
+        if not account.is_bank_account:
+            raise BankStatementImportError(f'{account.code} is not a bank account')
+        filename = filename or getattr(file, 'name', '') or ''
+        frame, file_format = BankReconciliationService.read_file(file, filename, file_format)
+
+        existing = set(
+            BankStatementLine.objects.filter(account=account, fit_id__in=frame['fit_id'].tolist())
+            .values_list('fit_id', flat=True)
+        )
+        new = frame[~frame['fit_id'].isin(existing)]
+
+        with transaction.atomic():
+            statement = BankStatement.objects.create(
+                account=account,
+                file_name=os.path.basename(filename)[:255] or 'statement',
+                file_format=file_format,
+                start_date=frame['date'].min(),
+                end_date=frame['date'].max(),
+                imported_by=user,
+            )
+            BankStatementLine.objects.bulk_create([
+                BankStatementLine(
+                    statement=statement,
+                    account=account,
+                    date=row.date,
+                    amount=from_cents(row.amount_cents),
+                    description=row.description,
+                    reference=row.reference,
+                    fit_id=row.fit_id,
+                )
+                for row in new.itertuples(index=False)
+            ], batch_size=1000)
+
+        result = {'statement': statement, 'imported': len(new), 'duplicates': len(frame) - len(new)}
+        if match:
+            result.update(BankReconciliationService.match(account, tolerance_days))
+        return result
+
+    @staticmethod
+    def candidate_pairs(amounts, days, candidate_amounts, candidate_days, tolerance):
+        """
+        Return (statement index, candidate index, day gap) arrays for every pair
+        with the same amount in cents and dates at most `tolerance` days apart.
+        Amount and day are packed into one int64 key (amount * span + day), so a
+        single sorted key array answers every window lookup with searchsorted.
+        """
+        empty = np.array([], dtype=np.int64)
+        if not len(amounts) or not len(candidate_amounts):
+            return empty, empty, empty
+
+        base = min(days.min(), candidate_days.min()) - tolerance
+        span = max(days.max(), candidate_days.max()) - base + tolerance + 1
+        keys = candidate_amounts * span + (candidate_days - base)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+
+        lookup = amounts * span + (days - base)
+        left = np.searchsorted(sorted_keys, lookup - tolerance, side='left')
+        right = np.searchsorted(sorted_keys, lookup + tolerance, side='right')
+        counts = right - left
+
+        index = np.repeat(np.arange(len(amounts)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        candidate_index = order[np.repeat(left, counts) + offsets]
+        return index, candidate_index, np.abs(days[index] - candidate_days[candidate_index])
+
+    @staticmethod
+    def resolve(size, candidate_size, index, candidate_index, gap):
+        """
+        Per statement line: the number of candidates, the closest candidate (-1
+        if none) and whether the pair is unambiguous on both sides.
+        """
+        counts = np.bincount(index, minlength=size)
+        best = np.full(size, -1, dtype=np.int64)
+        unique = np.zeros(size, dtype=bool)
+        if len(index):
+            order = np.lexsort((gap, index))
+            _, first = np.unique(index[order], return_index=True)
+            best[index[order][first]] = candidate_index[order][first]
+            competing = np.bincount(candidate_index, minlength=candidate_size)
+            single = (counts[index] == 1) & (competing[candidate_index] == 1)
+            unique[index[single]] = True
+        return counts, best, unique
+
+    @staticmethod
+    def match(account, tolerance_days=DEFAULT_TOLERANCE_DAYS):
+        """
+        Reconcile the open (unmatched/review) statement lines of a bank account.
+        Posted journal lines on the account are signed debit - credit so they
+        compare with statement amounts directly. Returns match counts.
+        """
+        tolerance = int(tolerance_days)
+        result = {'matched': 0, 'review': 0, 'unmatched': 0}
+
+        with transaction.atomic():
+            lines = list(
+                BankStatementLine.objects.select_for_update()
+                .filter(account=account, status__in=BankReconciliationService.QUEUE_STATUSES)
+                .order_by('date', 'id')
+            )
+            if not lines:
+                return result
+            amounts = np.array([to_cents(line.amount) for line in lines], dtype=np.int64)
+            days = np.array([line.date.toordinal() for line in lines], dtype=np.int64)
+            window = (date.fromordinal(int(days.min()) - tolerance), date.fromordinal(int(days.max()) + tolerance))
+
+            ledger = list(
+                JournalEntryLine.objects.filter(
+                    account=account, journal_entry__status='POSTED', journal_entry__date__range=window
+                ).exclude(bank_statement_lines__status='MATCHED')
+                .values_list('id', 'journal_entry__date', 'debit', 'credit')
+            )
+            ledger_ids = [row[0] for row in ledger]
+            counts, best, unique = BankReconciliationService.resolve(
+                len(lines), len(ledger),
+                *BankReconciliationService.candidate_pairs(
+                    amounts, days,
+                    np.array([to_cents(row[2]) - to_cents(row[3]) for row in ledger], dtype=np.int64),
+                    np.array([row[1].toordinal() for row in ledger], dtype=np.int64),
+                    tolerance,
+                )
+            )
+
+            # Deposits with no ledger candidate fall back to recorded client payments
+            pending = np.flatnonzero((counts == 0) & (amounts > 0))
+            payments = []
+            if len(pending):
+                payments = list(
+                    Payment.objects.filter(payment_date__range=window)
+                    .exclude(bank_statement_lines__status='MATCHED')
+                    .values_list('id', 'payment_date', 'amount')
+                )
+            payment_ids = [row[0] for row in payments]
+            payment_counts, payment_best, payment_unique = BankReconciliationService.resolve(
+                len(pending), len(payments),
+                *BankReconciliationService.candidate_pairs(
+                    amounts[pending], days[pending],
+                    np.array([to_cents(row[2]) for row in payments], dtype=np.int64),
+                    np.array([row[1].toordinal() for row in payments], dtype=np.int64),
+                    tolerance,
+                )
+            )
+
+            now = timezone.now()
+            for line in lines:
+                line.status = 'UNMATCHED'
+                line.candidate_count = 0
+                line.matched_line_id = line.matched_payment_id = line.matched_by_id = line.matched_at = None
+            for position in np.flatnonzero(counts):
+                line = lines[position]
+                line.candidate_count = int(counts[position])
+                line.matched_line_id = ledger_ids[best[position]]
+                line.status = 'MATCHED' if unique[position] else 'REVIEW'
+            for position in np.flatnonzero(payment_counts):
+                line = lines[pending[position]]
+                line.candidate_count = int(payment_counts[position])
+                line.matched_payment_id = payment_ids[payment_best[position]]
+                line.status = 'MATCHED' if payment_unique[position] else 'REVIEW'
+            for line in lines:
+                if line.status == 'MATCHED':
+                    line.matched_at = now
+                result[line.status.lower()] += 1
+
+            BankStatementLine.objects.bulk_update(
+                lines,
+                ['status', 'candidate_count', 'matched_line', 'matched_payment', 'matched_by', 'matched_at'],
+                batch_size=500
+            )
+        return result
+
+    @staticmethod
+    def confirm(line_id, user, journal_line_id=None, payment_id=None):
+        """Match a queued statement line by hand, defaulting to its suggested candidate"""
+        with transaction.atomic():
+            line = BankStatementLine.objects.select_for_update().get(pk=line_id)
+            if line.status == 'MATCHED':
+                raise ValueError('Statement line is already matched')
+            if not journal_line_id and not payment_id:
+                journal_line_id, payment_id = line.matched_line_id, line.matched_payment_id
+
+            if journal_line_id:
+                if not JournalEntryLine.objects.filter(
+                    pk=journal_line_id, account_id=line.account_id, journal_entry__status='POSTED'
+                ).exists():
+                    raise ValueError('Journal line is not a posted line on this bank account')
+                taken = BankStatementLine.objects.filter(matched_line_id=journal_line_id, status='MATCHED')
+                payment_id = None
+            elif payment_id:
+                if not Payment.objects.filter(pk=payment_id).exists():
+                    raise ValueError('Payment does not exist')
+                taken = BankStatementLine.objects.filter(matched_payment_id=payment_id, status='MATCHED')
+            else:
+                raise ValueError('No journal line or payment selected')
+            if taken.exists():
+                raise ValueError('That transaction is already matched to another statement line')
+
+            line.status = 'MATCHED'
+            line.matched_line_id = journal_line_id
+            line.matched_payment_id = payment_id
+            line.matched_by = user
+            line.matched_at = timezone.now()
+            line.save(update_fields=['status', 'matched_line', 'matched_payment', 'matched_by', 'matched_at'])
+        return line
+
+    @staticmethod
+    def set_status(line_id, status, user=None):
+        """Ignore a statement line (e.g. bank charges booked elsewhere) or put it back in the queue"""
+        line = BankStatementLine.objects.get(pk=line_id)
+        line.status = status
+        line.matched_line = line.matched_payment = None
+        line.matched_by = user if status == 'IGNORED' else None
+        line.matched_at = timezone.now() if status == 'IGNORED' else None
+        line.save(update_fields=['status', 'matched_line', 'matched_payment', 'matched_by', 'matched_at'])
+        return line
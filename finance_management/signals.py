@@ -0,0 +1,62 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import (
+    Payment, Expense, Invoice, AccountsPayable, FinanceDailyRollup,
+    Account, JournalEntry, JournalEntryLine
+)
+from .services import bump_ledger_version
+
+
+# Rollup metrics fed by each model, keyed by the model's date field
+ROLLUP_SOURCES = {
+    Payment: ('payment_date', ['PAYMENT', 'CLIENT_PAYMENT', 'PAYMENT_TIME']),
+    Expense: ('expense_date', ['EXPENSE']),
+    Invoice: ('issue_date', ['INVOICE']),
+    AccountsPayable: ('invoice_date', ['PAYABLE']),
+}
+
+
+def refresh_rollups(instance, previous_date=None):
+    """Recompute the daily rollups touched by a saved or deleted instance"""
+    date_field, metrics = ROLLUP_SOURCES[type(instance)]
+    dates = {getattr(instance, date_field), previous_date}
+    for metric in metrics:
+        FinanceDailyRollup.refresh(metric, dates)
+
+
+@receiver(pre_save, sender=Payment)
+@receiver(pre_save, sender=Expense)
+@receiver(pre_save, sender=Invoice)
+@receiver(pre_save, sender=AccountsPayable)
+def remember_rollup_date(sender, instance, **kwargs):
+    """Keep the stored date so a moved record also refreshes its old day"""
+    if instance.pk:
+        date_field = ROLLUP_SOURCES[sender][0]
+        instance._rollup_previous_date = sender.objects.filter(pk=instance.pk).values_list(date_field, flat=True).first()
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=Invoice)
+@receiver(post_save, sender=AccountsPayable)
+def update_rollups_on_save(sender, instance, **kwargs):
+    refresh_rollups(instance, getattr(instance, '_rollup_previous_date', None))
+
+
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=AccountsPayable)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    refresh_rollups(instance)
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+@receiver(post_save, sender=JournalEntry)
+@receiver(post_delete, sender=JournalEntry)
+@receiver(post_save, sender=JournalEntryLine)
+@receiver(post_delete, sender=JournalEntryLine)
+def invalidate_ledger_caches(sender, **kwargs):
+    bump_ledger_version()
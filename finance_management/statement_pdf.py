@@ -0,0 +1,32 @@
+"""
+Process pool workers that render statement HTML to PDF with WeasyPrint.
+
+The module deliberately imports nothing from Django: workers only receive
+(path, html) jobs, so they start quickly under any multiprocessing start
+method and never touch the database.
+"""
+import os
+
+_font_config = None
+
+
+def init_worker():
+    """Build one WeasyPrint font configuration per worker process"""
+    global _font_config
+    try:
+        from weasyprint.text.fonts import FontConfiguration
+    except ImportError:  # WeasyPrint < 53
+        from weasyprint.fonts import FontConfiguration
+    _font_config = FontConfiguration()
+
+
+def render(job):
+    """Render one (path, html) job; returns (path, size in bytes, error message)"""
+    path, html = job
+    try:
+        from weasyprint import HTML
+
+        HTML(string=html).write_pdf(path, font_config=_font_config)
+        return path, os.path.getsize(path), ''
+    except Exception as e:
+        return path, 0, str(e)
@@ -1,3 +1,1122 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time as clock
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from client_management.models import Case, Client
+from hr_management.models import Employee, TimeEntry
+
+from .models import (
+    Account, AccountBalance, AccountingPeriod, BankStatementLine, FinanceDailyRollup, Invoice, Journal, JournalEntry,
+    JournalEntryLine, LedgerVersion, Payment, Report,
+)
+from .services import (
+    BankReconciliationService, BankStatementImportError, JournalEntryImportService, LedgerCubeService,
+    LedgerVerificationService, NumberingService, PaymentAllocationService, ReportGenerationService,
+    TimeBillingService, get_ledger_version,
+)
+
+
+def create_account(code, name, account_type, account_category, normal_balance, **kwargs):
+    return Account.objects.create(
+        code=code,
+        name=name,
+        account_type=account_type,
+        account_category=account_category,
+        normal_balance=normal_balance,
+        **kwargs
+    )
+
+
+def create_entry(journal, period, user, entry_date, lines, description='Test entry'):
+    """Create a draft entry from (account, debit, credit) tuples"""
+    entry = JournalEntry.objects.create(
+        journal=journal,
+        period=period,
+        date=entry_date,
+        description=description,
+        total_debit=sum((Decimal(debit) for _, debit, _ in lines), Decimal('0.00')),
+        total_credit=sum((Decimal(credit) for _, _, credit in lines), Decimal('0.00')),
+        created_by=user,
+    )
+    for account, debit, credit in lines:
+        JournalEntryLine.objects.create(
+            journal_entry=entry,
+            account=account,
+            debit=Decimal(debit),
+            credit=Decimal(credit),
+        )
+    return entry
+
+
+class LedgerTestCase(TestCase):
+    """Chart of accounts, journals and two consecutive periods ending this month"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='accountant', password='password')
+        self.cash = create_account('1000', 'Cash', 'ASSET', 'CURRENT_ASSET', 'DEBIT', is_cash_account=True)
+        self.bank = create_account('1010', 'Bank', 'ASSET', 'CURRENT_ASSET', 'DEBIT', is_bank_account=True)
+        self.receivable = create_account('1040', 'Accounts Receivable', 'ASSET', 'CURRENT_ASSET', 'DEBIT')
+        self.retained = create_account('3000', 'Retained Earnings', 'EQUITY', 'RETAINED_EARNINGS', 'CREDIT')
+        self.revenue = create_account('4000', 'Legal Fees', 'REVENUE', 'OPERATING_REVENUE', 'CREDIT')
+        self.rent = create_account('5000', 'Rent', 'EXPENSE', 'OPERATING_EXPENSE', 'DEBIT')
+
+        self.general = Journal.objects.create(code='GJ', name='General Journal', journal_type='GENERAL')
+        Journal.objects.create(code='CLOSING', name='Closing Journal', journal_type='CLOSING')
+
+        today = date.today()
+        current_start = today.replace(day=1)
+        previous_end = current_start - timedelta(days=1)
+        previous_start = previous_end.replace(day=1)
+        next_start = (current_start + timedelta(days=32)).replace(day=1)
+        self.previous = AccountingPeriod.objects.create(
+            name=previous_start.strftime('%B %Y'), start_date=previous_start, end_date=previous_end
+        )
+        self.current = AccountingPeriod.objects.create(
+            name=current_start.strftime('%B %Y'), start_date=current_start, end_date=next_start - timedelta(days=1)
+        )
+        self.today = today
+
+    def post(self, period, entry_date, lines):
+        entry = create_entry(self.general, period, self.user, entry_date, lines)
+        entry.post_entry(self.user)
+        return entry
+
+    def refresh(self, *accounts):
+        for account in accounts:
+            account.refresh_from_db()
+
+
+class AccountBalanceSnapshotTests(LedgerTestCase):
+    def test_posting_records_period_snapshots(self):
+        """Test that posting updates the snapshot of its period and shifts later periods"""
+        self.post(self.previous, self.previous.start_date, [(self.cash, '500.00', '0.00'), (self.revenue, '0.00', '500.00')])
+
+        snapshot = AccountBalance.objects.get(account=self.cash, period=self.previous)
+        self.assertEqual(snapshot.opening_balance, Decimal('0.00'))
+        self.assertEqual(snapshot.period_debits, Decimal('500.00'))
+        self.assertEqual(snapshot.closing_balance, Decimal('500.00'))
+
+        self.post(self.current, self.today, [(self.cash, '200.00', '0.00'), (self.revenue, '0.00', '200.00')])
+        snapshot = AccountBalance.objects.get(account=self.cash, period=self.current)
+        self.assertEqual(snapshot.opening_balance, Decimal('500.00'))
+        self.assertEqual(snapshot.closing_balance, Decimal('700.00'))
+
+        # A back-dated posting moves the opening balance of the later period
+        self.post(self.previous, self.previous.end_date, [(self.cash, '50.00', '0.00'), (self.revenue, '0.00', '50.00')])
+        snapshot.refresh_from_db()
+        self.assertEqual(snapshot.opening_balance, Decimal('550.00'))
+        self.assertEqual(snapshot.closing_balance, Decimal('750.00'))
+
+    def test_rebuild_matches_incremental_snapshots(self):
+        """Test that rebuild_for_period reproduces the incrementally maintained snapshots"""
+        self.post(self.previous, self.previous.start_date, [(self.cash, '300.00', '0.00'), (self.revenue, '0.00', '300.00')])
+        self.post(self.current, self.today, [(self.rent, '120.00', '0.00'), (self.cash, '0.00', '120.00')])
+
+        expected = {
+            (row.account_id, row.period_id): (row.opening_balance, row.period_debits, row.period_credits, row.closing_balance)
+            for row in AccountBalance.objects.all()
+        }
+        AccountBalance.objects.all().delete()
+        AccountBalance.rebuild_for_period(self.previous)
+        AccountBalance.rebuild_for_period(self.current)
+
+        for (account_id, period_id), values in expected.items():
+            row = AccountBalance.objects.get(account_id=account_id, period_id=period_id)
+            self.assertEqual(
+                (row.opening_balance, row.period_debits, row.period_credits, row.closing_balance), values
+            )
+
+    def test_balance_as_of_date_uses_closed_snapshot(self):
+        """Test that get_balance_as_of_date starts from the snapshot of a closed period"""
+        self.post(self.previous, self.previous.start_date, [(self.cash, '400.00', '0.00'), (self.revenue, '0.00', '400.00')])
+        self.post(self.current, self.today, [(self.cash, '100.00', '0.00'), (self.revenue, '0.00', '100.00')])
+        AccountingPeriod.objects.filter(pk=self.previous.pk).update(status='CLOSED')
+
+        self.assertEqual(self.cash.get_balance_as_of_date(self.previous.end_date), Decimal('400.00'))
+        self.assertEqual(self.cash.get_balance_as_of_date(self.today), Decimal('500.00'))
+        self.assertEqual(self.revenue.get_balance_as_of_date(self.today), Decimal('500.00'))
+
+        # Only lines after the closed period are read once a snapshot exists
+        AccountBalance.objects.filter(account=self.cash, period=self.previous).update(closing_balance=Decimal('999.00'))
+        self.assertEqual(self.cash.get_balance_as_of_date(self.today), Decimal('1099.00'))
+
+
+class JournalEntryPostingTests(LedgerTestCase):
+    def test_post_entry_updates_current_balances(self):
+        """Test that posting moves current balances on each account's normal side"""
+        self.post(self.current, self.today, [(self.cash, '250.00', '0.00'), (self.revenue, '0.00', '250.00')])
+        self.post(self.current, self.today, [(self.rent, '40.00', '0.00'), (self.cash, '0.00', '40.00')])
+
+        self.refresh(self.cash, self.revenue, self.rent)
+        self.assertEqual(self.cash.current_balance, Decimal('210.00'))
+        self.assertEqual(self.revenue.current_balance, Decimal('250.00'))
+        self.assertEqual(self.rent.current_balance, Decimal('40.00'))
+
+    def test_post_entry_rejects_posted_and_unbalanced_entries(self):
+        """Test that only balanced drafts can be posted"""
+        entry = self.post(self.current, self.today, [(self.cash, '10.00', '0.00'), (self.revenue, '0.00', '10.00')])
+        with self.assertRaises(ValueError):
+            entry.post_entry(self.user)
+
+        unbalanced = create_entry(self.general, self.current, self.user, self.today, [(self.cash, '10.00', '0.00'), (self.revenue, '0.00', '9.00')])
+        with self.assertRaises(ValueError):
+            unbalanced.post_entry(self.user)
+
+        self.cash.refresh_from_db()
+        self.assertEqual(self.cash.current_balance, Decimal('10.00'))
+
+    def test_post_entries_batches_and_skips(self):
+        """Test that post_entries posts balanced drafts and reports the ones it skips"""
+        first = create_entry(self.general, self.current, self.user, self.today, [(self.cash, '100.00', '0.00'), (self.revenue, '0.00', '100.00')])
+        second = create_entry(self.general, self.previous, self.user, self.previous.end_date, [(self.cash, '60.00', '0.00'), (self.revenue, '0.00', '60.00')])
+        unbalanced = create_entry(self.general, self.current, self.user, self.today, [(self.cash, '5.00', '0.00'), (self.revenue, '0.00', '4.00')])
+        posted = self.post(self.current, self.today, [(self.rent, '30.00', '0.00'), (self.cash, '0.00', '30.00')])
+
+        numbers, skipped = JournalEntry.post_entries([first.pk, second.pk, unbalanced.pk, posted.pk], self.user)
+
+        self.assertEqual(sorted(numbers), sorted([first.entry_number, second.entry_number]))
+        self.assertEqual(set(skipped), {unbalanced.entry_number, posted.entry_number})
+        self.assertEqual(JournalEntry.objects.get(pk=unbalanced.pk).status, 'DRAFT')
+        self.assertEqual(JournalEntry.objects.get(pk=second.pk).posted_by, self.user)
+
+        self.refresh(self.cash, self.revenue)
+        self.assertEqual(self.cash.current_balance, Decimal('130.00'))
+        self.assertEqual(self.revenue.current_balance, Decimal('160.00'))
+
+        previous = AccountBalance.objects.get(account=self.cash, period=self.previous)
+        current = AccountBalance.objects.get(account=self.cash, period=self.current)
+        self.assertEqual(previous.closing_balance, Decimal('60.00'))
+        self.assertEqual(current.opening_balance, Decimal('60.00'))
+        self.assertEqual(current.closing_balance, Decimal('130.00'))
+
+    def test_reverse_entry_restores_balances(self):
+        """Test that reversing an entry cancels its effect on balances and snapshots"""
+        self.post(self.current, self.today, [(self.cash, '500.00', '0.00'), (self.revenue, '0.00', '500.00')])
+        entry = self.post(self.current, self.today, [(self.rent, '80.00', '0.00'), (self.cash, '0.00', '80.00')])
+
+        reversal = entry.reverse_entry(self.user, 'Posted to the wrong account')
+
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'REVERSED')
+        self.assertEqual(entry.reversal_reason, 'Posted to the wrong account')
+        self.assertEqual(reversal.status, 'POSTED')
+        self.assertEqual(reversal.total_debit, Decimal('80.00'))
+
+        # The original stays in the ledger and the reversal cancels it once
+        self.refresh(self.cash, self.rent)
+        self.assertEqual(self.cash.current_balance, Decimal('500.00'))
+        self.assertEqual(self.rent.current_balance, Decimal('0.00'))
+        snapshot = AccountBalance.objects.get(account=self.cash, period=self.current)
+        self.assertEqual(snapshot.closing_balance, Decimal('500.00'))
+        snapshot = AccountBalance.objects.get(account=self.rent, period=self.current)
+        self.assertEqual((snapshot.period_debits, snapshot.period_credits), (Decimal('80.00'), Decimal('80.00')))
+        self.assertEqual(self.cash.get_balance_as_of_date(self.today), Decimal('500.00'))
+        self.assertEqual(self.rent.get_balance_as_of_date(self.today), Decimal('0.00'))
+
+        with self.assertRaises(ValueError):
+            entry.reverse_entry(self.user)
+
+
+class LedgerVerificationTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.post(self.previous, self.previous.start_date, [(self.cash, '900.00', '0.00'), (self.revenue, '0.00', '900.00')])
+        self.post(self.current, self.today, [(self.rent, '150.00', '0.00'), (self.cash, '0.00', '150.00')])
+
+    def test_ledger_is_consistent_after_posting_and_reversal(self):
+        """Test that posting, batch posting and reversal leave nothing to report"""
+        draft = create_entry(self.general, self.current, self.user, self.today, [(self.bank, '75.00', '0.00'), (self.revenue, '0.00', '75.00')])
+        JournalEntry.post_entries([draft.pk], self.user)
+        JournalEntry.objects.get(pk=draft.pk).reverse_entry(self.user, 'Duplicate')
+
+        report = LedgerVerificationService.verify()
+        self.assertTrue(report['ok'])
+        self.bank.refresh_from_db()
+        self.assertEqual(self.bank.current_balance, Decimal('0.00'))
+        self.assertEqual(LedgerVerificationService.account_totals([self.bank.pk])[self.bank.pk], (Decimal('75.00'), Decimal('75.00')))
+        self.assertEqual(report['accounts_checked'], Account.objects.count())
+
+    def test_detects_and_repairs_drift(self):
+        """Test that tampered balances, snapshots and entry totals are found and repaired"""
+        Account.objects.filter(pk=self.cash.pk).update(current_balance=Decimal('1.00'))
+        AccountBalance.objects.filter(account=self.rent, period=self.current).update(closing_balance=Decimal('0.00'))
+        entry = JournalEntry.objects.filter(status='POSTED').first()
+        JournalEntry.objects.filter(pk=entry.pk).update(total_debit=Decimal('1.00'), total_credit=Decimal('1.00'))
+
+        report = LedgerVerificationService.verify()
+        self.assertFalse(report['ok'])
+        mismatch = report['account_mismatches'][0]
+        self.assertEqual(mismatch['code'], '1000')
+        self.assertEqual(mismatch['expected'], Decimal('750.00'))
+        self.assertIn((self.rent.pk, self.current.pk), {(row['account_id'], row['period_id']) for row in report['snapshot_mismatches']})
+        self.assertEqual([row['id'] for row in report['unbalanced_entries']], [entry.pk])
+
+        repaired = LedgerVerificationService.repair(report)
+        self.assertEqual(repaired, {'accounts': 1, 'periods': 1, 'entries': 1})
+        self.assertTrue(LedgerVerificationService.verify()['ok'])
+        self.cash.refresh_from_db()
+        self.assertEqual(self.cash.current_balance, Decimal('750.00'))
+
+    def test_unbalanced_lines_are_not_repaired(self):
+        """Test that entries whose lines do not balance are reported but left alone"""
+        line = JournalEntryLine.objects.filter(account=self.rent).first()
+        JournalEntryLine.objects.filter(pk=line.pk).update(debit=Decimal('140.00'))
+
+        report = LedgerVerificationService.verify()
+        [problem] = report['unbalanced_entries']
+        self.assertFalse(problem['repairable'])
+        self.assertIn('lines do not balance', problem['reasons'])
+
+        self.assertEqual(LedgerVerificationService.repair(report)['entries'], 0)
+        self.assertEqual(JournalEntry.objects.get(pk=problem['id']).total_debit, Decimal('150.00'))
+
+    def test_verify_ledger_command(self):
+        """Test that verify_ledger fails on drift and succeeds once --repair has fixed it"""
+        out = StringIO()
+        call_command('verify_ledger', stdout=out)
+        self.assertIn('Ledger is consistent.', out.getvalue())
+
+        Account.objects.filter(pk=self.revenue.pk).update(current_balance=Decimal('0.00'))
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('verify_ledger', stdout=out)
+        self.assertIn('1 accounts with a drifted current balance', out.getvalue())
+
+        out = StringIO()
+        call_command('verify_ledger', '--repair', stdout=out)
+        self.assertIn('Repaired 1 account balances', out.getvalue())
+
+        out = StringIO()
+        call_command('verify_ledger', stdout=out)
+        self.assertIn('Ledger is consistent.', out.getvalue())
+
+
+class PeriodCloseTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.post(self.previous, self.previous.start_date, [(self.cash, '900.00', '0.00'), (self.revenue, '0.00', '900.00')])
+        self.post(self.previous, self.previous.end_date, [(self.rent, '200.00', '0.00'), (self.cash, '0.00', '200.00')])
+        self.post(self.current, self.today, [(self.cash, '50.00', '0.00'), (self.revenue, '0.00', '50.00')])
+
+    def test_dry_run_writes_nothing(self):
+        """Test that a dry run returns the closing lines without closing the period"""
+        preview = self.previous.close_period(self.user, dry_run=True)
+
+        self.assertEqual(preview['total_revenue'], Decimal('900.00'))
+        self.assertEqual(preview['total_expenses'], Decimal('200.00'))
+        self.assertEqual(preview['net_income'], Decimal('700.00'))
+        self.assertEqual(preview['total_debit'], preview['total_credit'])
+        lines = {line['account'].code: (line['debit'], line['credit']) for line in preview['lines']}
+        self.assertEqual(lines, {
+            '4000': (Decimal('900.00'), Decimal('0.00')),
+            '5000': (Decimal('0.00'), Decimal('200.00')),
+            '3000': (Decimal('0.00'), Decimal('700.00')),
+        })
+
+        self.previous.refresh_from_db()
+        self.assertEqual(self.previous.status, 'OPEN')
+        self.assertFalse(JournalEntryLine.objects.filter(is_closing=True).exists())
+
+    def test_close_period_moves_income_to_retained_earnings(self):
+        """Test that closing zeroes revenue and expenses of the period into retained earnings"""
+        preview = self.previous.close_period(self.user, 'Month end')
+
+        self.previous.refresh_from_db()
+        self.assertEqual(self.previous.status, 'CLOSED')
+        self.assertEqual(self.previous.closed_by, self.user)
+        closing = preview['journal_entry']
+        self.assertEqual(closing.journal.code, 'CLOSING')
+        self.assertEqual(closing.status, 'POSTED')
+        self.assertEqual(closing.lines.filter(is_closing=True).count(), 3)
+
+        # Only the current period's revenue remains on the income accounts
+        self.refresh(self.revenue, self.rent, self.retained)
+        self.assertEqual(self.revenue.current_balance, Decimal('50.00'))
+        self.assertEqual(self.rent.current_balance, Decimal('0.00'))
+        self.assertEqual(self.retained.current_balance, Decimal('700.00'))
+
+        snapshot = AccountBalance.objects.get(account=self.revenue, period=self.previous)
+        self.assertEqual(snapshot.closing_balance, Decimal('0.00'))
+        snapshot = AccountBalance.objects.get(account=self.revenue, period=self.current)
+        self.assertEqual(snapshot.opening_balance, Decimal('0.00'))
+        self.assertEqual(snapshot.closing_balance, Decimal('-50.00'))
+        self.assertEqual(self.retained.get_balance_as_of_date(self.today), Decimal('700.00'))
+
+        self.assertTrue(LedgerVerificationService.verify()['ok'])
+
+        with self.assertRaises(ValueError):
+            self.previous.close_period(self.user)
+
+    def test_current_period_cannot_be_closed(self):
+        """Test that the current period is not closable"""
+        AccountingPeriod.objects.filter(pk=self.current.pk).update(is_current=True)
+        self.current.refresh_from_db()
+
+        with self.assertRaises(ValueError):
+            self.current.close_period(self.user, dry_run=True)
+
+
+def statement_file(content, name='statement.csv'):
+    file = BytesIO(content.encode())
+    file.name = name
+    return file
+
+
+class BankReconciliationTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.day = self.current.start_date + timedelta(days=10)
+
+    def deposit(self, amount, entry_date):
+        return self.post(self.current, entry_date, [(self.bank, amount, '0.00'), (self.revenue, '0.00', amount)])
+
+    def statement_line(self, status):
+        return BankStatementLine.objects.get(account=self.bank, status=status)
+
+    def test_import_skips_duplicates_and_matches(self):
+        """Test that a re-imported CSV adds no lines and a unique candidate is matched"""
+        entry = self.deposit('300.00', self.day)
+        content = (
+            'Date,Description,Deposit,Withdrawal\n'
+            f'{self.day + timedelta(days=2)},Client transfer,300.00,\n'
+            f'{self.day},Bank charges,,12.50\n'
+        )
+
+        result = BankReconciliationService.import_statement(statement_file(content), self.bank, self.user)
+        self.assertEqual((result['imported'], result['duplicates']), (2, 0))
+        self.assertEqual((result['matched'], result['review'], result['unmatched']), (1, 0, 1))
+
+        matched = self.statement_line('MATCHED')
+        self.assertEqual(matched.amount, Decimal('300.00'))
+        self.assertEqual(matched.matched_line, entry.lines.get(account=self.bank))
+        self.assertEqual(self.statement_line('UNMATCHED').amount, Decimal('-12.50'))
+
+        result = BankReconciliationService.import_statement(statement_file(content), self.bank, self.user)
+        self.assertEqual((result['imported'], result['duplicates']), (0, 2))
+        self.assertEqual(BankStatementLine.objects.count(), 2)
+
+    def test_ambiguous_candidates_go_to_review(self):
+        """Test that several candidates, or a candidate wanted by several lines, need review"""
+        self.deposit('120.00', self.day)
+        self.deposit('120.00', self.day + timedelta(days=1))
+        self.deposit('45.00', self.day)
+        content = (
+            'Date,Description,Amount\n'
+            f'{self.day},Fees,120.00\n'
+            f'{self.day},Retainer A,45.00\n'
+            f'{self.day + timedelta(days=1)},Retainer B,45.00\n'
+        )
+
+        result = BankReconciliationService.import_statement(statement_file(content), self.bank, self.user)
+        self.assertEqual((result['matched'], result['review']), (0, 3))
+        line = BankStatementLine.objects.get(amount=Decimal('120.00'))
+        self.assertEqual(line.candidate_count, 2)
+        # The closest candidate is suggested
+        self.assertEqual(line.matched_line.journal_entry.date, self.day)
+
+    def test_tolerance_window(self):
+        """Test that candidates outside the date tolerance are not considered"""
+        self.deposit('75.00', self.day)
+        content = f'Date,Description,Amount\n{self.day + timedelta(days=3)},Late deposit,75.00\n'
+
+        result = BankReconciliationService.import_statement(statement_file(content), self.bank, self.user, tolerance_days=2)
+        self.assertEqual(result['unmatched'], 1)
+        self.assertEqual(BankReconciliationService.match(self.bank, tolerance_days=3)['matched'], 1)
+
+    def test_deposit_falls_back_to_client_payment(self):
+        """Test that a deposit with no ledger candidate is matched to a recorded payment"""
+        client = Client.objects.create(
+            name='Moyo Holdings', contact_person='T. Moyo', email='moyo@example.com',
+            phone='0772000000', address='Harare'
+        )
+        invoice = Invoice.objects.create(
+            invoice_number='INV-T-1', client=client, issue_date=self.day, due_date=self.day,
+            subtotal=Decimal('500.00'), tax=Decimal('0.00'), total=Decimal('500.00')
+        )
+        payment = Payment.objects.create(
+            invoice=invoice, amount=Decimal('500.00'), payment_date=self.day, payment_method='BANK_TRANSFER'
+        )
+        content = f'Date,Description,Amount\n{self.day},Moyo Holdings,500.00\n'
+
+        result = BankReconciliationService.import_statement(statement_file(content), self.bank, self.user)
+        self.assertEqual(result['matched'], 1)
+        line = self.statement_line('MATCHED')
+        self.assertEqual(line.matched_payment, payment)
+        self.assertIsNone(line.matched_line)
+
+    def test_ofx_import(self):
+        """Test that OFX transactions keep their FITID"""
+        stamp = self.day.strftime('%Y%m%d')
+        content = (
+            '<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n'
+            f'<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>{stamp}120000<TRNAMT>-60.00<FITID>TX-1<NAME>Stationery</STMTTRN>\n'
+            f'<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>{stamp}<TRNAMT>1,250.00<FITID>TX-2<MEMO>Fees</STMTTRN>\n'
+            '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+        )
+
+        result = BankReconciliationService.import_statement(statement_file(content, 'june.ofx'), self.bank, self.user)
+        self.assertEqual(result['statement'].file_format, 'OFX')
+        lines = {line.fit_id: line for line in BankStatementLine.objects.all()}
+        self.assertEqual(lines['TX-1'].amount, Decimal('-60.00'))
+        self.assertEqual(lines['TX-1'].description, 'Stationery')
+        self.assertEqual(lines['TX-2'].amount, Decimal('1250.00'))
+        self.assertEqual(lines['TX-2'].date, self.day)
+
+    def test_invalid_statements_are_rejected(self):
+        """Test that bad files and non-bank accounts raise BankStatementImportError"""
+        with self.assertRaises(BankStatementImportError):
+            BankReconciliationService.import_statement(statement_file('Date,Amount\n2024-01-01,10\n'), self.cash, self.user)
+        with self.assertRaises(BankStatementImportError):
+            BankReconciliationService.import_statement(statement_file('Description,Amount\nFees,10\n'), self.bank, self.user)
+        with self.assertRaises(BankStatementImportError):
+            BankReconciliationService.import_statement(statement_file('Date,Amount\nnot a date,10\n'), self.bank, self.user)
+        self.assertFalse(BankStatementLine.objects.exists())
+
+    def test_confirm_and_ignore(self):
+        """Test that review lines can be confirmed by hand and matched lines are not reused"""
+        self.deposit('120.00', self.day)
+        self.deposit('120.00', self.day)
+        content = f'Date,Description,Amount\n{self.day},Fees,120.00\n{self.day},Charges,-5.00\n'
+        BankReconciliationService.import_statement(statement_file(content), self.bank, self.user)
+
+        line = self.statement_line('REVIEW')
+        line = BankReconciliationService.confirm(line.pk, self.user)
+        self.assertEqual(line.status, 'MATCHED')
+        self.assertEqual(line.matched_by, self.user)
+        with self.assertRaises(ValueError):
+            BankReconciliationService.confirm(line.pk, self.user)
+
+        charges = self.statement_line('UNMATCHED')
+        with self.assertRaises(ValueError):
+            BankReconciliationService.confirm(charges.pk, self.user, journal_line_id=line.matched_line_id)
+        charges = BankReconciliationService.set_status(charges.pk, 'IGNORED', self.user)
+        self.assertEqual(charges.status, 'IGNORED')
+
+        # Matched and ignored lines stay out of later matcher runs
+        result = BankReconciliationService.match(self.bank)
+        self.assertEqual(result, {'matched': 0, 'review': 0, 'unmatched': 0})
+
+
+class TimeBillingTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        Journal.objects.create(code='SJ', name='Sales Journal', journal_type='SALES')
+        self.employee = Employee.objects.create(
+            first_name='Rudo', last_name='Dube', email='rudo@example.com', phone='0772111111',
+            position='Associate', hire_date=date(2020, 1, 1)
+        )
+        self.moyo = Client.objects.create(
+            name='Moyo Holdings', contact_person='T. Moyo', email='moyo@example.com',
+            phone='0772000000', address='Harare'
+        )
+        trust = Client.objects.create(
+            name='Chiwenga Family Trust', contact_person='A. Chiwenga', email='trust@example.com',
+            phone='0772000001', address='Bulawayo'
+        )
+        self.case = Case.objects.create(client=trust, title='Estate administration', description='Estate')
+        self.date_from = self.current.start_date
+        self.date_to = self.current.end_date
+        self.day = self.date_from + timedelta(days=5)
+
+        self.log('moyo holdings', 'legal_research', 9, 11)
+        self.log('Moyo Holdings', 'legal_research', 14, 15)
+        self.log(self.case.code, 'court_appearance', 8, 12, rate='150.00')
+        self.log('Unknown Ltd', 'meeting', 10, 11)
+        self.log('Moyo Holdings', 'meeting', 10, 11, status='submitted')
+        self.log('Moyo Holdings', 'administrative', 10, 11, is_billable=False)
+
+    def log(self, client_case, activity_type, start, end, rate='100.00', status='approved', is_billable=True):
+        return TimeEntry.objects.create(
+            employee=self.employee,
+            date=self.day,
+            start_time=time(start),
+            end_time=time(end),
+            activity_type=activity_type,
+            description='Work',
+            client_case=client_case,
+            is_billable=is_billable,
+            billable_rate=Decimal(rate),
+            status=status,
+            submitted_by=self.user,
+        )
+
+    def test_dry_run_summarizes_without_writing(self):
+        """Test that a dry run groups billable time per client and writes nothing"""
+        result = TimeBillingService.run(self.date_from, self.date_to, self.user, dry_run=True)
+
+        totals = {draft['client'].name: (draft['hours'], draft['total'], len(draft['items'])) for draft in result['invoices']}
+        self.assertEqual(totals, {
+            'Chiwenga Family Trust': (Decimal('4.00'), Decimal('600.00'), 1),
+            'Moyo Holdings': (Decimal('3.00'), Decimal('300.00'), 1),
+        })
+        self.assertEqual(result['unresolved'], {'Unknown Ltd': 1})
+        self.assertEqual(result['entries'], 3)
+        self.assertEqual(result['total'], Decimal('900.00'))
+        self.assertFalse(Invoice.objects.exists())
+        self.assertEqual(TimeEntry.objects.filter(status='billed').count(), 0)
+
+    def test_run_creates_invoices_and_posts_revenue(self):
+        """Test that a billing run invoices each client, posts the sales entry and marks time billed"""
+        result = TimeBillingService.run(self.date_from, self.date_to, self.user)
+
+        invoices = {invoice.client_id: invoice for invoice in Invoice.objects.all()}
+        self.assertEqual(len(invoices), 2)
+        invoice = invoices[self.moyo.pk]
+        self.assertEqual(invoice.status, 'SENT')
+        self.assertEqual(invoice.total, Decimal('300.00'))
+        self.assertEqual(invoice.due_date, self.date_to + timedelta(days=30))
+        [item] = invoice.items.all()
+        self.assertEqual((item.quantity, item.unit_price), (Decimal('3.00'), Decimal('100.00')))
+        self.assertTrue(item.description.startswith('Legal Research'))
+        [item] = invoices[self.case.client_id].items.all()
+        self.assertIn(self.case.code, item.description)
+
+        entry = result['journal_entry']
+        self.assertEqual(entry.journal.code, 'SJ')
+        self.assertEqual(entry.status, 'POSTED')
+        self.assertEqual(entry.total_debit, Decimal('900.00'))
+        self.assertEqual(entry.lines.filter(client=self.moyo).count(), 2)
+        self.refresh(self.receivable, self.revenue)
+        self.assertEqual(self.receivable.current_balance, Decimal('900.00'))
+        self.assertEqual(self.revenue.current_balance, Decimal('900.00'))
+        self.assertTrue(LedgerVerificationService.verify()['ok'])
+
+        self.assertEqual(TimeEntry.objects.filter(status='billed').count(), 3)
+        self.assertEqual(TimeEntry.objects.get(client_case='Unknown Ltd').status, 'approved')
+
+        # Nothing billable is left for the period
+        with self.assertRaises(ValueError):
+            TimeBillingService.run(self.date_from, self.date_to, self.user)
+        self.assertEqual(Invoice.objects.count(), 2)
+
+    @override_settings(FINANCE_LEDGER_CODES={'receivable_account': '1200'})
+    def test_ledger_codes_from_settings(self):
+        """Test that FINANCE_LEDGER_CODES redirects the receivable account"""
+        with self.assertRaises(ValueError):
+            TimeBillingService.run(self.date_from, self.date_to, self.user)
+        self.assertFalse(Invoice.objects.exists())
+
+        debtors = create_account('1200', 'Trade Debtors', 'ASSET', 'CURRENT_ASSET', 'DEBIT')
+        TimeBillingService.run(self.date_from, self.date_to, self.user)
+        debtors.refresh_from_db()
+        self.receivable.refresh_from_db()
+        self.assertEqual(debtors.current_balance, Decimal('900.00'))
+        self.assertEqual(self.receivable.current_balance, Decimal('0.00'))
+
+    def test_run_requires_an_open_period(self):
+        """Test that billing into a period that is not open is refused"""
+        AccountingPeriod.objects.filter(pk=self.current.pk).update(status='CLOSED')
+
+        with self.assertRaises(ValueError):
+            TimeBillingService.run(self.date_from, self.date_to, self.user)
+        self.assertEqual(TimeEntry.objects.filter(status='billed').count(), 0)
+
+
+class LedgerCubeTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        LedgerCubeService._current = None
+
+    def revenue_total(self, cube):
+        return cube.pivot('account', accounts=['4000'])['total']
+
+    def test_posting_invalidates_cube(self):
+        """Test that a posting bumps the shared ledger version and the next cube sees it"""
+        self.post(self.current, self.today, [(self.cash, '300.00', '0.00'), (self.revenue, '0.00', '300.00')])
+        cube = LedgerCubeService.get_cube()
+        self.assertEqual(self.revenue_total(cube), Decimal('300.00'))
+        self.assertIs(LedgerCubeService.get_cube(), cube)
+
+        version = get_ledger_version()
+        self.post(self.current, self.today, [(self.cash, '50.00', '0.00'), (self.revenue, '0.00', '50.00')])
+        self.assertGreater(get_ledger_version(), version)
+
+        cube = LedgerCubeService.get_cube()
+        self.assertEqual(cube.version, get_ledger_version())
+        self.assertEqual(self.revenue_total(cube), Decimal('350.00'))
+
+    def test_version_is_shared_through_the_database(self):
+        """Test that the version survives a cache that does not see other processes' bumps"""
+        version = get_ledger_version()
+        cache.clear()
+        self.assertEqual(get_ledger_version(), version)
+
+        # A bump made by another process reaches this one through the table
+        LedgerVersion.objects.filter(pk=1).update(version=version + 10)
+        self.assertEqual(get_ledger_version(), version + 10)
+        self.assertNotEqual(LedgerCubeService.get_cube().version, version)
+
+
+class LedgerCubePivotTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        LedgerCubeService._current = None
+        self.moyo = Client.objects.create(
+            name='Moyo Holdings', contact_person='T. Moyo', email='moyo@example.com',
+            phone='0772000000', address='Harare'
+        )
+        fees = create_entry(self.general, self.previous, self.user, self.previous.start_date, [
+            (self.cash, '900.00', '0.00'), (self.revenue, '0.00', '900.00'),
+        ])
+        fees.lines.filter(account=self.revenue).update(client=self.moyo)
+        fees.post_entry(self.user)
+        self.post(self.previous, self.previous.end_date, [(self.rent, '200.00', '0.00'), (self.cash, '0.00', '200.00')])
+        self.post(self.current, self.today, [(self.cash, '50.00', '0.00'), (self.revenue, '0.00', '50.00')])
+
+    def pivot(self, rows, columns=None, **kwargs):
+        return LedgerCubeService.get_cube().pivot(rows, columns, **kwargs)
+
+    def cells(self, result):
+        """Map (row key, column key) to the amount of every cell"""
+        return {
+            (row['key'], column['key']): value
+            for row, values in zip(result['rows'], result['values'])
+            for column, value in zip(result['columns'], values)
+        }
+
+    def totals(self, result):
+        return dict(zip((row['key'] for row in result['rows']), result['row_totals']))
+
+    def test_slice_by_account_and_month(self):
+        """Test that the account x month pivot matches the posted movements"""
+        result = self.pivot('account', 'month')
+
+        previous = self.previous.start_date.strftime('%Y-%m')
+        current = self.current.start_date.strftime('%Y-%m')
+        self.assertEqual(self.cells(result), {
+            ('1000', previous): Decimal('700.00'), ('1000', current): Decimal('50.00'),
+            ('4000', previous): Decimal('900.00'), ('4000', current): Decimal('50.00'),
+            ('5000', previous): Decimal('200.00'), ('5000', current): Decimal('0.00'),
+        })
+        self.assertEqual(self.totals(result), {'1000': Decimal('750.00'), '4000': Decimal('950.00'), '5000': Decimal('200.00')})
+        self.assertEqual(self.pivot('account', measure='debit', accounts=['1000'])['total'], Decimal('950.00'))
+        self.assertEqual(self.pivot('account', measure='movement', accounts=['4000'])['total'], Decimal('-950.00'))
+
+    def test_roll_up_to_account_type_quarter_and_year(self):
+        """Test that coarser dimensions add up the months and accounts beneath them"""
+        result = self.pivot('account_type', account_types=['REVENUE', 'EXPENSE'])
+        self.assertEqual(self.totals(result), {'REVENUE': Decimal('950.00'), 'EXPENSE': Decimal('200.00')})
+
+        for dimension, label in (
+            ('quarter', lambda day: f'{day.year}-Q{(day.month - 1) // 3 + 1}'),
+            ('year', lambda day: str(day.year)),
+        ):
+            expected = {}
+            for day, amount in ((self.previous.start_date, Decimal('900.00')), (self.today, Decimal('50.00'))):
+                expected[label(day)] = expected.get(label(day), Decimal('0.00')) + amount
+            self.assertEqual(self.totals(self.pivot(dimension, accounts=['4000'])), expected)
+
+    def test_dice_by_client_and_date(self):
+        """Test that client and date filters narrow the facts before rolling up"""
+        self.assertEqual(self.totals(self.pivot('client', accounts=['4000'])), {
+            self.moyo.pk: Decimal('900.00'), None: Decimal('50.00'),
+        })
+        self.assertEqual(self.totals(self.pivot('account', clients=[self.moyo.pk])), {'4000': Decimal('900.00')})
+
+        result = self.pivot('account', account_types=['REVENUE'], date_from=self.current.start_date)
+        self.assertEqual(result['total'], Decimal('50.00'))
+        result = self.pivot('account', account_types=['REVENUE'], date_to=self.previous.end_date)
+        self.assertEqual(result['total'], Decimal('900.00'))
+
+    def test_closing_lines_are_excluded_by_default(self):
+        """Test that period closing lines only show up when include_closing is passed"""
+        self.previous.close_period(self.user, 'Month end')
+        accounts = ['3000', '4000', '5000']
+
+        self.assertEqual(self.totals(self.pivot('account', accounts=accounts)), {
+            '4000': Decimal('950.00'), '5000': Decimal('200.00'),
+        })
+        self.assertEqual(self.totals(self.pivot('account', accounts=accounts, include_closing=True)), {
+            '3000': Decimal('700.00'), '4000': Decimal('50.00'), '5000': Decimal('0.00'),
+        })
+        result = self.pivot('closing', accounts=['4000'], include_closing=True)
+        self.assertEqual(self.totals(result), {False: Decimal('950.00'), True: Decimal('-900.00')})
+
+    def test_api_passes_filters_and_include_closing(self):
+        """Test that the pivot API applies its query string filters to the cube"""
+        self.previous.close_period(self.user, 'Month end')
+        self.client.force_login(self.user)
+        url = reverse('finance_management:ledger_cube_api')
+
+        response = self.client.get(url, {'rows': 'account', 'columns': 'month', 'account': '4000'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.json()['total']), Decimal('950.00'))
+
+        response = self.client.get(url, {'rows': 'account', 'account': '4000', 'include_closing': '1'})
+        self.assertEqual(Decimal(response.json()['total']), Decimal('50.00'))
+
+        response = self.client.get(url, {'rows': 'colour'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ReportGenerationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='analyst', password='password')
+        self.client.force_login(self.user)
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.report = Report.objects.create(
+            name='Quarterly P&L',
+            report_type='profit_loss',
+            start_date=date(2025, 1, 1),
+            end_date=date(2025, 3, 31),
+            format='csv',
+            generated_by=self.user,
+        )
+
+    def preview(self):
+        return self.client.get(reverse('finance_management:report_preview', args=[self.report.pk]))
+
+    def test_preview_does_not_generate_in_the_request(self):
+        """Test that the preview of a queued report shows its status without building the data"""
+        with mock.patch.object(ReportGenerationService, 'generate_report_data') as generate:
+            response = self.preview()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'still being generated')
+        generate.assert_not_called()
+
+    def test_preview_shows_the_worker_output(self):
+        """Test that the worker stores the rendered preview and the file"""
+        with override_settings(MEDIA_ROOT=self.media_root):
+            report = ReportGenerationService.process_next()
+
+        self.assertEqual(report.pk, self.report.pk)
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.status, 'completed')
+        self.assertIsNone(self.report.lease_expires_at)
+        self.assertIn('Revenue', self.report.preview_html)
+        self.assertNotIn('{{', self.report.preview_html)
+
+        with mock.patch.object(ReportGenerationService, 'generate_report_data') as generate:
+            response = self.preview()
+        self.assertContains(response, 'Revenue')
+        self.assertNotContains(response, 'still being generated')
+        generate.assert_not_called()
+
+    def test_failed_generation_is_shown(self):
+        """Test that a failed report shows its error on the preview page"""
+        with mock.patch.object(ReportGenerationService, 'generate_report_data', return_value={'error': 'Unknown report type'}):
+            ReportGenerationService.process_next()
+
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.status, 'failed')
+        self.assertContains(self.preview(), 'Unknown report type')
+
+    def test_lease_is_renewed_during_generation(self):
+        """Test that keep_lease renews the lease repeatedly while the block runs, then stops"""
+        with mock.patch.object(Report, 'LEASE_DURATION', timedelta(milliseconds=60)), \
+                mock.patch.object(Report, 'renew_lease') as renew_lease:
+            with self.report.keep_lease():
+                clock.sleep(0.2)
+            calls = renew_lease.call_count
+            clock.sleep(0.1)
+
+        self.assertGreaterEqual(calls, 2)
+        self.assertEqual(renew_lease.call_count, calls)
+
+
+class PaymentAllocationTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        Journal.objects.create(code='CRJ', name='Cash Receipts Journal', journal_type='CASH_RECEIPTS')
+        self.customer = Client.objects.create(
+            name='Moyo Holdings', contact_person='T. Moyo', email='moyo@example.com',
+            phone='0772000000', address='Harare'
+        )
+        self.day = self.current.start_date + timedelta(days=10)
+        self.oldest = self.invoice('INV-1', '100.00', due_days=-20)
+        self.latest = self.invoice('INV-2', '200.00', due_days=10)
+        self.middle = self.invoice('INV-3', '150.00', due_days=-5)
+        self.draft = self.invoice('INV-4', '80.00', due_days=-30, status='DRAFT')
+
+    def invoice(self, number, total, due_days, status='SENT'):
+        return Invoice.objects.create(
+            invoice_number=number, client=self.customer, issue_date=self.day - timedelta(days=30),
+            due_date=self.day + timedelta(days=due_days), status=status,
+            subtotal=Decimal(total), tax=Decimal('0.00'), total=Decimal(total)
+        )
+
+    def allocate(self, amount, **kwargs):
+        return PaymentAllocationService.allocate(self.customer, amount, self.user, payment_date=self.day, **kwargs)
+
+    def statuses(self):
+        return dict(Invoice.objects.values_list('invoice_number', 'status'))
+
+    def test_oldest_due_first_with_partial_payment(self):
+        """Test that a receipt pays the oldest due invoices first and leaves a partly paid one SENT"""
+        result = self.allocate('320.00', reference='EFT-1')
+
+        self.assertEqual(result['allocations'], [
+            ('INV-1', Decimal('100.00')), ('INV-3', Decimal('150.00')), ('INV-2', Decimal('70.00')),
+        ])
+        self.assertEqual(result['applied'], Decimal('320.00'))
+        self.assertEqual(result['unapplied'], Decimal('0.00'))
+        self.assertEqual(result['paid_invoices'], 2)
+        self.assertEqual(self.statuses(), {'INV-1': 'PAID', 'INV-2': 'SENT', 'INV-3': 'PAID', 'INV-4': 'DRAFT'})
+        self.assertEqual(Payment.objects.get(invoice=self.latest).amount, Decimal('70.00'))
+        self.assertEqual(Payment.objects.filter(reference_number='EFT-1').count(), 3)
+
+        # The partly paid invoice is next in line for the balance
+        result = self.allocate('130.00')
+        self.assertEqual(result['allocations'], [('INV-2', Decimal('130.00'))])
+        self.assertEqual(self.statuses()['INV-2'], 'PAID')
+
+    def test_posts_receipt_to_bank_and_receivables(self):
+        """Test that the posted receipt debits the bank and credits receivables per invoice"""
+        result = self.allocate('250.00')
+
+        entry = result['journal_entry']
+        self.assertEqual(entry.journal.code, 'CRJ')
+        self.assertEqual(entry.status, 'POSTED')
+        self.assertEqual((entry.total_debit, entry.total_credit), (Decimal('250.00'), Decimal('250.00')))
+        self.assertEqual(entry.lines.filter(account=self.receivable).count(), 2)
+        self.assertEqual(set(entry.lines.values_list('client', flat=True)), {self.customer.pk})
+
+        self.refresh(self.bank, self.receivable, self.cash)
+        self.assertEqual(self.bank.current_balance, Decimal('250.00'))
+        self.assertEqual(self.receivable.current_balance, Decimal('-250.00'))
+        self.assertEqual(self.cash.current_balance, Decimal('0.00'))
+        self.assertTrue(LedgerVerificationService.verify()['ok'])
+
+        rollup = FinanceDailyRollup.objects.get(metric='PAYMENT', date=self.day)
+        self.assertEqual((rollup.count, rollup.amount), (2, Decimal('250.00')))
+
+    def test_unapplied_remainder(self):
+        """Test that an overpayment pays everything and returns the remainder as unapplied"""
+        result = self.allocate('500.00')
+
+        self.assertEqual(result['applied'], Decimal('450.00'))
+        self.assertEqual(result['unapplied'], Decimal('50.00'))
+        self.assertEqual(result['journal_entry'].total_debit, Decimal('450.00'))
+        self.bank.refresh_from_db()
+        self.assertEqual(self.bank.current_balance, Decimal('450.00'))
+
+        with self.assertRaises(ValueError):
+            self.allocate('10.00')
+
+    def test_explicit_invoice_order(self):
+        """Test that invoice_ids are paid in the order given"""
+        result = self.allocate('250.00', invoice_ids=[self.latest.pk, self.oldest.pk])
+
+        self.assertEqual(result['allocations'], [('INV-2', Decimal('200.00')), ('INV-1', Decimal('50.00'))])
+        self.assertEqual(self.statuses(), {'INV-1': 'SENT', 'INV-2': 'PAID', 'INV-3': 'SENT', 'INV-4': 'DRAFT'})
+
+    def test_rejects_invoices_that_are_not_open(self):
+        """Test that draft, paid or other clients' invoices cannot be selected and nothing is written"""
+        other = Client.objects.create(
+            name='Dube Ltd', contact_person='R. Dube', email='dube@example.com', phone='0772000001', address='Gweru'
+        )
+        foreign = Invoice.objects.create(
+            invoice_number='INV-9', client=other, issue_date=self.day, due_date=self.day, status='SENT',
+            subtotal=Decimal('50.00'), tax=Decimal('0.00'), total=Decimal('50.00')
+        )
+        for invoice in (self.draft, foreign):
+            with self.assertRaises(ValueError):
+                self.allocate('50.00', invoice_ids=[self.oldest.pk, invoice.pk])
+
+        self.allocate('100.00', invoice_ids=[self.oldest.pk])
+        with self.assertRaises(ValueError):
+            self.allocate('50.00', invoice_ids=[self.oldest.pk])
+
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(JournalEntry.objects.filter(journal__code='CRJ').count(), 1)
+
+    def test_setup_errors(self):
+        """Test that a missing journal, period or a non-positive amount is refused"""
+        with self.assertRaises(ValueError):
+            self.allocate('0.00')
+        with self.assertRaises(ValueError):
+            PaymentAllocationService.allocate(self.customer, '50.00', self.user, payment_date=date(2000, 1, 1))
+        AccountingPeriod.objects.filter(pk=self.current.pk).update(status='CLOSED')
+        with self.assertRaises(ValueError):
+            self.allocate('50.00')
+        AccountingPeriod.objects.filter(pk=self.current.pk).update(status='OPEN')
+
+        Journal.objects.filter(code='CRJ').update(status='INACTIVE')
+        with self.assertRaises(ValueError) as error:
+            self.allocate('50.00')
+        self.assertIn('CRJ', str(error.exception))
+        self.assertFalse(Payment.objects.exists())
+
+
+class JournalEntryImportTests(LedgerTestCase):
+    HEADER = 'entry,entry_number,date,journal,account,debit,credit,description\n'
+
+    def csv(self, *rows):
+        return statement_file(self.HEADER + ''.join(f'{row}\n' for row in rows), 'entries.csv')
+
+    def run_import(self, *rows, **kwargs):
+        return JournalEntryImportService.run(self.csv(*rows), self.user, **kwargs)
+
+    def messages(self, result):
+        return {(error['row'], error['message']) for error in result['errors']}
+
+    def test_validation_messages(self):
+        """Test that every rule reports the offending row and nothing is written"""
+        Account.objects.filter(pk=self.bank.pk).update(status='INACTIVE')
+        Journal.objects.create(code='SJ', name='Sales Journal', journal_type='SALES')
+        JournalEntry.objects.create(
+            journal=self.general, period=self.current, date=self.today, entry_number='GJ-TAKEN',
+            description='Existing', created_by=self.user
+        )
+        AccountingPeriod.objects.filter(pk=self.previous.pk).update(status='CLOSED')
+        day, closed_day = self.today, self.previous.start_date
+
+        result = self.run_import(
+            f'A,,{day},GJ,1000,100,,Unbalanced',
+            f'A,,{day},GJ,4000,,90,',
+            f'B,,{day},GJ,9999,10,,Unknown account',
+            f'B,,{day},GJ,1010,,10,',
+            f'C,,{closed_day},GJ,1000,10,,Closed period',
+            f'C,,{closed_day},GJ,4000,,10,',
+            f'D,,{self.current.start_date},GJ,1000,10,,Mixed',
+            f'D,,{self.current.start_date + timedelta(days=1)},SJ,4000,,10,',
+            f'E,GJ-DUP,{day},GJ,1000,10,,Duplicate number',
+            f'E,GJ-DUP,{day},GJ,4000,,10,',
+            f'F,GJ-DUP,{day},GJ,1000,10,,Duplicate number',
+            f'F,GJ-DUP,{day},GJ,4000,,10,',
+            f'G,GJ-TAKEN,{day},GJ,1000,10,,Existing number',
+            f'G,GJ-TAKEN,{day},GJ,4000,,10,',
+            f'H,,{day},GJ,1000,10,10,Both sides',
+            f'H,,{day},GJ,4000,,,',
+        )
+
+        self.assertEqual(self.messages(result), {
+            (2, 'Entry does not balance'),
+            (4, 'Unknown account'),
+            (5, 'Account is not active'),
+            (6, 'No open accounting period for this date'),
+            (7, 'No open accounting period for this date'),
+            (8, 'Entry lines have different dates'),
+            (8, 'Entry lines have different journals'),
+            (10, 'Entry number is used by another entry in the file'),
+            (12, 'Entry number is used by another entry in the file'),
+            (14, 'Entry number already exists'),
+            (16, 'Each line needs either a debit or a credit amount'),
+            (17, 'Each line needs either a debit or a credit amount'),
+        })
+        self.assertEqual(JournalEntry.objects.count(), 1)
+
+    def test_chunked_import_and_post(self):
+        """Test that entries are written in chunks, numbered per journal and posted"""
+        rows = []
+        for number in range(5):
+            rows += [f'E{number},,{self.today},GJ,1000,{number + 1}0.00,,Fees {number}', f'E{number},,{self.today},GJ,4000,,{number + 1}0.00,']
+        rows += [f'X,GJ-MANUAL,{self.today},GJ,5000,25,,Rent', f'X,GJ-MANUAL,{self.today},GJ,1000,,25,']
+
+        result = self.run_import(*rows, chunk_size=2, post=True)
+
+        self.assertEqual(result['errors'], [])
+        self.assertEqual((result['entries'], result['lines'], result['posted']), (6, 12, 6))
+        self.assertEqual(JournalEntry.objects.filter(status='POSTED').count(), 6)
+        self.assertTrue(JournalEntry.objects.filter(entry_number='GJ-MANUAL').exists())
+        numbers = list(JournalEntry.objects.exclude(entry_number='GJ-MANUAL').values_list('entry_number', flat=True))
+        self.assertEqual(len(set(numbers)), 5)
+        self.assertTrue(all(number.startswith('GJ') for number in numbers))
+
+        self.refresh(self.cash, self.revenue)
+        self.assertEqual(self.cash.current_balance, Decimal('125.00'))
+        self.assertEqual(self.revenue.current_balance, Decimal('150.00'))
+        self.assertTrue(LedgerVerificationService.verify()['ok'])
+
+    def test_dry_run_writes_nothing(self):
+        """Test that a dry run validates and counts without writing"""
+        result = self.run_import(f'A,,{self.today},GJ,1000,10,,', f'A,,{self.today},GJ,4000,,10,', dry_run=True)
+
+        self.assertEqual(result['errors'], [])
+        self.assertEqual((result['entries'], result['lines']), (1, 2))
+        self.assertFalse(JournalEntry.objects.exists())
+
+    def test_command_imports_xlsx(self):
+        """Test that import_journal_entries reads an XLSX file and posts it"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'entries.xlsx')
+        pd.DataFrame([
+            {'Entry': 'A', 'Date': str(self.today), 'Journal': 'GJ', 'Account': '1000', 'Debit': '40', 'Credit': ''},
+            {'Entry': 'A', 'Date': str(self.today), 'Journal': 'GJ', 'Account': '4000', 'Debit': '', 'Credit': '40'},
+        ]).to_excel(path, index=False)
+
+        out = StringIO()
+        call_command('import_journal_entries', path, '--user', 'accountant', '--post', stdout=out)
+        self.assertIn('Imported 1 journal entries (2 lines, 1 posted)', out.getvalue())
+        self.cash.refresh_from_db()
+        self.assertEqual(self.cash.current_balance, Decimal('40.00'))
+
+        pd.DataFrame([{'Entry': 'B', 'Date': str(self.today), 'Account': '1000'}]).to_excel(path, index=False)
+        with self.assertRaises(CommandError) as error:
+            call_command('import_journal_entries', path, '--user', 'accountant', stdout=StringIO())
+        self.assertIn('Missing columns: journal, debit, credit', str(error.exception))
+
+
+class NumberingServiceTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sales = Journal.objects.create(code='SJ', name='Sales Journal', journal_type='SALES')
+        self.customer = Client.objects.create(
+            name='Moyo Holdings', contact_person='T. Moyo', email='moyo@example.com',
+            phone='0772000000', address='Harare'
+        )
+        self.month = date(2025, 1, 15)
+
+    def invoice(self, number=''):
+        return Invoice.objects.create(
+            invoice_number=number, client=self.customer, issue_date=self.month, due_date=self.month,
+            subtotal=Decimal('10.00'), tax=Decimal('0.00'), total=Decimal('10.00')
+        )
+
+    def test_first_allocation_is_seeded_from_stored_numbers(self):
+        """Test that numbers issued before the sequence existed are not handed out again"""
+        self.invoice('INV-202501-0007')
+        self.invoice('INV-202501-0012')
+        self.invoice('INV-202501-0099-CN')    # does not match the format
+        self.invoice('INV-202412-0500')       # another month
+
+        self.assertEqual(self.invoice().invoice_number, 'INV-202501-0013')
+        self.assertEqual(NumberingService.next_number('INV', date=self.month), 'INV-202501-0014')
+        self.assertEqual(NumberingService.next_number('INV', date=date(2025, 2, 1)), 'INV-202502-0001')
+
+    def test_reserve_returns_consecutive_numbers(self):
+        """Test that reserve allocates a block in order and later calls continue after it"""
+        self.assertEqual(NumberingService.reserve('AP', 3, date=self.month), [
+            'AP-202501-0001', 'AP-202501-0002', 'AP-202501-0003',
+        ])
+        self.assertEqual(NumberingService.reserve('AP', 0, date=self.month), [])
+        self.assertEqual(NumberingService.next_number('AP', date=self.month), 'AP-202501-0004')
+
+    @override_settings(FINANCE_NUMBER_FORMATS={'INV': 'F{period}/{number:03d}'})
+    def test_formats_from_settings(self):
+        """Test that FINANCE_NUMBER_FORMATS overrides the format, including the seeding pattern"""
+        self.invoice('F202501/041')
+
+        self.assertEqual(NumberingService.reserve('INV', 2, date=self.month), ['F202501/042', 'F202501/043'])
+        self.assertEqual(NumberingService.next_number('JE', date=self.month, prefix='GJ'), 'GJ-202501-000001')
+
+    def test_journal_prefixes_do_not_collide(self):
+        """Test that each journal numbers its entries from its own sequence"""
+        day = self.current.start_date
+        period = day.strftime('%Y%m')
+        general = [create_entry(self.general, self.current, self.user, day, []) for _ in range(2)]
+        sales = create_entry(self.sales, self.current, self.user, day, [])
+
+        self.assertEqual(
+            [entry.entry_number for entry in general],
+            [f'GJ-{period}-000001', f'GJ-{period}-000002']
+        )
+        self.assertEqual(sales.entry_number, f'SJ-{period}-000001')
@@ -13,12 +13,15 @@ urlpatterns = [
     # Invoices
     path('invoices/', views.InvoiceListView.as_view(), name='invoice_list'),
     path('invoices/create/', views.InvoiceCreateView.as_view(), name='invoice_create'),
+    path('invoices/billing-run/', views.TimeBillingView.as_view(), name='time_billing'),
     path('invoices/<int:pk>/', views.InvoiceDetailView.as_view(), name='invoice_detail'),
     path('invoices/<int:pk>/update/', views.InvoiceUpdateView.as_view(), name='invoice_update'),
     
     # Payments
     path('payments/', views.PaymentListView.as_view(), name='payment_list'),
     path('payments/create/', views.PaymentCreateView.as_view(), name='payment_create'),
+    path('payments/allocate/', views.PaymentAllocationView.as_view(), name='payment_allocate'),
+    path('bank-reconciliation/', views.BankReconciliationView.as_view(), name='bank_reconciliation'),
     
 
     
@@ -33,14 +36,19 @@ urlpatterns = [
     path('accounts/<str:code>/delete/', views.AccountDeleteView.as_view(), name='account_delete'),
     path('api/accounts/<str:code>/', views.AccountDetailAPIView.as_view(), name='account_detail_api'),
     path('api/accounts/<str:code>/transactions/', views.AccountTransactionsAPIView.as_view(), name='account_transactions_api'),
+    path('accounts/<str:code>/ledger/export/', views.AccountLedgerExportView.as_view(), name='account_ledger_export'),
     
     # Journal Entry URLs
     path('journal-entries/', views.JournalEntryListView.as_view(), name='journal_entries'),
     path('journal-entries/new/', views.JournalEntryCreateView.as_view(), name='journal_entry_create'),
+    path('journal-entries/import/', views.JournalEntryImportView.as_view(), name='journal_entry_import'),
     path('journal-entries/<int:pk>/', views.JournalEntryDetailView.as_view(), name='journal_entry_detail'),
     path('journal-entries/<int:pk>/update/', views.JournalEntryUpdateView.as_view(), name='journal_entry_update'),
     path('api/journal-entries/<int:pk>/', views.JournalEntryDetailAPIView.as_view(), name='journal_entry_detail_api'),
     path('api/journal-entries/<int:pk>/delete/', views.JournalEntryDeleteView.as_view(), name='journal_entry_delete'),
+    path('api/journal-entries/post/', views.JournalEntryBulkPostAPIView.as_view(), name='journal_entry_bulk_post_api'),
+    path('api/ledger/verify/', views.LedgerVerificationAPIView.as_view(), name='ledger_verify_api'),
+    path('api/ledger/cube/', views.LedgerCubeAPIView.as_view(), name='ledger_cube_api'),
     
     # Petty Cash URLs
     path('petty-cash/', views.PettyCashListView.as_view(), name='petty_cash_list'),
@@ -77,6 +85,10 @@ urlpatterns = [
     path('reports/trial-balance/', views.TrialBalanceView.as_view(), name='trial_balance'),
     path('reports/balance-sheet/', views.BalanceSheetView.as_view(), name='balance_sheet'),
     path('reports/income-statement/', views.IncomeStatementView.as_view(), name='income_statement'),
+    path('reports/general-ledger/', views.GeneralLedgerReportView.as_view(), name='general_ledger'),
+    path('reports/comparative/', views.ComparativeStatementView.as_view(), name='comparative_statement'),
+    path('api/statements/<str:statement_type>/', views.FinancialStatementAPIView.as_view(), name='financial_statement_api'),
+    path('api/statements/comparative/<str:statement_type>/', views.ComparativeStatementAPIView.as_view(), name='comparative_statement_api'),
     
     # Reports URLs
     path('reports/', views.ReportListView.as_view(), name='reports'),
@@ -1,22 +1,31 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.admin.views.decorators import staff_member_required
 from django.views.generic import TemplateView, ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.views import View
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.db.models import Q, Sum, Count
+from django.db.models.functions import TruncMonth
 from django.urls import reverse_lazy, reverse
 from django.contrib import messages
 from django.utils import timezone
+from django.utils.decorators import method_decorator
 from datetime import datetime, timedelta
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from decimal import Decimal
+from itertools import chain
+import csv
 import json
+import os
+import tempfile
+import time
 from .models import (
     Invoice, InvoiceItem, Payment, Expense, Account, 
     JournalEntry, JournalEntryLine, PettyCash, Report,
     Journal, AccountingPeriod, AccountBalance, FinancialStatement,
-    ExpenseCategory, AccountsPayable, AccountsPayableLineItem
+    ExpenseCategory, AccountsPayable, AccountsPayableLineItem, FinanceDailyRollup, BankStatementLine
 )
 from .forms import (
     InvoiceForm, PaymentForm, ExpenseForm, ExpenseFilterForm, 
@@ -26,7 +35,14 @@ from .forms import (
     JournalForm, AccountingPeriodForm, FinancialStatementForm, PeriodClosingForm,
     ExpenseApprovalForm, ExpensePaymentForm, ExpenseLineItemFormSet,
     ExpenseCategoryForm, AccountsPayableForm, AccountsPayableLineItemFormSet,
-    AccountsPayableApprovalForm, AccountsPayablePaymentForm, AccountsPayableFilterForm
+    AccountsPayableApprovalForm, AccountsPayablePaymentForm, AccountsPayableFilterForm,
+    JournalEntryImportForm, GeneralLedgerReportForm, ComparativeStatementForm, PaymentAllocationForm,
+    BankStatementImportForm, TimeBillingForm
+)
+from .services import (
+    FinancialStatementService, GeneralLedgerService, ChartOfAccountsService, AgingService,
+    JournalEntryImportError, JournalEntryImportService, LedgerVerificationService, PaymentAllocationService,
+    BankReconciliationService, BankStatementImportError, TimeBillingService, LedgerCubeService
 )
 from client_management.models import Client
 
@@ -36,17 +52,40 @@ class FinanceDashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
+        # All dashboard figures are read from the pre-aggregated daily rollups,
+        # kept current by signals (see rebuild_finance_rollups)
+        totals = {}
+        for row in FinanceDailyRollup.objects.exclude(metric='CLIENT_PAYMENT').values(
+            'metric', 'dimension', 'status'
+        ).annotate(total_count=Sum('count'), total_amount=Sum('amount')):
+            totals[(row['metric'], row['dimension'], row['status'])] = (row['total_count'], row['total_amount'])
+        
+        def rollup_count(metric, dimension=None, statuses=None):
+            return sum(
+                count for (m, d, s), (count, amount) in totals.items()
+                if m == metric and (dimension is None or d == dimension) and (statuses is None or s in statuses)
+            )
+        
+        def rollup_amount(metric, dimension=None, statuses=None):
+            return sum(
+                (amount for (m, d, s), (count, amount) in totals.items()
+                 if m == metric and (dimension is None or d == dimension) and (statuses is None or s in statuses)),
+                Decimal('0.00')
+            )
+        
         # Calculate real financial metrics
         # Cash Position (Total payments received - Total expenses paid)
-        total_payments = Payment.objects.aggregate(total=Sum('amount'))['total'] or 0
-        total_expenses_paid = Expense.objects.filter(status='APPROVED').aggregate(total=Sum('total_amount'))['total'] or 0
+        total_payments = rollup_amount('PAYMENT')
+        total_expenses_paid = rollup_amount('EXPENSE', statuses=['APPROVED'])
         cash_position = total_payments - total_expenses_paid
         
-        # Accounts Receivable (Unpaid invoices)
-        accounts_receivable = Invoice.objects.filter(status__in=['SENT', 'OVERDUE']).aggregate(total=Sum('total'))['total'] or 0
+        # Accounts Receivable (Unpaid invoices, net of partial payments)
+        ar_aging = AgingService.receivables()
+        accounts_receivable = ar_aging['total']
+        context['ar_aging'] = ar_aging
         
         # Accounts Payable (Unpaid accounts payable)
-        accounts_payable = AccountsPayable.objects.filter(status__in=['DRAFT', 'PENDING_APPROVAL', 'APPROVED', 'PARTIALLY_PAID']).aggregate(total=Sum('balance_due'))['total'] or 0
+        accounts_payable = rollup_amount('PAYABLE', statuses=AgingService.PAYABLE_STATUSES)
         
         # Working Capital (Current Assets - Current Liabilities)
         working_capital = cash_position + accounts_receivable - accounts_payable
@@ -58,10 +97,10 @@ class FinanceDashboardView(LoginRequiredMixin, TemplateView):
         context['working_capital'] = working_capital
         
         # Get invoice counts by status
-        context['paid_count'] = Invoice.objects.filter(status='PAID').count()
-        context['overdue_count'] = Invoice.objects.filter(status='OVERDUE').count()
-        context['sent_count'] = Invoice.objects.filter(status='SENT').count()
-        context['draft_count'] = Invoice.objects.filter(status='DRAFT').count()
+        context['paid_count'] = rollup_count('INVOICE', statuses=['PAID'])
+        context['overdue_count'] = rollup_count('INVOICE', statuses=['OVERDUE'])
+        context['sent_count'] = rollup_count('INVOICE', statuses=['SENT'])
+        context['draft_count'] = rollup_count('INVOICE', statuses=['DRAFT'])
         
         # Get recent payments
         context['recent_payments'] = Payment.objects.select_related('invoice__client').order_by('-payment_date')[:5]
@@ -72,37 +111,41 @@ class FinanceDashboardView(LoginRequiredMixin, TemplateView):
         # Get recent accounts payable
         context['recent_payables'] = AccountsPayable.objects.order_by('-invoice_date')[:5]
         
-        # Calculate monthly revenue and expenses for the current year
-        current_year = timezone.now().year
-        monthly_revenue = [0] * 12
-        monthly_expenses = [0] * 12
-        monthly_labels = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+        # Monthly payment and expense totals for the current year and the
+        # cash flow window, in one grouped query
+        today = timezone.now()
+        current_year = today.year
+        current_month = today.month
+        cash_flow_months = [today - timedelta(days=30 * month_offset) for month_offset in range(5, -1, -1)]
+        window_start = min(cash_flow_months[0].date().replace(day=1), today.date().replace(month=1, day=1))
         
-        # Get monthly revenue from payments
-        payments = Payment.objects.filter(payment_date__year=current_year)
-        for payment in payments:
-            month_index = payment.payment_date.month - 1  # 0-based index
-            monthly_revenue[month_index] += float(payment.amount)
+        monthly_totals = {}
+        for row in FinanceDailyRollup.objects.filter(
+            metric__in=['PAYMENT', 'EXPENSE'],
+            date__gte=window_start
+        ).annotate(month=TruncMonth('date')).values('metric', 'month').annotate(total=Sum('amount')):
+            monthly_totals[(row['metric'], row['month'].year, row['month'].month)] = row['total']
         
-        # Get monthly expenses
-        expenses = Expense.objects.filter(expense_date__year=current_year)
-        for expense in expenses:
-            month_index = expense.expense_date.month - 1  # 0-based index
-            monthly_expenses[month_index] += float(expense.total_amount)
+        def monthly_amount(metric, year, month):
+            return monthly_totals.get((metric, year, month)) or Decimal('0.00')
+        
+        # Calculate monthly revenue and expenses for the current year
+        monthly_labels = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+        monthly_revenue = [monthly_amount('PAYMENT', current_year, month) for month in range(1, 13)]
+        monthly_expenses = [monthly_amount('EXPENSE', current_year, month) for month in range(1, 13)]
         
         # Get expense categories distribution
+        expense_categories = {}
+        for (metric, dimension, status), (count, amount) in totals.items():
+            if metric == 'EXPENSE':
+                expense_categories[dimension] = expense_categories.get(dimension, Decimal('0.00')) + amount
+        
         expense_categories_data = []
         expense_categories_labels = []
-        
-        # Get all expense categories that have expenses
-        categories_with_expenses = Expense.objects.values('expense_category__name').annotate(
-            total=Sum('total_amount')
-        ).filter(expense_category__isnull=False).order_by('-total')
-        
-        for category in categories_with_expenses:
-            if category['total'] > 0:
-                expense_categories_data.append(float(category['total']))
-                expense_categories_labels.append(category['expense_category__name'] or 'Unknown')
+        for name, total in sorted(expense_categories.items(), key=lambda item: item[1], reverse=True):
+            if total > 0:
+                expense_categories_data.append(float(total))
+                expense_categories_labels.append(name or 'Unknown')
         
         # Invoice status distribution
         invoice_status_data = [
@@ -113,50 +156,32 @@ class FinanceDashboardView(LoginRequiredMixin, TemplateView):
         ]
         
         # Top clients by revenue
-        top_clients = Payment.objects.select_related('invoice__client').values('invoice__client__name').annotate(
+        top_clients = FinanceDailyRollup.objects.filter(metric='CLIENT_PAYMENT').values('dimension').annotate(
             total_revenue=Sum('amount')
         ).order_by('-total_revenue')[:5]
         
         client_revenue_labels = []
         client_revenue_data = []
         for client in top_clients:
-            client_revenue_labels.append(client['invoice__client__name'] or 'Unknown Client')
+            client_revenue_labels.append(client['dimension'] or 'Unknown Client')
             client_revenue_data.append(float(client['total_revenue']))
         
         # Calculate real financial metrics
         # Collection Rate (Paid invoices / Total invoices)
-        total_invoices = Invoice.objects.count()
-        paid_invoices = Invoice.objects.filter(status='PAID').count()
+        total_invoices = rollup_count('INVOICE')
+        paid_invoices = context['paid_count']
         collection_rate = (paid_invoices / total_invoices * 100) if total_invoices > 0 else 0
         
         # Average Payment Time (in days)
-        paid_payments = Payment.objects.filter(payment_date__isnull=False)
-        if paid_payments.exists():
-            total_days = 0
-            payment_count = 0
-            for payment in paid_payments:
-                if payment.invoice and payment.invoice.issue_date:
-                    days_diff = (payment.payment_date - payment.invoice.issue_date).days
-                    if days_diff >= 0:  # Only count valid payment times
-                        total_days += days_diff
-                        payment_count += 1
-            
-            avg_payment_time = total_days / payment_count if payment_count > 0 else 0
-        else:
-            avg_payment_time = 0
+        payment_count = rollup_count('PAYMENT_TIME')
+        total_days = rollup_amount('PAYMENT_TIME')
+        avg_payment_time = float(total_days) / payment_count if payment_count > 0 else 0
         
         # Outstanding Amount (Unpaid invoices)
-        outstanding_amount = Invoice.objects.filter(status__in=['SENT', 'OVERDUE']).aggregate(total=Sum('total'))['total'] or 0
+        outstanding_amount = accounts_receivable
         
         # Monthly Growth (Compare current month vs previous month)
-        current_month = timezone.now().month
-        current_year = timezone.now().year
-        
-        # Current month revenue
-        current_month_revenue = Payment.objects.filter(
-            payment_date__year=current_year,
-            payment_date__month=current_month
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        current_month_revenue = monthly_amount('PAYMENT', current_year, current_month)
         
         # Previous month revenue
         if current_month == 1:
@@ -166,10 +191,7 @@ class FinanceDashboardView(LoginRequiredMixin, TemplateView):
             prev_month = current_month - 1
             prev_year = current_year
             
-        prev_month_revenue = Payment.objects.filter(
-            payment_date__year=prev_year,
-            payment_date__month=prev_month
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        prev_month_revenue = monthly_amount('PAYMENT', prev_year, prev_month)
         
         # Calculate growth percentage
         if prev_month_revenue > 0:
@@ -179,9 +201,9 @@ class FinanceDashboardView(LoginRequiredMixin, TemplateView):
             monthly_growth = "+0.0"
         
         # Finance Status
-        overdue_invoices = Invoice.objects.filter(status='OVERDUE').count()
-        pending_expenses = Expense.objects.filter(status='PENDING').count()
-        pending_payables = AccountsPayable.objects.filter(status__in=['DRAFT', 'PENDING_APPROVAL']).count()
+        overdue_invoices = context['overdue_count']
+        pending_expenses = rollup_count('EXPENSE', statuses=['PENDING'])
+        pending_payables = rollup_count('PAYABLE', statuses=['DRAFT', 'PENDING_APPROVAL'])
         
         if overdue_invoices > 0 and (pending_expenses > 0 or pending_payables > 0):
             finance_status = f"{overdue_invoices} overdue invoices, {pending_expenses} pending expenses, {pending_payables} pending payables"
@@ -200,38 +222,20 @@ class FinanceDashboardView(LoginRequiredMixin, TemplateView):
         context['finance_status'] = finance_status
         
         # Payment Methods Distribution
-        payment_methods_data = []
         payment_methods_labels = ['Bank Transfer', 'Credit Card', 'Cash', 'Check', 'Online']
-        
-        # Count payments by method
-        bank_transfer_count = Payment.objects.filter(payment_method='BANK_TRANSFER').count()
-        credit_card_count = Payment.objects.filter(payment_method='CREDIT_CARD').count()
-        cash_count = Payment.objects.filter(payment_method='CASH').count()
-        check_count = Payment.objects.filter(payment_method='CHECK').count()
-        online_count = Payment.objects.filter(payment_method='ONLINE_PAYMENT').count()
-        
-        payment_methods_data = [bank_transfer_count, credit_card_count, cash_count, check_count, online_count]
+        payment_methods_data = [
+            rollup_count('PAYMENT', dimension=method)
+            for method in ['BANK_TRANSFER', 'CREDIT_CARD', 'CASH', 'CHECK', 'ONLINE_PAYMENT']
+        ]
         
         # Cash Flow Trends (Last 6 months)
         cash_flow_data = []
         cash_flow_labels = []
         
-        for i in range(6):
-            month_offset = 5 - i  # Start from 5 months ago
-            target_date = timezone.now() - timedelta(days=30 * month_offset)
-            target_month = target_date.month
-            target_year = target_date.year
-            
+        for target_date in cash_flow_months:
             # Calculate net cash flow for this month
-            month_payments = Payment.objects.filter(
-                payment_date__year=target_year,
-                payment_date__month=target_month
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            month_expenses = Expense.objects.filter(
-                expense_date__year=target_year,
-                expense_date__month=target_month
-            ).aggregate(total=Sum('total_amount'))['total'] or 0
+            month_payments = monthly_amount('PAYMENT', target_date.year, target_date.month)
+            month_expenses = monthly_amount('EXPENSE', target_date.year, target_date.month)
             
             net_cash_flow = month_payments - month_expenses
             cash_flow_data.append(net_cash_flow)
@@ -371,6 +375,188 @@ class PaymentCreateView(LoginRequiredMixin, CreateView):
         messages.success(self.request, 'Payment recorded successfully.')
         return super().form_valid(form)
 
+class PaymentAllocationView(LoginRequiredMixin, View):
+    """Apply one client receipt across many open invoices"""
+    template_name = 'finance_management/payment_allocation.html'
+    
+    def get(self, request):
+        form = PaymentAllocationForm(initial={'client': request.GET.get('client')})
+        return render(request, self.template_name, {'form': form})
+    
+    def post(self, request):
+        form = PaymentAllocationForm(request.POST)
+        if not form.is_valid():
+            messages.error(request, 'Please correct the errors below.')
+            return render(request, self.template_name, {'form': form})
+        
+        data = form.cleaned_data
+        invoice_ids = None
+        if data['invoices']:
+            invoice_ids = [invoice.pk for invoice in sorted(data['invoices'], key=lambda invoice: (invoice.due_date, invoice.pk))]
+        
+        try:
+            result = PaymentAllocationService.allocate(
+                data['client'],
+                data['amount'],
+                request.user,
+                payment_date=data['payment_date'],
+                payment_method=data['payment_method'],
+                reference=data['reference_number'],
+                invoice_ids=invoice_ids,
+                deposit_account=data['deposit_account'],
+                notes=data['notes'],
+            )
+        except ValueError as e:
+            messages.error(request, str(e))
+            return render(request, self.template_name, {'form': form})
+        
+        message = (
+            f"Applied {result['applied']:,.2f} across {len(result['payments'])} invoices "
+            f"({result['paid_invoices']} fully paid), journal entry {result['journal_entry'].entry_number}."
+        )
+        if result['unapplied']:
+            message += f" {result['unapplied']:,.2f} was left unapplied."
+        messages.success(request, message)
+        return render(request, self.template_name, {'form': PaymentAllocationForm(), 'result': result})
+
+class TimeBillingView(LoginRequiredMixin, View):
+    """Preview and run the billing of approved time entries for a period"""
+    template_name = 'finance_management/time_billing.html'
+    
+    def get(self, request):
+        today = timezone.now().date()
+        last_month_end = today.replace(day=1) - timedelta(days=1)
+        form = TimeBillingForm(initial={
+            'date_from': last_month_end.replace(day=1),
+            'date_to': last_month_end,
+            'due_days': TimeBillingService.DEFAULT_DUE_DAYS,
+        })
+        return render(request, self.template_name, {'form': form})
+    
+    def post(self, request):
+        form = TimeBillingForm(request.POST)
+        if not form.is_valid():
+            messages.error(request, 'Please correct the errors below.')
+            return render(request, self.template_name, {'form': form})
+        
+        data = form.cleaned_data
+        dry_run = request.POST.get('action') != 'run'
+        try:
+            result = TimeBillingService.run(
+                data['date_from'],
+                data['date_to'],
+                request.user,
+                issue_date=data['issue_date'],
+                due_days=data['due_days'],
+                dry_run=dry_run,
+            )
+        except ValueError as e:
+            messages.error(request, str(e))
+            return render(request, self.template_name, {'form': form})
+        
+        if result['unresolved']:
+            messages.warning(
+                request,
+                f"{sum(result['unresolved'].values())} time entries do not match a client or case and were not billed."
+            )
+        if not dry_run:
+            messages.success(
+                request,
+                f"Created {len(result['invoices'])} invoices for {result['total']:,.2f} "
+                f"({result['entries']} time entries), journal entry {result['journal_entry'].entry_number}."
+            )
+        return render(request, self.template_name, {'form': form, 'result': result, 'dry_run': dry_run})
+
+class BankReconciliationView(LoginRequiredMixin, View):
+    """Import bank statements and work through the reconciliation review queue"""
+    template_name = 'finance_management/bank_reconciliation.html'
+    
+    def get_account(self, request):
+        accounts = Account.objects.filter(is_bank_account=True).order_by('code')
+        account_id = request.POST.get('account') or request.GET.get('account')
+        account = accounts.filter(pk=account_id).first() if account_id and account_id.isdigit() else None
+        return accounts, account or accounts.first()
+    
+    def get_context(self, request, form=None):
+        accounts, account = self.get_account(request)
+        status = request.GET.get('status', '')
+        context = {
+            'form': form or BankStatementImportForm(initial={'account': account}),
+            'accounts': accounts,
+            'account': account,
+            'status': status,
+            'status_choices': BankStatementLine.STATUS_CHOICES,
+        }
+        if account:
+            lines = BankStatementLine.objects.filter(account=account).select_related(
+                'matched_line__journal_entry', 'matched_payment__invoice', 'matched_by'
+            )
+            counts = dict(lines.order_by().values_list('status').annotate(count=Count('id')))
+            context['status_counts'] = [
+                (value, label, counts.get(value, 0)) for value, label in BankStatementLine.STATUS_CHOICES
+            ]
+            lines = lines.filter(status=status) if status else lines.filter(status__in=BankReconciliationService.QUEUE_STATUSES)
+            context['lines'] = Paginator(lines.order_by('date', 'id'), 50).get_page(request.GET.get('page'))
+        return context
+    
+    def get(self, request):
+        return render(request, self.template_name, self.get_context(request))
+    
+    def post(self, request):
+        action = request.POST.get('action')
+        _, account = self.get_account(request)
+        
+        if action == 'import':
+            form = BankStatementImportForm(request.POST, request.FILES)
+            if not form.is_valid():
+                messages.error(request, 'Please correct the errors below.')
+                return render(request, self.template_name, self.get_context(request, form))
+            account = form.cleaned_data['account']
+            try:
+                result = BankReconciliationService.import_statement(
+                    form.cleaned_data['file'],
+                    account,
+                    request.user,
+                    tolerance_days=form.cleaned_data['tolerance_days'],
+                )
+            except BankStatementImportError as e:
+                messages.error(request, str(e))
+                return render(request, self.template_name, self.get_context(request, form))
+            messages.success(
+                request,
+                f"Imported {result['imported']} lines ({result['duplicates']} already imported): "
+                f"{result['matched']} matched, {result['review']} to review, {result['unmatched']} unmatched."
+            )
+        elif action == 'match' and account:
+            tolerance_days = request.POST.get('tolerance_days', '')
+            result = BankReconciliationService.match(
+                account,
+                int(tolerance_days) if tolerance_days.isdigit() else BankReconciliationService.DEFAULT_TOLERANCE_DAYS
+            )
+            messages.success(
+                request,
+                f"{result['matched']} matched, {result['review']} to review, {result['unmatched']} unmatched."
+            )
+        elif action in ('confirm', 'ignore', 'reopen'):
+            line = get_object_or_404(BankStatementLine, pk=request.POST.get('line'))
+            account = line.account
+            try:
+                if action == 'confirm':
+                    BankReconciliationService.confirm(
+                        line.pk,
+                        request.user,
+                        journal_line_id=request.POST.get('journal_line') or None,
+                        payment_id=request.POST.get('payment') or None,
+                    )
+                else:
+                    status = 'IGNORED' if action == 'ignore' else 'UNMATCHED'
+                    BankReconciliationService.set_status(line.pk, status, request.user)
+            except ValueError as e:
+                messages.error(request, str(e))
+        
+        url = reverse('finance_management:bank_reconciliation')
+        return redirect(f'{url}?account={account.pk}' if account else url)
+
 class ExpenseListView(LoginRequiredMixin, TemplateView):
     template_name = 'finance_management/expense_list.html'
     
@@ -470,34 +656,8 @@ class ChartOfAccountsView(LoginRequiredMixin, TemplateView):
         if type_filter:
             accounts = accounts.filter(account_type=type_filter)
         
-        # Calculate actual balances from journal entries
-        for account in accounts:
-            # Calculate balance from journal entry lines
-            debit_total = JournalEntryLine.objects.filter(
-                account=account,
-                journal_entry__status='POSTED'
-            ).aggregate(total=Sum('debit'))['total'] or Decimal('0.00')
-            
-            credit_total = JournalEntryLine.objects.filter(
-                account=account,
-                journal_entry__status='POSTED'
-            ).aggregate(total=Sum('credit'))['total'] or Decimal('0.00')
-            
-            # Calculate net balance from journal entries
-            if account.account_type in ['ASSET', 'EXPENSE']:
-                # Debit accounts: positive balance = debit > credit
-                account.calculated_balance = debit_total - credit_total
-            else:
-                # Credit accounts: positive balance = credit > debit
-                account.calculated_balance = credit_total - debit_total
-            
-            # Only update balance if there are journal entries
-            if debit_total > 0 or credit_total > 0:
-                account.balance = account.calculated_balance
-                account.save()
-        
-        # Pagination
-        paginator = Paginator(accounts, 20)  # Show 20 accounts per page
+        # Pagination (over ids; the page's accounts are loaded below)
+        paginator = Paginator(accounts.values_list('pk', flat=True), 20)  # Show 20 accounts per page
         page = self.request.GET.get('page')
         
         try:
@@ -509,6 +669,25 @@ class ChartOfAccountsView(LoginRequiredMixin, TemplateView):
             # If page is out of range, deliver last page of results
             accounts_page = paginator.page(paginator.num_pages)
         
+        # Ledger totals for the accounts on this page only, in one query
+        posted = Q(journal_lines__journal_entry__status__in=JournalEntry.LEDGER_STATUSES)
+        accounts_page.object_list = list(
+            Account.objects.filter(pk__in=list(accounts_page.object_list)).annotate(
+                debit_total=Sum('journal_lines__debit', filter=posted),
+                credit_total=Sum('journal_lines__credit', filter=posted)
+            ).order_by('code')
+        )
+        
+        tree = ChartOfAccountsService.get_tree()
+        for account in accounts_page.object_list:
+            net = Decimal(account.opening_balance) + (account.debit_total or Decimal('0.00')) - (account.credit_total or Decimal('0.00'))
+            account.calculated_balance = -net if account.normal_balance == 'CREDIT' else net
+            
+            # Balance including all sub-accounts
+            node = tree['nodes'].get(account.pk)
+            account.rollup_balance = node['rollup_balance'] if node else account.calculated_balance
+            account.sub_account_count = len(node['children']) if node else 0
+        
         # Initialize search form
         initial = {}
         if search_param:
@@ -519,6 +698,7 @@ class ChartOfAccountsView(LoginRequiredMixin, TemplateView):
         context['search_form'] = search_form
         context['paginator'] = paginator
         context['page_obj'] = accounts_page
+        context['account_tree'] = tree
         
         return context
 
@@ -610,29 +790,105 @@ class AccountDetailAPIView(LoginRequiredMixin, View):
             return JsonResponse({'error': 'Account not found'}, status=404)
 
 class AccountTransactionsAPIView(LoginRequiredMixin, View):
-    """API view to return account transactions as JSON"""
+    """API view to return account transactions as JSON, one keyset page at a time"""
+    
+    page_size = 500
+    max_page_size = 5000
     
     def get(self, request, code):
+        account = get_object_or_404(Account, code=code)
+        
         try:
-            account = get_object_or_404(Account, code=code)
-            transactions = JournalEntryLine.objects.filter(
-                account=account,
-                journal_entry__status='POSTED'
-            ).select_related('journal_entry').order_by('journal_entry__date')
-
-            data = []
-            for transaction in transactions:
-                data.append({
-                    'date': transaction.journal_entry.date.strftime('%Y-%m-%d'),
-                    'reference': transaction.journal_entry.entry_number,
-                    'description': transaction.description or transaction.journal_entry.description,
-                    'debit': str(transaction.debit),
-                    'credit': str(transaction.credit),
-                    'status': transaction.journal_entry.get_status_display(),
-                })
-            return JsonResponse(data, safe=False)
-        except Account.DoesNotExist:
-            return JsonResponse({'error': 'Account not found'}, status=404)
+            after = GeneralLedgerService.parse_cursor(request.GET.get('after'))
+            limit = max(1, min(int(request.GET.get('limit', self.page_size)), self.max_page_size))
+        except ValueError:
+            return JsonResponse({'error': 'after must be <YYYY-MM-DD>,<id> and limit a number'}, status=400)
+        
+        # Fetch one extra row to know whether another page follows
+        rows = list(GeneralLedgerService.iter_rows(account, after, limit=limit + 1))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = GeneralLedgerService.make_cursor(rows[-1])
+        
+        data = []
+        for row in rows:
+            data.append({
+                'id': row['id'],
+                'date': row['date'].strftime('%Y-%m-%d'),
+                'reference': row['entry_number'],
+                'description': row['description'],
+                'debit': str(row['debit']),
+                'credit': str(row['credit']),
+                'running_balance': str(row['running_balance']),
+                'status': 'Posted',
+            })
+        return JsonResponse({'results': data, 'next': next_cursor})
+
+class Echo:
+    """File-like object that hands back what is written, for streaming csv.writer output"""
+    
+    def write(self, value):
+        return value
+
+class AccountLedgerExportView(LoginRequiredMixin, View):
+    """Stream the posted general ledger of an account as NDJSON, CSV or XLSX"""
+    
+    def get(self, request, code):
+        account = get_object_or_404(Account, code=code)
+        export_format = request.GET.get('format', 'csv')
+        
+        try:
+            after = GeneralLedgerService.parse_cursor(request.GET.get('after'))
+        except ValueError:
+            return JsonResponse({'error': 'after must be <YYYY-MM-DD>,<id>'}, status=400)
+        
+        rows = GeneralLedgerService.iter_rows(account, after)
+        filename = f'general_ledger_{account.code}_{timezone.now().strftime("%Y%m%d")}'
+        
+        if export_format == 'ndjson':
+            response = StreamingHttpResponse(
+                (json.dumps(self.serialize(row), cls=DjangoJSONEncoder) + '\n' for row in rows),
+                content_type='application/x-ndjson'
+            )
+        elif export_format == 'csv':
+            writer = csv.writer(Echo())
+            header = [writer.writerow(GeneralLedgerService.FIELDS)]
+            response = StreamingHttpResponse(
+                chain(header, (writer.writerow([row[field] for field in GeneralLedgerService.FIELDS]) for row in rows)),
+                content_type='text/csv'
+            )
+        elif export_format == 'xlsx':
+            return self.export_xlsx(account, rows, filename)
+        else:
+            return JsonResponse({'error': 'format must be ndjson, csv or xlsx'}, status=400)
+        
+        response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+        return response
+    
+    def serialize(self, row):
+        return {field: row[field] for field in GeneralLedgerService.FIELDS}
+    
+    def export_xlsx(self, account, rows, filename):
+        """Write rows through openpyxl's write-only mode into a temporary file and stream it"""
+        from openpyxl import Workbook
+        
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(account.code[:31])
+        ws.append([f'{account.code} - {account.name}'])
+        ws.append(GeneralLedgerService.FIELDS)
+        for row in rows:
+            ws.append([row[field] for field in GeneralLedgerService.FIELDS])
+        
+        output = tempfile.TemporaryFile()
+        wb.save(output)
+        output.seek(0)
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=f'{filename}.xlsx',
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
 
 class JournalEntryListView(LoginRequiredMixin, TemplateView):
     template_name = 'finance_management/journal_entries.html'
@@ -1249,23 +1505,11 @@ class ReportListView(LoginRequiredMixin, ListView):
             report = form.save(commit=False)
             report.generated_by = request.user
             
-            # Generate report data immediately
-            try:
-                report_data = self.generate_report_data(
-                    report.report_type,
-                    report.start_date,
-                    report.end_date,
-                    {}
-                )
-                report.status = 'completed'
-                report.data = report_data
-            except Exception as e:
-                report.status = 'failed'
-                report.error_message = str(e)
-            
+            # Queue the report; run_report_worker generates the file
+            report.status = 'pending'
             report.save()
             
-            messages.success(request, 'Report generated successfully!')
+            messages.success(request, 'Report queued for generation.')
             
             # Check if this is an HTMX request
             if request.headers.get('HX-Request'):
@@ -1278,13 +1522,6 @@ class ReportListView(LoginRequiredMixin, ListView):
             messages.error(request, 'Please correct the errors in the form.')
             return self.get(request, *args, **kwargs)
     
-    def generate_report_data(self, report_type, start_date, end_date, filters):
-        """Generate report data based on report type"""
-        # Import here to avoid circular imports
-        from .views import ReportCreateView
-        report_creator = ReportCreateView()
-        return report_creator.generate_report_data(report_type, start_date, end_date, filters)
-    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
@@ -1333,7 +1570,7 @@ class ReportCreateView(LoginRequiredMixin, View):
                     filters['category'] = form.cleaned_data['expense_category']
             
             report.filters = filters
-            report.save()
+            report.save()  # Picked up by run_report_worker
             
             messages.success(request, 'Report generation request submitted successfully.')
             
@@ -1357,534 +1594,6 @@ class ReportCreateView(LoginRequiredMixin, View):
             messages.error(request, 'Please correct the errors below.')
             return redirect('finance_management:reports')
 
-    def generate_report_data(self, report_type, start_date, end_date, filters=None):
-        """Generate report data based on report type"""
-        from django.db.models import Sum, Count, Avg
-        from decimal import Decimal
-        
-        if report_type == 'cash_flow':
-            return self.generate_cash_flow_report(start_date, end_date)
-        elif report_type == 'profit_loss':
-            return self.generate_profit_loss_report(start_date, end_date)
-        elif report_type == 'balance_sheet':
-            return self.generate_balance_sheet_report(start_date, end_date)
-        elif report_type == 'accounts_receivable':
-            return self.generate_ar_aging_report(start_date, end_date)
-        elif report_type == 'accounts_payable':
-            return self.generate_ap_aging_report(start_date, end_date)
-        elif report_type == 'expense_analysis':
-            return self.generate_expense_analysis_report(start_date, end_date)
-        elif report_type == 'revenue_analysis':
-            return self.generate_revenue_analysis_report(start_date, end_date)
-        elif report_type == 'working_capital':
-            return self.generate_working_capital_report(start_date, end_date)
-        elif report_type == 'collection_performance':
-            return self.generate_collection_performance_report(start_date, end_date)
-        elif report_type == 'vendor_analysis':
-            return self.generate_vendor_analysis_report(start_date, end_date)
-        elif report_type == 'client_revenue':
-            return self.generate_client_revenue_report(start_date, end_date)
-        elif report_type == 'monthly_summary':
-            return self.generate_monthly_summary_report(start_date, end_date)
-        else:
-            return {'error': 'Unknown report type'}
-
-    def generate_cash_flow_report(self, start_date, end_date):
-        """Generate Cash Flow Report"""
-        # Operating Activities
-        payments_received = Payment.objects.filter(
-            payment_date__range=[start_date, end_date]
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        expenses_paid = Expense.objects.filter(
-            expense_date__range=[start_date, end_date],
-            status='PAID'
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-        
-        ap_payments = AccountsPayable.objects.filter(
-            status='PAID'
-        ).aggregate(total=Sum('amount_paid'))['total'] or 0
-        
-        net_operating_cash = payments_received - expenses_paid - ap_payments
-        
-        return {
-            'report_type': 'Cash Flow Report',
-            'period': f'{start_date} to {end_date}',
-            'operating_activities': {
-                'payments_received': float(payments_received),
-                'expenses_paid': float(expenses_paid),
-                'ap_payments': float(ap_payments),
-                'net_operating_cash': float(net_operating_cash)
-            },
-            'cash_position': {
-                'opening_balance': 0,  # Would need to track this
-                'net_change': float(net_operating_cash),
-                'closing_balance': float(net_operating_cash)
-            }
-        }
-
-    def generate_profit_loss_report(self, start_date, end_date):
-        """Generate Profit & Loss Statement"""
-        # Revenue
-        total_revenue = Payment.objects.filter(
-            payment_date__range=[start_date, end_date]
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Expenses
-        total_expenses = Expense.objects.filter(
-            expense_date__range=[start_date, end_date],
-            status__in=['APPROVED', 'PAID']
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-        
-        # Net Income
-        net_income = total_revenue - total_expenses
-        
-        # Expense breakdown by category
-        expense_by_category = Expense.objects.filter(
-            expense_date__range=[start_date, end_date],
-            status__in=['APPROVED', 'PAID']
-        ).values('expense_category__name').annotate(
-            total=Sum('total_amount')
-        ).order_by('-total')
-        
-        return {
-            'report_type': 'Profit & Loss Statement',
-            'period': f'{start_date} to {end_date}',
-            'revenue': {
-                'total_revenue': float(total_revenue)
-            },
-            'expenses': {
-                'total_expenses': float(total_expenses),
-                'by_category': [
-                    {
-                        'category': item['expense_category__name'] or 'Uncategorized',
-                        'amount': float(item['total'])
-                    } for item in expense_by_category
-                ]
-            },
-            'net_income': float(net_income),
-            'gross_margin': float((net_income / total_revenue * 100) if total_revenue > 0 else 0)
-        }
-
-    def generate_balance_sheet_report(self, start_date, end_date):
-        """Generate Balance Sheet"""
-        # Assets
-        cash_position = Payment.objects.aggregate(total=Sum('amount'))['total'] or 0
-        accounts_receivable = Invoice.objects.filter(
-            status__in=['SENT', 'OVERDUE']
-        ).aggregate(total=Sum('total'))['total'] or 0
-        
-        # Liabilities
-        accounts_payable = AccountsPayable.objects.filter(
-            status__in=['DRAFT', 'PENDING_APPROVAL', 'APPROVED', 'PARTIALLY_PAID']
-        ).aggregate(total=Sum('balance_due'))['total'] or 0
-        
-        # Equity (simplified)
-        total_assets = cash_position + accounts_receivable
-        total_liabilities = accounts_payable
-        total_equity = total_assets - total_liabilities
-        
-        return {
-            'report_type': 'Balance Sheet',
-            'as_of_date': end_date,
-            'assets': {
-                'cash_and_equivalents': float(cash_position),
-                'accounts_receivable': float(accounts_receivable),
-                'total_assets': float(total_assets)
-            },
-            'liabilities': {
-                'accounts_payable': float(accounts_payable),
-                'total_liabilities': float(total_liabilities)
-            },
-            'equity': {
-                'total_equity': float(total_equity)
-            }
-        }
-
-    def generate_ar_aging_report(self, start_date, end_date):
-        """Generate Accounts Receivable Aging Report"""
-        from datetime import date, timedelta
-        
-        today = date.today()
-        
-        # Group invoices by aging buckets
-        current = Invoice.objects.filter(
-            status__in=['SENT', 'OVERDUE'],
-            due_date__gte=today
-        ).aggregate(total=Sum('total'))['total'] or 0
-        
-        days_30 = Invoice.objects.filter(
-            status__in=['SENT', 'OVERDUE'],
-            due_date__lt=today,
-            due_date__gte=today - timedelta(days=30)
-        ).aggregate(total=Sum('total'))['total'] or 0
-        
-        days_60 = Invoice.objects.filter(
-            status__in=['SENT', 'OVERDUE'],
-            due_date__lt=today - timedelta(days=30),
-            due_date__gte=today - timedelta(days=60)
-        ).aggregate(total=Sum('total'))['total'] or 0
-        
-        days_90 = Invoice.objects.filter(
-            status__in=['SENT', 'OVERDUE'],
-            due_date__lt=today - timedelta(days=60),
-            due_date__gte=today - timedelta(days=90)
-        ).aggregate(total=Sum('total'))['total'] or 0
-        
-        over_90 = Invoice.objects.filter(
-            status__in=['SENT', 'OVERDUE'],
-            due_date__lt=today - timedelta(days=90)
-        ).aggregate(total=Sum('total'))['total'] or 0
-        
-        total_ar = current + days_30 + days_60 + days_90 + over_90
-        
-        return {
-            'report_type': 'Accounts Receivable Aging',
-            'as_of_date': today,
-            'aging_buckets': {
-                'current': float(current),
-                'days_30': float(days_30),
-                'days_60': float(days_60),
-                'days_90': float(days_90),
-                'over_90': float(over_90),
-                'total': float(total_ar)
-            },
-            'total_outstanding': float(total_ar)
-        }
-
-    def generate_ap_aging_report(self, start_date, end_date):
-        """Generate Accounts Payable Aging Report"""
-        from datetime import date, timedelta
-        
-        today = date.today()
-        
-        # Group payables by aging buckets
-        current = AccountsPayable.objects.filter(
-            status__in=['DRAFT', 'PENDING_APPROVAL', 'APPROVED', 'PARTIALLY_PAID'],
-            due_date__gte=today
-        ).aggregate(total=Sum('balance_due'))['total'] or 0
-        
-        days_30 = AccountsPayable.objects.filter(
-            status__in=['DRAFT', 'PENDING_APPROVAL', 'APPROVED', 'PARTIALLY_PAID'],
-            due_date__lt=today,
-            due_date__gte=today - timedelta(days=30)
-        ).aggregate(total=Sum('balance_due'))['total'] or 0
-        
-        days_60 = AccountsPayable.objects.filter(
-            status__in=['DRAFT', 'PENDING_APPROVAL', 'APPROVED', 'PARTIALLY_PAID'],
-            due_date__lt=today - timedelta(days=30),
-            due_date__gte=today - timedelta(days=60)
-        ).aggregate(total=Sum('balance_due'))['total'] or 0
-        
-        over_60 = AccountsPayable.objects.filter(
-            status__in=['DRAFT', 'PENDING_APPROVAL', 'APPROVED', 'PARTIALLY_PAID'],
-            due_date__lt=today - timedelta(days=60)
-        ).aggregate(total=Sum('balance_due'))['total'] or 0
-        
-        total_ap = current + days_30 + days_60 + over_60
-        
-        return {
-            'report_type': 'Accounts Payable Aging',
-            'as_of_date': today,
-            'aging_buckets': {
-                'current': float(current),
-                'days_30': float(days_30),
-                'days_60': float(days_60),
-                'over_60': float(over_60),
-                'total': float(total_ap)
-            },
-            'total_outstanding': float(total_ap)
-        }
-
-    def generate_expense_analysis_report(self, start_date, end_date):
-        """Generate Expense Analysis Report"""
-        # Total expenses
-        total_expenses = Expense.objects.filter(
-            expense_date__range=[start_date, end_date],
-            status__in=['APPROVED', 'PAID']
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-        
-        # Expenses by category
-        expenses_by_category = Expense.objects.filter(
-            expense_date__range=[start_date, end_date],
-            status__in=['APPROVED', 'PAID']
-        ).values('expense_category__name').annotate(
-            total=Sum('total_amount'),
-            count=Count('id')
-        ).order_by('-total')
-        
-        # Expenses by vendor
-        expenses_by_vendor = Expense.objects.filter(
-            expense_date__range=[start_date, end_date],
-            status__in=['APPROVED', 'PAID']
-        ).values('vendor').annotate(
-            total=Sum('total_amount'),
-            count=Count('id')
-        ).order_by('-total')[:10]
-        
-        return {
-            'report_type': 'Expense Analysis Report',
-            'period': f'{start_date} to {end_date}',
-            'summary': {
-                'total_expenses': float(total_expenses),
-                'total_transactions': Expense.objects.filter(
-                    expense_date__range=[start_date, end_date],
-                    status__in=['APPROVED', 'PAID']
-                ).count()
-            },
-            'by_category': [
-                {
-                    'category': item['expense_category__name'] or 'Uncategorized',
-                    'amount': float(item['total']),
-                    'count': item['count'],
-                    'percentage': float((item['total'] / total_expenses * 100) if total_expenses > 0 else 0)
-                } for item in expenses_by_category
-            ],
-            'by_vendor': [
-                {
-                    'vendor': item['vendor'],
-                    'amount': float(item['total']),
-                    'count': item['count']
-                } for item in expenses_by_vendor
-            ]
-        }
-
-    def generate_revenue_analysis_report(self, start_date, end_date):
-        """Generate Revenue Analysis Report"""
-        # Total revenue
-        total_revenue = Payment.objects.filter(
-            payment_date__range=[start_date, end_date]
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Revenue by client
-        revenue_by_client = Payment.objects.filter(
-            payment_date__range=[start_date, end_date]
-        ).values('invoice__client__name').annotate(
-            total=Sum('amount'),
-            count=Count('id')
-        ).order_by('-total')
-        
-        # Revenue by payment method
-        revenue_by_method = Payment.objects.filter(
-            payment_date__range=[start_date, end_date]
-        ).values('payment_method').annotate(
-            total=Sum('amount'),
-            count=Count('id')
-        ).order_by('-total')
-        
-        return {
-            'report_type': 'Revenue Analysis Report',
-            'period': f'{start_date} to {end_date}',
-            'summary': {
-                'total_revenue': float(total_revenue),
-                'total_payments': Payment.objects.filter(
-                    payment_date__range=[start_date, end_date]
-                ).count()
-            },
-            'by_client': [
-                {
-                    'client': item['invoice__client__name'] or 'Unknown Client',
-                    'amount': float(item['total']),
-                    'count': item['count'],
-                    'percentage': float((item['total'] / total_revenue * 100) if total_revenue > 0 else 0)
-                } for item in revenue_by_client
-            ],
-            'by_payment_method': [
-                {
-                    'method': item['payment_method'],
-                    'amount': float(item['total']),
-                    'count': item['count']
-                } for item in revenue_by_method
-            ]
-        }
-
-    def generate_working_capital_report(self, start_date, end_date):
-        """Generate Working Capital Report"""
-        # Current Assets
-        cash_position = Payment.objects.aggregate(total=Sum('amount'))['total'] or 0
-        accounts_receivable = Invoice.objects.filter(
-            status__in=['SENT', 'OVERDUE']
-        ).aggregate(total=Sum('total'))['total'] or 0
-        
-        # Current Liabilities
-        accounts_payable = AccountsPayable.objects.filter(
-            status__in=['DRAFT', 'PENDING_APPROVAL', 'APPROVED', 'PARTIALLY_PAID']
-        ).aggregate(total=Sum('balance_due'))['total'] or 0
-        
-        # Working Capital
-        current_assets = cash_position + accounts_receivable
-        current_liabilities = accounts_payable
-        working_capital = current_assets - current_liabilities
-        
-        # Working Capital Ratio
-        working_capital_ratio = (current_assets / current_liabilities) if current_liabilities > 0 else 0
-        
-        return {
-            'report_type': 'Working Capital Report',
-            'as_of_date': end_date,
-            'current_assets': {
-                'cash_and_equivalents': float(cash_position),
-                'accounts_receivable': float(accounts_receivable),
-                'total_current_assets': float(current_assets)
-            },
-            'current_liabilities': {
-                'accounts_payable': float(accounts_payable),
-                'total_current_liabilities': float(current_liabilities)
-            },
-            'working_capital': {
-                'working_capital': float(working_capital),
-                'working_capital_ratio': float(working_capital_ratio)
-            }
-        }
-
-    def generate_collection_performance_report(self, start_date, end_date):
-        """Generate Collection Performance Report"""
-        # Collection metrics
-        total_invoices = Invoice.objects.count()
-        paid_invoices = Invoice.objects.filter(status='PAID').count()
-        overdue_invoices = Invoice.objects.filter(status='OVERDUE').count()
-        
-        # Collection rate
-        collection_rate = (paid_invoices / total_invoices * 100) if total_invoices > 0 else 0
-        
-        # Average payment time
-        paid_payments = Payment.objects.filter(payment_date__isnull=False)
-        if paid_payments.exists():
-            total_days = 0
-            payment_count = 0
-            for payment in paid_payments:
-                if payment.invoice and payment.invoice.issue_date:
-                    days_diff = (payment.payment_date - payment.invoice.issue_date).days
-                    if days_diff >= 0:
-                        total_days += days_diff
-                        payment_count += 1
-            
-            avg_payment_time = total_days / payment_count if payment_count > 0 else 0
-        else:
-            avg_payment_time = 0
-        
-        # Outstanding amounts
-        outstanding_amount = Invoice.objects.filter(
-            status__in=['SENT', 'OVERDUE']
-        ).aggregate(total=Sum('total'))['total'] or 0
-        
-        return {
-            'report_type': 'Collection Performance Report',
-            'period': f'{start_date} to {end_date}',
-            'collection_metrics': {
-                'total_invoices': total_invoices,
-                'paid_invoices': paid_invoices,
-                'overdue_invoices': overdue_invoices,
-                'collection_rate': float(collection_rate),
-                'avg_payment_time': float(avg_payment_time),
-                'outstanding_amount': float(outstanding_amount)
-            }
-        }
-
-    def generate_vendor_analysis_report(self, start_date, end_date):
-        """Generate Vendor Analysis Report"""
-        # Vendor spending
-        vendor_spending = AccountsPayable.objects.filter(
-            invoice_date__range=[start_date, end_date]
-        ).values('vendor').annotate(
-            total_amount=Sum('total_amount'),
-            total_paid=Sum('amount_paid'),
-            count=Count('id')
-        ).order_by('-total_amount')
-        
-        # Vendor payment performance
-        vendor_performance = []
-        for vendor in vendor_spending:
-            vendor_name = vendor['vendor']
-            total_amount = vendor['total_amount']
-            total_paid = vendor['total_paid']
-            payment_rate = (total_paid / total_amount * 100) if total_amount > 0 else 0
-            
-            vendor_performance.append({
-                'vendor': vendor_name,
-                'total_amount': float(total_amount),
-                'total_paid': float(total_paid),
-                'outstanding': float(total_amount - total_paid),
-                'payment_rate': float(payment_rate),
-                'transaction_count': vendor['count']
-            })
-        
-        return {
-            'report_type': 'Vendor Analysis Report',
-            'period': f'{start_date} to {end_date}',
-            'vendor_performance': vendor_performance
-        }
-
-    def generate_client_revenue_report(self, start_date, end_date):
-        """Generate Client Revenue Report"""
-        # Client revenue
-        client_revenue = Payment.objects.filter(
-            payment_date__range=[start_date, end_date]
-        ).values('invoice__client__name').annotate(
-            total_revenue=Sum('amount'),
-            payment_count=Count('id')
-        ).order_by('-total_revenue')
-        
-        # Client outstanding amounts
-        client_outstanding = Invoice.objects.filter(
-            status__in=['SENT', 'OVERDUE']
-        ).values('client__name').annotate(
-            outstanding_amount=Sum('total'),
-            invoice_count=Count('id')
-        ).order_by('-outstanding_amount')
-        
-        return {
-            'report_type': 'Client Revenue Report',
-            'period': f'{start_date} to {end_date}',
-            'client_revenue': [
-                {
-                    'client': item['invoice__client__name'] or 'Unknown Client',
-                    'revenue': float(item['total_revenue']),
-                    'payment_count': item['payment_count']
-                } for item in client_revenue
-            ],
-            'client_outstanding': [
-                {
-                    'client': item['client__name'] or 'Unknown Client',
-                    'outstanding': float(item['outstanding_amount']),
-                    'invoice_count': item['invoice_count']
-                } for item in client_outstanding
-            ]
-        }
-
-    def generate_monthly_summary_report(self, start_date, end_date):
-        """Generate Monthly Financial Summary"""
-        # Monthly revenue
-        monthly_revenue = Payment.objects.filter(
-            payment_date__range=[start_date, end_date]
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Monthly expenses
-        monthly_expenses = Expense.objects.filter(
-            expense_date__range=[start_date, end_date],
-            status__in=['APPROVED', 'PAID']
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-        
-        # Net income
-        net_income = monthly_revenue - monthly_expenses
-        
-        # Key metrics
-        collection_rate = 0
-        if Invoice.objects.count() > 0:
-            collection_rate = (Invoice.objects.filter(status='PAID').count() / Invoice.objects.count()) * 100
-        
-        return {
-            'report_type': 'Monthly Financial Summary',
-            'period': f'{start_date} to {end_date}',
-            'summary': {
-                'total_revenue': float(monthly_revenue),
-                'total_expenses': float(monthly_expenses),
-                'net_income': float(net_income),
-                'collection_rate': float(collection_rate),
-                'profit_margin': float((net_income / monthly_revenue * 100) if monthly_revenue > 0 else 0)
-            }
-        }
-
 class ReportDetailView(LoginRequiredMixin, DetailView):
     model = Report
     template_name = 'finance_management/report_detail.html'
@@ -1895,25 +1604,10 @@ class ReportDetailView(LoginRequiredMixin, DetailView):
         return context
 
 class ReportPreviewView(LoginRequiredMixin, DetailView):
+    """Shows the preview rendered by run_report_worker, or its status until it is ready"""
     model = Report
     template_name = 'finance_management/report_preview.html'
     context_object_name = 'report'
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        report = self.get_object()
-        
-        # Generate report data using the ReportCreateView methods
-        report_creator = ReportCreateView()
-        report_data = report_creator.generate_report_data(
-            report.report_type, 
-            report.start_date, 
-            report.end_date, 
-            report.filters
-        )
-        
-        context['report_data'] = report_data
-        return context
 
 class ReportDetailAPIView(LoginRequiredMixin, View):
     """API view to return report details as JSON for modal population"""
@@ -1934,45 +1628,42 @@ class ReportDetailAPIView(LoginRequiredMixin, View):
                 'created_at': report.created_at.strftime('%Y-%m-%d %H:%M'),
                 'updated_at': report.updated_at.strftime('%Y-%m-%d %H:%M'),
                 'file_path': report.file_path,
+                'error_message': report.error_message,
             }
             return JsonResponse(data)
         except Report.DoesNotExist:
             return JsonResponse({'error': 'Report not found'}, status=404)
 
 class ReportDownloadView(LoginRequiredMixin, View):
-    """View to handle report downloads"""
+    """View to stream generated report files"""
+    
+    CONTENT_TYPES = {
+        'pdf': 'application/pdf',
+        'excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'csv': 'text/csv',
+    }
     
     def get(self, request, pk):
-        try:
-            report = get_object_or_404(Report, pk=pk)
-            
-            # Handle different report statuses
-            if report.status == 'failed':
-                messages.error(request, 'Report generation failed. Please try generating the report again.')
-                return JsonResponse({'error': 'Report generation failed'}, status=400)
-            elif report.status == 'pending':
-                # Update status to processing and simulate report generation
-                report.status = 'processing'
-                report.save()
-                messages.info(request, f'Report "{report.name}" is being generated. Please wait a moment and try again.')
-                return JsonResponse({'info': 'Report is being generated'}, status=202)
-            elif report.status == 'processing':
-                # Simulate completion for demo purposes
-                report.status = 'completed'
-                report.file_path = f'reports/{report.name.replace(" ", "_").lower()}_{report.pk}.pdf'
-                report.save()
-                messages.success(request, f'Report "{report.name}" has been generated and download started.')
-                return JsonResponse({'success': True, 'message': 'Report generated and download started'})
-            elif report.status == 'completed':
-                # Report is ready for download
-                messages.success(request, f'Report "{report.name}" download started.')
-                return JsonResponse({'success': True, 'message': 'Download started'})
-            else:
-                messages.error(request, 'Report status is unknown.')
-                return JsonResponse({'error': 'Unknown report status'}, status=400)
-            
-        except Report.DoesNotExist:
-            return JsonResponse({'error': 'Report not found'}, status=404)
+        report = get_object_or_404(Report, pk=pk)
+        
+        # Handle different report statuses
+        if report.status == 'failed':
+            return JsonResponse({'error': 'Report generation failed', 'detail': report.error_message}, status=400)
+        elif report.status in ('pending', 'processing'):
+            return JsonResponse({'info': f'Report "{report.name}" is being generated. Please try again shortly.'}, status=202)
+        elif report.status != 'completed':
+            return JsonResponse({'error': 'Unknown report status'}, status=400)
+        
+        path = report.absolute_file_path
+        if not path or not os.path.exists(path):
+            return JsonResponse({'error': 'Report file not found'}, status=404)
+        
+        return FileResponse(
+            open(path, 'rb'),
+            as_attachment=True,
+            filename=os.path.basename(path),
+            content_type=self.CONTENT_TYPES.get(report.format, 'application/octet-stream')
+        )
 
 class AccountDeleteView(LoginRequiredMixin, View):
     """View to handle account deletion"""
@@ -2182,9 +1873,9 @@ class AccountingPeriodDetailView(LoginRequiredMixin, DetailView):
         context['account_balances'] = period.account_balances.all().order_by('account__code')
         
         # Calculate period summary
-        total_debits = period.journal_entries.filter(status='POSTED').aggregate(
+        total_debits = period.journal_entries.filter(status__in=JournalEntry.LEDGER_STATUSES).aggregate(
             total=Sum('total_debit'))['total'] or Decimal('0.00')
-        total_credits = period.journal_entries.filter(status='POSTED').aggregate(
+        total_credits = period.journal_entries.filter(status__in=JournalEntry.LEDGER_STATUSES).aggregate(
             total=Sum('total_credit'))['total'] or Decimal('0.00')
         
         context['total_debits'] = total_debits
@@ -2208,6 +1899,13 @@ class PeriodClosingView(LoginRequiredMixin, View):
             closing_notes = form.cleaned_data['closing_notes']
             
             try:
+                if form.cleaned_data.get('dry_run'):
+                    preview = period.close_period(request.user, closing_notes, dry_run=True)
+                    periods = AccountingPeriod.objects.filter(status='OPEN')
+                    # Submitting the form again closes the previewed period
+                    form = PeriodClosingForm(initial={'period': period, 'closing_notes': closing_notes})
+                    return render(request, self.template_name, {'form': form, 'periods': periods, 'preview': preview})
+                
                 period.close_period(request.user, closing_notes)
                 messages.success(request, f'Period {period.name} closed successfully.')
                 return redirect('finance_management:period_detail', pk=period.pk)
@@ -2370,6 +2068,86 @@ class JournalEntryPostView(LoginRequiredMixin, View):
         
         return redirect('finance_management:enhanced_journal_entry_detail', pk=pk)
 
+class JournalEntryBulkPostAPIView(LoginRequiredMixin, View):
+    """API view to post a batch of selected draft journal entries in one pass"""
+    
+    def post(self, request):
+        if request.content_type == 'application/json':
+            try:
+                entry_ids = json.loads(request.body).get('entry_ids', [])
+            except (ValueError, AttributeError):
+                return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+        else:
+            entry_ids = request.POST.getlist('entry_ids')
+        
+        try:
+            entry_ids = [int(entry_id) for entry_id in entry_ids]
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'entry_ids must be a list of journal entry IDs'}, status=400)
+        
+        if not entry_ids:
+            return JsonResponse({'error': 'No journal entries selected'}, status=400)
+        
+        posted, skipped = JournalEntry.post_entries(entry_ids, request.user)
+        
+        return JsonResponse({
+            'posted': posted,
+            'posted_count': len(posted),
+            'skipped': skipped,
+            'skipped_count': len(skipped),
+        })
+
+class JournalEntryImportView(LoginRequiredMixin, View):
+    """Bulk import journal entries from an uploaded CSV/XLSX file"""
+    template_name = 'finance_management/journal_entry_import.html'
+    
+    def get(self, request):
+        return render(request, self.template_name, {'form': JournalEntryImportForm()})
+    
+    def post(self, request):
+        form = JournalEntryImportForm(request.POST, request.FILES)
+        if not form.is_valid():
+            messages.error(request, 'Please correct the errors below.')
+            return render(request, self.template_name, {'form': form})
+        
+        try:
+            result = JournalEntryImportService.run(
+                form.cleaned_data['file'],
+                request.user,
+                post=form.cleaned_data['post_entries'],
+                dry_run=form.cleaned_data['dry_run'],
+            )
+        except JournalEntryImportError as e:
+            messages.error(request, str(e))
+            return render(request, self.template_name, {'form': form})
+        
+        if result['errors']:
+            messages.error(request, f"{len(result['errors'])} validation errors, nothing was imported.")
+            return render(request, self.template_name, {'form': form, 'result': result})
+        
+        if form.cleaned_data['dry_run']:
+            messages.success(request, f"File is valid: {result['entries']} entries, {result['lines']} lines.")
+            return render(request, self.template_name, {'form': form, 'result': result})
+        
+        messages.success(
+            request,
+            f"Imported {result['entries']} journal entries ({result['lines']} lines, {result['posted']} posted)."
+        )
+        return redirect('finance_management:journal_entries')
+
+@method_decorator(staff_member_required, name='dispatch')
+class LedgerVerificationAPIView(View):
+    """Staff endpoint: GET reports ledger drift, POST with repair=1 also fixes it"""
+    
+    def get(self, request):
+        return JsonResponse(LedgerVerificationService.verify())
+    
+    def post(self, request):
+        report = LedgerVerificationService.verify()
+        if request.POST.get('repair') in ('1', 'true', 'on') and not report['ok']:
+            report['repaired'] = LedgerVerificationService.repair(report)
+        return JsonResponse(report)
+
 class JournalEntryReverseView(LoginRequiredMixin, View):
     def post(self, request, pk):
         journal_entry = get_object_or_404(JournalEntry, pk=pk)
@@ -2398,40 +2176,14 @@ class TrialBalanceView(LoginRequiredMixin, View):
             period = form.cleaned_data['period']
             as_of_date = form.cleaned_data['as_of_date']
             
-            # Get all active accounts with balances
-            accounts = Account.objects.filter(status='ACTIVE').order_by('code')
-            trial_balance_data = []
-            
-            total_debits = Decimal('0.00')
-            total_credits = Decimal('0.00')
-            
-            for account in accounts:
-                balance = account.get_balance_as_of_date(as_of_date)
-                
-                if balance != 0:
-                    if account.normal_balance == 'DEBIT':
-                        debit = balance
-                        credit = Decimal('0.00')
-                    else:
-                        debit = Decimal('0.00')
-                        credit = abs(balance)
-                    
-                    trial_balance_data.append({
-                        'account': account,
-                        'debit': debit,
-                        'credit': credit,
-                        'balance': balance
-                    })
-                    
-                    total_debits += debit
-                    total_credits += credit
+            trial_balance = FinancialStatementService.trial_balance(as_of_date)
             
             context = {
                 'form': form,
-                'trial_balance_data': trial_balance_data,
-                'total_debits': total_debits,
-                'total_credits': total_credits,
-                'is_balanced': total_debits == total_credits,
+                'trial_balance_data': trial_balance['rows'],
+                'total_debits': trial_balance['total_debits'],
+                'total_credits': trial_balance['total_credits'],
+                'is_balanced': trial_balance['is_balanced'],
                 'period': period,
                 'as_of_date': as_of_date
             }
@@ -2453,37 +2205,17 @@ class BalanceSheetView(LoginRequiredMixin, View):
             period = form.cleaned_data['period']
             as_of_date = form.cleaned_data['as_of_date']
             
-            # Get assets
-            assets = Account.objects.filter(
-                account_type='ASSET', 
-                status='ACTIVE'
-            ).order_by('code')
-            
-            # Get liabilities
-            liabilities = Account.objects.filter(
-                account_type='LIABILITY', 
-                status='ACTIVE'
-            ).order_by('code')
-            
-            # Get equity
-            equity = Account.objects.filter(
-                account_type='EQUITY', 
-                status='ACTIVE'
-            ).order_by('code')
-            
-            # Calculate totals
-            total_assets = sum(acc.get_balance_as_of_date(as_of_date) for acc in assets)
-            total_liabilities = sum(acc.get_balance_as_of_date(as_of_date) for acc in liabilities)
-            total_equity = sum(acc.get_balance_as_of_date(as_of_date) for acc in equity)
+            balance_sheet = FinancialStatementService.balance_sheet(as_of_date)
             
             context = {
                 'form': form,
-                'assets': assets,
-                'liabilities': liabilities,
-                'equity': equity,
-                'total_assets': total_assets,
-                'total_liabilities': total_liabilities,
-                'total_equity': total_equity,
+                'assets': balance_sheet['assets'],
+                'liabilities': balance_sheet['liabilities'],
+                'equity': balance_sheet['equity'],
+                'total_assets': balance_sheet['total_assets'],
+                'total_liabilities': balance_sheet['total_liabilities'],
+                'total_equity': balance_sheet['total_equity'],
+                'by_category': balance_sheet['by_category'],
                 'period': period,
                 'as_of_date': as_of_date
             }
@@ -2507,7 +2239,7 @@ class IncomeStatementView(LoginRequiredMixin, View):
             data = self.generate_income_statement(period, as_of_date)
             
             if format_type == 'JSON':
-                return JsonResponse(data)
+                return JsonResponse(FinancialStatementService.serialize(data))
             else:
                 context = {
                     'form': form,
@@ -2522,50 +2254,195 @@ class IncomeStatementView(LoginRequiredMixin, View):
     
     def generate_income_statement(self, period, as_of_date):
         """Generate income statement data"""
-        # Get revenue accounts
-        revenue_accounts = Account.objects.filter(
-            account_type='REVENUE',
-            is_active=True
-        )
+        return FinancialStatementService.income_statement(as_of_date)
+
+class FinancialStatementAPIView(LoginRequiredMixin, View):
+    """API view to return a trial balance, balance sheet or income statement as JSON"""
+    
+    STATEMENTS = {
+        'trial-balance': FinancialStatementService.trial_balance,
+        'balance-sheet': FinancialStatementService.balance_sheet,
+        'income-statement': FinancialStatementService.income_statement,
+    }
+    
+    def get(self, request, statement_type):
+        builder = self.STATEMENTS.get(statement_type)
+        if builder is None:
+            return JsonResponse({'error': 'Unknown statement type'}, status=404)
         
-        # Get expense accounts
-        expense_accounts = Account.objects.filter(
-            account_type='EXPENSE',
-            is_active=True
-        )
+        as_of_date = request.GET.get('as_of_date')
+        try:
+            as_of_date = datetime.strptime(as_of_date, '%Y-%m-%d').date() if as_of_date else timezone.now().date()
+        except ValueError:
+            return JsonResponse({'error': 'as_of_date must be in YYYY-MM-DD format'}, status=400)
         
-        # Calculate balances
-        revenue_total = sum(
-            account.get_balance_as_of_date(as_of_date) 
-            for account in revenue_accounts
+        return JsonResponse(FinancialStatementService.serialize(builder(as_of_date)))
+
+
+class ComparativeStatementView(LoginRequiredMixin, View):
+    """Income statement or balance sheet with months, quarters or years side by side"""
+    template_name = 'finance_management/comparative_statement.html'
+    
+    def get(self, request):
+        today = timezone.now().date()
+        # Default to the last twelve months, current month included
+        year, month = divmod(today.year * 12 + today.month - 12, 12)
+        form = ComparativeStatementForm(request.GET or {
+            'statement_type': 'income-statement',
+            'granularity': 'month',
+            'date_from': f'{year:04d}-{month + 1:02d}-01',
+            'date_to': today.isoformat(),
+        })
+        context = {'form': form}
+        if form.is_valid():
+            context['statement'] = FinancialStatementService.comparative(
+                form.cleaned_data['statement_type'],
+                form.cleaned_data['date_from'],
+                form.cleaned_data['date_to'],
+                form.cleaned_data['granularity'],
+            )
+        return render(request, self.template_name, context)
+
+class ComparativeStatementAPIView(LoginRequiredMixin, View):
+    """API view to return a comparative statement as JSON"""
+    
+    def get(self, request, statement_type):
+        params = request.GET.copy()
+        params['statement_type'] = statement_type
+        params.setdefault('granularity', 'month')
+        form = ComparativeStatementForm(params)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        
+        statement = FinancialStatementService.comparative(
+            statement_type,
+            form.cleaned_data['date_from'],
+            form.cleaned_data['date_to'],
+            form.cleaned_data['granularity'],
         )
+        return JsonResponse(statement)
+
+class LedgerCubeAPIView(LoginRequiredMixin, View):
+    """
+    Pivot the posted ledger in memory, e.g.
+    ?rows=account_category&columns=month&account_type=EXPENSE&date_from=2025-01-01
+    Period closing lines are excluded unless include_closing=1 is passed.
+    """
+    
+    def get(self, request):
+        def listed(name):
+            return [value for value in request.GET.get(name, '').split(',') if value]
         
-        expense_total = sum(
-            account.get_balance_as_of_date(as_of_date) 
-            for account in expense_accounts
-        )
+        try:
+            filters = {
+                'account_types': listed('account_type'),
+                'account_categories': listed('account_category'),
+                'accounts': listed('account'),
+                'clients': [int(value) for value in listed('client')],
+                'include_closing': request.GET.get('include_closing') in ('1', 'true'),
+            }
+            for name in ('date_from', 'date_to'):
+                value = request.GET.get(name)
+                filters[name] = datetime.strptime(value, '%Y-%m-%d').date() if value else None
+            
+            started = time.perf_counter()
+            cube = LedgerCubeService.get_cube()
+            result = cube.pivot(
+                request.GET.get('rows', 'account'),
+                request.GET.get('columns') or None,
+                request.GET.get('measure', 'net'),
+                **filters
+            )
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        result['facts'] = len(cube)
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return JsonResponse(result)
+
+class GeneralLedgerReportView(LoginRequiredMixin, View):
+    """General ledger over a date range and account set with opening, running and closing balances"""
+    template_name = 'finance_management/general_ledger.html'
+    paginate_by = 100
+    
+    def get(self, request):
+        today = timezone.now().date()
+        form = GeneralLedgerReportForm(request.GET or {
+            'date_from': today.replace(month=1, day=1).isoformat(),
+            'date_to': today.isoformat(),
+        })
+        if not form.is_valid():
+            return render(request, self.template_name, {'form': form})
+        
+        date_from = form.cleaned_data['date_from']
+        date_to = form.cleaned_data['date_to']
+        accounts = form.cleaned_data['accounts']
+        if not accounts:
+            accounts = Account.objects.filter(status='ACTIVE')
+        else:
+            accounts = Account.objects.filter(pk__in=[account.pk for account in accounts])
         
-        net_income = revenue_total - expense_total
+        summaries = GeneralLedgerService.report_accounts(accounts, date_from, date_to)
+        lines = GeneralLedgerService.report_lines(accounts, date_from, date_to)
         
-        return {
-            'revenue_accounts': [
-                {
-                    'name': account.name,
-                    'balance': account.get_balance_as_of_date(as_of_date)
-                }
-                for account in revenue_accounts
-            ],
-            'expense_accounts': [
-                {
-                    'name': account.name,
-                    'balance': account.get_balance_as_of_date(as_of_date)
-                }
-                for account in expense_accounts
-            ],
-            'revenue_total': revenue_total,
-            'expense_total': expense_total,
-            'net_income': net_income,
-        }
+        export_format = request.GET.get('export')
+        if export_format:
+            return self.export(export_format, summaries, lines, date_from, date_to)
+        
+        paginator = Paginator(lines, self.paginate_by)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        openings = {summary['account_id']: summary['opening_balance'] for summary in summaries}
+        
+        query = request.GET.copy()
+        query.pop('page', None)
+        
+        return render(request, self.template_name, {
+            'form': form,
+            'summaries': summaries,
+            'rows': [GeneralLedgerService.report_row(line, openings) for line in page_obj.object_list],
+            'page_obj': page_obj,
+            'paginator': paginator,
+            'query_string': query.urlencode(),
+            'date_from': date_from,
+            'date_to': date_to,
+        })
+    
+    def export(self, export_format, summaries, lines, date_from, date_to):
+        rows = GeneralLedgerService.iter_report(summaries, lines)
+        fields = GeneralLedgerService.REPORT_FIELDS
+        filename = f'general_ledger_{date_from:%Y%m%d}_{date_to:%Y%m%d}'
+        
+        if export_format == 'csv':
+            writer = csv.writer(Echo())
+            header = [writer.writerow(fields)]
+            response = StreamingHttpResponse(
+                chain(header, (writer.writerow([row[field] for field in fields]) for row in rows)),
+                content_type='text/csv'
+            )
+            response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+            return response
+        
+        if export_format == 'xlsx':
+            from openpyxl import Workbook
+            
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet('General Ledger')
+            ws.append([f'General Ledger {date_from:%Y-%m-%d} to {date_to:%Y-%m-%d}'])
+            ws.append(fields)
+            for row in rows:
+                ws.append([row[field] for field in fields])
+            
+            output = tempfile.TemporaryFile()
+            wb.save(output)
+            output.seek(0)
+            return FileResponse(
+                output,
+                as_attachment=True,
+                filename=f'{filename}.xlsx',
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
+        
+        return JsonResponse({'error': 'export must be csv or xlsx'}, status=400)
 
 
 # Expense Management Views
@@ -3165,6 +3042,7 @@ class AccountsPayableCreateView(CreateView):
                 reference=self.object.reference_number,
                 description=f"Vendor Invoice: {self.object.vendor}",
                 status='POSTED',
+                period=self.object.period,
                 created_by=self.request.user
             )
             
@@ -3200,6 +3078,7 @@ class AccountsPayableCreateView(CreateView):
                 credit=self.object.total_amount,
                 description=f"Vendor Invoice: {self.object.vendor}"
             )
+            entry.update_period_balances()
             
             # Link journal entry to payable
             self.object.journal_entry = entry
@@ -3315,9 +3194,10 @@ class AccountsReceivableListView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Get unpaid invoices from the database
-        unpaid_invoices = Invoice.objects.filter(
-            status__in=['SENT', 'OVERDUE']
+        # Get unpaid invoices from the database, with paid and outstanding
+        # amounts computed in the same query
+        unpaid_invoices = AgingService.annotate_invoices(
+            Invoice.objects.filter(status__in=AgingService.RECEIVABLE_STATUSES)
         ).select_related('client').order_by('-due_date', '-created_at')
         
         # Handle search functionality
@@ -3367,14 +3247,19 @@ class AccountsReceivableListView(LoginRequiredMixin, TemplateView):
         context['clients'] = clients
         
         # Summary statistics
-        context['total_receivables'] = unpaid_invoices.count()
-        context['total_amount'] = unpaid_invoices.aggregate(
-            total=models.Sum('total')
-        )['total'] or Decimal('0.00')
-        context['overdue_count'] = unpaid_invoices.filter(status='OVERDUE').count()
-        context['overdue_amount'] = unpaid_invoices.filter(status='OVERDUE').aggregate(
-            total=models.Sum('total')
-        )['total'] or Decimal('0.00')
+        summary = unpaid_invoices.aggregate(
+            total_receivables=Count('id'),
+            total_amount=models.Sum('total'),
+            overdue_count=Count('id', filter=Q(status='OVERDUE')),
+            overdue_amount=models.Sum('total', filter=Q(status='OVERDUE'))
+        )
+        context['total_receivables'] = summary['total_receivables']
+        context['total_amount'] = summary['total_amount'] or Decimal('0.00')
+        context['overdue_count'] = summary['overdue_count']
+        context['overdue_amount'] = summary['overdue_amount'] or Decimal('0.00')
+        
+        # Outstanding balances by aging bucket for the filtered invoices
+        context['aging'] = AgingService.receivables(queryset=unpaid_invoices.order_by())
         
         return context
 
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
+from decimal import Decimal
 
 class Department(models.Model):
     name = models.CharField(max_length=100)
@@ -188,7 +189,7 @@ class TimeEntry(models.Model):
                 end_dt += timedelta(days=1)
             
             time_diff = end_dt - start_dt
-            self.hours_worked = round(time_diff.total_seconds() / 3600, 2)
+            self.hours_worked = Decimal(time_diff.total_seconds() / 3600).quantize(Decimal('0.01'))
         
         # Calculate billable amount if rate and hours are provided
         if self.billable_rate and self.hours_worked and self.is_billable:
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import DilisenseConfig, CapessoConfig, KYCProfile, KYCBusiness, KYCReport, Document
+from .models import DilisenseConfig, DilisenseCachedResponse, CapessoConfig, KYCProfile, KYCBusiness, KYCReport, Document, KYCScreeningJob
 
 @admin.register(DilisenseConfig)
 class DilisenseConfigAdmin(admin.ModelAdmin):
@@ -10,6 +10,13 @@ class DilisenseConfigAdmin(admin.ModelAdmin):
         # Only allow one configuration
         return not DilisenseConfig.objects.exists()
 
+@admin.register(DilisenseCachedResponse)
+class DilisenseCachedResponseAdmin(admin.ModelAdmin):
+    list_display = ['endpoint', 'query', 'hit_count', 'miss_count', 'fetched_at', 'expires_at', 'last_hit_at']
+    list_filter = ['endpoint', 'fetched_at']
+    search_fields = ['query']
+    readonly_fields = ['cache_key', 'fetched_at', 'last_hit_at']
+
 @admin.register(CapessoConfig)
 class CapessoConfigAdmin(admin.ModelAdmin):
     list_display = ['id', 'base_url', 'is_active', 'created_at', 'updated_at']
@@ -46,3 +53,9 @@ class DocumentAdmin(admin.ModelAdmin):
     list_display = ['document_type', 'status', 'upload_date', 'verification_date']
     list_filter = ['document_type', 'status', 'upload_date']
     readonly_fields = ['upload_date', 'verification_date']
+
+@admin.register(KYCScreeningJob)
+class KYCScreeningJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'job_type', 'status', 'total', 'processed', 'failed', 'workers', 'attempts', 'created_at', 'completed_at']
+    list_filter = ['job_type', 'status', 'created_at']
+    readonly_fields = ['created_at', 'started_at', 'heartbeat_at', 'completed_at']
@@ -1,12 +1,208 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import requests
+from django.conf import settings
+from django.db import connections
+from requests.adapters import HTTPAdapter
 from .models import DilisenseConfig
+from .services import DilisenseCacheService
 
 def get_dilisense_config():
     config = DilisenseConfig.objects.first()
     if not config:
         raise Exception("DILISense configuration not found. Please set up your API key in the admin.")
     return config
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows ``rate`` calls per second on average with bursts
+    of up to ``capacity`` calls. acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class DilisenseClient:
+    """
+    DILISense API client shared by the screening helpers. It keeps one pooled
+    requests.Session, caches the API key, throttles calls with a token bucket and
+    retries 429/5xx responses and connection errors with exponential backoff.
+    Responses go through DilisenseCacheService.
+
+    base_url, rate limit and retry settings come from settings.DILISENSE_* and can be
+    overridden per instance (e.g. to point at a local stand-in server in tests).
+    """
+
+    BASE_URL = "https://api.dilisense.com/v1"
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    CONFIG_CACHE_SECONDS = 300
+
+    def __init__(self, api_key=None, base_url=None, rate_limit=None, burst=None, max_retries=None,
+                 backoff=None, max_backoff=30, timeout=10, pool_size=None):
+        self.base_url = (base_url or getattr(settings, 'DILISENSE_BASE_URL', self.BASE_URL)).rstrip('/')
+        self.max_retries = max_retries if max_retries is not None else getattr(settings, 'DILISENSE_MAX_RETRIES', 4)
+        self.backoff = backoff if backoff is not None else getattr(settings, 'DILISENSE_BACKOFF', 0.5)
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.pool_size = pool_size or getattr(settings, 'DILISENSE_POOL_SIZE', 10)
+
+        rate_limit = rate_limit or getattr(settings, 'DILISENSE_RATE_LIMIT', 5)
+        self.bucket = TokenBucket(rate_limit, burst or getattr(settings, 'DILISENSE_BURST', None))
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        self._api_key = api_key
+        self._fixed_api_key = api_key is not None
+        self._api_key_loaded_at = time.monotonic() if api_key else None
+        self._lock = threading.Lock()
+
+    @property
+    def api_key(self):
+        """The configured API key, re-read from DilisenseConfig at most every CONFIG_CACHE_SECONDS"""
+        if self._fixed_api_key:
+            return self._api_key
+        with self._lock:
+            if self._api_key is None or time.monotonic() - self._api_key_loaded_at > self.CONFIG_CACHE_SECONDS:
+                self._api_key = get_dilisense_config().api_key
+                self._api_key_loaded_at = time.monotonic()
+            return self._api_key
+
+    def is_configured(self):
+        try:
+            return bool(self.api_key)
+        except Exception:
+            return False
+
+    def retry_delay(self, attempt, response=None):
+        """Seconds to wait before retry ``attempt`` (0-based), honouring Retry-After"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(self.max_backoff, int(retry_after))
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return delay + random.uniform(0, delay / 10)
+
+    def request(self, endpoint, params=None):
+        """GET an endpoint and return its JSON, retrying throttled and failed calls"""
+        url = f"{self.base_url}/{endpoint}"
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                response = self.session.get(
+                    url, params=params, headers={"x-api-key": self.api_key}, timeout=self.timeout
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self.retry_delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code in self.RETRY_STATUSES and attempt < self.max_retries:
+                time.sleep(self.retry_delay(attempt, response))
+                attempt += 1
+                continue
+
+            response.raise_for_status()
+            return response.json()
+
+    def cached_request(self, endpoint, params=None, refresh=False):
+        params = {name: value for name, value in (params or {}).items() if value not in (None, '')}
+        return DilisenseCacheService.fetch(
+            endpoint, params, lambda: self.request(endpoint, params), refresh=refresh
+        )
+
+    def check_individual(self, names=None, search_all=None, fuzzy_search=None, dob=None, gender=None,
+                         includes=None, refresh=False):
+        params = {"search_all": search_all} if search_all else {"names": names}
+        params.update({"fuzzy_search": fuzzy_search, "dob": dob, "gender": gender, "includes": includes})
+        return self.cached_request("checkIndividual", params, refresh=refresh)
+
+    def check_entity(self, search_all=None, names=None, fuzzy_search=None, includes=None, refresh=False):
+        params = {"search_all": search_all} if search_all else {"names": names}
+        params.update({"fuzzy_search": fuzzy_search, "includes": includes})
+        return self.cached_request("checkEntity", params, refresh=refresh)
+
+    def generate_entity_report(self, names, includes=None, refresh=False):
+        return self.cached_request("generateEntityReport", {"names": names, "includes": includes}, refresh=refresh)
+
+    def list_sources(self, refresh=False):
+        return self.cached_request("listSources", refresh=refresh)
+
+    def check_many(self, names, endpoint="checkIndividual", workers=None, **params):
+        """
+        Check many names concurrently, all calls sharing the client's rate limit.
+        Returns {name: response or the exception raised for that name}.
+        """
+        check = self.check_entity if endpoint == "checkEntity" else self.check_individual
+        names = list(dict.fromkeys(names))
+
+        def run(name):
+            try:
+                return check(names=name, **params)
+            finally:
+                connections.close_all()
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers or self.pool_size, thread_name_prefix='dilisense') as executor:
+            futures = {executor.submit(run, name): name for name in names}
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    results[futures[future]] = e
+        return results
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_dilisense_client():
+    """Process-wide DilisenseClient, so every caller shares one connection pool and rate limit"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = DilisenseClient()
+        return _client
+
+
+def reset_dilisense_client():
+    """Drop the shared client, e.g. after the API key has been changed"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
 ###########################################################################################################
 
 # views.py
@@ -39,28 +235,18 @@ def check_individual(request):
         })
     
     # 2) Make sure we have a DilisenseConfig with an API key
-    config = DilisenseConfig.objects.first()
-    if not config:
+    client = get_dilisense_client()
+    if not client.is_configured():
         return render(request, 'check_individual.html', {
             'error': "DILISense API key not configured. Please set up DILISense configuration."
         })
     
-    # 3) Prepare DILISense request (names= query)
-    url = "https://api.dilisense.com/v1/checkIndividual"
-    params = {
-        "names": query,  # searching only the name fields
-        # We do NOT add includes= source_type here, because we plan to filter afterwards
-    }
-    headers = {
-        "x-api-key": config.api_key,
-        "Content-Type": "application/json"
-    }
-    
     try:
-        # 4) Call DILISense
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        response.raise_for_status()
-        results = response.json()  # e.g. { 'total_hits': X, 'found_records': [...] }
+        # 3) Call DILISense checkIndividual (names= query), served from the response cache unless ?refresh=1
+        # We do NOT add includes= source_type here, because we plan to filter afterwards
+        results = client.check_individual(
+            names=query, refresh=request.GET.get('refresh') == '1'
+        )  # e.g. { 'total_hits': X, 'found_records': [...] }
 
         # 5) If there's an error or no 'found_records' in the data, handle it
         if 'found_records' not in results:
@@ -252,60 +438,27 @@ def _generate_pdf_with_reportlab(results, query, source_type, screening_time):
 
 ##########################################################################################################
 
-def check_entity(search_all=None, names=None, fuzzy_search=None, includes=None):
+def check_entity(search_all=None, names=None, fuzzy_search=None, includes=None, refresh=False):
     """
     Calls the DILISense checkEntity endpoint.
+    Responses are cached; pass refresh=True to force a new API call.
     """
-    config = get_dilisense_config()
-    url = "https://api.dilisense.com/v1/checkEntity"
-    params = {}
-    if search_all:
-        params["search_all"] = search_all
-    elif names:
-        params["names"] = names
-    if fuzzy_search:
-        params["fuzzy_search"] = fuzzy_search
-    if includes:
-        params["includes"] = includes
-
-    headers = {
-        "x-api-key": config.api_key,
-        "Content-Type": "application/json"
-    }
-    response = requests.get(url, params=params, headers=headers, timeout=10)
-    response.raise_for_status()
-    return response.json()
-
-def generate_entity_report(names, includes=None):
+    return get_dilisense_client().check_entity(
+        search_all=search_all, names=names, fuzzy_search=fuzzy_search, includes=includes, refresh=refresh
+    )
+
+def generate_entity_report(names, includes=None, refresh=False):
     """
     Calls the DILISense generateEntityReport endpoint.
     Returns a Base64 encoded PDF report.
+    Responses are cached; pass refresh=True to force a new API call.
     """
-    config = get_dilisense_config()
-    url = "https://api.dilisense.com/v1/generateEntityReport"
-    params = {"names": names}
-    if includes:
-        params["includes"] = includes
-
-    headers = {
-        "x-api-key": config.api_key,
-        "Content-Type": "application/json"
-    }
-    response = requests.get(url, params=params, headers=headers, timeout=10)
-    response.raise_for_status()
-    return response.json()
-
-def list_sources():
+    return get_dilisense_client().generate_entity_report(names, includes=includes, refresh=refresh)
+
+def list_sources(refresh=False):
     """
     Calls the DILISense listSources endpoint.
     Returns the available sources as JSON.
+    Responses are cached; pass refresh=True to force a new API call.
     """
-    config = get_dilisense_config()
-    url = "https://api.dilisense.com/v1/listSources"
-    headers = {
-        "x-api-key": config.api_key,
-        "Content-Type": "application/json"
-    }
-    response = requests.get(url, headers=headers, timeout=10)
-    response.raise_for_status()
-    return response.json()
+    return get_dilisense_client().list_sources(refresh=refresh)
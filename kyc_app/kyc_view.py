@@ -3,8 +3,10 @@ import json
 from datetime import timedelta, timezone
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, render
-from kyc_app import perform_kyc_screening
-from kyc_app.models import KYCProfile, KYCTestResult
+from django.urls import reverse
+from kyc_app.perform_kyc_screening import perform_kyc_screening
+from kyc_app.models import KYCProfile, KYCScreeningJob, KYCTestResult
+from kyc_app.services import KYCBatchScreeningService
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.utils.dateparse import parse_datetime
@@ -118,20 +120,19 @@ def run_individual_kyc(request, customer_id):
 def kyc_aml_screening(request):
     """
     View to manually trigger KYC AML screening on all KYC profiles.
+    The screening is queued for run_kyc_screening_worker; poll the status URL.
     """
     # Fetch all KYC profiles
-    sample_profiles = KYCProfile.objects.all()
+    profile_ids = list(KYCProfile.objects.values_list("pk", flat=True))
 
-    flagged_count = 0
-    for profile in sample_profiles:
-        result = perform_kyc_screening(profile.id_document_number)  # Run KYC screening
-        
-        if isinstance(result, str):
-            continue  # Skip if customer is not found
-        
-        flagged_count += 1  # Track number of KYC profiles processed
+    job = KYCBatchScreeningService.create_job(profile_ids, requested_by=request.user.username)
 
-    return JsonResponse({"status": "KYC AML screening completed", "profiles_checked": flagged_count})
+    return JsonResponse({
+        "status": "KYC AML screening queued",
+        "job_id": job.pk,
+        "profiles_queued": job.total,
+        "status_url": reverse("kyc_app:kyc_screening_job_status", args=[job.pk]),
+    }, status=202)
 
 
 ############################################################################################
@@ -177,20 +178,18 @@ def run_kyc_aml_screening(request):
             kyc_profiles = kyc_profiles.filter(created_at__lte=dt_end)
 
     # 5) Handle POST: Run screening for all profiles in date range
+    # Screening is queued for run_kyc_screening_worker; the page polls the job
     if request.method == "POST":
-        flagged_count = 0
-        for profile in kyc_profiles:
-            result = perform_kyc_screening(profile.id_document_number)
-            if isinstance(result, str):
-                # e.g. "Error: No customer found..."
-                continue
-            flagged_count += 1
+        profile_ids = list(kyc_profiles.values_list("pk", flat=True))
+        job = KYCBatchScreeningService.create_job(profile_ids, requested_by=request.user.username)
 
         # Return JSON
         return JsonResponse({
-            "status": "KYC AML screening completed",
-            "profiles_checked": flagged_count,
-        })
+            "status": "KYC AML screening queued",
+            "job_id": job.pk,
+            "profiles_queued": job.total,
+            "status_url": reverse("kyc_app:kyc_screening_job_status", args=[job.pk]),
+        }, status=202)
 
     # If GET request: Display suspicious results for the filtered KYCProfiles
     # 6) Gather all test results that belong to these KYC profiles
@@ -215,6 +214,28 @@ def run_kyc_aml_screening(request):
 
 
 
+@login_required
+def kyc_screening_job_status(request, job_id):
+    """
+    Progress of a batch KYC screening job, polled by the screening page.
+    """
+    job = get_object_or_404(KYCScreeningJob, pk=job_id)
+
+    return JsonResponse({
+        "job_id": job.pk,
+        "job_type": job.job_type,
+        "status": job.status,
+        "total": job.total,
+        "processed": job.processed,
+        "succeeded": job.succeeded,
+        "failed": job.failed,
+        "progress": job.progress_percentage,
+        "summary": job.summary,
+        "errors": job.errors[:20],
+        "error_message": job.error_message,
+    })
+
+
 ###########################################################################################
 
 from django.shortcuts import render, redirect
@@ -310,12 +331,14 @@ def api_check_entity(request):
     names = request.query_params.get("names")
     fuzzy_search = request.query_params.get("fuzzy_search")
     includes = request.query_params.get("includes")
+    refresh = request.query_params.get("refresh") == "1"
     try:
         result = check_entity(
             search_all=search_all,
             names=names,
             fuzzy_search=fuzzy_search,
-            includes=includes
+            includes=includes,
+            refresh=refresh
         )
         return Response(result)
     except Exception as e:
@@ -326,12 +349,14 @@ def api_check_entity(request):
 def api_generate_entity_report(request):
     names = request.query_params.get("names")
     includes = request.query_params.get("includes")
+    refresh = request.query_params.get("refresh") == "1"
     if not names:
         return Response({"error": "The 'names' parameter is required."}, status=400)
     try:
         result = generate_entity_report(
             names=names,
-            includes=includes
+            includes=includes,
+            refresh=refresh
         )
         return Response(result)
     except Exception as e:
@@ -341,7 +366,7 @@ def api_generate_entity_report(request):
 @permission_classes([IsAuthenticated])
 def api_list_sources(request):
     try:
-        result = list_sources()
+        result = list_sources(refresh=request.query_params.get("refresh") == "1")
         return Response(result)
     except Exception as e:
         return Response({"error": str(e)}, status=500)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from kyc_app.services import DilisenseCacheService
+
+
+class Command(BaseCommand):
+    help = 'Show DILISense response cache hit/miss counters and purge expired entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--purge',
+            action='store_true',
+            help='Delete expired cache entries',
+        )
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            deleted = DilisenseCacheService.purge_expired()
+            self.stdout.write(self.style.SUCCESS(f'Purged {deleted} expired DILISense cache entries.'))
+
+        stats = DilisenseCacheService.stats()
+        if not stats:
+            self.stdout.write('The DILISense response cache is empty.')
+            return
+
+        for row in stats:
+            calls = (row['hits'] or 0) + (row['misses'] or 0)
+            hit_rate = (row['hits'] or 0) / calls * 100 if calls else 0
+            self.stdout.write(
+                f"  {row['endpoint']}: {row['live_entries']}/{row['entries']} live entries, "
+                f"{row['hits']} hits, {row['misses']} misses ({hit_rate:.1f}% hit rate)"
+            )
@@ -1,4 +1,4 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 from kyc_app.services import KYCScreeningService
 
@@ -12,35 +12,57 @@ class Command(BaseCommand):
             action='store_true',
             help='Only display profiles that would be rescreened without actually performing the screening',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Number of concurrent screening workers (defaults to KYC_SCREENING_WORKERS)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Number of profiles handed to a worker at a time (defaults to KYC_SCREENING_CHUNK_SIZE)',
+        )
+        parser.add_argument(
+            '--processes',
+            action='store_true',
+            help='Use a process pool instead of a thread pool',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS(f'Starting KYC rescreening job at {timezone.now()}'))
         
         # Get profiles due for rescreening
-        profiles = KYCScreeningService.get_profiles_due_for_rescreening()
-        self.stdout.write(f'Found {len(profiles)} profiles due for rescreening')
+        due_count = KYCScreeningService.profiles_due_for_rescreening_queryset().count()
+        self.stdout.write(f'Found {due_count} profiles due for rescreening')
         
         # If dry run, just list the profiles
         if options['dry_run']:
-            for profile in profiles:
+            for profile in KYCScreeningService.get_profiles_due_for_rescreening():
                 self.stdout.write(f'  - {profile.full_name} (ID: {profile.customer_id})')
             self.stdout.write(self.style.SUCCESS('Dry run completed.'))
             return
         
         # Otherwise, run the rescreening
-        results = KYCScreeningService.run_automatic_rescreening()
+        job = KYCScreeningService.run_automatic_rescreening(
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            use_processes=options['processes'],
+        )
         
         # Output results
-        success_count = len([r for r in results if r['status'] == 'Success'])
-        error_count = len(results) - success_count
+        self.stdout.write(
+            f'Completed rescreening job #{job.pk} with {job.workers} workers: '
+            f'{job.succeeded} successful, {job.failed} errors '
+            f"in {job.summary.get('duration_seconds')}s"
+        )
         
-        self.stdout.write(f'Completed rescreening: {success_count} successful, {error_count} errors')
+        if job.status == 'FAILED':
+            raise CommandError(f'Rescreening job #{job.pk} failed: {job.error_message}')
         
         # Show error details if any
-        if error_count > 0:
+        if job.errors:
             self.stdout.write(self.style.WARNING('Error details:'))
-            for result in results:
-                if result['status'].startswith('Error'):
-                    self.stdout.write(f"  - {result['profile'].full_name}: {result['status']}")
+            for error in job.errors:
+                self.stdout.write(f"  - {error['customer_id'] or error['profile_id']}: {error['error']}")
         
         self.stdout.write(self.style.SUCCESS(f'Rescreening job completed at {timezone.now()}')) 
\ No newline at end of file
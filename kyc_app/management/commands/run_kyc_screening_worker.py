@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+from kyc_app.services import KYCBatchScreeningService
+
+
+class Command(BaseCommand):
+    help = 'Run queued KYC screening jobs in the background'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling for new jobs',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5.0,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=0,
+            help='Exit after running this many jobs (default: no limit)',
+        )
+        parser.add_argument(
+            '--processes',
+            action='store_true',
+            help='Use a process pool instead of a thread pool',
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        self.stdout.write('KYC screening worker started.')
+
+        try:
+            while not options['max_jobs'] or processed < options['max_jobs']:
+                job = KYCBatchScreeningService.process_next(use_processes=options['processes'])
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                processed += 1
+                if job.status == 'COMPLETED':
+                    self.stdout.write(self.style.SUCCESS(
+                        f'  Job #{job.pk}: {job.succeeded} screened, {job.failed} errors'
+                    ))
+                else:
+                    self.stdout.write(self.style.ERROR(f'  Job #{job.pk}: {job.error_message}'))
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'KYC screening worker stopped after {processed} jobs.'))
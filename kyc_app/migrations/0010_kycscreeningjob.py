@@ -0,0 +1,39 @@
+# Generated by Django 5.1.7 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kyc_app', '0009_capessoconfig'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KYCScreeningJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_type', models.CharField(choices=[('MANUAL', 'Manual Screening'), ('RESCREENING', 'Periodic Rescreening')], default='MANUAL', max_length=20)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('succeeded', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('workers', models.PositiveSmallIntegerField(default=1)),
+                ('chunk_size', models.PositiveIntegerField(default=1)),
+                ('errors', models.JSONField(blank=True, default=list, help_text='Per-profile screening errors')),
+                ('summary', models.JSONField(blank=True, default=dict, help_text='Aggregated screening outcome')),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('requested_by', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'KYC Screening Job',
+                'verbose_name_plural': 'KYC Screening Jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
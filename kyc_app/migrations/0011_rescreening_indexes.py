@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-17 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kyc_app', '0010_kycscreeningjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='kyctestresult',
+            index=models.Index(fields=['kyc_profile', '-created_at'], name='kyc_app_kyc_kyc_pro_ddf3f4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kycworkflowstate',
+            index=models.Index(fields=['current_state'], name='kyc_app_kyc_current_39fff6_idx'),
+        ),
+    ]
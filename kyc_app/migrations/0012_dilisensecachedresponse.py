@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kyc_app', '0011_rescreening_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DilisenseCachedResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(help_text='SHA-256 of endpoint and normalized parameters', max_length=64, unique=True)),
+                ('endpoint', models.CharField(max_length=50)),
+                ('query', models.CharField(blank=True, help_text='Normalized name searched, if any', max_length=255)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('response', models.JSONField(default=dict)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('miss_count', models.PositiveIntegerField(default=0)),
+                ('fetched_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'DILISense Cached Response',
+                'verbose_name_plural': 'DILISense Cached Responses',
+                'indexes': [models.Index(fields=['endpoint', 'expires_at'], name='kyc_app_dil_endpoin_659061_idx'), models.Index(fields=['expires_at'], name='kyc_app_dil_expires_9c7ff5_idx')],
+            },
+        ),
+    ]
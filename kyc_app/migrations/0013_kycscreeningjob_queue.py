@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-17 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kyc_app', '0012_dilisensecachedresponse'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kycscreeningjob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='kycscreeningjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='kycscreeningjob',
+            name='profile_ids',
+            field=models.JSONField(blank=True, default=list, help_text='Profiles the job screens'),
+        ),
+        migrations.AddIndex(
+            model_name='kycscreeningjob',
+            index=models.Index(fields=['status', 'created_at'], name='kyc_app_kyc_status_ae649a_idx'),
+        ),
+    ]
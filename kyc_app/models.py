@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
 from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth.models import User
@@ -114,6 +115,9 @@ class KYCWorkflowState(models.Model):
     class Meta:
         verbose_name = "KYC Workflow State"
         verbose_name_plural = "KYC Workflow States"
+        indexes = [
+            models.Index(fields=['current_state']),
+        ]
         constraints = [
             models.CheckConstraint(
                 check=models.Q(kyc_profile__isnull=False) | models.Q(business_kyc__isnull=False),
@@ -144,9 +148,16 @@ class KYCWorkflowState(models.Model):
             return self.business_kyc.business_id
         return "Unknown"
     
-    def transition_to(self, new_state, user=None, notes=None):
+    # Fields written by transition_to, for bulk_update of many transitions
+    TRANSITION_FIELDS = [
+        'current_state', 'history', 'updated_at', 'last_modified_by', 'reviewer_notes',
+        'days_in_current_state', 'approved_by', 'approval_date', 'next_review_date', 'screening_date',
+    ]
+
+    def transition_to(self, new_state, user=None, notes=None, commit=True):
         """
-        Transition the KYC profile to a new state, recording the history
+        Transition the KYC profile to a new state, recording the history.
+        With commit=False the change is not saved, so callers can bulk_update many states.
         """
         if new_state not in [choice[0] for choice in self.STATE_CHOICES]:
             raise ValueError(f"Invalid state: {new_state}")
@@ -188,7 +199,8 @@ class KYCWorkflowState(models.Model):
         if new_state == 'SCREENING':
             self.screening_date = timezone.now()
         
-        self.save()
+        if commit:
+            self.save()
         return True
 
 class KYCProfile(models.Model):
@@ -372,6 +384,12 @@ class KYCTestResult(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)  # KYC test result timestamp
     updated_at = models.DateTimeField(auto_now=True)  # Auto-updates on modification
 
+    class Meta:
+        indexes = [
+            # Latest result per profile (rescreening selection)
+            models.Index(fields=['kyc_profile', '-created_at']),
+        ]
+
     def __str__(self):
         return f"KYC Test for {self.kyc_profile.full_name} - Risk: {self.risk_level}"
 
@@ -397,6 +415,41 @@ class DilisenseConfig(models.Model):
         return f"DILISense Config - {self.created_at.strftime('%Y-%m-%d')}"
 
 
+class DilisenseCachedResponse(models.Model):
+    """
+    DILISense API response cached per endpoint, normalized query and parameters.
+    hit_count counts answers served from the cache (front-cache hits are written in
+    batches), miss_count the API calls made.
+    """
+    cache_key = models.CharField(max_length=64, unique=True, help_text="SHA-256 of endpoint and normalized parameters")
+    endpoint = models.CharField(max_length=50)
+    query = models.CharField(max_length=255, blank=True, help_text="Normalized name searched, if any")
+    params = models.JSONField(default=dict, blank=True)
+    response = models.JSONField(default=dict)
+
+    hit_count = models.PositiveIntegerField(default=0)
+    miss_count = models.PositiveIntegerField(default=0)
+
+    fetched_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "DILISense Cached Response"
+        verbose_name_plural = "DILISense Cached Responses"
+        indexes = [
+            models.Index(fields=['endpoint', 'expires_at']),
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint}: {self.query or '-'} (expires {self.expires_at.strftime('%Y-%m-%d %H:%M')})"
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+
 class CapessoConfig(models.Model):
     """
     Model to store Capesso API configuration settings.
@@ -812,3 +865,101 @@ class Document(models.Model):
             return f"customer_{self.profile.customer_id}/{self.document_type}/{self.document_file.name.split('/')[-1]}"
         return None
 
+
+
+class KYCScreeningJob(models.Model):
+    """
+    Tracks a batch KYC screening run (manual or scheduled rescreening).
+    Workers update the counters as chunks complete so progress can be polled.
+    """
+    JOB_TYPE_CHOICES = [
+        ('MANUAL', 'Manual Screening'),
+        ('RESCREENING', 'Periodic Rescreening'),
+    ]
+
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+
+    job_type = models.CharField(max_length=20, choices=JOB_TYPE_CHOICES, default='MANUAL')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+
+    # Progress counters
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    succeeded = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+
+    # Pool configuration
+    workers = models.PositiveSmallIntegerField(default=1)
+    chunk_size = models.PositiveIntegerField(default=1)
+
+    # Queue state (see run_kyc_screening_worker)
+    profile_ids = models.JSONField(default=list, blank=True, help_text="Profiles the job screens")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    # Results
+    errors = models.JSONField(default=list, blank=True, help_text="Per-profile screening errors")
+    summary = models.JSONField(default=dict, blank=True, help_text="Aggregated screening outcome")
+    error_message = models.TextField(null=True, blank=True)
+
+    # Metadata
+    requested_by = models.CharField(max_length=100, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "KYC Screening Job"
+        verbose_name_plural = "KYC Screening Jobs"
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.get_job_type_display()} #{self.pk} - {self.get_status_display()} ({self.processed}/{self.total})"
+
+    @property
+    def progress_percentage(self):
+        if not self.total:
+            return 100 if self.status == 'COMPLETED' else 0
+        return int((self.processed / self.total) * 100)
+
+    # A running job whose worker has not reported for this long is considered dead
+    STALE_AFTER = timezone.timedelta(minutes=15)
+    MAX_ATTEMPTS = 3
+
+    @classmethod
+    def claim_next(cls):
+        """
+        Take the oldest pending job off the queue and mark it running.
+
+        Jobs left RUNNING by a worker that stopped sending heartbeats are claimed
+        again from the start, or failed once they have used up MAX_ATTEMPTS.
+        Rows locked by another worker are skipped. Returns None when there is
+        nothing to do.
+        """
+        now = timezone.now()
+        stale = Q(status='RUNNING', heartbeat_at__lt=now - cls.STALE_AFTER)
+        with transaction.atomic():
+            cls.objects.filter(stale, attempts__gte=cls.MAX_ATTEMPTS).update(
+                status='FAILED',
+                error_message='Screening worker stopped responding',
+                completed_at=now,
+            )
+            job = cls.objects.select_for_update(skip_locked=True).filter(
+                Q(status='PENDING') | stale
+            ).order_by('created_at', 'id').first()
+            if job is None:
+                return None
+
+            job.status = 'RUNNING'
+            job.attempts += 1
+            job.started_at = now
+            job.heartbeat_at = now
+            job.processed = job.succeeded = job.failed = 0
+            job.save(update_fields=['status', 'attempts', 'started_at', 'heartbeat_at', 'processed', 'succeeded', 'failed'])
+            return job
@@ -18,6 +18,8 @@ class SanctionsList:
 class WatchlistEntry:
     pass
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Q
 from django.utils.timezone import make_aware, now
 from .risk_scoring import KYCRiskScorer
 
@@ -38,192 +40,290 @@ def perform_kyc_screening(identifier):
         if not kyc_profile:
             return f"Error: No customer found with ID '{identifier}'"
 
-        # ✅ Remove any existing KYCTestResult to prevent duplicates
-        KYCTestResult.objects.filter(kyc_profile__id_document_number=kyc_profile.id_document_number).delete()
-
-        flagged_reasons = []
-        enhanced_due_diligence = False
-
-        # ✅ 2. Initialize KYC Test Result
-        test_result = KYCTestResult(
-            kyc_profile=kyc_profile,
-            # ✅ Populate basic customer details
-            full_name=kyc_profile.full_name,
-            customer_id=kyc_profile.customer_id,
-            id_document_number=kyc_profile.id_document_number,
-            risk_level="Low",
-            politically_exposed_person=False,
-            sanctions_list_check=False,
-            watchlist_check=False,
-            adverse_media_check=False,
-            suspicious_activity_flag=False,
-            financial_crime_check=False,
-            fraud_check=False,
-            enhanced_due_diligence_required=False,
-            transaction_monitoring_required=False,
-            high_risk_country=False,
-            kyc_status="Pending",
-            verification_notes="",
-            reviewer="Automated System",
-            review_date=now()
-        )
-
-        # ✅ 3. Check Against **Blacklist**
-        blacklist_entry = BlacklistEntry.objects.filter(id_document_number=kyc_profile.id_document_number).first()
-        if blacklist_entry:
-            test_result.suspicious_activity_flag = True
-            flagged_reasons.append(f"Customer is blacklisted: {blacklist_entry.reason}")
-
-        # ✅ 4. Check Against **Sanctions List**
-        sanctions_match = SanctionsList.objects.filter(id_document_number=kyc_profile.id_document_number).first()
-        if sanctions_match:
-            test_result.sanctions_list_check = True
-            flagged_reasons.append(f"Customer found in sanctions list ({sanctions_match.sanctions_source}).")
-
-        # ✅ 5. Check Against **Watchlist**
-        watchlist_entry = WatchlistEntry.objects.filter(id_document_number=kyc_profile.id_document_number).first()
-        if watchlist_entry:
-            test_result.watchlist_check = True
-            flagged_reasons.append(f"Customer is on a watchlist: {watchlist_entry.reason}")
-
-        # ✅ 6. Check Against **Adverse Media**
-        adverse_media = AdverseMediaCheck.objects.filter(id_document_number=kyc_profile.id_document_number).first()
-        if adverse_media:
-            test_result.adverse_media_check = True
-            flagged_reasons.append(f"Customer has adverse media: {adverse_media.headline}.")
-
-        # ✅ 7. Check If Customer is a **Politically Exposed Person (PEP)**
-        pep_match = PoliticallyExposedPerson.objects.filter(id_document_number=kyc_profile.id_document_number).first()
-        if pep_match:
-            test_result.politically_exposed_person = True
-            test_result.enhanced_due_diligence_required = True
-            enhanced_due_diligence = True
-            flagged_reasons.append(f"Customer is a PEP: {pep_match.position}.")
-
-        # ✅ 8. Flag if Customer is from **High-Risk Countries**
-        high_risk_countries = ["North Korea", "Iran", "Syria", "Venezuela", "Yemen", "Libya", "Somalia"]
-        if kyc_profile.country in high_risk_countries:
-            test_result.high_risk_country = True
-            flagged_reasons.append(f"Customer from high-risk country: {kyc_profile.country}.")
-
-        # ✅ 9. Fraud & Financial Crime Checks (Using Past KYC Test Results)
-        past_kyc_results = KYCTestResult.objects.filter(kyc_profile=kyc_profile)
-        if past_kyc_results.filter(fraud_check=True).exists():
-            test_result.fraud_check = True
-            flagged_reasons.append("Previous fraud detected.")
-
-        if past_kyc_results.filter(financial_crime_check=True).exists():
-            test_result.financial_crime_check = True
-            flagged_reasons.append("Linked to financial crime cases.")
-
-        # ✅ 10. Use the risk scorer to calculate risk score and level
-        risk_scorer = KYCRiskScorer()
-        risk_assessment = risk_scorer.score_kyc_profile(kyc_profile, test_result)
-        
-        # Set the risk level based on the calculated score
-        test_result.risk_level = risk_assessment['risk_level']
-        
-        # Set KYC status based on risk level and checks
-        if test_result.sanctions_list_check or test_result.suspicious_activity_flag:
-            # Automatic rejection for sanctions or blacklist matches
-            test_result.kyc_status = "Rejected"
-        elif test_result.risk_level == "High" or enhanced_due_diligence:
-            # High risk or PEP requires enhanced due diligence
-            test_result.kyc_status = "Pending"
-            test_result.enhanced_due_diligence_required = True
-        elif test_result.risk_level == "Medium":
-            # Medium risk requires standard review
-            test_result.kyc_status = "Pending"
-        else:
-            # Low risk can be auto-approved
-            test_result.kyc_status = "Verified"
-        
-        # For any risk level, if there are certain flags, require transaction monitoring
-        if (test_result.politically_exposed_person or 
-            test_result.adverse_media_check or 
-            test_result.high_risk_country or
-            risk_assessment['overall_score'] > 50):
-            test_result.transaction_monitoring_required = True
-
-        # ✅ 11. Add risk score details to verification notes
-        risk_notes = [
-            f"Overall risk score: {risk_assessment['overall_score']}",
-            f"Risk level: {risk_assessment['risk_level']}",
-            "Risk factor scores:"
-        ]
-        
-        for factor, score in risk_assessment['risk_factors'].items():
-            risk_notes.append(f"- {factor}: {score}")
-        
-        # Combine all notes
-        all_notes = flagged_reasons + ["\n"] + risk_notes
-        test_result.verification_notes = "; ".join(flagged_reasons) + "\n\n" + "\n".join(risk_notes)
-        
-        # ✅ 12. Save Final KYC Test Result
-        test_result.save()
-
-        # ✅ 13. Update the workflow state if it exists
+        return perform_kyc_screening_batch([kyc_profile])[kyc_profile.pk]
+
+    except ObjectDoesNotExist:
+        return "Error: KYC profile not found."
+    except Exception as e:
+        return f"Error during KYC screening: {str(e)}"
+
+
+#######################################################################################################
+
+def fetch_list_hits(model, document_numbers):
+    """
+    Fetch the entries of one screening list for many document numbers in a single query.
+    Returns {id_document_number: first matching entry}.
+    """
+    hits = {}
+    for entry in model.objects.filter(id_document_number__in=document_numbers).order_by('pk'):
+        hits.setdefault(entry.id_document_number, entry)
+    return hits
+
+
+HIGH_RISK_COUNTRIES = ["North Korea", "Iran", "Syria", "Venezuela", "Yemen", "Libya", "Somalia"]
+
+
+def build_test_result(kyc_profile, hits, past_fraud, past_financial_crime, risk_scorer, reviewed_at):
+    """
+    Screen one profile against the pre-fetched list hits without writing anything.
+    Returns the unsaved KYCTestResult and the reasons it was flagged.
+    """
+    document_number = kyc_profile.id_document_number
+    flagged_reasons = []
+    enhanced_due_diligence = False
+
+    # ✅ 2. Initialize KYC Test Result
+    test_result = KYCTestResult(
+        kyc_profile=kyc_profile,
+        # ✅ Populate basic customer details
+        full_name=kyc_profile.full_name,
+        customer_id=kyc_profile.customer_id,
+        id_document_number=document_number,
+        risk_level="Low",
+        politically_exposed_person=False,
+        sanctions_list_check=False,
+        watchlist_check=False,
+        adverse_media_check=False,
+        suspicious_activity_flag=False,
+        financial_crime_check=False,
+        fraud_check=False,
+        enhanced_due_diligence_required=False,
+        transaction_monitoring_required=False,
+        high_risk_country=False,
+        kyc_status="Pending",
+        verification_notes="",
+        reviewer="Automated System",
+        review_date=reviewed_at
+    )
+
+    # ✅ 3. Check Against **Blacklist**
+    blacklist_entry = hits['blacklist'].get(document_number)
+    if blacklist_entry:
+        test_result.suspicious_activity_flag = True
+        flagged_reasons.append(f"Customer is blacklisted: {blacklist_entry.reason}")
+
+    # ✅ 4. Check Against **Sanctions List**
+    sanctions_match = hits['sanctions'].get(document_number)
+    if sanctions_match:
+        test_result.sanctions_list_check = True
+        flagged_reasons.append(f"Customer found in sanctions list ({sanctions_match.sanctions_source}).")
+
+    # ✅ 5. Check Against **Watchlist**
+    watchlist_entry = hits['watchlist'].get(document_number)
+    if watchlist_entry:
+        test_result.watchlist_check = True
+        flagged_reasons.append(f"Customer is on a watchlist: {watchlist_entry.reason}")
+
+    # ✅ 6. Check Against **Adverse Media**
+    adverse_media = hits['adverse_media'].get(document_number)
+    if adverse_media:
+        test_result.adverse_media_check = True
+        flagged_reasons.append(f"Customer has adverse media: {adverse_media.headline}.")
+
+    # ✅ 7. Check If Customer is a **Politically Exposed Person (PEP)**
+    pep_match = hits['pep'].get(document_number)
+    if pep_match:
+        test_result.politically_exposed_person = True
+        test_result.enhanced_due_diligence_required = True
+        enhanced_due_diligence = True
+        flagged_reasons.append(f"Customer is a PEP: {pep_match.position}.")
+
+    # ✅ 8. Flag if Customer is from **High-Risk Countries**
+    if kyc_profile.country in HIGH_RISK_COUNTRIES:
+        test_result.high_risk_country = True
+        flagged_reasons.append(f"Customer from high-risk country: {kyc_profile.country}.")
+
+    # ✅ 9. Fraud & Financial Crime Checks (Using Past KYC Test Results)
+    if kyc_profile.pk in past_fraud:
+        test_result.fraud_check = True
+        flagged_reasons.append("Previous fraud detected.")
+
+    if kyc_profile.pk in past_financial_crime:
+        test_result.financial_crime_check = True
+        flagged_reasons.append("Linked to financial crime cases.")
+
+    # ✅ 10. Use the risk scorer to calculate risk score and level
+    risk_assessment = risk_scorer.score_kyc_profile(kyc_profile, test_result)
+    
+    # Set the risk level based on the calculated score
+    test_result.risk_level = risk_assessment['risk_level']
+    
+    # Set KYC status based on risk level and checks
+    if test_result.sanctions_list_check or test_result.suspicious_activity_flag:
+        # Automatic rejection for sanctions or blacklist matches
+        test_result.kyc_status = "Rejected"
+    elif test_result.risk_level == "High" or enhanced_due_diligence:
+        # High risk or PEP requires enhanced due diligence
+        test_result.kyc_status = "Pending"
+        test_result.enhanced_due_diligence_required = True
+    elif test_result.risk_level == "Medium":
+        # Medium risk requires standard review
+        test_result.kyc_status = "Pending"
+    else:
+        # Low risk can be auto-approved
+        test_result.kyc_status = "Verified"
+    
+    # For any risk level, if there are certain flags, require transaction monitoring
+    if (test_result.politically_exposed_person or 
+        test_result.adverse_media_check or 
+        test_result.high_risk_country or
+        risk_assessment['overall_score'] > 50):
+        test_result.transaction_monitoring_required = True
+
+    # ✅ 11. Add risk score details to verification notes
+    risk_notes = [
+        f"Overall risk score: {risk_assessment['overall_score']}",
+        f"Risk level: {risk_assessment['risk_level']}",
+        "Risk factor scores:"
+    ]
+    
+    for factor, score in risk_assessment['risk_factors'].items():
+        risk_notes.append(f"- {factor}: {score}")
+    
+    test_result.verification_notes = "; ".join(flagged_reasons) + "\n\n" + "\n".join(risk_notes)
+
+    return test_result, flagged_reasons
+
+
+def perform_kyc_screening_batch(kyc_profiles):
+    """
+    Screens many KYC profiles with a constant number of queries: every screening list is
+    read once with an ``__in`` lookup, the test results, workflow states and alerts are
+    written with bulk operations.
+
+    All lookups and results are computed before anything is written, and the writes
+    (replacing the previous results, workflow states and alerts) happen in one
+    transaction, so a failure leaves every profile's screening history untouched. A
+    profile that cannot be screened gets an error without failing the rest.
+    Returns {profile pk: KYCTestResult, or an error message if its screening failed}.
+    """
+    kyc_profiles = list(kyc_profiles)
+    if not kyc_profiles:
+        return {}
+
+    try:
+        profile_ids = [profile.pk for profile in kyc_profiles]
+        document_numbers = [profile.id_document_number for profile in kyc_profiles]
+
+        # ✅ Fraud & financial crime flags from previous results, read before they are replaced
+        past_flags = KYCTestResult.objects.filter(kyc_profile_id__in=profile_ids).filter(
+            Q(fraud_check=True) | Q(financial_crime_check=True)
+        ).values_list('kyc_profile_id', 'fraud_check', 'financial_crime_check')
+        past_fraud = set()
+        past_financial_crime = set()
+        for profile_id, fraud_check, financial_crime_check in past_flags:
+            if fraud_check:
+                past_fraud.add(profile_id)
+            if financial_crime_check:
+                past_financial_crime.add(profile_id)
+
+        # ✅ One query per screening list for the whole batch
+        hits = {
+            'blacklist': fetch_list_hits(BlacklistEntry, document_numbers),
+            'sanctions': fetch_list_hits(SanctionsList, document_numbers),
+            'watchlist': fetch_list_hits(WatchlistEntry, document_numbers),
+            'adverse_media': fetch_list_hits(AdverseMediaCheck, document_numbers),
+            'pep': fetch_list_hits(PoliticallyExposedPerson, document_numbers),
+        }
+    except Exception as e:
+        # Nothing has been written yet, so the previous results are kept
+        return {profile.pk: f"Error during KYC screening: {str(e)}" for profile in kyc_profiles}
+
+    risk_scorer = KYCRiskScorer()
+    reviewed_at = now()
+
+    results = {}
+    test_results = []
+    reasons_by_profile = {}
+    for kyc_profile in kyc_profiles:
         try:
-            if hasattr(kyc_profile, 'workflow_state'):
-                # Map KYC status to workflow state
-                state_mapping = {
-                    'Verified': 'APPROVED',
-                    'Rejected': 'REJECTED',
-                    'Pending': 'APPROVAL_PENDING'
-                }
-                
+            test_result, flagged_reasons = build_test_result(
+                kyc_profile, hits, past_fraud, past_financial_crime, risk_scorer, reviewed_at
+            )
+        except Exception as e:
+            results[kyc_profile.pk] = f"Error during KYC screening: {str(e)}"
+            continue
+        test_results.append(test_result)
+        reasons_by_profile[kyc_profile.pk] = flagged_reasons
+
+    if not test_results:
+        return results
+
+    try:
+        with transaction.atomic():
+            # ✅ Replace the previous results of the screened profiles only
+            KYCTestResult.objects.filter(kyc_profile_id__in=list(reasons_by_profile)).delete()
+
+            # ✅ 12. Save all KYC Test Results at once
+            KYCTestResult.objects.bulk_create(test_results, batch_size=500)
+
+            # ✅ 13. Update the workflow states that exist
+            state_mapping = {
+                'Verified': 'APPROVED',
+                'Rejected': 'REJECTED',
+                'Pending': 'APPROVAL_PENDING'
+            }
+            results_by_profile = {test_result.kyc_profile_id: test_result for test_result in test_results}
+            workflow_states = list(KYCWorkflowState.objects.filter(kyc_profile_id__in=list(results_by_profile)))
+            for workflow_state in workflow_states:
+                test_result = results_by_profile[workflow_state.kyc_profile_id]
+
                 # Get the mapped state or default to APPROVAL_PENDING
                 new_state = state_mapping.get(test_result.kyc_status, 'APPROVAL_PENDING')
-                
+
                 # Add enhanced due diligence note if required
                 notes = f"Risk Level: {test_result.risk_level}"
                 if test_result.enhanced_due_diligence_required:
                     notes += "; Enhanced Due Diligence Required"
-                
-                # Transition the workflow state
-                kyc_profile.workflow_state.transition_to(
-                    new_state,
-                    user='Automated System',
-                    notes=notes
-                )
-        except Exception as e:
-            # Log the error but continue
-            print(f"Error updating workflow state: {str(e)}")
-
-        # ✅ 14. Create an alert if high risk
-        if test_result.risk_level == "High" or test_result.sanctions_list_check or test_result.suspicious_activity_flag:
-            severity = "HIGH"
-            title = "High-Risk KYC Profile"
-            message = "KYC Profile flagged as high risk. Please review."
-            
-            if test_result.sanctions_list_check:
-                title = "Sanctions Match Detected"
-                message = "Customer matches sanctions list. Immediate review required."
-            elif test_result.suspicious_activity_flag:
-                title = "Blacklisted Customer Detected"
-                message = "Customer found on blacklist. Immediate review required."
-            
-            Alert.objects.create(
-                alert_type="KYC",
-                severity=severity,
-                status="OPEN",
-                kyc_test=test_result,
-                title=title,
-                message=message
-            )
-        elif test_result.risk_level == "Medium" or test_result.politically_exposed_person:
-            Alert.objects.create(
-                alert_type="KYC",
-                severity="MEDIUM",
-                status="OPEN",
-                kyc_test=test_result,
-                title="Medium-Risk KYC Profile",
-                message=f"KYC Profile flagged as medium risk. {'; '.join(flagged_reasons)}"
+
+                workflow_state.transition_to(new_state, user='Automated System', notes=notes, commit=False)
+
+            KYCWorkflowState.objects.bulk_update(
+                workflow_states, KYCWorkflowState.TRANSITION_FIELDS, batch_size=500
             )
 
-        return test_result
+            # ✅ 14. Create alerts for high and medium risk results
+            alerts = []
+            for test_result in test_results:
+                if test_result.risk_level == "High" or test_result.sanctions_list_check or test_result.suspicious_activity_flag:
+                    severity = "HIGH"
+                    title = "High-Risk KYC Profile"
+                    message = "KYC Profile flagged as high risk. Please review."
 
-    except ObjectDoesNotExist:
-        return "Error: KYC profile not found."
+                    if test_result.sanctions_list_check:
+                        title = "Sanctions Match Detected"
+                        message = "Customer matches sanctions list. Immediate review required."
+                    elif test_result.suspicious_activity_flag:
+                        title = "Blacklisted Customer Detected"
+                        message = "Customer found on blacklist. Immediate review required."
+
+                    alerts.append(Alert(
+                        alert_type="KYC",
+                        severity=severity,
+                        status="OPEN",
+                        kyc_test=test_result,
+                        title=title,
+                        message=message
+                    ))
+                elif test_result.risk_level == "Medium" or test_result.politically_exposed_person:
+                    flagged_reasons = reasons_by_profile[test_result.kyc_profile_id]
+                    alerts.append(Alert(
+                        alert_type="KYC",
+                        severity="MEDIUM",
+                        status="OPEN",
+                        kyc_test=test_result,
+                        title="Medium-Risk KYC Profile",
+                        message=f"KYC Profile flagged as medium risk. {'; '.join(flagged_reasons)}"
+                    ))
+
+            if alerts:
+                Alert.objects.bulk_create(alerts, batch_size=500)
     except Exception as e:
-        return f"Error during KYC screening: {str(e)}"
+        # The transaction rolled back, so the previous results are kept
+        for profile_id in reasons_by_profile:
+            results[profile_id] = f"Error during KYC screening: {str(e)}"
+        return results
+
+    results.update(results_by_profile)
+    return results
@@ -1,116 +1,113 @@
+import hashlib
+import json
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
 from django.utils import timezone
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection, send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
-from django.db.models import Q
+from django.core.cache import caches
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
 
-from .models import KYCProfile, KYCTestResult, KYCWorkflowState
-from .perform_kyc_screening import perform_kyc_screening
+from .models import DilisenseCachedResponse, KYCProfile, KYCScreeningJob, KYCTestResult, KYCWorkflowState
+from .perform_kyc_screening import perform_kyc_screening, perform_kyc_screening_batch
 
 
 class KYCScreeningService:
     """Service class to handle KYC screening operations"""
     
     @staticmethod
-    def get_profiles_due_for_rescreening():
+    def profiles_due_for_rescreening_queryset():
         """
-        Get KYC profiles that are due for rescreening based on risk level and last screening date.
+        Queryset of KYC profiles that are due for rescreening based on risk level and last
+        screening date, resolved in one query by annotating each profile with its latest
+        test result.
         - High risk: Rescreen every 3 months
         - Medium risk: Rescreen every 6 months
         - Low risk: Rescreen every 12 months
+        - Never screened: Rescreen now
         """
         today = timezone.now().date()
         three_months_ago = today - timezone.timedelta(days=90)
         six_months_ago = today - timezone.timedelta(days=180)
         twelve_months_ago = today - timezone.timedelta(days=365)
-        
-        # Get profiles with an approved workflow state
-        profiles_with_state = KYCProfile.objects.filter(
+
+        latest_test = KYCTestResult.objects.filter(
+            kyc_profile=OuterRef('pk')
+        ).order_by('-created_at')
+
+        return KYCProfile.objects.filter(
             workflow_state__current_state='APPROVED'
-        ).select_related('workflow_state')
-        
-        # Construct query based on risk level and last screening date
-        profiles_due = []
-        
-        for profile in profiles_with_state:
-            # Get the latest test result for this profile
-            latest_test = KYCTestResult.objects.filter(
-                kyc_profile=profile
-            ).order_by('-created_at').first()
-            
-            if not latest_test:
-                profiles_due.append(profile)
-                continue
-            
-            # Check if profile is due for rescreening based on risk level
-            if latest_test.risk_level == 'High' and latest_test.created_at.date() <= three_months_ago:
-                profiles_due.append(profile)
-            elif latest_test.risk_level == 'Medium' and latest_test.created_at.date() <= six_months_ago:
-                profiles_due.append(profile)
-            elif latest_test.risk_level == 'Low' and latest_test.created_at.date() <= twelve_months_ago:
-                profiles_due.append(profile)
-        
-        return profiles_due
+        ).select_related('workflow_state').annotate(
+            latest_risk_level=Subquery(latest_test.values('risk_level')[:1]),
+            latest_screened_at=Subquery(latest_test.values('created_at')[:1]),
+        ).filter(
+            Q(latest_screened_at__isnull=True) |
+            Q(latest_risk_level='High', latest_screened_at__date__lte=three_months_ago) |
+            Q(latest_risk_level='Medium', latest_screened_at__date__lte=six_months_ago) |
+            Q(latest_risk_level='Low', latest_screened_at__date__lte=twelve_months_ago)
+        ).order_by('pk')
+
+    @staticmethod
+    def get_profiles_due_for_rescreening(chunk_size=2000):
+        """
+        Iterate over the KYC profiles that are due for rescreening, streaming them from
+        the database in chunks instead of loading them all.
+        """
+        return KYCScreeningService.profiles_due_for_rescreening_queryset().iterator(chunk_size=chunk_size)
     
     @staticmethod
-    def run_automatic_rescreening():
+    def apply_rescreening_result(profile, result, commit=True):
         """
-        Run automatic rescreening for all profiles that are due
+        Move a rescreened profile's workflow to the state implied by its new test result
         """
-        profiles = KYCScreeningService.get_profiles_due_for_rescreening()
-        results = []
-        
-        for profile in profiles:
-            # Update workflow state to indicate rescreening
-            if hasattr(profile, 'workflow_state'):
-                profile.workflow_state.transition_to(
-                    'SCREENING',
-                    user='Automated System',
-                    notes='Automated periodic rescreening'
-                )
-            
-            # Run the screening
-            result = perform_kyc_screening(profile.id_document_number)
-            
-            if not isinstance(result, str):  # If result is not an error message
-                # Update workflow state based on screening result
-                if hasattr(profile, 'workflow_state'):
-                    if result.kyc_status == 'Verified':
-                        profile.workflow_state.transition_to(
-                            'APPROVED',
-                            user='Automated System',
-                            notes=f'Automatic approval after rescreening. Risk level: {result.risk_level}'
-                        )
-                    elif result.kyc_status == 'Rejected':
-                        profile.workflow_state.transition_to(
-                            'REJECTED',
-                            user='Automated System',
-                            notes=f'Automatic rejection after rescreening. Risk level: {result.risk_level}'
-                        )
-                    else:
-                        profile.workflow_state.transition_to(
-                            'APPROVAL_PENDING',
-                            user='Automated System',
-                            notes=f'Manual review required after rescreening. Risk level: {result.risk_level}'
-                        )
-                
-                results.append({
-                    'profile': profile,
-                    'result': result,
-                    'status': 'Success'
-                })
-                
-                # Send notification about rescreening
-                KYCNotificationService.send_rescreening_notification(profile, result)
-            else:
-                # Log error
-                results.append({
-                    'profile': profile,
-                    'result': None,
-                    'status': f'Error: {result}'
-                })
-        
-        return results
+        if not hasattr(profile, 'workflow_state'):
+            return
+
+        if result.kyc_status == 'Verified':
+            profile.workflow_state.transition_to(
+                'APPROVED',
+                user='Automated System',
+                notes=f'Automatic approval after rescreening. Risk level: {result.risk_level}',
+                commit=commit
+            )
+        elif result.kyc_status == 'Rejected':
+            profile.workflow_state.transition_to(
+                'REJECTED',
+                user='Automated System',
+                notes=f'Automatic rejection after rescreening. Risk level: {result.risk_level}',
+                commit=commit
+            )
+        else:
+            profile.workflow_state.transition_to(
+                'APPROVAL_PENDING',
+                user='Automated System',
+                notes=f'Manual review required after rescreening. Risk level: {result.risk_level}',
+                commit=commit
+            )
+
+    @staticmethod
+    def run_automatic_rescreening(workers=None, chunk_size=None, use_processes=False):
+        """
+        Run automatic rescreening for all profiles that are due.
+        Returns the KYCScreeningJob that tracked the run.
+        """
+        profile_ids = list(
+            KYCScreeningService.profiles_due_for_rescreening_queryset().values_list('pk', flat=True)
+        )
+        job = KYCBatchScreeningService.create_job(
+            profile_ids,
+            job_type='RESCREENING',
+            requested_by='Automated System',
+            workers=workers,
+            chunk_size=chunk_size,
+            claimed=True,
+        )
+        KYCBatchScreeningService.run(job, profile_ids, use_processes=use_processes)
+        return job
     
     @staticmethod
     def check_expiring_documents(days_before=30):
@@ -135,12 +132,12 @@ class KYCNotificationService:
     """Service class to handle KYC-related notifications"""
     
     @staticmethod
-    def send_rescreening_notification(profile, test_result):
+    def build_rescreening_message(profile, test_result, connection=None):
         """
-        Send notification about KYC rescreening result
+        Build the email about a KYC rescreening result, or None if the profile has no email
         """
         if not profile.email:
-            return False
+            return None
             
         subject = f'KYC Rescreening Completed - {profile.full_name}'
         
@@ -151,21 +148,55 @@ class KYCNotificationService:
             message = f'Your KYC verification has been reviewed and requires attention. Please contact our compliance team.'
         else:
             message = f'Your KYC information is being reviewed by our compliance team.'
+
+        return EmailMessage(
+            subject,
+            message,
+            settings.DEFAULT_FROM_EMAIL,
+            [profile.email],
+            connection=connection,
+        )
+
+    @staticmethod
+    def send_rescreening_notification(profile, test_result):
+        """
+        Send notification about KYC rescreening result
+        """
+        email = KYCNotificationService.build_rescreening_message(profile, test_result)
+        if email is None:
+            return False
             
         # Try to send email
         try:
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [profile.email],
-                fail_silently=False,
-            )
+            email.send(fail_silently=False)
             return True
         except Exception as e:
             # Log error
             print(f"Error sending email to {profile.email}: {str(e)}")
             return False
+
+    @staticmethod
+    def send_rescreening_notifications(results):
+        """
+        Send rescreening emails for many (profile, test_result) pairs over a single
+        mail connection. Returns the number of messages sent.
+        """
+        connection = get_connection(fail_silently=False)
+        emails = [
+            email for email in (
+                KYCNotificationService.build_rescreening_message(profile, test_result, connection)
+                for profile, test_result in results
+            ) if email is not None
+        ]
+        if not emails:
+            return 0
+
+        try:
+            return connection.send_messages(emails) or 0
+        except Exception as e:
+            # Log error
+            print(f"Error sending {len(emails)} rescreening emails: {str(e)}")
+            return 0
     
     @staticmethod
     def send_document_expiry_notification(profile):
@@ -243,4 +274,413 @@ class KYCNotificationService:
         except Exception as e:
             # Log error
             print(f"Error sending email to {profile.email}: {str(e)}")
-            return False 
\ No newline at end of file
+            return False 
+
+class KYCBatchScreeningService:
+    """
+    Runs KYC screening over many profiles at once. Profiles are split into chunks
+    which are screened on a bounded thread (or process) pool; every worker uses its
+    own database connection and adds its chunk's counts to the KYCScreeningJob as
+    soon as the chunk finishes, so the job can be polled while it runs.
+    """
+
+    DEFAULT_WORKERS = 4
+    DEFAULT_CHUNK_SIZE = 100
+    MAX_RECORDED_ERRORS = 500
+
+    @staticmethod
+    def chunks(items, size):
+        """Yield consecutive slices of ``items`` holding at most ``size`` elements"""
+        for start in range(0, len(items), size):
+            yield items[start:start + size]
+
+    @staticmethod
+    def empty_summary():
+        return {
+            'processed': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'notifications_sent': 0,
+            'risk_levels': {},
+            'kyc_statuses': {},
+            'errors': [],
+        }
+
+    @staticmethod
+    def merge_summary(total, part):
+        """Add the counts of one chunk summary into the running total"""
+        for key, value in part.items():
+            if isinstance(value, dict):
+                for name, count in value.items():
+                    total[key][name] = total[key].get(name, 0) + count
+            elif isinstance(value, list):
+                total[key].extend(value)
+            else:
+                total[key] += value
+        return total
+
+    @staticmethod
+    def create_job(profile_ids, job_type='MANUAL', requested_by=None, workers=None, chunk_size=None, claimed=False):
+        """
+        Queue a pending screening job for the given profiles; run_kyc_screening_worker
+        picks it up. With ``claimed`` the job is created already RUNNING for a caller
+        that runs it inline, so no worker can claim it as well.
+        """
+        workers = workers or getattr(settings, 'KYC_SCREENING_WORKERS', KYCBatchScreeningService.DEFAULT_WORKERS)
+        chunk_size = chunk_size or getattr(settings, 'KYC_SCREENING_CHUNK_SIZE', KYCBatchScreeningService.DEFAULT_CHUNK_SIZE)
+
+        profile_ids = list(profile_ids)
+        now = timezone.now() if claimed else None
+        return KYCScreeningJob.objects.create(
+            job_type=job_type,
+            status='RUNNING' if claimed else 'PENDING',
+            attempts=1 if claimed else 0,
+            started_at=now,
+            heartbeat_at=now,
+            profile_ids=profile_ids,
+            total=len(profile_ids),
+            workers=max(1, workers),
+            chunk_size=max(1, chunk_size),
+            requested_by=requested_by,
+        )
+
+    @staticmethod
+    def screen_chunk(job_id, profile_ids, rescreening=False):
+        """
+        Screen one chunk of profiles as a single set-based batch and add its counts to
+        the job. For rescreening the workflow is moved through SCREENING and the
+        customer emails of the whole chunk are sent over one mail connection.
+        """
+        summary = KYCBatchScreeningService.empty_summary()
+        notifications = []
+
+        profiles = list(KYCProfile.objects.filter(pk__in=profile_ids).select_related('workflow_state'))
+        found = {profile.pk for profile in profiles}
+
+        if rescreening:
+            workflow_states = [profile.workflow_state for profile in profiles if hasattr(profile, 'workflow_state')]
+            for workflow_state in workflow_states:
+                workflow_state.transition_to(
+                    'SCREENING',
+                    user='Automated System',
+                    notes='Automated periodic rescreening',
+                    commit=False
+                )
+            KYCWorkflowState.objects.bulk_update(workflow_states, KYCWorkflowState.TRANSITION_FIELDS)
+
+        results = perform_kyc_screening_batch(profiles)
+
+        if rescreening:
+            # The screening moved the workflow states on; continue from the saved copies
+            fresh_states = KYCWorkflowState.objects.in_bulk(
+                [profile.pk for profile in profiles], field_name='kyc_profile_id'
+            )
+            for profile in profiles:
+                result = results[profile.pk]
+                if isinstance(result, str):
+                    continue
+                if profile.pk in fresh_states:
+                    profile.workflow_state = fresh_states[profile.pk]
+                KYCScreeningService.apply_rescreening_result(profile, result, commit=False)
+                notifications.append((profile, result))
+            KYCWorkflowState.objects.bulk_update(fresh_states.values(), KYCWorkflowState.TRANSITION_FIELDS)
+
+        for profile in profiles:
+            result = results[profile.pk]
+            if isinstance(result, str):
+                summary['failed'] += 1
+                summary['errors'].append({
+                    'profile_id': profile.pk,
+                    'customer_id': profile.customer_id,
+                    'error': result,
+                })
+                continue
+
+            summary['succeeded'] += 1
+            summary['risk_levels'][result.risk_level] = summary['risk_levels'].get(result.risk_level, 0) + 1
+            summary['kyc_statuses'][result.kyc_status] = summary['kyc_statuses'].get(result.kyc_status, 0) + 1
+
+        for profile_id in set(profile_ids) - found:
+            summary['failed'] += 1
+            summary['errors'].append({
+                'profile_id': profile_id,
+                'customer_id': None,
+                'error': 'KYC profile no longer exists',
+            })
+
+        if notifications:
+            summary['notifications_sent'] = KYCNotificationService.send_rescreening_notifications(notifications)
+
+        summary['processed'] = summary['succeeded'] + summary['failed']
+        KYCScreeningJob.objects.filter(pk=job_id).update(
+            processed=F('processed') + summary['processed'],
+            succeeded=F('succeeded') + summary['succeeded'],
+            failed=F('failed') + summary['failed'],
+            heartbeat_at=timezone.now(),
+        )
+        return summary
+
+    @staticmethod
+    def screen_chunk_in_worker(job_id, profile_ids, rescreening=False):
+        """Pool entry point: screen a chunk, then release the worker's database connection"""
+        try:
+            return KYCBatchScreeningService.screen_chunk(job_id, profile_ids, rescreening)
+        finally:
+            connections.close_all()
+
+    @staticmethod
+    def init_process_worker():
+        """Process pool initializer, needed when workers are spawned rather than forked"""
+        import django
+        django.setup()
+
+    @staticmethod
+    def run(job, profile_ids, use_processes=False):
+        """
+        Screen ``profile_ids`` for ``job`` and return the job with its final counters
+        and summary. A single worker (or a single chunk) runs inline.
+        """
+        rescreening = job.job_type == 'RESCREENING'
+        chunks = list(KYCBatchScreeningService.chunks(list(profile_ids), job.chunk_size))
+        summary = KYCBatchScreeningService.empty_summary()
+        started = time.monotonic()
+
+        job.status = 'RUNNING'
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at'])
+
+        try:
+            if job.workers <= 1 or len(chunks) <= 1:
+                for chunk in chunks:
+                    KYCBatchScreeningService.merge_summary(
+                        summary, KYCBatchScreeningService.screen_chunk(job.pk, chunk, rescreening)
+                    )
+            else:
+                if use_processes:
+                    # Forked workers must not inherit this process's open connections
+                    connections.close_all()
+                    executor = ProcessPoolExecutor(
+                        max_workers=job.workers,
+                        initializer=KYCBatchScreeningService.init_process_worker,
+                    )
+                else:
+                    executor = ThreadPoolExecutor(max_workers=job.workers, thread_name_prefix='kyc-screening')
+
+                with executor:
+                    futures = [
+                        executor.submit(KYCBatchScreeningService.screen_chunk_in_worker, job.pk, chunk, rescreening)
+                        for chunk in chunks
+                    ]
+                    for future in as_completed(futures):
+                        KYCBatchScreeningService.merge_summary(summary, future.result())
+        except Exception as e:
+            job.status = 'FAILED'
+            job.error_message = str(e)
+        else:
+            job.status = 'COMPLETED'
+
+        duration = time.monotonic() - started
+        summary['duration_seconds'] = round(duration, 2)
+        summary['profiles_per_second'] = round(summary['processed'] / duration, 2) if duration else None
+
+        job.errors = summary.pop('errors')[:KYCBatchScreeningService.MAX_RECORDED_ERRORS]
+        job.summary = summary
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'error_message', 'errors', 'summary', 'completed_at'])
+        job.refresh_from_db(fields=['processed', 'succeeded', 'failed'])
+        return job
+
+    @staticmethod
+    def process_next(use_processes=False):
+        """Claim the next queued job and run it. Returns the job, or None if the queue is empty"""
+        job = KYCScreeningJob.claim_next()
+        if job is not None:
+            KYCBatchScreeningService.run(job, job.profile_ids, use_processes=use_processes)
+        return job
+
+
+class DilisenseCacheService:
+    """
+    Caches DILISense API responses in the DilisenseCachedResponse table, optionally
+    fronted by a Django cache (settings.DILISENSE_CACHE_ALIAS). Entries are keyed by
+    endpoint, normalized query and parameters and live for a per-endpoint TTL.
+    """
+
+    # Seconds; override per endpoint with settings.DILISENSE_CACHE_TTL, 0 disables caching
+    DEFAULT_TTLS = {
+        'checkIndividual': 24 * 60 * 60,
+        'checkEntity': 24 * 60 * 60,
+        'generateEntityReport': 60 * 60,
+        'listSources': 7 * 24 * 60 * 60,
+    }
+
+    # Parameters that carry a searched name and are normalized before keying
+    QUERY_PARAMS = ('names', 'search_all')
+
+    KEY_PREFIX = 'dilisense'
+
+    # Hits served by the front cache are counted there and written to the table in batches
+    HIT_FLUSH_EVERY = 50
+
+    @staticmethod
+    def normalize_query(value):
+        """Case-fold, NFKC-normalize and collapse whitespace so equivalent searches share an entry"""
+        value = unicodedata.normalize('NFKC', str(value))
+        return ' '.join(value.casefold().split())
+
+    @staticmethod
+    def make_key(endpoint, params):
+        """
+        Return (cache_key, normalized query, normalized params) for an endpoint call.
+        Empty parameters are dropped so they do not split the cache.
+        """
+        normalized = {}
+        for name, value in (params or {}).items():
+            if value in (None, ''):
+                continue
+            if name in DilisenseCacheService.QUERY_PARAMS:
+                value = DilisenseCacheService.normalize_query(value)
+            else:
+                value = str(value).strip()
+            normalized[name] = value
+
+        query = ' | '.join(normalized[name] for name in DilisenseCacheService.QUERY_PARAMS if name in normalized)
+        payload = json.dumps({'endpoint': endpoint, 'params': normalized}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest(), query[:255], normalized
+
+    @staticmethod
+    def get_ttl(endpoint):
+        ttls = {**DilisenseCacheService.DEFAULT_TTLS, **getattr(settings, 'DILISENSE_CACHE_TTL', {})}
+        return ttls.get(endpoint, 0)
+
+    @staticmethod
+    def get_front_cache():
+        """The Django cache in front of the table, or None when not configured"""
+        alias = getattr(settings, 'DILISENSE_CACHE_ALIAS', None)
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def record_hit(cache_key, count=1):
+        DilisenseCachedResponse.objects.filter(cache_key=cache_key).update(
+            hit_count=F('hit_count') + count,
+            last_hit_at=timezone.now(),
+        )
+
+    @staticmethod
+    def take_front_hits(front, hits_key):
+        """Remove and return the hits counted in the front cache so far"""
+        pending = front.get(hits_key) or 0
+        if pending:
+            try:
+                front.decr(hits_key, pending)
+            except ValueError:
+                # The counter expired meanwhile; its hits are lost
+                return 0
+        return pending
+
+    @staticmethod
+    def record_front_hit(front, front_key, cache_key, ttl):
+        """
+        Count a front-cache hit without touching the database, writing the counted hits
+        to the table once HIT_FLUSH_EVERY have accumulated. Hits still counted when the
+        counter expires are lost, so hit_count may slightly undercount.
+        """
+        hits_key = f'{front_key}:hits'
+        front.add(hits_key, 0, ttl)
+        try:
+            hits = front.incr(hits_key)
+        except ValueError:
+            # Evicted between add and incr; record this hit directly
+            DilisenseCacheService.record_hit(cache_key)
+            return
+        if hits >= DilisenseCacheService.HIT_FLUSH_EVERY:
+            flushed = DilisenseCacheService.take_front_hits(front, hits_key)
+            if flushed:
+                DilisenseCacheService.record_hit(cache_key, flushed)
+
+    @staticmethod
+    def store(cache_key, endpoint, query, params, response, ttl):
+        """Save a fresh API response, counting the call as a miss"""
+        fetched_at = timezone.now()
+        values = {
+            'endpoint': endpoint,
+            'query': query,
+            'params': params,
+            'response': response,
+            'fetched_at': fetched_at,
+            'expires_at': fetched_at + timezone.timedelta(seconds=ttl),
+        }
+
+        updated = DilisenseCachedResponse.objects.filter(cache_key=cache_key).update(
+            miss_count=F('miss_count') + 1, **values
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    DilisenseCachedResponse.objects.create(cache_key=cache_key, miss_count=1, **values)
+            except IntegrityError:
+                # Another worker stored the same call first
+                DilisenseCachedResponse.objects.filter(cache_key=cache_key).update(
+                    miss_count=F('miss_count') + 1, **values
+                )
+
+    @staticmethod
+    def fetch(endpoint, params, loader, refresh=False):
+        """
+        Return the response for ``endpoint`` called with ``params``, calling ``loader()``
+        (which performs the real API request) only on a cache miss or when ``refresh``
+        forces the entry to be fetched again. Errors raised by the loader are not cached.
+        """
+        ttl = DilisenseCacheService.get_ttl(endpoint)
+        if not ttl:
+            return loader()
+
+        cache_key, query, normalized = DilisenseCacheService.make_key(endpoint, params)
+        front = DilisenseCacheService.get_front_cache()
+        front_key = f'{DilisenseCacheService.KEY_PREFIX}:{cache_key}'
+
+        if not refresh:
+            if front is not None:
+                response = front.get(front_key)
+                if response is not None:
+                    DilisenseCacheService.record_front_hit(front, front_key, cache_key, ttl)
+                    return response
+
+            entry = DilisenseCachedResponse.objects.filter(
+                cache_key=cache_key, expires_at__gt=timezone.now()
+            ).only('response', 'expires_at').first()
+            if entry is not None:
+                hits = 1
+                if front is not None:
+                    hits += DilisenseCacheService.take_front_hits(front, f'{front_key}:hits')
+                DilisenseCacheService.record_hit(cache_key, hits)
+                if front is not None:
+                    remaining = int((entry.expires_at - timezone.now()).total_seconds())
+                    if remaining > 0:
+                        front.set(front_key, entry.response, remaining)
+                return entry.response
+
+        response = loader()
+        DilisenseCacheService.store(cache_key, endpoint, query, normalized, response, ttl)
+        if front is not None:
+            front.set(front_key, response, ttl)
+        return response
+
+    @staticmethod
+    def stats():
+        """Cached entries and hit/miss totals per endpoint"""
+        now = timezone.now()
+        return list(
+            DilisenseCachedResponse.objects.values('endpoint').annotate(
+                entries=Count('id'),
+                live_entries=Count('id', filter=Q(expires_at__gt=now)),
+                hits=Sum('hit_count'),
+                misses=Sum('miss_count'),
+            ).order_by('endpoint')
+        )
+
+    @staticmethod
+    def purge_expired():
+        """Delete expired entries; returns the number removed"""
+        deleted, _ = DilisenseCachedResponse.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
@@ -1,3 +1,474 @@
-from django.test import TestCase
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import requests
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import perform_kyc_screening as screening
+from .dilisense import DilisenseClient, TokenBucket
+from .models import DilisenseCachedResponse, KYCProfile, KYCScreeningJob, KYCTestResult, KYCWorkflowState
+from .services import DilisenseCacheService, KYCBatchScreeningService, KYCScreeningService
+
+
+class StubDilisenseHandler(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the DILISense API. Replies with the queued
+    (status, headers) pairs in order, then with 200 and the request echoed back.
+    Names listed in ``rejected_names`` get a 400.
+    """
+    responses = []
+    rejected_names = set()
+    requests_seen = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        with self.lock:
+            self.requests_seen.append((url.path, params, self.headers.get('x-api-key')))
+            status, headers = self.responses.pop(0) if self.responses else (200, {})
+        if params.get('names') in self.rejected_names:
+            status = 400
+
+        body = json.dumps({'endpoint': url.path.rsplit('/', 1)[-1], 'params': params}).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Responses are not cached, so every call reaches the stub server
+@override_settings(DILISENSE_CACHE_TTL={'checkIndividual': 0, 'checkEntity': 0, 'listSources': 0})
+class DilisenseClientTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubDilisenseHandler)
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}/v1'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubDilisenseHandler.responses = []
+        StubDilisenseHandler.rejected_names = set()
+        StubDilisenseHandler.requests_seen = []
+
+    def make_client(self, **kwargs):
+        options = {'api_key': 'test-key', 'base_url': self.base_url, 'rate_limit': 1000, 'backoff': 0.01}
+        options.update(kwargs)
+        client = DilisenseClient(**options)
+        self.addCleanup(client.close)
+        return client
+
+    def test_retries_server_errors(self):
+        """5xx responses are retried until the call succeeds"""
+        StubDilisenseHandler.responses = [(503, {}), (500, {}), (502, {})]
+
+        result = self.make_client().check_individual(names='Jane Doe')
+
+        self.assertEqual(result['params']['names'], 'Jane Doe')
+        self.assertEqual(len(StubDilisenseHandler.requests_seen), 4)
+        self.assertEqual(StubDilisenseHandler.requests_seen[0][2], 'test-key')
+
+    def test_retries_rate_limited_calls_after_retry_after(self):
+        """A 429 is retried once the Retry-After delay has passed"""
+        StubDilisenseHandler.responses = [(429, {'Retry-After': '1'})]
+
+        started = time.monotonic()
+        result = self.make_client().check_individual(names='Jane Doe')
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.9)
+        self.assertEqual(result['endpoint'], 'checkIndividual')
+        self.assertEqual(len(StubDilisenseHandler.requests_seen), 2)
+
+    def test_retry_after_is_capped(self):
+        """Retry-After is honoured but never beyond max_backoff"""
+        client = self.make_client(max_backoff=5)
+        response = requests.Response()
+        response.headers['Retry-After'] = '2'
+        self.assertEqual(client.retry_delay(0, response), 2)
+        response.headers['Retry-After'] = '120'
+        self.assertEqual(client.retry_delay(0, response), 5)
+
+    def test_gives_up_after_max_retries(self):
+        """The last error is raised once the retries are used up"""
+        StubDilisenseHandler.responses = [(503, {})] * 5
+
+        with self.assertRaises(requests.HTTPError):
+            self.make_client(max_retries=2).check_individual(names='Jane Doe')
+        self.assertEqual(len(StubDilisenseHandler.requests_seen), 3)
+
+    def test_does_not_retry_client_errors(self):
+        """4xx responses other than 429 fail straight away"""
+        StubDilisenseHandler.responses = [(404, {})]
+
+        with self.assertRaises(requests.HTTPError):
+            self.make_client().check_individual(names='Jane Doe')
+        self.assertEqual(len(StubDilisenseHandler.requests_seen), 1)
+
+    def test_rate_limit_throttles_calls(self):
+        """Calls beyond the burst wait for the token bucket"""
+        client = self.make_client(rate_limit=20, burst=1)
+
+        started = time.monotonic()
+        for index in range(6):
+            client.check_individual(names=f'Person {index}')
+
+        # One call from the burst, then five more at 20 per second
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        self.assertEqual(len(StubDilisenseHandler.requests_seen), 6)
+
+    def test_check_many(self):
+        """check_many calls each distinct name once and reports failures per name"""
+        StubDilisenseHandler.rejected_names = {'Bad Name'}
+        names = ['Jane Doe', 'John Doe', 'Jane Doe', 'Bad Name']
+
+        results = self.make_client().check_many(names, workers=3)
+
+        self.assertEqual(set(results), {'Jane Doe', 'John Doe', 'Bad Name'})
+        self.assertEqual(results['John Doe']['params']['names'], 'John Doe')
+        self.assertIsInstance(results['Bad Name'], requests.HTTPError)
+        self.assertEqual(len(StubDilisenseHandler.requests_seen), 3)
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_burst_then_rate(self):
+        """The first ``capacity`` tokens are immediate, later ones arrive at ``rate`` per second"""
+        bucket = TokenBucket(rate=50, capacity=3)
+
+        started = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+        self.assertLess(time.monotonic() - started, 0.05)
+
+        for _ in range(5):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+
+def create_profile(number, **fields):
+    values = {
+        'customer_id': f'CUST{number:04d}',
+        'full_name': f'Customer {number}',
+        'nationality': 'Zimbabwean',
+        'id_document_number': f'ID{number:06d}',
+        'id_issued_country': 'Zimbabwe',
+        'email': f'customer{number}@example.com',
+        'phone_number': f'+26377{number:07d}',
+        'address': '1 Main Street',
+        'city': 'Harare',
+        'country': 'Zimbabwe',
+        'account_number': f'ACC{number:06d}',
+    }
+    values.update(fields)
+    return KYCProfile.objects.create(**values)
+
+
+class KYCScreeningQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('analyst', password='password')
+        self.client.force_login(self.user)
+        self.profiles = [create_profile(number) for number in range(3)]
+
+    def test_screening_view_queues_a_job(self):
+        """Triggering a screening only queues it; nothing is screened in the request"""
+        response = self.client.get(reverse('kyc_app:kyc_aml_screening'))
+
+        self.assertEqual(response.status_code, 202)
+        job = KYCScreeningJob.objects.get(pk=response.json()['job_id'])
+        self.assertEqual(job.status, 'PENDING')
+        self.assertEqual(sorted(job.profile_ids), sorted(profile.pk for profile in self.profiles))
+        self.assertEqual(job.processed, 0)
+
+    def test_worker_runs_queued_jobs(self):
+        """run_kyc_screening_worker claims the job and screens all its profiles"""
+        job = KYCBatchScreeningService.create_job([profile.pk for profile in self.profiles])
+
+        call_command('run_kyc_screening_worker', once=True, stdout=io.StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'COMPLETED')
+        self.assertEqual(job.processed, 3)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.heartbeat_at)
+        self.assertIsNone(KYCScreeningJob.claim_next())
+
+    def test_stale_running_job_is_reclaimed(self):
+        """A running job without a recent heartbeat is claimed again from the start"""
+        job = KYCBatchScreeningService.create_job([profile.pk for profile in self.profiles])
+        KYCScreeningJob.objects.filter(pk=job.pk).update(
+            status='RUNNING', attempts=1, processed=2,
+            heartbeat_at=timezone.now() - KYCScreeningJob.STALE_AFTER - timezone.timedelta(minutes=1),
+        )
+
+        claimed = KYCScreeningJob.claim_next()
+
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.attempts, 2)
+        self.assertEqual(claimed.processed, 0)
+
+    def test_running_job_with_recent_heartbeat_is_left_alone(self):
+        job = KYCBatchScreeningService.create_job([profile.pk for profile in self.profiles])
+        KYCScreeningJob.objects.filter(pk=job.pk).update(status='RUNNING', attempts=1, heartbeat_at=timezone.now())
+
+        self.assertIsNone(KYCScreeningJob.claim_next())
+
+    def test_stale_job_fails_after_max_attempts(self):
+        """A job whose worker keeps dying is failed instead of staying RUNNING forever"""
+        job = KYCBatchScreeningService.create_job([profile.pk for profile in self.profiles])
+        KYCScreeningJob.objects.filter(pk=job.pk).update(
+            status='RUNNING', attempts=KYCScreeningJob.MAX_ATTEMPTS,
+            heartbeat_at=timezone.now() - KYCScreeningJob.STALE_AFTER - timezone.timedelta(minutes=1),
+        )
+
+        self.assertIsNone(KYCScreeningJob.claim_next())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'FAILED')
+        self.assertTrue(job.error_message)
+
+    def test_inline_rescreening_job_cannot_be_claimed_by_a_worker(self):
+        """run_automatic_rescreening creates its job already running, so workers skip it"""
+        claims = []
+
+        def run(job, profile_ids, use_processes=False):
+            claims.append(KYCScreeningJob.claim_next())
+            return job
+
+        with mock.patch.object(KYCBatchScreeningService, 'run', side_effect=run):
+            job = KYCScreeningService.run_automatic_rescreening()
+
+        self.assertEqual(claims, [None])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'RUNNING')
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.heartbeat_at)
+
+
+class KYCBatchScreeningTests(TestCase):
+    def setUp(self):
+        self.profiles = [create_profile(number) for number in range(3)]
+        self.previous = [
+            KYCTestResult.objects.create(
+                kyc_profile=profile,
+                full_name=profile.full_name,
+                customer_id=profile.customer_id,
+                id_document_number=profile.id_document_number,
+                risk_level='Low',
+                kyc_status='Verified',
+                review_date=timezone.now(),
+            )
+            for profile in self.profiles
+        ]
+
+    def no_list_hits(self):
+        return mock.patch.object(screening, 'fetch_list_hits', return_value={})
+
+    def test_screens_every_profile(self):
+        with self.no_list_hits():
+            results = screening.perform_kyc_screening_batch(self.profiles)
+
+        self.assertEqual(set(results), {profile.pk for profile in self.profiles})
+        for profile in self.profiles:
+            self.assertIsInstance(results[profile.pk], KYCTestResult)
+            self.assertEqual(KYCTestResult.objects.filter(kyc_profile=profile).count(), 1)
+        self.assertFalse(KYCTestResult.objects.filter(pk__in=[result.pk for result in self.previous]).exists())
+
+    def test_failed_list_lookup_keeps_previous_results(self):
+        """A lookup failure reports every profile as failed and deletes nothing"""
+        with mock.patch.object(screening, 'fetch_list_hits', side_effect=RuntimeError('list unavailable')):
+            results = screening.perform_kyc_screening_batch(self.profiles)
+
+        self.assertTrue(all(isinstance(result, str) for result in results.values()))
+        self.assertEqual(
+            set(KYCTestResult.objects.values_list('pk', flat=True)), {result.pk for result in self.previous}
+        )
+
+    def test_bad_profile_does_not_fail_the_batch(self):
+        """A profile that cannot be scored gets an error; the others are screened"""
+        bad = self.profiles[1]
+        score = screening.KYCRiskScorer.score_kyc_profile
+
+        def failing_score(scorer, profile, test_result=None):
+            if profile.pk == bad.pk:
+                raise ValueError('cannot score')
+            return score(scorer, profile, test_result)
+
+        with self.no_list_hits(), mock.patch.object(screening.KYCRiskScorer, 'score_kyc_profile', failing_score):
+            results = screening.perform_kyc_screening_batch(self.profiles)
+
+        self.assertIn('cannot score', results[bad.pk])
+        self.assertTrue(KYCTestResult.objects.filter(pk=self.previous[1].pk).exists())
+        for profile in (self.profiles[0], self.profiles[2]):
+            self.assertIsInstance(results[profile.pk], KYCTestResult)
+
+    def test_failed_write_rolls_back(self):
+        """If a write fails the whole batch rolls back and the previous results stay"""
+        with self.no_list_hits(), mock.patch.object(
+            screening.KYCWorkflowState.objects, 'bulk_update', side_effect=RuntimeError('write failed')
+        ):
+            results = screening.perform_kyc_screening_batch(self.profiles)
+
+        self.assertTrue(all('write failed' in result for result in results.values()))
+        self.assertEqual(
+            set(KYCTestResult.objects.values_list('pk', flat=True)), {result.pk for result in self.previous}
+        )
+
+
+class KYCRescreeningDueTests(TestCase):
+    def setUp(self):
+        self.number = 0
+
+    def approved_profile(self, *results, state='APPROVED'):
+        """Create a profile in the given state with results as (risk_level, days_ago) pairs"""
+        self.number += 1
+        profile = create_profile(self.number)
+        KYCWorkflowState.objects.filter(kyc_profile=profile).update(current_state=state)
+        for risk_level, days_ago in results:
+            result = KYCTestResult.objects.create(
+                kyc_profile=profile,
+                full_name=profile.full_name,
+                customer_id=profile.customer_id,
+                id_document_number=profile.id_document_number,
+                risk_level=risk_level,
+                kyc_status='Verified',
+                review_date=timezone.now(),
+            )
+            KYCTestResult.objects.filter(pk=result.pk).update(
+                created_at=timezone.now() - timezone.timedelta(days=days_ago)
+            )
+        return profile
+
+    def test_due_set_follows_latest_risk_level_and_age(self):
+        """Only approved profiles whose latest result is past its risk interval, or never screened, are due"""
+        due = [
+            self.approved_profile(('High', 91)),
+            self.approved_profile(('Medium', 181)),
+            self.approved_profile(('Low', 366)),
+            self.approved_profile(),
+            self.approved_profile(('Low', 400), ('High', 100)),
+        ]
+        self.approved_profile(('High', 89))
+        self.approved_profile(('Medium', 179))
+        self.approved_profile(('Low', 364))
+        self.approved_profile(('High', 400), ('Low', 100))
+        self.approved_profile(('High', 400), state='DRAFT')
+        self.approved_profile(state='DRAFT')
+
+        queryset = KYCScreeningService.profiles_due_for_rescreening_queryset()
+
+        self.assertEqual(list(queryset.values_list('pk', flat=True)), [profile.pk for profile in due])
+
+
+@override_settings(DILISENSE_CACHE_TTL={'checkIndividual': 60})
+class DilisenseCacheServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def loader(self):
+        self.calls += 1
+        return {'total_hits': self.calls}
+
+    def fetch(self, names='John Smith', **kwargs):
+        return DilisenseCacheService.fetch('checkIndividual', {'names': names}, self.loader, **kwargs)
+
+    def entry(self):
+        return DilisenseCachedResponse.objects.get()
+
+    def test_cached_response_is_reused_until_it_expires(self):
+        self.assertEqual(self.fetch(), {'total_hits': 1})
+        self.assertEqual(self.fetch(), {'total_hits': 1})
+        self.assertEqual(self.calls, 1)
+
+        DilisenseCachedResponse.objects.update(expires_at=timezone.now() - timezone.timedelta(seconds=1))
+
+        self.assertEqual(self.fetch(), {'total_hits': 2})
+        entry = self.entry()
+        self.assertEqual((entry.hit_count, entry.miss_count), (1, 2))
+        self.assertGreater(entry.expires_at, timezone.now())
+
+    def test_refresh_bypasses_the_cache(self):
+        self.fetch()
+
+        self.assertEqual(self.fetch(refresh=True), {'total_hits': 2})
+        self.assertEqual(self.fetch(), {'total_hits': 2})
+        self.assertEqual(self.entry().miss_count, 2)
+
+    def test_equivalent_names_share_an_entry(self):
+        """Case and whitespace differences in the searched name hit the same entry"""
+        self.fetch('John Smith')
+        self.fetch('  JOHN   smith ')
+        self.fetch('john\tSmith')
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.entry().query, 'john smith')
+        self.fetch('Jane Smith')
+        self.assertEqual(self.calls, 2)
+
+    def test_loader_errors_are_not_cached(self):
+        def failing_loader():
+            raise requests.HTTPError('503 Server Error')
+
+        with self.assertRaises(requests.HTTPError):
+            DilisenseCacheService.fetch('checkIndividual', {'names': 'John Smith'}, failing_loader)
+
+        self.assertFalse(DilisenseCachedResponse.objects.exists())
+        self.assertEqual(self.fetch(), {'total_hits': 1})
+
+    @override_settings(DILISENSE_CACHE_TTL={'checkIndividual': 0})
+    def test_zero_ttl_disables_the_cache(self):
+        self.fetch()
+        self.fetch()
+
+        self.assertEqual(self.calls, 2)
+        self.assertFalse(DilisenseCachedResponse.objects.exists())
+
+    @override_settings(DILISENSE_CACHE_ALIAS='default')
+    def test_front_cache_hits_do_not_write_to_the_table(self):
+        """Front-cache hits are counted in the cache and flushed every HIT_FLUSH_EVERY hits"""
+        self.fetch()
+
+        with mock.patch.object(DilisenseCacheService, 'HIT_FLUSH_EVERY', 3):
+            with self.assertNumQueries(0):
+                self.fetch()
+                self.fetch()
+            self.assertEqual(self.entry().hit_count, 0)
+
+            with self.assertNumQueries(1):
+                self.fetch()
+            self.assertEqual(self.entry().hit_count, 3)
+        self.assertEqual(self.calls, 1)
+
+    @override_settings(DILISENSE_CACHE_ALIAS='default')
+    def test_table_hit_flushes_pending_front_cache_hits(self):
+        self.fetch()
+        self.fetch()
+        cache.delete(f'{DilisenseCacheService.KEY_PREFIX}:{self.entry().cache_key}')
+
+        self.fetch()
+
+        self.assertEqual(self.entry().hit_count, 2)
+        self.assertEqual(self.calls, 1)
@@ -1,7 +1,7 @@
 from django.urls import path
 
 from kyc_app.dilisense import check_individual, download_individual_report
-from kyc_app.kyc_view import api_check_entity, api_generate_entity_report, api_list_sources, generate_aml_kyc_report, kyc_aml_screening, kyc_search_view, register_kyc_Busi, register_kyc_profile, run_individual_kyc, run_kyc_aml_screening
+from kyc_app.kyc_view import api_check_entity, api_generate_entity_report, api_list_sources, generate_aml_kyc_report, kyc_aml_screening, kyc_screening_job_status, kyc_search_view, register_kyc_Busi, register_kyc_profile, run_individual_kyc, run_kyc_aml_screening
 
 from . import views
 
@@ -61,6 +61,7 @@ urlpatterns = [
     path('run-individual-kyc/<str:customer_id>/', run_individual_kyc, name='run_individual_kyc'),
     path('kyc-screening/', kyc_aml_screening, name='kyc_aml_screening'),
     path('run-kyc-aml-screening/', run_kyc_aml_screening, name='run_kyc_aml_screening'),
+    path('screening-jobs/<int:job_id>/', kyc_screening_job_status, name='kyc_screening_job_status'),
     
     # KYC Reports URLs
     path('aml-report-kyc/', generate_aml_kyc_report, name='aml_report_kyc'),
@@ -22,6 +22,7 @@ from .models import Document, KYCBusiness, KYCProfile, KYCReport, KYCTestResult,
 from .forms import KYCBusinessForm, KYCProfileForm
 from .services import KYCScreeningService
 from .perform_kyc_screening import perform_kyc_screening
+from .dilisense import reset_dilisense_client
 from django.core.files.base import ContentFile
 import tempfile
 from django.urls import reverse
@@ -3429,6 +3430,8 @@ def kyc_configurations(request):
                     # Create new configuration
                     DilisenseConfig.objects.create(api_key=api_key)
                     messages.success(request, 'DILISense configuration created successfully!')
+                # Make the shared client pick up the new key
+                reset_dilisense_client()
             else:
                 messages.error(request, 'API key is required.')
         